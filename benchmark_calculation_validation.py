@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Benchmark and golden-output check of calculation linkbase validation
+
+Compares the vectorized engine of src2.xbrl.calculation_validator with a
+reference implementation that checks one relationship and context at a time:
+
+- a synthetic calculation linkbase written as XML (several roles, prohibited
+  and repeated arcs, negative weights), loaded with load_calculation_arcs and
+  compared with the arcs it was generated from
+- random filings built on that linkbase: consistent sums with rounding,
+  injected errors, missing facts, duplicates (consistent and conflicting),
+  sign="-", scale, INF decimals and the zero and number word formats
+- the stored filings, checked against common US GAAP summation relationships
+  (fact files written before the sign attribute was extracted show negative
+  values as positive, so their cash flow totals are reported inconsistent)
+- larger synthetic filings, timed against the reference
+
+Exits with status 1 if any result differs from the reference.
+"""
+
+import sys
+import json
+import math
+import time
+import glob
+import random
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+from src2.xbrl.calculation_validator import (
+    concept_from_href, load_calculation_arcs, parse_fact_value, validate_calculations
+)
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/_xbrl_raw.json"
+
+# Common US GAAP summation relationships (parent, [(child, weight)])
+US_GAAP_CALCULATIONS = {
+    "http://example.com/role/BalanceSheet": [
+        ("us-gaap:Assets", [("us-gaap:AssetsCurrent", 1), ("us-gaap:AssetsNoncurrent", 1)]),
+        ("us-gaap:LiabilitiesAndStockholdersEquity", [("us-gaap:Liabilities", 1), ("us-gaap:StockholdersEquity", 1)]),
+        ("us-gaap:Liabilities", [("us-gaap:LiabilitiesCurrent", 1), ("us-gaap:LiabilitiesNoncurrent", 1)]),
+    ],
+    "http://example.com/role/IncomeStatement": [
+        ("us-gaap:GrossProfit", [("us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax", 1), ("us-gaap:CostOfGoodsAndServicesSold", -1)]),
+        ("us-gaap:OperatingIncomeLoss", [("us-gaap:GrossProfit", 1), ("us-gaap:OperatingExpenses", -1)]),
+        ("us-gaap:NetIncomeLoss", [("us-gaap:IncomeLossFromContinuingOperationsBeforeIncomeTaxesExtraordinaryItemsNoncontrollingInterest", 1), ("us-gaap:IncomeTaxExpenseBenefit", -1)]),
+    ],
+    "http://example.com/role/CashFlow": [
+        ("us-gaap:CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalentsPeriodIncreaseDecreaseIncludingExchangeRateEffect", [
+            ("us-gaap:NetCashProvidedByUsedInOperatingActivities", 1),
+            ("us-gaap:NetCashProvidedByUsedInInvestingActivities", 1),
+            ("us-gaap:NetCashProvidedByUsedInFinancingActivities", 1)
+        ]),
+    ],
+}
+
+
+def reference_validate(facts, arcs):
+    """Check each relationship in each context and unit with plain Python loops"""
+    relationships = {}
+    for arc in arcs:
+        key = (arc.get("role") or "", concept_from_href(arc["parent"]))
+        relationships.setdefault(key, []).append((concept_from_href(arc["child"]), float(arc.get("weight", 1.0))))
+    concepts = {parent for _, parent in relationships} | {child for items in relationships.values() for child, _ in items}
+
+    def half_unit(decimals):
+        return 0.0 if decimals == math.inf else 0.5 * 10.0 ** (-decimals)
+
+    columns = []
+    values = {}
+    conflicts = set()
+    for fact in facts:
+        if fact.get("name") not in concepts or not fact.get("unitRef") or not fact.get("contextRef"):
+            continue
+        parsed = parse_fact_value(fact)
+        if parsed is None:
+            continue
+        column = (fact["contextRef"], fact["unitRef"])
+        if column not in columns:
+            columns.append(column)
+        cell = (fact["name"], column)
+        if cell not in values:
+            values[cell] = parsed
+            continue
+        previous = values[cell]
+        if abs(previous[0] - parsed[0]) > half_unit(previous[1]) + half_unit(parsed[1]):
+            conflicts.add(cell)
+        if parsed[1] > previous[1]:
+            values[cell] = parsed
+    for cell in conflicts:
+        del values[cell]
+
+    result = {"checked": 0, "inconsistent": 0, "duplicate_conflicts": len(conflicts), "roles": {}, "inconsistencies": []}
+    for (role, parent), children in relationships.items():
+        counts = result["roles"].setdefault(role, {"relationships": 0, "checked": 0, "inconsistent": 0})
+        counts["relationships"] += 1
+        for column in columns:
+            if (parent, column) not in values:
+                continue
+            reported, parent_decimals = values[(parent, column)]
+            computed = 0.0
+            tolerance = half_unit(parent_decimals)
+            reported_children = 0
+            for child, weight in children:
+                if (child, column) in values:
+                    value, decimals = values[(child, column)]
+                    computed += weight * value
+                    tolerance += abs(weight) * half_unit(decimals)
+                    reported_children += 1
+            if not reported_children:
+                continue
+            tolerance += 1e-9 * max(abs(reported), abs(computed))
+            counts["checked"] += 1
+            result["checked"] += 1
+            if abs(reported - computed) > tolerance:
+                counts["inconsistent"] += 1
+                result["inconsistent"] += 1
+                result["inconsistencies"].append({
+                    "role": role, "concept": parent, "context": column[0], "unit": column[1],
+                    "reported": reported, "computed": computed, "children": reported_children
+                })
+    return result
+
+
+def same_result(result, expected):
+    """Whether the engine result matches the reference result"""
+    keys = ("checked", "inconsistent", "duplicate_conflicts", "roles")
+    if any(result[key] != expected[key] for key in keys):
+        return False
+    found = sorted(result["inconsistencies"], key=lambda i: (i["role"], i["concept"], i["context"], i["unit"]))
+    wanted = sorted(expected["inconsistencies"], key=lambda i: (i["role"], i["concept"], i["context"], i["unit"]))
+    if len(found) != len(wanted):
+        return False
+    for item, other in zip(found, wanted):
+        if any(item[key] != other[key] for key in ("role", "concept", "context", "unit", "children")):
+            return False
+        if not (math.isclose(item["reported"], other["reported"]) and
+                math.isclose(item["computed"], other["computed"], rel_tol=1e-9, abs_tol=1e-6)):
+            return False
+    return True
+
+
+def synthetic_calculations(rng, roles, relationships_per_role):
+    """Random summation trees: {role: [(parent, [(child, weight)])]} with shared leaf concepts"""
+    calculations = {}
+    for r in range(roles):
+        role = f"http://example.com/role/Statement{r}"
+        items = []
+        for p in range(relationships_per_role):
+            parent = f"ex:Total{r}x{p}"
+            children = [(f"ex:Item{rng.randint(0, relationships_per_role * 3)}", rng.choice([1, 1, 1, -1]))
+                        for _ in range(rng.randint(1, 6))]
+            # Nested totals of the same role
+            if p and rng.random() < 0.3:
+                children.append((f"ex:Total{r}x{rng.randint(0, p - 1)}", 1))
+            items.append((parent, list(dict.fromkeys(children))))
+        calculations[role] = items
+    return calculations
+
+
+def calculation_arcs(calculations):
+    """Arc dictionaries of summation trees, one per (role, parent, child)"""
+    arcs = []
+    for role, items in calculations.items():
+        for parent, children in items:
+            seen = set()
+            for child, weight in children:
+                if child not in seen:
+                    seen.add(child)
+                    arcs.append({"role": role, "parent": parent, "child": child, "weight": float(weight)})
+    return arcs
+
+
+def linkbase_xml(calculations):
+    """Calculation linkbase of summation trees, with a repeated and a prohibited arc per role"""
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">'
+    ]
+    for role, items in calculations.items():
+        lines.append(f'<link:calculationLink xlink:type="extended" xlink:role="{role}">')
+        locators = set()
+        arcs = []
+        for parent, children in items:
+            for concept in [parent] + [child for child, _ in children]:
+                if concept not in locators:
+                    locators.add(concept)
+                    lines.append(f'<link:loc xlink:type="locator" xlink:href="ex.xsd#{concept.replace(":", "_")}" '
+                                 f'xlink:label="loc_{concept.replace(":", "_")}"/>')
+            for child, weight in children:
+                arcs.append(f'<link:calculationArc xlink:type="arc" xlink:from="loc_{parent.replace(":", "_")}" '
+                            f'xlink:to="loc_{child.replace(":", "_")}" weight="{weight:.1f}" order="1"/>')
+        lines.extend(arcs)
+        # A repeated arc and an arc that is added and then prohibited
+        lines.append(arcs[0])
+        parent = items[0][0].replace(":", "_")
+        lines.append('<link:loc xlink:type="locator" xlink:href="ex.xsd#ex_Prohibited" xlink:label="loc_ex_Prohibited"/>')
+        lines.append(f'<link:calculationArc xlink:type="arc" xlink:from="loc_{parent}" xlink:to="loc_ex_Prohibited" weight="1"/>')
+        lines.append(f'<link:calculationArc xlink:type="arc" xlink:from="loc_{parent}" xlink:to="loc_ex_Prohibited" '
+                     f'weight="1" use="prohibited" priority="1"/>')
+        lines.append('</link:calculationLink>')
+    lines.append('</link:linkbase>')
+    return "\n".join(lines)
+
+
+def inline_fact(name, context, value, rng, decimals=-6):
+    """Fact dictionary as extracted from inline XBRL, showing the value in a random style"""
+    fact = {"name": name, "contextRef": context, "unitRef": "usd"}
+    if value == 0 and rng.random() < 0.3:
+        fact.update({"format": rng.choice(["ixt:fixed-zero", "ixt:zerodash"]), "value": "—", "decimals": str(decimals)})
+        return fact
+    if value < 0:
+        fact["sign"] = "-"
+    if decimals == "INF":
+        fact.update({"value": f"{abs(value):,.0f}", "decimals": "INF", "format": "ixt:num-dot-decimal"})
+        return fact
+    scale = -decimals if decimals < 0 else 0
+    shown = round(abs(value) / 10 ** scale, max(decimals, 0))
+    fact.update({"value": f"{shown:,}", "scale": str(scale), "decimals": str(decimals), "format": "ixt:num-dot-decimal"})
+    if rng.random() < 0.1:
+        del fact["decimals"]
+    return fact
+
+
+def synthetic_facts(calculations, contexts, rng):
+    """Facts of a filing following the summation trees, with errors, gaps and duplicates"""
+    facts = []
+    for c in range(contexts):
+        context = f"c-{c}"
+        values = {}
+
+        def value_of(concept):
+            if concept not in values:
+                values[concept] = rng.choice([0, rng.randint(-5000, 5000) * 10 ** 6, rng.randint(1, 99999) * 10 ** 3])
+            return values[concept]
+
+        for items in calculations.values():
+            for parent, children in items:
+                if parent not in values:
+                    values[parent] = sum(weight * value_of(child) for child, weight in children)
+        for concept, value in values.items():
+            if rng.random() < 0.1:
+                continue
+            if rng.random() < 0.05:
+                value += rng.choice([1, -1]) * rng.randint(1, 9) * 10 ** 6
+            decimals = rng.choice([-6, -6, -3, "INF"]) if value % 10 ** 6 else -6
+            if decimals != "INF" and value % 10 ** -decimals:
+                decimals = "INF"
+            facts.append(inline_fact(concept, context, value, rng, decimals))
+            if rng.random() < 0.03:
+                duplicate = value + (rng.randint(1, 5) * 10 ** 6 if rng.random() < 0.5 else 0)
+                facts.append(inline_fact(concept, context, duplicate, rng, decimals))
+        if rng.random() < 0.2:
+            facts.append({"name": "ex:Item1", "contextRef": context, "unitRef": "shares", "format": "ixt-sec:numwordsen",
+                          "value": rng.choice(["two", "none", "many"])})
+        facts.append({"name": "ex:Item2", "contextRef": context, "value": "Text block"})
+    rng.shuffle(facts)
+    return facts
+
+
+def stored_arcs():
+    """Arc dictionaries of US_GAAP_CALCULATIONS"""
+    return [
+        {"role": role, "parent": parent, "child": child, "weight": float(weight)}
+        for role, items in US_GAAP_CALCULATIONS.items()
+        for parent, children in items
+        for child, weight in children
+    ]
+
+
+def compare(facts, arcs):
+    """Engine and reference results and timings for one filing"""
+    start = time.perf_counter()
+    result = validate_calculations(facts, arcs, max_reported=sys.maxsize)
+    engine_time = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = reference_validate(facts, arcs)
+    reference_time = time.perf_counter() - start
+    return result, same_result(result, expected), engine_time, reference_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized calculation validation against the reference loops")
+    parser.add_argument("files", nargs="*", help=f"Raw XBRL fact files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--fuzz", type=int, default=300, help="Number of random filings to compare")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000],
+                        help="Relationships of the timed synthetic filings (20 roles, 40 contexts)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(0)
+    mismatches = 0
+
+    # Linkbase loading
+    calculations = synthetic_calculations(rng, 4, 30)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "ex_cal.xml"
+        path.write_text(linkbase_xml(calculations), encoding="utf-8")
+        loaded = load_calculation_arcs(path)
+    if loaded != calculation_arcs(calculations):
+        mismatches += 1
+    print(f"Linkbase loading:     {len(loaded):,} arcs, {'matches' if loaded == calculation_arcs(calculations) else 'DIFFERS'}")
+
+    # Random filings
+    inconsistent = checked = 0
+    for _ in range(args.fuzz):
+        calculations = synthetic_calculations(rng, rng.randint(1, 4), rng.randint(1, 25))
+        facts = synthetic_facts(calculations, rng.randint(1, 8), rng)
+        result, same, _, _ = compare(facts, calculation_arcs(calculations))
+        mismatches += not same
+        checked += result["checked"]
+        inconsistent += result["inconsistent"]
+    print(f"Random filings:       {args.fuzz:,} compared, {checked:,} checks, {inconsistent:,} inconsistent")
+
+    # Stored filings
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    arcs = stored_arcs()
+    checked = inconsistent = 0
+    engine_total = reference_total = 0.0
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            facts = json.load(f)
+        result, same, engine_time, reference_time = compare(facts, arcs)
+        mismatches += not same
+        checked += result["checked"]
+        inconsistent += result["inconsistent"]
+        engine_total += engine_time
+        reference_total += reference_time
+    if files:
+        print(f"Stored filings:       {len(files)}, {checked:,} checks, {inconsistent:,} inconsistent, "
+              f"engine {engine_total:.2f}s, reference {reference_total:.2f}s")
+
+    print()
+    print(f"{'Relationships':>13} {'Facts':>9} {'Checks':>9} {'Engine':>9} {'Reference':>10}")
+    for size in args.sizes:
+        calculations = synthetic_calculations(rng, 20, max(size // 20, 1))
+        facts = synthetic_facts(calculations, 40, rng)
+        result, same, engine_time, reference_time = compare(facts, calculation_arcs(calculations))
+        mismatches += not same
+        print(f"{size:>13,} {len(facts):>9,} {result['checked']:>9,} {engine_time:>8.3f}s {reference_time:>9.3f}s")
+
+    print(f"Mismatches:           {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark and golden-output check of the fused text normalizer
+
+For each stored filing, extracts the document text as the HTML text
+extractor does, normalizes it with clean_text_multipass (the previous
+multi-pass clean_text) and with normalize_text (the fused normalizer),
+checks that both give identical output and prints the timings. Random
+snippets built from whitespace, short tokens, hyphens, tags, page numbers
+and "Continued" markers are also compared, to cover the edge cases of the
+whitespace collapse that real filings rarely hit.
+
+Exits with status 1 if any output differs.
+"""
+
+import sys
+import time
+import glob
+import random
+import logging
+import argparse
+import warnings
+
+from bs4 import BeautifulSoup
+
+from src2.xbrl.text_normalizer import clean_text_multipass, normalize_text
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/*.htm"
+
+FUZZ_PIECES = [
+    " ", "  ", "\n", "\n\n", "\n\n\n", "\t", "\xa0", " \n ", "\n \n",
+    "a", "b", "ab", "word", "Word", "1", "12", "x-", "-", "- ", "-\n",
+    "<b>", "</p>", "<", ">", "(Continued)", "(continued)", "Continued",
+    "CONTINUED", "Page 3 of 9", "page 1 of 2", "(", ")"
+]
+
+
+def fuzz_cases(count, seed=0):
+    """Random snippets assembled from FUZZ_PIECES"""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 24))) for _ in range(count)]
+
+
+def timed(function, text, repeat):
+    """Best-of-repeat timing of function(text) and its output"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return output, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fused text normalizer against the multi-pass clean_text")
+    parser.add_argument("files", nargs="*", help=f"HTML filings (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per filing (best is kept)")
+    parser.add_argument("--fuzz", type=int, default=100000, help="Number of random snippets to compare")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    mismatches = 0
+
+    fuzz = fuzz_cases(args.fuzz)
+    for snippet in fuzz:
+        if clean_text_multipass(snippet) != normalize_text(snippet):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"Mismatch for snippet {snippet!r}: {clean_text_multipass(snippet)!r} != {normalize_text(snippet)!r}")
+    print(f"Random snippets: {len(fuzz):,} compared, {mismatches} mismatches")
+    print()
+
+    files = args.files or sorted(path for path in glob.glob(DEFAULT_PATTERN) if not path.endswith("index.htm"))
+    if not files:
+        print(f"No filings found (looked for {DEFAULT_PATTERN})")
+
+    totals = {"multipass": 0.0, "fused": 0.0}
+    if files:
+        print(f"{'Filing':32} {'Text':>8} {'Multi-pass':>11} {'Fused':>8} {'Speedup':>8} {'Identical':>10}")
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            soup = BeautifulSoup(f.read(), 'html.parser')
+        for script in soup(["script", "style"]):
+            script.extract()
+        text = soup.get_text()
+
+        expected, multipass_time = timed(clean_text_multipass, text, args.repeat)
+        output, fused_time = timed(normalize_text, text, args.repeat)
+        identical = output == expected
+        if not identical:
+            mismatches += 1
+
+        totals["multipass"] += multipass_time
+        totals["fused"] += fused_time
+        print(f"{path.split('/')[-1][:32]:32} {len(text) // 1024:>6}KB {multipass_time * 1000:>9.1f}ms "
+              f"{fused_time * 1000:>6.1f}ms {multipass_time / fused_time:>7.1f}x {str(identical):>10}")
+
+    if files:
+        print()
+        print(f"Filings:         {len(files)}")
+        print(f"Multi-pass:      {totals['multipass']:.3f}s")
+        print(f"Fused:           {totals['fused']:.3f}s")
+        print(f"Speedup:         {totals['multipass'] / totals['fused']:.1f}x")
+    print(f"Mismatches:      {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
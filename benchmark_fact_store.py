@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Backfill the numeric fact store and measure series queries
+
+Backfills a fact store (a fresh one by default) from the saved LLM files and
+their downloads, then queries the series of every concept of every company
+(facts without dimensions, one value per period) and prints the time per
+query against finding the same concept by reading the LLM files. Backfilling
+again checks that replacing a filing's facts stores the same rows.
+
+Exits with status 1 if the second backfill stores a different number of facts.
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import tempfile
+import statistics
+
+from src2.storage.fact_store import FactStore, backfill_from_outputs
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the numeric fact store and measure series queries")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--store", help="Fact store to fill (default: a temporary store)")
+    parser.add_argument("--downloads-dir", help="Downloads directory (default: FACT_STORE['downloads_dir'])")
+    parser.add_argument("--ticker", default="AAPL", help="Company of the printed series")
+    parser.add_argument("--concept", default="RevenueFromContractWithCustomerExcludingAssessedTax",
+                        help="Concept of the printed series")
+    args = parser.parse_args()
+
+    files = sorted(args.files or glob.glob(DEFAULT_PATTERN))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = FactStore(args.store or os.path.join(temp_dir, "facts.sqlite"))
+
+        result = backfill_from_outputs(store, files, downloads_dir=args.downloads_dir, skip_existing=False)
+        stats = store.stats()
+        print(f"Backfill: {result['filings']} filings, {result['facts']:,} facts in {result['time_seconds']:.2f}s; "
+              f"store {stats['facts']:,} facts of {stats['companies']} companies")
+        for skipped in result["skipped"]:
+            print(f"Skipped {skipped['path']}: {skipped['reason']}")
+
+        # Every concept of every company
+        tickers = sorted({filing["ticker"] for filing in store.filings()})
+        pairs = [(ticker, concept) for ticker in tickers for concept in store.concepts(ticker)]
+        timings = []
+        points = 0
+        for ticker, concept in pairs:
+            start = time.perf_counter()
+            points += len(store.query_series(ticker, concept))
+            timings.append(time.perf_counter() - start)
+        print(f"Series: {len(pairs):,} queries, {points:,} points; "
+              f"median {1000 * statistics.median(timings):.2f} ms, max {1000 * max(timings):.2f} ms per query")
+
+        # The same lookup by reading the LLM files of the company
+        start = time.perf_counter()
+        pattern = re.compile(rf'^@CONCEPT: (?:[\w-]+:)?{re.escape(args.concept)}\n', re.MULTILINE)
+        blocks = 0
+        for path in files:
+            if os.path.basename(path).startswith(f"{args.ticker}_"):
+                with open(path, 'r', encoding='utf-8') as f:
+                    blocks += len(pattern.findall(f.read()))
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        series = store.query_series(args.ticker, args.concept, months=3)
+        query_time = time.perf_counter() - start
+        print(f"{args.ticker} {args.concept}: LLM files {1000 * scan_time:.1f} ms ({blocks} fact blocks), "
+              f"store {1000 * query_time:.2f} ms ({len(series)} quarterly points)")
+        for point in series:
+            print(f"  {point['period_start']} to {point['period_end']}: {point['value']:,.0f} {point['unit']} "
+                  f"({point['accession']})")
+
+        again = backfill_from_outputs(store, files, downloads_dir=args.downloads_dir, skip_existing=False)
+        store.close()
+
+    print(f"Second backfill: {again['facts']:,} facts")
+    if again["facts"] != result["facts"]:
+        print("Mismatch: the second backfill stored a different number of facts")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
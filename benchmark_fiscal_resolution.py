@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk fiscal period resolution against per-filing resolution
+
+Resolves the same set of (ticker, period_end_date, filing_type) rows with
+fiscal_registry.determine_fiscal_period (one call per row) and with
+resolve_fiscal_periods (one vectorized pass), checks that both give the same
+fiscal years and periods, and prints the timings.
+"""
+
+import time
+import random
+import logging
+import argparse
+
+from src2.sec.fiscal.company_fiscal import fiscal_registry
+from src2.sec.fiscal.bulk_resolver import resolve_fiscal_periods
+from src2.sec.fiscal.calendar_generator import KNOWN_FISCAL_YEAR_END_RULES, generate_fiscal_calendar
+
+
+def build_rows(count, seed=0):
+    """Build random rows from the pre-defined companies' calendars, with some off-by-days dates"""
+    rng = random.Random(seed)
+    periods = []
+    for ticker, rule in KNOWN_FISCAL_YEAR_END_RULES.items():
+        for iso_date, _, fiscal_period in generate_fiscal_calendar(rule, 2005, 2025).periods:
+            periods.append((ticker, iso_date, "10-K" if fiscal_period == "annual" else "10-Q"))
+
+    rows = []
+    for _ in range(count):
+        ticker, iso_date, filing_type = rng.choice(periods)
+        if rng.random() < 0.1:
+            # Shift a few dates to exercise the nearest-date lookup
+            year, month, day = iso_date.split("-")
+            iso_date = f"{year}-{month}-{max(1, int(day) - rng.randint(1, 3)):02d}"
+        rows.append((ticker, iso_date, filing_type))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk fiscal period resolution")
+    parser.add_argument("--rows", type=int, default=20000, help="Number of rows to resolve")
+    args = parser.parse_args()
+
+    # Per-call resolution logs every row; keep the benchmark output readable
+    logging.disable(logging.CRITICAL)
+
+    rows = build_rows(args.rows)
+    tickers, dates, filing_types = (list(column) for column in zip(*rows))
+
+    start = time.perf_counter()
+    per_call = [fiscal_registry.determine_fiscal_period(t, d, f) for t, d, f in rows]
+    per_call_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = resolve_fiscal_periods(tickers, dates, filing_types)
+    bulk_time = time.perf_counter() - start
+
+    mismatches = 0
+    for index, result in enumerate(per_call):
+        if (result.get("fiscal_year") or "", result.get("fiscal_period") or "") != \
+                (bulk.fiscal_year[index], bulk.fiscal_period[index]):
+            mismatches += 1
+
+    print(f"Rows:            {len(rows):,}")
+    print(f"Per-call:        {per_call_time:.3f}s ({len(rows) / per_call_time:,.0f} rows/s)")
+    print(f"Bulk:            {bulk_time:.3f}s ({len(rows) / bulk_time:,.0f} rows/s)")
+    print(f"Speedup:         {per_call_time / bulk_time:.1f}x")
+    print(f"Bulk summary:    {bulk.summary()}")
+    print(f"Mismatches:      {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
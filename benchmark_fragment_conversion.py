@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark and golden-output check of the HTML fragment conversion engine
+
+Collects the text block and table fact values of the stored inline XBRL
+filings (the inner HTML of every ix:nonNumeric element, as markup and with
+non-ASCII characters written as character references, the way XBRL instance
+documents carry them) and converts them with extract_text_only_from_html
+(BeautifulSoup) and with the fragment conversion engine: uncached, memoized
+in one batch, in a process pool, and from a warm fragment store (as a later
+filing repeating the same text blocks would). All outputs must be identical. Random
+fragments built from well-formed and malformed markup pieces are compared
+as well, to cover the fallback boundaries.
+
+Exits with status 1 if any output differs.
+"""
+
+import sys
+import time
+import glob
+import random
+import logging
+import argparse
+import tempfile
+import warnings
+
+import lxml.html
+from lxml import etree
+
+from src2.xbrl.xbrl_parser import extract_text_only_from_html
+from src2.xbrl.html_fragment_converter import convert_fragment, parse_fragment, FragmentConverter
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/*.htm"
+
+# Markup pieces the tokenizer accepts
+FUZZ_PIECES = [
+    "<p>", "</p>", "<div style=\"font-family:Arial; text-align:center;color:#000\">", "</div>",
+    "<table class=\"x y\" border=\"1\">", "</table>", "<tr>", "</tr>", "<td nowrap>", "<td colspan='2'>",
+    "</td>", "<br>", "<br/>", "</br>", "<hr />", "<p/>", "<span title='a \"b\"'>", "<span title=\"it's\">",
+    "<span title='it&#39;s \"x\"'>", "</span>", "<a rel=\" a  b \" href=\"?a=1&amp;b=2\">", "</a>",
+    "<FONT FACE=\"Times\">", "</FONT>", "<b>", "</b>", "<i>", "</td></tr>", "<img src='x'>",
+    "<td style=\"\" STYLE=\"color:red;WIDTH:5%\">", "<ix:nonFraction name=\"us-gaap:Revenues\">",
+    "</ix:nonFraction>", "&#160;", "&nbsp;", "&amp;", "&lt;", "&gt;", "&#8212;", "&#x2014;", "&#1;",
+    "1,234", "(5,678)", "$9.10", "12%", "2023", "-", "Revenue", "Net income", " > ",
+    " ", "  ", "\n", "\n\n", "\t", "\r\n", "\xa0", "x", "Total"
+]
+
+# Pieces that are handed to the BeautifulSoup implementation
+FALLBACK_PIECES = [
+    "<!-- note -->", "<script>var a = '<b>';</script>", "<pre> x </pre>", "<meta charset=\"utf-8\">",
+    "<img src=x>", "&#150;", "&#0;", "&bogus;", "&copy", "AT&T", "a < b", "<a/ >", "<p", "</ p>"
+]
+
+
+def fuzz_cases(count, seed=0):
+    """Random fragments assembled from FUZZ_PIECES, half of them with a fallback piece"""
+    rng = random.Random(seed)
+    cases = []
+    for index in range(count):
+        pieces = [rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 30))]
+        if index % 2:
+            pieces.insert(rng.randrange(len(pieces) + 1), rng.choice(FALLBACK_PIECES))
+        case = "".join(pieces)
+        # Only values with markup reach the HTML branches
+        cases.append(case if "<" in case else "<p>" + case + "</p>")
+    return cases
+
+
+def collect_fragments(files):
+    """Inner HTML of every ix:nonNumeric element of the given filings"""
+    fragments = []
+    parser = lxml.html.HTMLParser(encoding='utf-8', huge_tree=True)
+    for path in files:
+        with open(path, 'rb') as f:
+            root = lxml.html.document_fromstring(f.read(), parser=parser)
+        for element in root.iter('ix:nonnumeric'):
+            inner = (element.text or '') + ''.join(
+                etree.tostring(child, encoding='unicode', method='html') for child in element
+            )
+            inner = inner.strip()
+            fragments.append(inner)
+            # XBRL instance documents write non-ASCII characters as references
+            escaped = inner.encode('ascii', 'xmlcharrefreplace').decode('ascii')
+            if escaped != inner:
+                fragments.append(escaped)
+    return fragments
+
+
+def compare(fragments, convert):
+    """Number of fragments for which convert differs from extract_text_only_from_html"""
+    mismatches = 0
+    for fragment in fragments:
+        expected = extract_text_only_from_html(fragment)
+        output = convert(fragment)
+        if output != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"Mismatch for fragment {fragment[:200]!r}:\n  {expected[:200]!r}\n  {output[:200]!r}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fragment conversion engine against extract_text_only_from_html")
+    parser.add_argument("files", nargs="*", help=f"Inline XBRL filings (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Number of random fragments to compare")
+    parser.add_argument("--workers", type=int, default=4, help="Processes for the parallel run")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    fuzz = fuzz_cases(args.fuzz)
+    mismatches = compare(fuzz, convert_fragment)
+    fast = sum(1 for case in fuzz if parse_fragment(case) is not None)
+    print(f"Random fragments: {len(fuzz):,} compared ({fast:,} on the tokenizer), {mismatches} mismatches")
+    print()
+
+    files = args.files or sorted(path for path in glob.glob(DEFAULT_PATTERN) if not path.endswith("index.htm"))
+    fragments = collect_fragments(files)
+    if not fragments:
+        print(f"No text block facts found (looked for {DEFAULT_PATTERN})")
+    else:
+        markup = [fragment for fragment in fragments if '<' in fragment]
+        fast = sum(1 for fragment in markup if parse_fragment(fragment) is not None)
+        print(f"Filings:              {len(files)}")
+        print(f"Fact values:          {len(fragments):,} ({len(set(fragments)):,} distinct, "
+              f"{sum(map(len, fragments)) // 1024:,} KB)")
+        print(f"With markup:          {len(markup):,} ({fast:,} on the tokenizer)")
+
+        start = time.perf_counter()
+        expected = [extract_text_only_from_html(fragment) for fragment in fragments]
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        uncached = [convert_fragment(fragment) for fragment in fragments]
+        engine_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        memoized = FragmentConverter(use_store=False).convert_many(fragments, workers=1)
+        memo_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = FragmentConverter(use_store=False).convert_many(fragments, workers=args.workers)
+        parallel_time = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            store_path = f"{store_dir}/fragments.sqlite"
+            FragmentConverter(use_store=True, store_path=store_path).convert_many(fragments, workers=1)
+            start = time.perf_counter()
+            stored = FragmentConverter(use_store=True, store_path=store_path).convert_many(fragments, workers=1)
+            stored_time = time.perf_counter() - start
+
+        for name, outputs in (("uncached", uncached), ("memoized", memoized), ("parallel", parallel), ("stored", stored)):
+            differing = sum(1 for output, reference in zip(outputs, expected) if output != reference)
+            if differing:
+                print(f"{name}: {differing} outputs differ")
+            mismatches += differing
+
+        print()
+        print(f"BeautifulSoup:        {reference_time:.2f}s")
+        print(f"Engine (uncached):    {engine_time:.2f}s ({reference_time / engine_time:.1f}x)")
+        print(f"Engine (memoized):    {memo_time:.2f}s ({reference_time / memo_time:.1f}x)")
+        print(f"Engine ({args.workers} processes): {parallel_time:.2f}s ({reference_time / parallel_time:.1f}x)")
+        print(f"Engine (warm store):  {stored_time:.2f}s ({reference_time / stored_time:.1f}x)")
+    print(f"Mismatches:           {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark and golden-output check of concept relationship inference
+
+Compares the indexed relationship inference of XBRLHierarchyExtractor
+(_identify_relationships and _identify_relationships_from_patterns) with the
+pairwise and scanning reference implementations defined here, on concept
+sets of the stored filings, on synthetic concept sets of 1k, 5k and 20k concepts (the
+concepts of the stored filings plus company extension concepts derived from
+them), and on random small sets built from name pieces that exercise the
+prefix and suffix edge cases. The hierarchies must be identical, including
+the order of parents and children.
+
+The pairwise reference is quadratic, so it is only run up to --reference-limit
+concepts; larger sets are timed with the indexed engine only.
+
+Exits with status 1 if any hierarchy differs.
+"""
+
+import sys
+import json
+import time
+import glob
+import random
+import logging
+import argparse
+
+from src2.formatter.xbrl_hierarchy import XBRLHierarchyExtractor, HIERARCHY_PATTERNS
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/_xbrl_raw.json"
+
+# Name pieces of company extension concepts
+EXTENSION_SUFFIXES = ["Current", "Noncurrent", "Net", "Gross", "Other", "Total", "Domestic", "Foreign", "Expense", "Income"]
+
+# Name pieces of the random concept sets
+FUZZ_PREFIXES = ["us-gaap:", "aapl:", "x:", "", "a:b:", ":"]
+FUZZ_PIECES = [
+    "Assets", "Current", "Noncurrent", "Liabilities", "Stockholders", "Equity", "Revenues", "Revenue",
+    "Costs", "And", "Expenses", "Operating", "Inventory", "Cash", "CashEquivalents", "Accounts", "Payable",
+    "Common", "Stock", "Retained", "Earnings", "Deferred", "Income", "Tax", "NetCashProvidedByUsedIn",
+    "Activities", "Depreciation", "Amortization", "A", ""
+]
+
+
+def identify_relationships_pairwise(extractor, xbrl_data, hierarchy):
+    """
+    Reference implementation of XBRLHierarchyExtractor._identify_relationships
+    that tests every pair of concepts with _is_child_of.
+
+    Args:
+        extractor: XBRLHierarchyExtractor
+        xbrl_data: The raw XBRL data
+        hierarchy: The hierarchy dictionary to update
+    """
+    # Extract all concept names
+    concepts = set()
+    for fact in xbrl_data:
+        concept = fact.get("name", "")
+        if concept:
+            concepts.add(concept)
+
+    # Identify potential parent-child relationships based on naming patterns
+    for concept in concepts:
+        # Skip concepts that don't have a statement type
+        if concept not in hierarchy["statement_mapping"]:
+            continue
+
+        statement_type = hierarchy["statement_mapping"][concept]
+
+        # Check for potential parent concepts
+        for parent_concept in concepts:
+            # Skip if same concept or parent doesn't have a statement type
+            if parent_concept == concept or parent_concept not in hierarchy["statement_mapping"]:
+                continue
+
+            # Skip if different statement types
+            if hierarchy["statement_mapping"][parent_concept] != statement_type:
+                continue
+
+            # Check if concept is a child of parent based on naming patterns
+            if extractor._is_child_of(concept, parent_concept):
+                if parent_concept not in hierarchy["presentation"]:
+                    hierarchy["presentation"][parent_concept] = []
+
+                hierarchy["presentation"][parent_concept].append({
+                    "child": concept,
+                    "order": len(hierarchy["presentation"][parent_concept])
+                })
+
+
+def identify_relationships_from_patterns_by_scan(extractor, concepts, hierarchy):
+    """
+    Reference implementation of
+    XBRLHierarchyExtractor._identify_relationships_from_patterns that scans all
+    concepts for every suffix.
+
+    Args:
+        extractor: XBRLHierarchyExtractor
+        concepts: Set of all concept names
+        hierarchy: The hierarchy dictionary to update
+    """
+    for parent_suffix, child_suffixes in HIERARCHY_PATTERNS:
+        # Find all concepts that end with the parent suffix
+        parent_concepts = [c for c in concepts if c.split(":")[-1].endswith(parent_suffix)]
+
+        for parent in parent_concepts:
+            if parent not in hierarchy["presentation"]:
+                hierarchy["presentation"][parent] = []
+
+            # Find all concepts that end with any of the child suffixes
+            for child_suffix in child_suffixes:
+                child_concepts = [c for c in concepts if c.split(":")[-1].endswith(child_suffix)]
+
+                for child in child_concepts:
+                    if child != parent:  # Avoid self-references
+                        hierarchy["presentation"][parent].append({
+                            "child": child,
+                            "order": len(hierarchy["presentation"][parent])
+                        })
+
+                        # Determine statement type based on naming patterns
+                        statement_type = extractor._determine_statement_type_from_name(parent)
+                        hierarchy["statement_mapping"][parent] = statement_type
+                        hierarchy["statement_mapping"][child] = statement_type
+
+
+def relationship_hierarchy(extractor, concepts, method):
+    """Hierarchy built from the statement types of the concepts and one inference method"""
+    facts = [{"name": concept} for concept in concepts]
+    hierarchy = {"presentation": {}, "statement_mapping": {}, "top_level": {
+        "Balance_Sheet": set(), "Income_Statement": set(), "Cash_Flow_Statement": set(), "Statement_Of_Equity": set()
+    }}
+    extractor._process_facts(facts, hierarchy)
+    start = time.perf_counter()
+    method(facts, hierarchy)
+    return hierarchy, time.perf_counter() - start
+
+
+def pattern_hierarchy(extractor, concepts, method):
+    """Hierarchy built by one pattern-based inference method"""
+    hierarchy = {"presentation": {}, "statement_mapping": {}}
+    start = time.perf_counter()
+    method(set(concepts), hierarchy)
+    return hierarchy, time.perf_counter() - start
+
+
+def ordered(hierarchy):
+    """Hierarchy as JSON, keeping dictionary and list order"""
+    return json.dumps([list(hierarchy["presentation"].items()), list(hierarchy["statement_mapping"].items())])
+
+
+def compare(extractor, concepts, reference=True):
+    """Mismatches and timings (indexed, reference) of both inference methods for a concept set"""
+    mismatches = 0
+    timings = []
+    for build, indexed, scanning in (
+        (relationship_hierarchy, extractor._identify_relationships,
+         lambda *args: identify_relationships_pairwise(extractor, *args)),
+        (pattern_hierarchy, extractor._identify_relationships_from_patterns,
+         lambda *args: identify_relationships_from_patterns_by_scan(extractor, *args))
+    ):
+        output, indexed_time = build(extractor, concepts, indexed)
+        reference_time = None
+        if reference:
+            expected, reference_time = build(extractor, concepts, scanning)
+            if ordered(output) != ordered(expected):
+                mismatches += 1
+        timings.append((indexed_time, reference_time))
+    return mismatches, timings
+
+
+def stored_concepts(files):
+    """Distinct concept names of each stored filing"""
+    concept_sets = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            names = {fact.get("name", "") for fact in json.load(f)}
+        names.discard("")
+        concept_sets.append(sorted(names))
+    return concept_sets
+
+
+def synthetic_concepts(base, size, seed=0):
+    """Concept set of the given size: the base concepts plus derived extension concepts"""
+    rng = random.Random(seed)
+    concepts = list(dict.fromkeys(base))[:size]
+    seen = set(concepts)
+    while len(concepts) < size:
+        local_name = rng.choice(base).split(":")[-1]
+        for _ in range(rng.randint(1, 2)):
+            local_name += rng.choice(EXTENSION_SUFFIXES)
+        concept = f"ext{rng.randint(0, 20)}:{local_name}"
+        if concept not in seen:
+            seen.add(concept)
+            concepts.append(concept)
+    return concepts
+
+
+def fuzz_sets(count, seed=0):
+    """Random small concept sets built from FUZZ_PREFIXES and FUZZ_PIECES"""
+    rng = random.Random(seed)
+    return [
+        [rng.choice(FUZZ_PREFIXES) + "".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(0, 4)))
+         for _ in range(rng.randint(1, 120))]
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexed concept relationship inference against the pairwise reference")
+    parser.add_argument("files", nargs="*", help=f"Raw XBRL fact files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="Synthetic concept set sizes")
+    parser.add_argument("--reference-limit", type=int, default=5000, help="Largest set compared with the pairwise reference")
+    parser.add_argument("--fuzz", type=int, default=2000, help="Number of random concept sets to compare")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    extractor = XBRLHierarchyExtractor()
+    mismatches = 0
+
+    for concepts in fuzz_sets(args.fuzz):
+        mismatches += compare(extractor, concepts)[0]
+    print(f"Random concept sets:  {args.fuzz:,} compared, {mismatches} mismatches")
+
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    concept_sets = stored_concepts(files)
+    indexed_total = reference_total = 0.0
+    for concepts in concept_sets:
+        differing, timings = compare(extractor, concepts)
+        mismatches += differing
+        indexed_total += sum(indexed for indexed, _ in timings)
+        reference_total += sum(reference for _, reference in timings)
+    if concept_sets:
+        print(f"Stored filings:       {len(concept_sets)} ({max(map(len, concept_sets)):,} concepts at most), "
+              f"indexed {indexed_total:.2f}s, reference {reference_total:.2f}s")
+
+    base = [concept for concepts in concept_sets for concept in concepts] or ["us-gaap:Assets"]
+    print()
+    print(f"{'Concepts':>9} {'Relationships':>14} {'Pairwise':>9} {'Patterns':>9} {'Scan':>9}")
+    for size in args.sizes:
+        concepts = synthetic_concepts(base, size)
+        differing, ((indexed, pairwise), (patterns, scan)) = compare(extractor, concepts, size <= args.reference_limit)
+        mismatches += differing
+        pairwise = f"{pairwise:.2f}s" if pairwise is not None else "-"
+        scan = f"{scan:.2f}s" if scan is not None else "-"
+        print(f"{size:>9,} {indexed:>13.3f}s {pairwise:>9} {patterns:>8.3f}s {scan:>9}")
+
+    print(f"Mismatches:           {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Check and time the chunked LLM output
+
+Chunks each saved LLM file with several token budgets and checks that:
+
+- the chunks joined give back the file
+- every chunk is within the budget, unless it is a single table or fact
+  block (no blank line inside) or a single section header
+- every section and block of the section index is covered by its chunks
+
+and prints the number of chunks, the oversized chunks, the chunks needed
+for the balance sheet and MD&A against the whole file, and the time taken.
+
+Exits with status 1 if any check fails.
+"""
+
+import sys
+import glob
+import time
+import argparse
+
+from src2.formatter.section_index import build_section_index
+from src2.formatter.llm_chunker import chunk_llm_content, build_chunk_manifest, chunks_for_sections
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+DEFAULT_BUDGETS = [8000, 32000]
+QUERY_SECTIONS = ["BALANCE_SHEET", "ITEM_7_MD_AND_A", "ITEM_2_MD_AND_A"]
+
+
+def check_chunks(content, chunks, manifest, max_tokens):
+    """Problems found in the chunks of one file."""
+    problems = []
+    if "".join(chunk["text"] for chunk in chunks) != content:
+        problems.append("chunks do not join to the file")
+
+    for number, chunk in enumerate(chunks):
+        # An oversized chunk holds one paragraph (a table or fact block)
+        body = chunk["text"].rstrip("\n")
+        if chunk["tokens"] > max_tokens and "\n\n" in body:
+            problems.append(f"chunk {number + 1} has {chunk['tokens']} tokens and more than one paragraph")
+
+    for section in manifest["sections"]:
+        if not section["chunks"]:
+            problems.append(f"section {section['name']} is not covered")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the chunked LLM output")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--budget", type=int, action="append", help="Token budgets (default: 8000 and 32000)")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    budgets = args.budget or DEFAULT_BUDGETS
+    failures = 0
+
+    for max_tokens in budgets:
+        chunk_count = 0
+        oversized = 0
+        query_tokens = 0
+        total_tokens = 0
+        elapsed = 0.0
+
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            start = time.perf_counter()
+            index = build_section_index(content)
+            chunks = chunk_llm_content(content, max_tokens, index=index)
+            manifest = build_chunk_manifest(chunks, index, max_tokens)
+            elapsed += time.perf_counter() - start
+
+            for problem in check_chunks(content, chunks, manifest, max_tokens):
+                failures += 1
+                print(f"{path}: {problem}")
+
+            chunk_count += len(chunks)
+            oversized += sum(1 for chunk in chunks if chunk["oversized"])
+            total_tokens += manifest["total_tokens"]
+            needed = set(chunks_for_sections(manifest, QUERY_SECTIONS))
+            query_tokens += sum(chunk["tokens"] for chunk in manifest["chunks"] if chunk["file"] in needed)
+
+        print(f"Budget {max_tokens:,}: {chunk_count} chunks ({oversized} oversized) for {len(files)} files "
+              f"in {elapsed:.2f}s; balance sheet and MD&A chunks: {query_tokens:,} of {total_tokens:,} tokens")
+
+    print(f"Failures: {failures}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Check and measure the delta LLM output
+
+For each company, builds the delta of every saved LLM file against the
+company's previous filing and checks that applying it to the previous
+filing gives back the file. Prints, per pair, the size of the delta against
+the file, the new or changed facts, the matched contexts and the changed
+sections, with totals for all pairs and for quarter-to-quarter pairs.
+
+Exits with status 1 if any rebuilt file differs from the original.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import defaultdict
+
+from src2.formatter.llm_delta import build_llm_delta, apply_llm_delta, filing_sort_key
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and measure the delta LLM output")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--min-copy-bytes", type=int, help="Shortest copied run (default: LLM_DELTA['min_copy_bytes'])")
+    args = parser.parse_args()
+
+    companies = defaultdict(list)
+    for path in args.files or glob.glob(DEFAULT_PATTERN):
+        key = filing_sort_key(path)
+        if key is not None:
+            companies[key[0]].append((key, path))
+
+    mismatches = 0
+    totals = defaultdict(lambda: [0, 0])
+    build_time = 0.0
+    apply_time = 0.0
+
+    for ticker in sorted(companies):
+        filings = [path for _, path in sorted(companies[ticker])]
+        for base_path, path in zip(filings, filings[1:]):
+            with open(base_path, 'r', encoding='utf-8') as f:
+                base_content = f.read()
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            start = time.perf_counter()
+            delta = build_llm_delta(base_content, content, base_name=os.path.basename(base_path),
+                                    target_name=os.path.basename(path), min_copy_bytes=args.min_copy_bytes)
+            delta_bytes = len(json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode('utf-8'))
+            build_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            try:
+                rebuilt = apply_llm_delta(base_content, json.loads(json.dumps(delta)))
+            except ValueError as e:
+                rebuilt = None
+                print(f"{path}: {str(e)}")
+            apply_time += time.perf_counter() - start
+            if rebuilt != content:
+                mismatches += 1
+                print(f"Mismatch: {path}")
+
+            summary = delta["summary"]
+            changed = sum(1 for section in summary["sections"] if section["status"] != "unchanged")
+            print(f"{os.path.basename(base_path)} -> {os.path.basename(path)}: "
+                  f"{delta_bytes:,} of {delta['target']['size']:,} bytes ({100 * delta_bytes / max(delta['target']['size'], 1):.0f}%); "
+                  f"facts {summary['facts']['new_or_changed']}/{summary['facts']['total']} new or changed; "
+                  f"contexts {summary['contexts']['matched']}/{summary['contexts']['total']} matched; "
+                  f"sections {changed}/{len(summary['sections'])} changed")
+
+            kinds = ("all", "quarterly") if "10-Q" in base_path and "10-Q" in path else ("all",)
+            for kind in kinds:
+                totals[kind][0] += delta_bytes
+                totals[kind][1] += delta["target"]["size"]
+
+    for kind, (delta_bytes, file_bytes) in totals.items():
+        print(f"Total ({kind} pairs): {delta_bytes:,} delta bytes for {file_bytes:,} bytes of files "
+              f"({100 * delta_bytes / max(file_bytes, 1):.1f}%)")
+    print(f"Build {build_time:.2f}s, apply {apply_time:.2f}s")
+    print(f"Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark and golden-output check of LLM format generation
+
+For each stored filing with extracted inline XBRL facts (_xbrl_raw.json),
+builds the formatter input the way the pipeline does (facts from the raw
+JSON, narrative sections from the extractor) and generates the LLM format
+sequentially and with the section producers in a process pool. The outputs
+and data integrity metrics must be identical.
+
+Exits with status 1 if any output differs.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import logging
+import argparse
+import warnings
+
+from src2.config import LLM_FORMATTING
+from src2.sec.extractor import SECExtractor
+from src2.formatter.llm_formatter import llm_formatter
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/_xbrl_raw.json"
+
+
+def build_input(raw_path, extractor):
+    """Parsed XBRL data and filing metadata of a stored filing, as the pipeline builds them"""
+    filing_dir = os.path.dirname(raw_path)
+    documents = [path for path in glob.glob(os.path.join(filing_dir, "*.htm")) if not path.endswith("index.htm")]
+    if not documents:
+        return None
+    filing_type = os.path.basename(os.path.dirname(filing_dir))
+
+    with open(raw_path, 'r', encoding='utf-8') as f:
+        raw_facts = json.load(f)
+    facts = []
+    for fact_data in raw_facts:
+        fact = {
+            "concept": fact_data.get('name', ''),
+            "value": fact_data.get('value', ''),
+            "context_ref": fact_data.get('contextRef', '')
+        }
+        if fact_data.get('unitRef'):
+            fact["unit_ref"] = fact_data['unitRef']
+        facts.append(fact)
+
+    extract_result = extractor.process_filing(documents[0], metadata={"filing_type": filing_type})
+    metadata = {
+        "ticker": os.path.basename(os.path.dirname(os.path.dirname(filing_dir))),
+        "filing_type": filing_type,
+        "doc_path": documents[0],
+        "html_content": {"document_sections": extract_result.get("document_sections", {})}
+    }
+    return {"contexts": {}, "units": {}, "facts": facts}, metadata
+
+
+def generate(parsed_xbrl, metadata, workers):
+    """LLM format, data integrity metrics and seconds taken with the given number of workers"""
+    LLM_FORMATTING.update(workers=workers, min_parallel_facts=0)
+    start = time.perf_counter()
+    output = llm_formatter.generate_llm_format(json.loads(json.dumps(parsed_xbrl)), json.loads(json.dumps(metadata)))
+    elapsed = time.perf_counter() - start
+    return output, json.dumps(llm_formatter.data_integrity, sort_keys=True), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential and parallel LLM format generation")
+    parser.add_argument("files", nargs="*", help=f"Raw XBRL fact files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--workers", type=int, default=4, help="Processes for the parallel run")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    extractor = SECExtractor()
+    settings = dict(LLM_FORMATTING)
+
+    sequential_total = parallel_total = 0.0
+    filings = mismatches = 0
+    print(f"{'Filing':<60} {'Facts':>6} {'Sequential':>11} {'Parallel':>9}")
+    for raw_path in files:
+        built = build_input(raw_path, extractor)
+        if built is None:
+            continue
+        parsed_xbrl, metadata = built
+
+        sequential, sequential_integrity, sequential_time = generate(parsed_xbrl, metadata, 1)
+        parallel, parallel_integrity, parallel_time = generate(parsed_xbrl, metadata, args.workers)
+        if (parallel, parallel_integrity) != (sequential, sequential_integrity):
+            mismatches += 1
+            print(f"Output differs for {raw_path}")
+
+        filings += 1
+        sequential_total += sequential_time
+        parallel_total += parallel_time
+        print(f"{os.path.dirname(raw_path):<60} {len(parsed_xbrl['facts']):>6} {sequential_time:>10.2f}s {parallel_time:>8.2f}s")
+
+    LLM_FORMATTING.update(settings)
+    if not filings:
+        print(f"No filings found (looked for {DEFAULT_PATTERN})")
+    else:
+        print()
+        print(f"Filings:              {filings}")
+        print(f"Sequential:           {sequential_total:.2f}s")
+        print(f"{args.workers} processes:          {parallel_total:.2f}s ({sequential_total / parallel_total:.2f}x, {os.cpu_count()} CPUs)")
+    print(f"Mismatches:           {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Size comparison and round-trip check of the LLM output profiles
+
+Formats the facts of the stored filings (_xbrl_raw.json) with the full and
+the compact output profile (LLM_FORMATTING["profile"]), saves both with
+save_llm_format (normalized statements and file size optimization, as
+uploaded) and reports the generated and saved sizes and the estimated tokens
+of the saved files.
+
+For the compact profile, the fact table of the generated and of the saved
+file must give back every input fact (concept, value, unit, context and
+decimals) in order, so no fact is lost by writing it only once.
+
+Exits with status 1 if any fact table differs from the input facts.
+"""
+
+import sys
+import copy
+import json
+import glob
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+from src2.config import LLM_FORMATTING
+from src2.formatter.llm_formatter import llm_formatter
+from src2.formatter.fact_table import read_fact_table
+from src2.storage.token_estimator import count_tokens
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/_xbrl_raw.json"
+PROFILES = ["full", "compact"]
+
+
+def filing_input(path):
+    """Parsed XBRL data and metadata of a stored filing, as built by the pipeline"""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw_facts = json.load(f)
+
+    facts = []
+    for raw_fact in raw_facts:
+        fact = {
+            "concept": raw_fact.get("name", ""),
+            "value": raw_fact.get("value", ""),
+            "context_ref": raw_fact.get("contextRef", "")
+        }
+        if raw_fact.get("unitRef"):
+            fact["unit_ref"] = raw_fact["unitRef"]
+        if raw_fact.get("decimals"):
+            fact["decimals"] = raw_fact["decimals"]
+        facts.append(fact)
+
+    filing_dir = Path(path).parent
+    metadata = {"ticker": filing_dir.parent.parent.name, "filing_type": filing_dir.parent.name}
+    info_path = filing_dir / "filing_info.json"
+    if info_path.exists():
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        for key in ("company_name", "filing_date", "period_end_date", "fiscal_year", "fiscal_period"):
+            if info.get(key):
+                metadata[key] = info[key]
+
+    return {"contexts": {}, "units": {}, "facts": facts}, metadata
+
+
+def table_mismatches(content, facts):
+    """Number of input facts not given back by the fact table of the content"""
+    table = read_fact_table(content)
+    if table is None:
+        return len(facts)
+    read = [
+        (fact["concept"], fact["value"], fact["unit_ref"], fact["context_ref"], fact["decimals"])
+        for fact in table["facts"].values()
+    ]
+    expected = [
+        (fact.get("concept", ""), fact.get("value", ""), fact.get("unit_ref", ""),
+         fact.get("context_ref", ""), fact.get("decimals", ""))
+        for fact in facts
+    ]
+    return sum(a != b for a, b in zip(read, expected)) + abs(len(read) - len(expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sizes of the full and compact LLM output profiles")
+    parser.add_argument("files", nargs="*", help=f"Raw XBRL fact files (default: {DEFAULT_PATTERN})")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    totals = {profile: [0, 0, 0] for profile in PROFILES}
+    mismatches = 0
+    configured_profile = LLM_FORMATTING.get("profile", "full")
+
+    print(f"{'Filing':<40} {'Full saved':>11} {'Compact saved':>14} {'Full tokens':>12} {'Compact tokens':>15}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            for path in files:
+                parsed_xbrl, metadata = filing_input(path)
+                sizes = {}
+                for profile in PROFILES:
+                    LLM_FORMATTING["profile"] = profile
+                    content = llm_formatter.generate_llm_format(copy.deepcopy(parsed_xbrl), copy.deepcopy(metadata))
+                    output_path = Path(temp_dir) / f"{profile}_llm.txt"
+                    llm_formatter.save_llm_format(content, metadata, str(output_path))
+                    saved = output_path.read_text(encoding='utf-8')
+                    sizes[profile] = (len(content.encode('utf-8')), len(saved.encode('utf-8')), count_tokens(saved))
+                    totals[profile] = [total + size for total, size in zip(totals[profile], sizes[profile])]
+
+                    if profile == "compact":
+                        mismatches += table_mismatches(content, parsed_xbrl["facts"])
+                        mismatches += table_mismatches(saved, parsed_xbrl["facts"])
+
+                filing = "/".join(Path(path).parent.parts[-3:])
+                print(f"{filing:<40} {sizes['full'][1]:>11,} {sizes['compact'][1]:>14,} "
+                      f"{sizes['full'][2]:>12,} {sizes['compact'][2]:>15,}")
+        finally:
+            LLM_FORMATTING["profile"] = configured_profile
+
+    if files:
+        print()
+        for label, index in (("Generated bytes", 0), ("Saved bytes", 1), ("Estimated tokens", 2)):
+            full, compact = totals["full"][index], totals["compact"][index]
+            print(f"{label + ':':<18} full {full:>12,}  compact {compact:>12,}  ({100 * (1 - compact / max(full, 1)):.1f}% smaller)")
+    print(f"Fact table mismatches: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark section reads of LLM files through the section index
+
+For each saved LLM file, builds its section index and compares reading every
+named section (@SEC:, @STATEMENT:) by scanning the whole file, as readers did,
+with reading it through the index (load the index, mmap the section's bytes).
+
+The indexed sections must equal the sections found by the scan, which splits
+the decoded file into lines independently of the byte offsets of the index.
+
+Exits with status 1 if any indexed section differs from the scanned one.
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+
+from src2.formatter.section_index import (
+    BLOCK_MARKERS, write_section_index, load_section_index, read_section
+)
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+
+NAMED_HEADER = re.compile(r'^@(SEC|SECTION|STATEMENT|FS|FINANCIAL_STATEMENT): ?(.*)$')
+
+
+def scan_sections(content):
+    """Named sections of the content, by line scan: (tag, name, text) in file order."""
+    sections = []
+    current = None
+    in_fact_table = False
+    for line in content.split("\n"):
+        if in_fact_table:
+            in_fact_table = not line.startswith("@END_FACT_TABLE")
+        else:
+            match = NAMED_HEADER.match(line)
+            block = line.startswith("@DOCUMENT: ") or (line[1:] in BLOCK_MARKERS and line.startswith("@"))
+            if match or block:
+                current = None
+                in_fact_table = line == "@FACT_TABLE"
+            if match:
+                current = [match.group(1), match.group(2).strip(), []]
+                sections.append(current)
+        if current is not None:
+            current[2].append(line)
+
+    scanned = []
+    for index, (tag, name, lines) in enumerate(sections):
+        text = "\n".join(lines)
+        # Sections end before the next header line, with their line break
+        if index < len(sections) - 1 or not content.endswith(text):
+            text += "\n"
+        scanned.append((tag, name, text))
+    return scanned
+
+
+def scan_read(path, tag, name):
+    """Section read as before: the whole file, then a search for the section."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    match = re.search(rf'^@{tag}: {re.escape(name)}\n.*?(?=^@(?:SEC|SECTION|STATEMENT|FS|FINANCIAL_STATEMENT): |\Z)',
+                      content, re.DOTALL | re.MULTILINE)
+    return match.group(0) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark section reads through the section index")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    mismatches = 0
+    reads = 0
+    scan_time = 0.0
+    index_time = 0.0
+    build_time = 0.0
+    index_bytes = 0
+    file_bytes = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for path in files:
+            # Index a copy, so no index is written next to the stored files
+            copy_path = os.path.join(temp_dir, "filing_llm.txt")
+            shutil.copyfile(path, copy_path)
+            with open(copy_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            start = time.perf_counter()
+            index_path = write_section_index(content, copy_path)
+            build_time += time.perf_counter() - start
+            index_bytes += os.path.getsize(index_path)
+            file_bytes += os.path.getsize(copy_path)
+
+            seen = set()
+            for tag, name, text in scan_sections(content):
+                if (tag, name) in seen:
+                    continue
+                seen.add((tag, name))
+
+                start = time.perf_counter()
+                scan_read(copy_path, tag, name)
+                scan_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                indexed = read_section(copy_path, name, tag, index=load_section_index(copy_path))
+                index_time += time.perf_counter() - start
+
+                reads += 1
+                if indexed != text:
+                    mismatches += 1
+                    print(f"Mismatch: {path} {tag} {name}")
+
+    print(f"Files: {len(files)}  sections read: {reads}")
+    print(f"Index: {index_bytes:,} bytes for {file_bytes:,} bytes of LLM files, built in {build_time:.2f}s")
+    print(f"Whole-file scan: {scan_time:.2f}s  indexed read: {index_time:.2f}s "
+          f"({scan_time / max(index_time, 1e-9):.1f}x)")
+    print(f"Mismatches: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
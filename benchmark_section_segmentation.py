@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark section segmentation of full 10-K filings
+
+For each filing, compares the per-element heading search the extractors used
+(every candidate heading element tested against a list of uncompiled Item
+patterns) with the section segmenter (one flattening pass and one compiled
+pattern over the text), on the same parsed document, and prints the timings
+and the number of sections each approach found.
+
+Also checks that every section ID the segmenter can produce (and every ID it
+found) is formatted by the LLM formatter, which drops sections it does not
+know. Exits with status 1 if one is not.
+"""
+
+import re
+import sys
+import time
+import glob
+import logging
+import argparse
+import warnings
+
+from bs4 import BeautifulSoup
+
+from src2.sec.section_segmenter import flatten_html, segment_text, FORM_10K_SECTIONS, FORM_10Q_SECTIONS
+from src2.formatter.llm_formatter import LLMFormatter, PRIORITY_SECTIONS
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-K/*/*.htm"
+
+# Item patterns of the previous per-element heading search
+LEGACY_PATTERNS = [
+    (r'Item\s+1\.?\s*Business', 'ITEM_1_BUSINESS'),
+    (r'Item\s+1A\.?\s*Risk\s+Factors', 'ITEM_1A_RISK_FACTORS'),
+    (r'Item\s+1B\.?\s*Unresolved\s+Staff\s+Comments', 'ITEM_1B_UNRESOLVED_STAFF_COMMENTS'),
+    (r'Item\s+2\.?\s*Properties', 'ITEM_2_PROPERTIES'),
+    (r'Item\s+3\.?\s*Legal\s+Proceedings', 'ITEM_3_LEGAL_PROCEEDINGS'),
+    (r'Item\s+4\.?\s*Mine\s+Safety\s+Disclosures', 'ITEM_4_MINE_SAFETY_DISCLOSURES'),
+    (r'Item\s+5\.?\s*Market\s+for\s+Registrant', 'ITEM_5_MARKET'),
+    (r'Item\s+6\.?\s*Selected\s+Financial\s+Data', 'ITEM_6_SELECTED_FINANCIAL_DATA'),
+    (r'Item\s+7\.?\s*Management.*Discussion', 'ITEM_7_MD_AND_A'),
+    (r'Item\s+7A\.?\s*Quantitative\s+and\s+Qualitative', 'ITEM_7A_MARKET_RISK'),
+    (r'Item\s+8\.?\s*Financial\s+Statements', 'ITEM_8_FINANCIAL_STATEMENTS'),
+    (r'Item\s+9\.?\s*Changes\s+in\s+and\s+Disagreements', 'ITEM_9_DISAGREEMENTS'),
+    (r'Item\s+9A\.?\s*Controls\s+and\s+Procedures', 'ITEM_9A_CONTROLS'),
+    (r'Item\s+9B\.?\s*Other\s+Information', 'ITEM_9B_OTHER_INFORMATION'),
+    (r'Item\s+10\.?\s*Directors', 'ITEM_10_DIRECTORS'),
+    (r'Item\s+11\.?\s*Executive\s+Compensation', 'ITEM_11_EXECUTIVE_COMPENSATION'),
+    (r'Item\s+12\.?\s*Security\s+Ownership', 'ITEM_12_SECURITY_OWNERSHIP'),
+    (r'Item\s+13\.?\s*Certain\s+Relationships', 'ITEM_13_RELATIONSHIPS'),
+    (r'Item\s+14\.?\s*Principal\s+Accountant\s+Fees', 'ITEM_14_ACCOUNTANT_FEES'),
+    (r'Item\s+15\.?\s*Exhibits', 'ITEM_15_EXHIBITS')
+]
+
+
+def legacy_heading_search(soup):
+    """Per-element heading search as previously done by the extractors."""
+    sections = {}
+    for tag in ['h1', 'h2', 'h3', 'h4', 'strong', 'b', 'p', 'div']:
+        for element in soup.find_all(tag):
+            text = element.get_text().strip()
+            if text and 5 < len(text) < 100:
+                for pattern, section_id in LEGACY_PATTERNS:
+                    if re.search(pattern, text, re.IGNORECASE):
+                        sections[section_id] = {'heading': text, 'element': element}
+                        break
+    return sections
+
+
+def unformatted_section_ids(section_ids):
+    """Section IDs the LLM formatter would drop (not in its section order or names)."""
+    readable_names = LLMFormatter().section_to_readable_name
+    return sorted({section_id for section_id in section_ids
+                   if section_id not in PRIORITY_SECTIONS or section_id not in readable_names})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark section segmentation of 10-K filings")
+    parser.add_argument("files", nargs="*", help=f"HTML filings (default: {DEFAULT_PATTERN})")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    table_ids = list(FORM_10K_SECTIONS.values()) + [
+        section_id for part in FORM_10Q_SECTIONS.values() for section_id in part.values()]
+    unformatted = unformatted_section_ids(table_ids)
+    print(f"Section IDs: {len(table_ids)} in the segmenter table, "
+          + (f"not formatted: {', '.join(unformatted)}" if unformatted else "all formatted"))
+
+    files = args.files or sorted(path for path in glob.glob(DEFAULT_PATTERN) if not path.endswith("index.htm"))
+    if not files:
+        print(f"No filings found (looked for {DEFAULT_PATTERN})")
+        sys.exit(1 if unformatted else 0)
+
+    found_ids = set()
+    totals = {"parse": 0.0, "legacy": 0.0, "segmenter": 0.0}
+    print(f"{'Filing':32} {'Size':>8} {'Parse':>8} {'Legacy':>8} {'Segment':>8} {'Legacy #':>9} {'Spans #':>8}")
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+
+        start = time.perf_counter()
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for script in soup(["script", "style"]):
+            script.extract()
+        parse_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy = legacy_heading_search(soup)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        spans = segment_text(flatten_html(soup), "10-K")
+        segment_time = time.perf_counter() - start
+        found_ids.update(span.section_id for span in spans)
+
+        totals["parse"] += parse_time
+        totals["legacy"] += legacy_time
+        totals["segmenter"] += segment_time
+        print(f"{path.split('/')[-1][:32]:32} {len(html_content) // 1024:>6}KB {parse_time:>7.2f}s "
+              f"{legacy_time:>7.2f}s {segment_time:>7.3f}s {len(legacy):>9} {len(spans):>8}")
+
+    print()
+    print(f"Filings:         {len(files)}")
+    print(f"Parse (once):    {totals['parse']:.2f}s")
+    print(f"Legacy search:   {totals['legacy']:.2f}s")
+    print(f"Segmenter:       {totals['segmenter']:.2f}s")
+    print(f"Speedup:         {totals['legacy'] / totals['segmenter']:.1f}x")
+
+    unformatted_found = unformatted_section_ids(found_ids)
+    if unformatted_found:
+        print(f"Found sections the formatter drops: {', '.join(unformatted_found)}")
+    if unformatted or unformatted_found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
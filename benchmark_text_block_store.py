@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Check the cross-filing text block store and measure its savings
+
+Writes the saved LLM files, in filing order, through a fresh text block store
+(as the optimizer does as its last step) for each scope, and checks that
+rehydrating every written file from the store gives back the original and
+that writing every file a second time (reprocessing) gives the same file.
+
+Prints the bytes written for the files with and without the store, the size
+of the store, and the time taken.
+
+Exits with status 1 if any rehydrated file differs from the original, or
+any reprocessed file differs from its first write.
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import tempfile
+
+from src2.formatter.text_block_store import TextBlockStore, reference_stored_blocks, rehydrate_text_blocks
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+
+FILE_NAME_PATTERN = re.compile(r'^([A-Z.]+)_(10-[KQ])_(\d{4})(?:_(Q\d))?_llm\.txt$')
+
+
+def filing_order(path):
+    """Sort key of a saved LLM file: fiscal year, then quarter (annual report last)."""
+    match = FILE_NAME_PATTERN.match(os.path.basename(path))
+    if not match:
+        return ("", 0, "", path)
+    ticker, filing_type, year, period = match.groups()
+    return (ticker, int(year), period or "Q4", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cross-filing text block store")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    parser.add_argument("--min-chars", type=int, help="Shortest text stored (default: TEXT_BLOCK_STORE['min_chars'])")
+    args = parser.parse_args()
+
+    files = sorted(args.files or glob.glob(DEFAULT_PATTERN), key=filing_order)
+    documents = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            documents.append((path, f.read()))
+    original_bytes = sum(len(content.encode('utf-8')) for _, content in documents)
+
+    mismatches = 0
+    for scope in ("company", "global"):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = TextBlockStore(os.path.join(temp_dir, "text_blocks.sqlite"))
+            written = []
+            referenced = 0
+
+            start = time.perf_counter()
+            for path, content in documents:
+                ticker = filing_order(path)[0]
+                result = reference_stored_blocks(content, store, ticker=ticker, filing_id=os.path.basename(path),
+                                                 scope=scope, min_chars=args.min_chars)
+                written.append((path, content, result["content"]))
+                referenced += len(result["referenced"])
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for path, content, stored_content in written:
+                if rehydrate_text_blocks(stored_content, store) != content:
+                    mismatches += 1
+                    print(f"Mismatch: {path} ({scope})")
+            read_time = time.perf_counter() - start
+
+            for path, content, stored_content in written:
+                again = reference_stored_blocks(content, store, ticker=filing_order(path)[0],
+                                                filing_id=os.path.basename(path), scope=scope, min_chars=args.min_chars)
+                if again["content"] != stored_content:
+                    mismatches += 1
+                    print(f"Changed on reprocessing: {path} ({scope}), "
+                          f"{again['content'].count('@STORED:')} references instead of {stored_content.count('@STORED:')}")
+
+            written_bytes = sum(len(stored_content.encode('utf-8')) for _, _, stored_content in written)
+            stats = store.stats()
+            store.close()
+            store_bytes = os.path.getsize(os.path.join(temp_dir, "text_blocks.sqlite"))
+
+        print(f"Scope {scope}: {len(files)} files, {referenced:,} block references; "
+              f"files {original_bytes:,} -> {written_bytes:,} bytes "
+              f"({100 * (original_bytes - written_bytes) / max(original_bytes, 1):.1f}% smaller); "
+              f"store {stats['blocks']:,} blocks, {stats['bytes']:,} bytes of text ({store_bytes:,} bytes on disk); "
+              f"write {write_time:.2f}s, rehydrate {read_time:.2f}s")
+
+    print(f"Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
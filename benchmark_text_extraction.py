@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lxml and BeautifulSoup text extraction engines
+
+Runs extract_clean_text on each stored filing with the BeautifulSoup
+('html.parser') engine and with the lxml engine, checks that both give the
+same sections, table of contents and text, and prints the timings.
+
+Exits with status 1 if any filing differs.
+"""
+
+import sys
+import time
+import glob
+import logging
+import argparse
+import warnings
+
+from src2.config import HTML_TEXT_EXTRACTION
+from src2.xbrl.html_text_extractor import extract_clean_text
+
+DEFAULT_PATTERN = "sec_processed/tmp/sec_downloads/*/10-[KQ]/*/*.htm"
+
+# Metadata that legitimately differs between runs or engines
+VOLATILE_METADATA = ("extraction_timestamp", "parser_engine", "html_structure")
+
+
+def comparable(sections):
+    """The parts of an extraction result both engines must agree on"""
+    # The full text starts with a technical summary that holds the extraction date
+    full_text = sections["full_text"].split("==============================================\n", 1)[-1]
+    document_sections = {
+        section_id: {key: value for key, value in info.items() if key != "element"}
+        for section_id, info in sections.get("document_sections", {}).items()
+    }
+    metadata = {key: value for key, value in sections["metadata"].items() if key not in VOLATILE_METADATA}
+    return {
+        "full_text": full_text,
+        "toc": sections.get("toc"),
+        "document_sections": document_sections,
+        "section_spans": sections.get("section_spans"),
+        "metadata": metadata
+    }
+
+
+def run_engine(engine, html_content, filing_type, path):
+    """Extract text with the given engine and time it"""
+    HTML_TEXT_EXTRACTION["engine"] = engine
+    start = time.perf_counter()
+    sections = extract_clean_text(html_content, filing_type, path)
+    return sections, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lxml text extraction engine against BeautifulSoup")
+    parser.add_argument("files", nargs="*", help=f"HTML filings (default: {DEFAULT_PATTERN})")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+
+    files = args.files or sorted(path for path in glob.glob(DEFAULT_PATTERN) if not path.endswith("index.htm"))
+    if not files:
+        print(f"No filings found (looked for {DEFAULT_PATTERN})")
+        return
+
+    configured_engine = HTML_TEXT_EXTRACTION.get("engine")
+    totals = {"html.parser": 0.0, "lxml": 0.0}
+    mismatches = 0
+
+    print(f"{'Filing':32} {'Size':>8} {'html.parser':>12} {'lxml':>8} {'Speedup':>8} {'Sections':>9} {'Equal':>6}")
+    try:
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            filing_type = "10-Q" if "/10-Q/" in path else "10-K"
+
+            reference, reference_time = run_engine("html.parser", html_content, filing_type, path)
+            result, lxml_time = run_engine("lxml", html_content, filing_type, path)
+
+            expected = comparable(reference)
+            actual = comparable(result)
+            equal = expected == actual
+            if not equal:
+                mismatches += 1
+                differing = [key for key in expected if expected[key] != actual[key]]
+                print(f"  {path}: differs in {', '.join(differing)}")
+
+            totals["html.parser"] += reference_time
+            totals["lxml"] += lxml_time
+            print(f"{path.split('/')[-1][:32]:32} {len(html_content) // 1024:>6}KB {reference_time:>11.2f}s "
+                  f"{lxml_time:>7.2f}s {reference_time / lxml_time:>7.1f}x "
+                  f"{len(actual['document_sections']):>9} {str(equal):>6}")
+    finally:
+        HTML_TEXT_EXTRACTION["engine"] = configured_engine
+
+    print()
+    print(f"Filings:         {len(files)}")
+    print(f"html.parser:     {totals['html.parser']:.2f}s")
+    print(f"lxml:            {totals['lxml']:.2f}s")
+    print(f"Speedup:         {totals['html.parser'] / totals['lxml']:.1f}x")
+    print(f"Mismatches:      {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
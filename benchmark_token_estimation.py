@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark token estimation
+
+Compares the character-by-character token estimate previously in
+gcp_storage (reproduced below) with the byte-class estimate of
+token_estimator on the saved LLM files, on their paragraphs (the pieces the
+chunker counts) and on strings with non-ASCII letters, digits and
+punctuation. The two estimates must be equal.
+
+With tiktoken installed, also reports the accuracy of the estimate against
+exact BPE counts (TOKEN_ESTIMATION["encoding"]) and the BPE batch speed.
+
+Exits with status 1 if the estimates differ.
+"""
+
+import sys
+import glob
+import time
+import argparse
+
+from src2.storage.token_estimator import estimate_tokens, count_tokens_batch, tiktoken
+
+DEFAULT_PATTERN = "sec_processed/*/*_llm.txt"
+
+EDGE_CASES = [
+    "", "a", " ", "@|", "Café № 5 — 10½ ² ٣ 東京 “quoted” •item  ",
+    "1234567890" * 40, "{\"a\": [1, 2, {\"b\": null}]}" * 20, "x@y|z!" * 50, "\U0001F600 emoji 𝔘𝔫𝔦𝔠𝔬𝔡𝔢"
+]
+
+
+def legacy_estimate_tokens(text_content):
+    """Token estimate as previously in gcp_storage (two Python passes over the text)."""
+    if not text_content:
+        return 0
+
+    special_chars_ratio = sum(1 for c in text_content if not c.isalnum() and not c.isspace()) / max(1, len(text_content))
+
+    chars_per_token = 4.0
+    if '@' in text_content and '|' in text_content and special_chars_ratio > 0.1:
+        chars_per_token = 3.0
+    elif special_chars_ratio > 0.15:
+        chars_per_token = 2.5
+    elif len([c for c in text_content[:1000] if c.isdigit()]) > 300:
+        chars_per_token = 3.0
+
+    estimated_tokens = int(len(text_content) / chars_per_token)
+    return int(estimated_tokens * 1.05)
+
+
+def timed(function, texts):
+    """Results of a function over the texts and the time taken."""
+    start = time.perf_counter()
+    results = [function(text) for text in texts]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark token estimation")
+    parser.add_argument("files", nargs="*", help=f"LLM files (default: {DEFAULT_PATTERN})")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    documents = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            documents.append(f.read())
+    paragraphs = [paragraph for document in documents for paragraph in document.split("\n\n") if paragraph]
+    total_chars = sum(len(document) for document in documents)
+
+    mismatches = 0
+    for label, texts in (("Files", documents), ("Paragraphs", paragraphs), ("Edge cases", EDGE_CASES)):
+        legacy, legacy_time = timed(legacy_estimate_tokens, texts)
+        fast, fast_time = timed(estimate_tokens, texts)
+        differing = sum(a != b for a, b in zip(legacy, fast))
+        mismatches += differing
+        print(f"{label}: {len(texts):,} texts  previous {legacy_time:.3f}s  byte classes {fast_time:.3f}s "
+              f"({legacy_time / max(fast_time, 1e-9):.1f}x)  differing: {differing}")
+
+    print(f"Throughput: {total_chars / max(timed(estimate_tokens, documents)[1], 1e-9) / 1e6:.0f}M chars/s over {total_chars:,} chars")
+
+    if tiktoken is not None:
+        start = time.perf_counter()
+        exact = count_tokens_batch(documents, method="bpe")
+        bpe_time = time.perf_counter() - start
+        estimates = [estimate_tokens(document) for document in documents]
+        errors = [abs(estimate - count) / max(count, 1) for estimate, count in zip(estimates, exact)]
+        print(f"BPE: {sum(exact):,} tokens in {bpe_time:.2f}s; estimate {sum(estimates):,} "
+              f"(mean absolute error {100 * sum(errors) / max(len(errors), 1):.1f}%)")
+    else:
+        print("BPE: tiktoken not installed, accuracy against exact counts not measured")
+
+    print(f"Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
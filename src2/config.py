@@ -52,5 +52,161 @@ HTML_OPTIMIZATION = {
     "enable_logging": True
 }
 
+# Arelle render cache configuration
+RENDER_CACHE = {
+    # Reuse rendered output when the input document, output format and plugin
+    # set are unchanged, so reruns skip Arelle entirely
+    "enabled": True,
+
+    # Cache location (None places it under the system temp directory)
+    "cache_dir": None,
+
+    # Bounds on the cache; least recently used entries are evicted first
+    "max_entries": 500,
+    "max_bytes": 5 * 1024 * 1024 * 1024  # 5 GB
+}
+
+# HTML text extraction configuration
+HTML_TEXT_EXTRACTION = {
+    # Parser engine used by extract_clean_text
+    # - "lxml": lxml.html tree with iterative traversal (same sections, several times faster)
+    # - "html.parser": BeautifulSoup with Python's built-in HTML parser
+    "engine": "lxml"
+}
+
+# XBRL fact value (text block and table) conversion configuration
+XBRL_FRAGMENT_CONVERSION = {
+    # Keep converted fragments in a SQLite store shared across filings
+    "store_enabled": True,
+
+    # Store location (None places it under the system temp directory)
+    "store_path": None,
+
+    # Bounds: stored fragments (least recently used evicted first) and
+    # fragments memoized in memory for the current process
+    "store_max_entries": 50000,
+    "memo_entries": 4096,
+
+    # Smaller fragments convert faster than a store lookup, so are only memoized
+    "min_stored_chars": 512,
+
+    # Conversion processes per filing; batches smaller than min_parallel_chars
+    # of unconverted markup are converted in process
+    "workers": 1,
+    "min_parallel_chars": 2 * 1024 * 1024
+}
+
+# LLM format generation configuration
+LLM_FORMATTING = {
+    # Processes producing the financial statements and narrative sections of a
+    # filing while the fact sections are formatted (1 formats sequentially)
+    "workers": 1,
+
+    # Filings with fewer XBRL facts are formatted sequentially
+    "min_parallel_facts": 1000,
+
+    # Output profile
+    # - "full": facts in the facts section, concept blocks and individual facts section
+    # - "compact": each fact once, in a fact table with unit and context
+    #   dictionaries; statements and individual facts refer to facts by ID
+    "profile": "full",
+
+    # Write a byte-offset section index next to each saved LLM file
+    # (*_llm.idx.json) and upload it with the file, for section range reads
+    "section_index": True
+}
+
+# Chunked LLM output configuration
+LLM_CHUNKING = {
+    # Also write each saved LLM file as section-aligned chunks with a manifest
+    # (*_llm_chunks/), uploaded with the file
+    "enabled": False,
+
+    # Token budget of a chunk (see TOKEN_ESTIMATION); a single table or fact block
+    # larger than the budget is written as one oversized chunk
+    "max_tokens": 32000
+}
+
+# Token counting configuration (LLM file metadata, chunk budgets, reports)
+TOKEN_ESTIMATION = {
+    # - "heuristic": fast estimate from characters per token
+    # - "bpe": exact counts with a tiktoken encoding (requires tiktoken,
+    #   otherwise the heuristic is used)
+    "method": "heuristic",
+
+    # tiktoken encoding and threads for batch encoding
+    "encoding": "cl100k_base",
+    "threads": 4
+}
+
+# Delta LLM output configuration
+LLM_DELTA = {
+    # Also write each saved LLM file as a delta against the company's previous
+    # filing (*_llm.delta.json, llm_delta.py), uploaded with the file
+    "enabled": False,
+
+    # Shortest run of unchanged lines written as a copy of the base; shorter
+    # runs cost less written out
+    "min_copy_bytes": 16
+}
+
+# Cross-filing text block store configuration
+TEXT_BLOCK_STORE = {
+    # Store the narrative text of saved LLM files by content hash, and write
+    # text stored by an earlier filing as a reference (text_block_store.py);
+    # readers rehydrate the references from the store
+    "enabled": False,
+
+    # Store location (None places it at text_blocks.sqlite under PROCESSED_DATA_DIR)
+    "store_path": None,
+
+    # - "company": reference only blocks stored by the same ticker
+    # - "global": reference blocks stored by any company
+    "scope": "company",
+
+    # Shorter text is kept inline (a reference takes about 40 characters)
+    "min_chars": 256
+}
+
+# Numeric fact store configuration
+FACT_STORE = {
+    # Append the numeric facts of each processed filing to a SQLite store
+    # (fact_store.py), for concept x period series across filings
+    "enabled": False,
+
+    # Store location (None places it at facts.sqlite under PROCESSED_DATA_DIR)
+    "store_path": None,
+
+    # Downloads read when backfilling from filings processed before (None
+    # uses tmp/sec_downloads under PROCESSED_DATA_DIR)
+    "downloads_dir": None
+}
+
+# Pipeline instrumentation configuration
+INSTRUMENTATION = {
+    # Profile each filing (nested spans with wall/CPU time, memory and counters)
+    "enabled": True,
+
+    # Also trace Python allocations with tracemalloc (slows processing down)
+    "tracemalloc": False,
+
+    # Output formats: "jsonl" (one record per span) and/or "prometheus"
+    "formats": ["jsonl"],
+
+    # Output location (None places it under the pipeline output directory)
+    "output_dir": None
+}
+
+# Calculation linkbase validation configuration
+CALCULATION_VALIDATION = {
+    # Check the XBRL facts of each filing against its calculation linkbase
+    # (the downloader saves the *_cal.xml linkbase and schema listed in the
+    # filing index next to the document)
+    "enabled": True,
+
+    # Maximum number of inconsistencies listed in the result
+    "max_reported": 100
+}
+
 # The text.txt output format has been completely removed
 # All output is now in LLM format only (llm.txt)
\ No newline at end of file
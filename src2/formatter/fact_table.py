@@ -0,0 +1,215 @@
+"""
+Fact Table Module
+
+Dense fact table of the compact LLM output profile (LLM_FORMATTING["profile"]
+in config). Every fact is written once, as one row of the table, with unit and
+context dictionaries; the other sections of a compact file refer to facts by
+their ID (f1, f2, ...) instead of repeating their values.
+
+Layout:
+
+    @FACT_TABLE
+    @FACT_UNITS
+    u1|usd
+    @FACT_CONTEXTS
+    x1|<context ref>|<period>
+    @FACT_COLUMNS: id|concept|value|unit|context|decimals
+    f1|us-gaap:Assets|301,311|u1|x1|-6
+    @END_FACT_TABLE
+
+Cells escape backslashes, line breaks, the column separator and spaces at
+their ends, so values survive the file size optimizer unchanged.
+"""
+
+import re
+
+FACT_TABLE_COLUMNS = ["id", "concept", "value", "unit", "context", "decimals"]
+
+# Fact IDs as they appear in the other sections of a compact file
+FACT_ID_PATTERN = re.compile(r'\bf\d+\b')
+
+_ESCAPES = {"\\": "\\\\", "\n": "\\n", "\r": "\\r", "|": "\\p"}
+_UNESCAPES = {"\\": "\\", "n": "\n", "r": "\r", "p": "|", "s": " "}
+_ESCAPE_PATTERN = re.compile(r'[\\\n\r|]')
+_UNESCAPE_PATTERN = re.compile(r'\\([\\nrps])')
+
+
+def escape_cell(value):
+    """
+    Escape a value for a fact table cell
+
+    Args:
+        value: Cell value
+
+    Returns:
+        Escaped value
+    """
+    value = _ESCAPE_PATTERN.sub(lambda match: _ESCAPES[match.group(0)], str(value))
+    # The size optimizer removes spaces next to separators and at line ends
+    if value.startswith(" "):
+        value = "\\s" + value[1:]
+    if value.endswith(" "):
+        value = value[:-1] + "\\s"
+    return value
+
+
+def unescape_cell(value):
+    """
+    Restore a value escaped by escape_cell
+
+    Args:
+        value: Escaped cell value
+
+    Returns:
+        Original value
+    """
+    return _UNESCAPE_PATTERN.sub(lambda match: _UNESCAPES[match.group(1)], value)
+
+
+def assign_fact_ids(parsed_xbrl):
+    """
+    Copy of the parsed XBRL data with the fact ID of each fact in "fact_id"
+
+    Args:
+        parsed_xbrl: Parsed XBRL data
+
+    Returns:
+        Parsed XBRL data with copied facts; the input is not changed
+    """
+    facts = [dict(fact, fact_id=f"f{index}") for index, fact in enumerate(parsed_xbrl.get("facts", []), 1)]
+    return dict(parsed_xbrl, facts=facts)
+
+
+def format_period(period):
+    """Period of a context as written in the context dictionary."""
+    if "instant" in period:
+        return period["instant"]
+    if "startDate" in period and "endDate" in period:
+        return f"{period['startDate']} to {period['endDate']}"
+    return ""
+
+
+def format_fact_table(parsed_xbrl):
+    """
+    Produce the fact table of the compact profile
+
+    Args:
+        parsed_xbrl: Parsed XBRL data with fact IDs (see assign_fact_ids)
+
+    Returns:
+        List of output lines
+    """
+    facts = parsed_xbrl.get("facts", [])
+    contexts = parsed_xbrl.get("contexts", {})
+
+    # Dictionaries in order of first use
+    unit_ids = {}
+    context_ids = {}
+    for fact in facts:
+        unit_ref = fact.get("unit_ref", "")
+        if unit_ref and unit_ref not in unit_ids:
+            unit_ids[unit_ref] = f"u{len(unit_ids) + 1}"
+        context_ref = fact.get("context_ref", "")
+        if context_ref and context_ref not in context_ids:
+            context_ids[context_ref] = f"x{len(context_ids) + 1}"
+
+    output = ["", "@FACT_TABLE", "@FACT_UNITS"]
+    for unit_ref, unit_id in unit_ids.items():
+        output.append(f"{unit_id}|{escape_cell(unit_ref)}")
+
+    output.append("@FACT_CONTEXTS")
+    for context_ref, context_id in context_ids.items():
+        period = format_period(contexts.get(context_ref, {}).get("period", {}))
+        output.append(f"{context_id}|{escape_cell(context_ref)}|{period}")
+
+    output.append(f"@FACT_COLUMNS: {'|'.join(FACT_TABLE_COLUMNS)}")
+    for fact in facts:
+        output.append("|".join([
+            fact["fact_id"],
+            escape_cell(fact.get("concept", "")),
+            escape_cell(fact.get("value", "")),
+            unit_ids.get(fact.get("unit_ref", ""), ""),
+            context_ids.get(fact.get("context_ref", ""), ""),
+            escape_cell(fact.get("decimals", ""))
+        ]))
+    output.append("@END_FACT_TABLE")
+    output.append("")
+
+    return output
+
+
+def _optimized_context_codes(content):
+    """Context refs replaced by the file size optimizer (c-N code to original ref)."""
+    section = re.search(r'^@DD_CONTEXTS\n(.*?)(?=^@|\Z)', content, re.DOTALL | re.MULTILINE)
+    if not section:
+        return {}
+    return dict(re.findall(r'^(c-\d+) ?\| ?@CODE: (\S+)', section.group(1), re.MULTILINE))
+
+
+def read_fact_table(content):
+    """
+    Read the fact table of a compact LLM file
+
+    Context refs rewritten by the file size optimizer are resolved to the
+    original refs through its context dictionary.
+
+    Args:
+        content: Content of the LLM file
+
+    Returns:
+        Dictionary with units and contexts (ID to ref), contexts_period (ID
+        to period) and facts (ID to dictionary with concept, value,
+        unit_ref, context_ref and decimals) in table order, or None if the
+        content has no fact table
+    """
+    start = content.find("\n@FACT_TABLE\n")
+    if start < 0:
+        if not content.startswith("@FACT_TABLE\n"):
+            return None
+        start = -1
+    end = content.find("\n@END_FACT_TABLE", start)
+    if end < 0:
+        end = len(content)
+
+    original_refs = _optimized_context_codes(content)
+    table = {"units": {}, "contexts": {}, "contexts_period": {}, "facts": {}}
+    part = None
+    for line in content[start + 1:end].split("\n"):
+        if line.startswith("@"):
+            part = line
+            continue
+        if not line:
+            continue
+        cells = line.split("|")
+        if part == "@FACT_UNITS" and len(cells) >= 2:
+            table["units"][cells[0]] = unescape_cell(cells[1])
+        elif part == "@FACT_CONTEXTS" and len(cells) >= 2:
+            context_ref = unescape_cell(cells[1])
+            table["contexts"][cells[0]] = original_refs.get(context_ref, context_ref)
+            table["contexts_period"][cells[0]] = cells[2] if len(cells) > 2 else ""
+        elif part and part.startswith("@FACT_COLUMNS") and len(cells) >= len(FACT_TABLE_COLUMNS):
+            table["facts"][cells[0]] = {
+                "concept": unescape_cell(cells[1]),
+                "value": unescape_cell(cells[2]),
+                "unit_ref": table["units"].get(cells[3], ""),
+                "context_ref": table["contexts"].get(cells[4], ""),
+                "decimals": unescape_cell(cells[5])
+            }
+
+    return table
+
+
+def resolve_fact_value(value, table):
+    """
+    Value of a fact ID cell, or the cell itself if it is not a fact ID
+
+    Args:
+        value: Cell of a statement or table (a fact ID in compact files)
+        table: Fact table (see read_fact_table), or None
+
+    Returns:
+        The referenced fact's value, or the cell unchanged
+    """
+    if table and value in table["facts"]:
+        return table["facts"][value]["value"]
+    return value
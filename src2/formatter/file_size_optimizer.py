@@ -9,18 +9,34 @@ import re
 import logging
 import hashlib
 
+from .text_block_store import reference_stored_blocks
+
 class FileSizeOptimizer:
     """
     Optimizes the size of LLM-formatted files by:
     1. Consolidating context definitions
     2. Optimizing tags
     3. Deduplicating narrative blocks
+    4. Referencing narrative text stored by earlier filings (optional)
     """
 
-    def __init__(self):
-        """Initialize the file size optimizer."""
+    def __init__(self, text_block_store=None, ticker=None, filing_id=None):
+        """
+        Initialize the file size optimizer.
+
+        Args:
+            text_block_store: TextBlockStore shared across filings (optional)
+            ticker: Company of the filing, for the text block store
+            filing_id: Filing identifier recorded with newly stored blocks
+        """
         self.logger = logging.getLogger(__name__)
 
+        # Cross-filing text block store
+        self.text_block_store = text_block_store
+        self.ticker = ticker
+        self.filing_id = filing_id
+        self.text_block_result = None
+
         # Define tag mappings for optimization
         self.tag_mappings = {
             "@FINANCIAL_STATEMENT:": "@FS:",
@@ -65,6 +81,14 @@ class FileSizeOptimizer:
         # Reduce whitespace
         content = self._reduce_whitespace(content)
 
+        # Reference text stored by earlier filings, on the final text so
+        # rehydrating gives back exactly this content
+        if self.text_block_store is not None:
+            self.text_block_result = reference_stored_blocks(
+                content, self.text_block_store, ticker=self.ticker, filing_id=self.filing_id
+            )
+            content = self.text_block_result["content"]
+
         return content
 
     def _consolidate_contexts(self, content: str) -> str:
@@ -241,7 +265,7 @@ class FileSizeOptimizer:
         self.logger.info("Normalizing financial statements...")
 
         # Find all financial statement sections
-        fs_sections = re.findall(r'@(?:FS|FINANCIAL_STATEMENT): ([^\n]+).*?(?=\n\n@(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|\Z)',
+        fs_sections = re.findall(r'@(?:FS|FINANCIAL_STATEMENT): ([^\n]+).*?(?=\n\n@(?:(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|FACT_TABLE\n)|\Z)',
                                 content, re.DOTALL)
 
         if not fs_sections:
@@ -254,7 +278,7 @@ class FileSizeOptimizer:
         normalized_data = []
 
         # Find all financial statement sections with their content
-        fs_matches = re.finditer(r'@(?:FS|FINANCIAL_STATEMENT): ([^\n]+)(.*?)(?=\n\n@(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|\Z)',
+        fs_matches = re.finditer(r'@(?:FS|FINANCIAL_STATEMENT): ([^\n]+)(.*?)(?=\n\n@(?:(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|FACT_TABLE\n)|\Z)',
                                 content, re.DOTALL)
 
         for fs_match in fs_matches:
@@ -339,7 +363,7 @@ class FileSizeOptimizer:
             # Remove the old financial statement sections
             for statement_type in fs_sections:
                 content = re.sub(r'@(?:FS|FINANCIAL_STATEMENT): ' + re.escape(statement_type) +
-                                r'.*?(?=\n\n@(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|\Z)',
+                                r'.*?(?=\n\n@(?:(?:FS|FINANCIAL_STATEMENT|SEC|SECTION):|FACT_TABLE\n)|\Z)',
                                 '', content, flags=re.DOTALL)
 
             # Add the new normalized section
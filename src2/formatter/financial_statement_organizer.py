@@ -379,7 +379,8 @@ class FinancialStatementOrganizer:
         """
         return self.statement_contexts.get(statement_type, set())
 
-    def format_statement(self, statement_type: str, contexts: List[str], xbrl_data: Dict[str, Any]) -> List[str]:
+    def format_statement(self, statement_type: str, contexts: List[str], xbrl_data: Dict[str, Any],
+                         fact_references: bool = False) -> List[str]:
         """
         Format a financial statement as a table.
 
@@ -387,6 +388,7 @@ class FinancialStatementOrganizer:
             statement_type: The statement type (BALANCE_SHEET, INCOME_STATEMENT, etc.)
             contexts: List of context references to include in the statement
             xbrl_data: The XBRL data containing contexts and facts
+            fact_references: Show the fact IDs ("fact_id") of the facts instead of their values
 
         Returns:
             List of strings representing the formatted statement
@@ -475,7 +477,9 @@ class FinancialStatementOrganizer:
             for concept_name, context_facts in sorted(facts_by_concept.items()):
                 row = concept_name
                 for context_ref in contexts:
-                    if context_ref in context_facts:
+                    if context_ref in context_facts and fact_references:
+                        row += f" | {context_facts[context_ref]['fact_id']}"
+                    elif context_ref in context_facts:
                         fact = context_facts[context_ref]
                         value = fact.get("value", "")
                         # Add currency symbol if available
@@ -493,12 +497,13 @@ class FinancialStatementOrganizer:
         return output
 
 
-def organize_financial_statements(xbrl_data: Dict[str, Any]) -> Dict[str, List[str]]:
+def organize_financial_statements(xbrl_data: Dict[str, Any], fact_references: bool = False) -> Dict[str, List[str]]:
     """
     Organize financial facts into coherent financial statements.
 
     Args:
         xbrl_data: The XBRL data containing contexts and facts
+        fact_references: Show fact IDs instead of values (compact output profile)
 
     Returns:
         Dictionary of formatted financial statements
@@ -546,7 +551,8 @@ def organize_financial_statements(xbrl_data: Dict[str, Any]) -> Dict[str, List[s
         statements["BALANCE_SHEET"] = organizer.format_statement(
             FinancialStatementOrganizer.BALANCE_SHEET,
             balance_sheet_contexts,
-            xbrl_wrapper
+            xbrl_wrapper,
+            fact_references
         )
 
     # Income Statement
@@ -555,7 +561,8 @@ def organize_financial_statements(xbrl_data: Dict[str, Any]) -> Dict[str, List[s
         statements["INCOME_STATEMENT"] = organizer.format_statement(
             FinancialStatementOrganizer.INCOME_STATEMENT,
             income_statement_contexts,
-            xbrl_wrapper
+            xbrl_wrapper,
+            fact_references
         )
 
     # Cash Flow Statement
@@ -564,7 +571,8 @@ def organize_financial_statements(xbrl_data: Dict[str, Any]) -> Dict[str, List[s
         statements["CASH_FLOW_STATEMENT"] = organizer.format_statement(
             FinancialStatementOrganizer.CASH_FLOW_STATEMENT,
             cash_flow_contexts,
-            xbrl_wrapper
+            xbrl_wrapper,
+            fact_references
         )
 
     # Statement of Equity
@@ -573,7 +581,8 @@ def organize_financial_statements(xbrl_data: Dict[str, Any]) -> Dict[str, List[s
         statements["EQUITY_STATEMENT"] = organizer.format_statement(
             FinancialStatementOrganizer.EQUITY_STATEMENT,
             equity_contexts,
-            xbrl_wrapper
+            xbrl_wrapper,
+            fact_references
         )
 
     return statements
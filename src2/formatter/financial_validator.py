@@ -10,6 +10,8 @@ import logging
 import json
 from typing import Dict, List, Any, Tuple, Optional, Set
 from decimal import Decimal, InvalidOperation
+from .fact_table import read_fact_table, resolve_fact_value
+from .section_index import load_section_index, find_sections, read_spans
 
 class FinancialValidator:
     """
@@ -321,6 +323,19 @@ class FinancialValidator:
 
         return normalized_data
 
+    def _statement_value(self, cell: str, fact_table: Optional[Dict[str, Any]]) -> str:
+        """
+        Number of a normalized statement cell, resolving fact IDs of compact files.
+
+        Args:
+            cell: Statement cell ($ amount or fact ID)
+            fact_table: Fact table of the file, or None
+
+        Returns:
+            The amount without currency symbol and thousands separators
+        """
+        return resolve_fact_value(cell, fact_table).replace('$', '').replace(',', '')
+
     def extract_balance_sheet_data(self, content: str) -> Dict[str, Dict[str, float]]:
         """
         Extract balance sheet data from LLM file content.
@@ -333,14 +348,17 @@ class FinancialValidator:
         """
         balance_sheet_data = {}
 
+        # Compact files refer to the facts of the fact table by ID
+        fact_table = read_fact_table(content)
+
         # Extract assets
         assets_matches = re.finditer(
-            r'Balance Sheet\|Assets\|(\$[0-9,]+)\|(c-\d+)\|As of ([0-9-]+)',
+            r'Balance Sheet\|Assets\|(\$[0-9,]+|f\d+)\|(c-\d+)\|As of ([0-9-]+)',
             content
         )
 
         for match in assets_matches:
-            value_str = match.group(1).replace('$', '').replace(',', '')
+            value_str = self._statement_value(match.group(1), fact_table)
             context = match.group(2)
             date = match.group(3)
 
@@ -354,12 +372,12 @@ class FinancialValidator:
 
         # Extract liabilities
         liabilities_matches = re.finditer(
-            r'Balance Sheet\|Liabilities\|(\$[0-9,]+)\|(c-\d+)\|As of ([0-9-]+)',
+            r'Balance Sheet\|Liabilities\|(\$[0-9,]+|f\d+)\|(c-\d+)\|As of ([0-9-]+)',
             content
         )
 
         for match in liabilities_matches:
-            value_str = match.group(1).replace('$', '').replace(',', '')
+            value_str = self._statement_value(match.group(1), fact_table)
             context = match.group(2)
             date = match.group(3)
 
@@ -373,12 +391,12 @@ class FinancialValidator:
 
         # Extract stockholders' equity
         equity_matches = re.finditer(
-            r'Balance Sheet\|Stockholders Equity\|(\$[0-9,]+)\|(c-\d+)\|As of ([0-9-]+)',
+            r'Balance Sheet\|Stockholders Equity\|(\$[0-9,]+|f\d+)\|(c-\d+)\|As of ([0-9-]+)',
             content
         )
 
         for match in equity_matches:
-            value_str = match.group(1).replace('$', '').replace(',', '')
+            value_str = self._statement_value(match.group(1), fact_table)
             context = match.group(2)
             date = match.group(3)
 
@@ -392,12 +410,12 @@ class FinancialValidator:
 
         # Extract minority interests
         minority_matches = re.finditer(
-            r'Balance Sheet\|Minority Interest\|(\$[0-9,]+)\|(c-\d+)\|As of ([0-9-]+)',
+            r'Balance Sheet\|Minority Interest\|(\$[0-9,]+|f\d+)\|(c-\d+)\|As of ([0-9-]+)',
             content
         )
 
         for match in minority_matches:
-            value_str = match.group(1).replace('$', '').replace(',', '')
+            value_str = self._statement_value(match.group(1), fact_table)
             context = match.group(2)
             date = match.group(3)
 
@@ -411,12 +429,12 @@ class FinancialValidator:
 
         # Extract total liabilities and equity
         total_matches = re.finditer(
-            r'Balance Sheet\|Liabilities And Stockholders Equity\|(\$[0-9,]+)\|(c-\d+)\|As of ([0-9-]+)',
+            r'Balance Sheet\|Liabilities And Stockholders Equity\|(\$[0-9,]+|f\d+)\|(c-\d+)\|As of ([0-9-]+)',
             content
         )
 
         for match in total_matches:
-            value_str = match.group(1).replace('$', '').replace(',', '')
+            value_str = self._statement_value(match.group(1), fact_table)
             context = match.group(2)
             date = match.group(3)
 
@@ -438,6 +456,30 @@ class FinancialValidator:
 
         return balance_sheet_data
 
+    def _read_balance_sheet_content(self, llm_file_path: str) -> str:
+        """
+        Read the balance sheet statement of an LLM file.
+
+        With a section index, only the normalized balance sheet and the fact
+        table (of compact files) are read; otherwise the whole file.
+
+        Args:
+            llm_file_path: Path to the LLM file
+
+        Returns:
+            Content to extract balance sheet data from
+        """
+        index = load_section_index(llm_file_path)
+        if index is not None:
+            spans = find_sections(index, "Balance Sheet", "STATEMENT")
+            if spans:
+                if index.get("fact_table"):
+                    spans.append(index["fact_table"])
+                return "\n".join(read_spans(llm_file_path, spans))
+
+        with open(llm_file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
     def verify_balance_sheet_integrity(self, llm_file_path: str) -> Dict[str, Dict[str, Any]]:
         """
         Verify the integrity of the balance sheet in the LLM file.
@@ -449,8 +491,7 @@ class FinancialValidator:
             Verification results
         """
         try:
-            with open(llm_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_balance_sheet_content(llm_file_path)
         except Exception as e:
             self.logger.error(f"Error reading LLM file: {str(e)}")
             return {"error": str(e)}
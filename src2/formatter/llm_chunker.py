@@ -0,0 +1,274 @@
+"""
+LLM Chunker Module
+
+Chunked output mode of saved LLM files (LLM_CHUNKING in config). The file is
+also written as section-aligned chunks of at most max_tokens tokens each
+(counted as configured in TOKEN_ESTIMATION), with a manifest listing every
+chunk's token count and the sections it covers, so a reader loads only the
+chunks a query needs.
+
+Layout, next to AAPL_10-K_2024_llm.txt (llm.txt -> llm_chunks/ in GCS):
+
+    AAPL_10-K_2024_llm_chunks/
+        manifest.json
+        chunk_001.txt
+        chunk_002.txt
+
+Chunks are consecutive byte ranges of the file, so their concatenation is
+the file. Narrative text written as references to the text block store
+(text_block_store.py) is put back first, so chunks are self-contained; the
+offsets are then those of the file as it would be written without the store.
+Sections and blocks of the section index (section_index.py) are
+kept whole when they fit in a chunk; larger ones are split between
+blank-line separated paragraphs, so a table or fact block is never split.
+A single paragraph larger than the budget becomes a chunk of its own,
+marked oversized.
+"""
+
+import os
+import json
+import logging
+
+from .section_index import build_section_index
+from .text_block_store import REFERENCE_PREFIX, TextBlockStore, rehydrate_text_blocks
+from ..storage.token_estimator import count_tokens, count_tokens_batch
+
+CHUNK_MANIFEST_VERSION = 1
+CHUNK_MANIFEST_NAME = "manifest.json"
+
+
+def chunk_dir_path(llm_path):
+    """
+    Directory of the chunks of an LLM file (local path or GCS object name)
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        Path of the chunk directory, as a string
+    """
+    llm_path = str(llm_path)
+    base = llm_path[:-len(".txt")] if llm_path.endswith(".txt") else llm_path
+    return f"{base}_chunks"
+
+
+def _segments(data, index):
+    """Byte ranges between consecutive section and block headers."""
+    starts = sorted({0, len(data)} | {entry["offset"] for entry in index["sections"]})
+    return [(start, end) for start, end in zip(starts, starts[1:]) if end > start]
+
+
+def _paragraphs(data, start, end):
+    """Byte ranges of the blank-line separated paragraphs of a segment."""
+    paragraphs = []
+    position = start
+    while position < end:
+        separator = data.find(b"\n\n", position, end)
+        if separator < 0:
+            paragraphs.append((position, end))
+            break
+        # Keep the blank lines with the paragraph before them
+        paragraph_end = separator + 2
+        while paragraph_end < end and data[paragraph_end:paragraph_end + 1] == b"\n":
+            paragraph_end += 1
+        paragraphs.append((position, paragraph_end))
+        position = paragraph_end
+    return paragraphs
+
+
+def chunk_llm_content(content, max_tokens, index=None):
+    """
+    Split LLM file content into section-aligned chunks
+
+    Args:
+        content: Content of the LLM file, as written
+        max_tokens: Token budget of a chunk (counted with count_tokens)
+        index: Section index of the content (built if not given)
+
+    Returns:
+        List of chunks, each a dictionary with offset, length (bytes),
+        tokens, oversized and text
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    if index is None:
+        index = build_section_index(data)
+
+    def tokens(start, end):
+        return count_tokens(data[start:end])
+
+    def counted(ranges):
+        return [(start, end, count) for (start, end), count in
+                zip(ranges, count_tokens_batch([data[start:end] for start, end in ranges]))]
+
+    # Pieces that are never split: segments within budget, otherwise paragraphs
+    pieces = []
+    for start, end, segment_tokens in counted(_segments(data, index)):
+        if segment_tokens <= max_tokens:
+            pieces.append((start, end, segment_tokens))
+        else:
+            pieces.extend(counted(_paragraphs(data, start, end)))
+
+    # Pack pieces greedily into chunks
+    ranges = []
+    first = 0
+    while first < len(pieces):
+        last = first
+        total = pieces[first][2]
+        while last + 1 < len(pieces) and total + pieces[last + 1][2] <= max_tokens:
+            last += 1
+            total += pieces[last][2]
+        # The count of the joined text can exceed the sum of the pieces
+        while last > first and tokens(pieces[first][0], pieces[last][1]) > max_tokens:
+            last -= 1
+        ranges.append((pieces[first][0], pieces[last][1]))
+        first = last + 1
+
+    chunks = []
+    for start, end in ranges:
+        text = data[start:end].decode('utf-8')
+        chunk_tokens = count_tokens(text)
+        chunks.append({
+            "offset": start,
+            "length": end - start,
+            "tokens": chunk_tokens,
+            "oversized": chunk_tokens > max_tokens,
+            "text": text
+        })
+    return chunks
+
+
+def build_chunk_manifest(chunks, index, max_tokens, source=None):
+    """
+    Manifest of the chunks of an LLM file
+
+    Args:
+        chunks: Chunks from chunk_llm_content
+        index: Section index of the file
+        max_tokens: Token budget of a chunk
+        source: File name of the LLM file (optional)
+
+    Returns:
+        Dictionary with the chunks (file, offset, length, tokens, oversized)
+        and the sections and blocks of the index with the chunks covering them
+    """
+    sections = []
+    for entry in index["sections"]:
+        entry_end = entry["offset"] + entry["length"]
+        covering = [
+            number for number, chunk in enumerate(chunks)
+            if chunk["offset"] < entry_end and entry["offset"] < chunk["offset"] + chunk["length"]
+        ]
+        sections.append({"tag": entry["tag"], "name": entry["name"], "chunks": covering})
+
+    return {
+        "version": CHUNK_MANIFEST_VERSION,
+        "source": source,
+        "file_size": index["file_size"],
+        "max_tokens": max_tokens,
+        "total_tokens": sum(chunk["tokens"] for chunk in chunks),
+        "chunks": [
+            {
+                "file": f"chunk_{number + 1:03d}.txt",
+                "offset": chunk["offset"],
+                "length": chunk["length"],
+                "tokens": chunk["tokens"],
+                "oversized": chunk["oversized"]
+            }
+            for number, chunk in enumerate(chunks)
+        ],
+        "sections": sections
+    }
+
+
+def write_llm_chunks(content, llm_path, max_tokens, store=None):
+    """
+    Write the chunks of an LLM file and their manifest next to it
+
+    Chunks of a previous run are removed first.
+
+    Args:
+        content: Content of the LLM file, as written
+        llm_path: Path of the LLM file
+        max_tokens: Token budget of a chunk
+        store: TextBlockStore the content's text block references are read
+            from (default: the configured store, opened only if there are references)
+
+    Returns:
+        Path of the manifest
+
+    Raises:
+        KeyError: If a referenced text block is not in the store
+    """
+    file_size = len(content.encode('utf-8'))
+    rehydrated = REFERENCE_PREFIX in content
+    if rehydrated:
+        content = rehydrate_text_blocks(content, store or TextBlockStore())
+
+    data = content.encode('utf-8')
+    index = build_section_index(data)
+    chunks = chunk_llm_content(data, max_tokens, index=index)
+    manifest = build_chunk_manifest(chunks, index, max_tokens, source=os.path.basename(str(llm_path)))
+    # Size of the file as written, which load_chunk_manifest checks the chunks against
+    manifest["file_size"] = file_size
+    manifest["text_blocks_rehydrated"] = rehydrated
+
+    chunk_dir = chunk_dir_path(llm_path)
+    os.makedirs(chunk_dir, exist_ok=True)
+    for name in os.listdir(chunk_dir):
+        if name.startswith("chunk_") and name.endswith(".txt"):
+            os.remove(os.path.join(chunk_dir, name))
+
+    for entry, chunk in zip(manifest["chunks"], chunks):
+        with open(os.path.join(chunk_dir, entry["file"]), 'w', encoding='utf-8') as f:
+            f.write(chunk["text"])
+
+    manifest_path = os.path.join(chunk_dir, CHUNK_MANIFEST_NAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+    oversized = sum(1 for entry in manifest["chunks"] if entry["oversized"])
+    logging.info(f"Wrote {len(chunks)} chunks of up to {max_tokens} tokens to {chunk_dir}"
+                 + (f" ({oversized} oversized)" if oversized else ""))
+    return manifest_path
+
+
+def load_chunk_manifest(llm_path):
+    """
+    Load the chunk manifest of an LLM file
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        The manifest, or None if the file has no chunks or they were written
+        for a different version of the file
+    """
+    manifest_path = os.path.join(chunk_dir_path(llm_path), CHUNK_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != CHUNK_MANIFEST_VERSION or manifest.get("file_size") != os.path.getsize(llm_path):
+        logging.info(f"Ignoring stale chunks of {llm_path}")
+        return None
+    return manifest
+
+
+def chunks_for_sections(manifest, names):
+    """
+    Chunk files covering the given sections
+
+    Args:
+        manifest: Chunk manifest
+        names: Section names (e.g. ["BALANCE_SHEET", "ITEM_7_MD_AND_A"])
+
+    Returns:
+        List of chunk file names in file order
+    """
+    names = set(names)
+    numbers = sorted({
+        number for section in manifest["sections"] if section["name"] in names
+        for number in section["chunks"]
+    })
+    return [manifest["chunks"][number]["file"] for number in numbers]
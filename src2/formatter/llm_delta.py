@@ -0,0 +1,479 @@
+"""
+LLM Delta Module
+
+Delta output mode of saved LLM files (LLM_DELTA in config). Successive
+filings of a company share most of their contexts, concepts and narrative,
+so next to AAPL_10-Q_2024_Q2_llm.txt a delta against the company's previous
+filing (AAPL_10-Q_2024_Q1_llm.txt) is written as AAPL_10-Q_2024_Q2_llm.delta.json:
+
+    {
+      "version": 1,
+      "base": {"file": "AAPL_10-Q_2024_Q1_llm.txt", "gcs_path": ..., "sha256": ..., "size": ...},
+      "target": {"file": "AAPL_10-Q_2024_Q2_llm.txt", "sha256": ..., "size": ...},
+      "context_map": {"c-17": "c-4", ...},
+      "ops": [[0, 212], "new or changed lines", [230, 415], ...],
+      "summary": {"facts": ..., "contexts": ..., "sections": [...]}
+    }
+
+Context IDs are assigned per filing, so contexts of the filing are first
+matched to contexts of the base (same period, sharing facts) and renamed to
+the base IDs. The renamed file is then written as ops over its lines: a pair
+[start, end] copies lines of the base, a string holds new or changed lines.
+The summary lists the new or changed facts, the contexts without a match in
+the base and the status of each section.
+
+apply_llm_delta / reconstruct_llm_file rebuild the filing from the base and
+the delta, checked against the SHA-256 of the filing.
+
+Both files are read with the text of the text block store put back
+(rehydrate_llm_file), so the delta rebuilds the full filing and references
+of either file to the store do not show up as changes.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from collections import defaultdict
+
+from .section_index import build_section_index
+from .text_block_store import rehydrate_llm_file
+from ..config import LLM_DELTA
+
+DELTA_VERSION = 1
+
+# Fact blocks of the individual facts section
+FACT_BLOCK_PATTERN = re.compile(r'^@CONCEPT: .*?(?=\n\n|\Z)', re.MULTILINE | re.DOTALL)
+
+# Saved LLM file names: ticker, filing type, fiscal year and period
+LLM_FILE_NAME_PATTERN = re.compile(r'^([A-Z0-9.]+)_(.+?)_(\d{4})(?:_(Q[1-4]|FY))?_llm\.txt$')
+
+
+def delta_path(llm_path):
+    """
+    Path of the delta of an LLM file (local path or GCS object name)
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        Path of the delta, as a string
+    """
+    llm_path = str(llm_path)
+    base = llm_path[:-len(".txt")] if llm_path.endswith(".txt") else llm_path
+    return f"{base}.delta.json"
+
+
+def filing_sort_key(llm_path):
+    """
+    Sort key of a saved LLM file in filing order
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        Tuple of ticker, fiscal year and period (annual reports after Q3),
+        or None if the name does not follow the pipeline's naming
+    """
+    match = LLM_FILE_NAME_PATTERN.match(os.path.basename(str(llm_path)))
+    if not match:
+        return None
+    ticker, _, fiscal_year, fiscal_period = match.groups()
+    period = fiscal_period if fiscal_period and fiscal_period != "FY" else "Q4"
+    return (ticker, int(fiscal_year), period)
+
+
+def gcs_llm_path(llm_path):
+    """
+    GCS object name of a saved LLM file, as uploaded by the pipeline
+
+    Args:
+        llm_path: Path or name of the LLM file
+
+    Returns:
+        companies/{ticker}/{filing_type}/{fiscal_year}[/{fiscal_period}]/llm.txt,
+        or None if the name does not follow the pipeline's naming
+    """
+    match = LLM_FILE_NAME_PATTERN.match(os.path.basename(str(llm_path)))
+    if not match:
+        return None
+    ticker, filing_type, fiscal_year, fiscal_period = match.groups()
+    if filing_type == "10-K" or not fiscal_period:
+        return f"companies/{ticker}/{filing_type}/{fiscal_year}/llm.txt"
+    return f"companies/{ticker}/{filing_type}/{fiscal_year}/{fiscal_period}/llm.txt"
+
+
+def previous_llm_file(llm_path):
+    """
+    Previous filing of the same company, in the directory of an LLM file
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        Path of the latest LLM file before it in filing order, or None
+    """
+    key = filing_sort_key(llm_path)
+    if key is None:
+        return None
+
+    directory = os.path.dirname(str(llm_path)) or "."
+    earlier = []
+    for name in os.listdir(directory):
+        other_key = filing_sort_key(name)
+        if other_key is not None and other_key[0] == key[0] and other_key < key:
+            earlier.append((other_key, name))
+    if not earlier:
+        return None
+    return os.path.join(directory, max(earlier)[1])
+
+
+def _fact_contexts(content):
+    """Period and facts (concept, value, unit) of each context used by the fact blocks."""
+    periods = {}
+    facts = defaultdict(set)
+    for match in FACT_BLOCK_PATTERN.finditer(content):
+        fields = {}
+        for line in match.group(0).split("\n"):
+            tag, separator, value = line.partition(": ")
+            if separator:
+                fields.setdefault(tag, value)
+
+        context_id, _, label = fields.get("@CONTEXT_REF", "").partition("|@CONTEXT: ")
+        context_id = context_id.strip()
+        if not context_id:
+            continue
+        periods.setdefault(context_id, (
+            label.strip(), fields.get("@DATE_TYPE"), fields.get("@START_DATE"),
+            fields.get("@END_DATE"), fields.get("@DATE")
+        ))
+        facts[context_id].add((fields.get("@CONCEPT"), fields.get("@VALUE"), fields.get("@UNIT_REF")))
+    return periods, facts
+
+
+def match_contexts(base_content, target_content):
+    """
+    Match the contexts of a filing to the contexts of its base
+
+    Contexts match when they have the same period and share facts, or when
+    they are the only context with the period in both filings.
+
+    Args:
+        base_content: Content of the base LLM file
+        target_content: Content of the LLM file
+
+    Returns:
+        Dict of target context ID to base context ID
+    """
+    return _match_contexts(_fact_contexts(base_content), _fact_contexts(target_content))
+
+
+def _match_contexts(base_contexts, target_contexts):
+    """Matches of contexts given the periods and facts of each filing (see match_contexts)."""
+    base_periods, base_facts = base_contexts
+    target_periods, target_facts = target_contexts
+
+    base_by_period = defaultdict(list)
+    for context_id, period in base_periods.items():
+        base_by_period[period].append(context_id)
+    target_period_counts = defaultdict(int)
+    for period in target_periods.values():
+        target_period_counts[period] += 1
+
+    candidates = []
+    for target_id, period in target_periods.items():
+        base_ids = base_by_period.get(period, [])
+        for base_id in base_ids:
+            shared = len(target_facts[target_id] & base_facts[base_id])
+            if shared or (len(base_ids) == 1 and target_period_counts[period] == 1):
+                candidates.append((shared, target_id, base_id))
+
+    # Most shared facts first, each context matched once
+    matches = {}
+    used = set()
+    for _, target_id, base_id in sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1], candidate[2])):
+        if target_id not in matches and base_id not in used:
+            matches[target_id] = base_id
+            used.add(base_id)
+    return matches
+
+
+def _rename(content, mapping):
+    """Replace the whole-token occurrences of the mapping's IDs in the content."""
+    if not mapping:
+        return content
+    # Longest IDs first, so c-17 is not taken for c-1
+    pattern = re.compile(
+        r'(?<![\w.-])(?:' + "|".join(map(re.escape, sorted(mapping, key=len, reverse=True))) + r')(?![\w.-])'
+    )
+    return pattern.sub(lambda match: mapping[match.group(0)], content)
+
+
+def _context_map(base_content, target_content, matches, target_ids):
+    """Renaming of the target's context IDs that the inverse renaming undoes exactly."""
+    context_map = {target_id: base_id for target_id, base_id in matches.items() if target_id != base_id}
+    if not context_map:
+        return {}
+
+    # Unmatched IDs that a matched context is renamed to get a fresh name
+    renamed_to = set(context_map.values())
+    number = 0
+    for target_id in sorted(set(target_ids) - set(matches)):
+        if target_id in renamed_to:
+            number += 1
+            while f"delta-context-{number}" in target_content or f"delta-context-{number}" in base_content:
+                number += 1
+            context_map[target_id] = f"delta-context-{number}"
+
+    inverse = {renamed: target_id for target_id, renamed in context_map.items()}
+    if _rename(_rename(target_content, context_map), inverse) != target_content:
+        logging.info("Context IDs collide with other text; writing the delta without renaming")
+        return {}
+    return context_map
+
+
+def _line_ops(base_lines, target_lines, min_copy_bytes):
+    """Ops rebuilding the target lines: [start, end] copies base lines, a string holds lines."""
+    positions = defaultdict(list)
+    for number, line in enumerate(base_lines):
+        positions[line].append(number)
+
+    def run_length(base_start, target_start):
+        length = 0
+        while (base_start + length < len(base_lines) and target_start + length < len(target_lines)
+               and base_lines[base_start + length] == target_lines[target_start + length]):
+            length += 1
+        return length
+
+    ops = []
+    literal = []
+    next_base = None
+    position = 0
+    while position < len(target_lines):
+        line = target_lines[position]
+        # Continue the previous copy if it goes on, otherwise take the longest
+        # run among the first occurrences of the line
+        if next_base is not None and next_base < len(base_lines) and base_lines[next_base] == line:
+            start = next_base
+            length = run_length(start, position)
+        else:
+            start, length = None, 0
+            for candidate in positions.get(line, [])[:16]:
+                candidate_length = run_length(candidate, position)
+                if candidate_length > length:
+                    start, length = candidate, candidate_length
+
+        if start is None or sum(len(copied) + 1 for copied in target_lines[position:position + length]) < min_copy_bytes:
+            literal.append(line)
+            position += 1
+            next_base = None
+            continue
+
+        if literal:
+            ops.append("\n".join(literal))
+            literal = []
+        ops.append([start, start + length])
+        position += length
+        next_base = start + length
+
+    if literal:
+        ops.append("\n".join(literal))
+    return ops
+
+
+def _section_summary(base_content, base_lines, renamed_content, ops):
+    """Status of each section of the filing: unchanged, changed or new."""
+    base_sections = {(entry["tag"], entry["name"]) for entry in build_section_index(base_content)["sections"]}
+
+    # Byte ranges of the renamed filing held in string ops
+    changed_ranges = []
+    offset = 0
+    for op in ops:
+        if isinstance(op, str):
+            length = len(op.encode('utf-8')) + 1
+            changed_ranges.append((offset, offset + length))
+        else:
+            length = sum(len(line.encode('utf-8')) + 1 for line in base_lines[op[0]:op[1]])
+        offset += length
+
+    sections = []
+    for entry in build_section_index(renamed_content)["sections"]:
+        start, end = entry["offset"], entry["offset"] + entry["length"]
+        if (entry["tag"], entry["name"]) not in base_sections:
+            status = "new"
+        elif any(range_start < end and start < range_end for range_start, range_end in changed_ranges):
+            status = "changed"
+        else:
+            status = "unchanged"
+        sections.append({"tag": entry["tag"], "name": entry["name"], "status": status})
+    return sections
+
+
+def build_llm_delta(base_content, target_content, base_name=None, target_name=None, min_copy_bytes=None):
+    """
+    Delta of an LLM file against the previous filing's LLM file
+
+    Args:
+        base_content: Content of the base (previous) LLM file
+        target_content: Content of the LLM file
+        base_name: File name of the base, recorded as the reference to it
+        target_name: File name of the LLM file (optional)
+        min_copy_bytes: Shortest run of base lines copied (default:
+            LLM_DELTA["min_copy_bytes"]); shorter runs are written inline
+
+    Returns:
+        Delta dictionary (see the module docstring)
+    """
+    if min_copy_bytes is None:
+        min_copy_bytes = LLM_DELTA.get("min_copy_bytes", 16)
+
+    base_contexts = _fact_contexts(base_content)
+    target_contexts = _fact_contexts(target_content)
+    matches = _match_contexts(base_contexts, target_contexts)
+    context_map = _context_map(base_content, target_content, matches, target_contexts[0])
+    renamed_content = _rename(target_content, context_map)
+
+    base_lines = base_content.split("\n")
+    target_lines = renamed_content.split("\n")
+    ops = _line_ops(base_lines, target_lines, min_copy_bytes)
+
+    base_periods, base_facts = base_contexts
+    target_periods, target_facts = target_contexts
+    base_fact_keys = {fact + (base_periods[context_id],) for context_id, facts in base_facts.items() for fact in facts}
+    target_fact_keys = {fact + (target_periods[context_id],) for context_id, facts in target_facts.items() for fact in facts}
+
+    return {
+        "version": DELTA_VERSION,
+        "base": {
+            "file": base_name,
+            "gcs_path": gcs_llm_path(base_name) if base_name else None,
+            "sha256": hashlib.sha256(base_content.encode('utf-8')).hexdigest(),
+            "size": len(base_content.encode('utf-8'))
+        },
+        "target": {
+            "file": target_name,
+            "sha256": hashlib.sha256(target_content.encode('utf-8')).hexdigest(),
+            "size": len(target_content.encode('utf-8'))
+        },
+        "context_map": context_map,
+        "ops": ops,
+        "summary": {
+            "facts": {
+                "total": len(target_fact_keys),
+                "new_or_changed": len(target_fact_keys - base_fact_keys)
+            },
+            "contexts": {
+                "total": len(target_periods),
+                "matched": len(matches),
+                "new": sorted(set(target_periods) - set(matches))
+            },
+            "lines": {
+                "total": len(target_lines),
+                "copied": sum(op[1] - op[0] for op in ops if not isinstance(op, str))
+            },
+            "sections": _section_summary(base_content, base_lines, renamed_content, ops)
+        }
+    }
+
+
+def apply_llm_delta(base_content, delta):
+    """
+    Rebuild an LLM file from its base and its delta
+
+    Args:
+        base_content: Content of the base LLM file
+        delta: Delta dictionary
+
+    Returns:
+        Content of the LLM file
+
+    Raises:
+        ValueError: If the base is not the file the delta was built against,
+            or the rebuilt content does not match the delta's checksum
+    """
+    if delta.get("version") != DELTA_VERSION:
+        raise ValueError(f"Unsupported delta version: {delta.get('version')}")
+    if hashlib.sha256(base_content.encode('utf-8')).hexdigest() != delta["base"]["sha256"]:
+        raise ValueError(f"Base content does not match the delta base {delta['base'].get('file')}")
+
+    base_lines = base_content.split("\n")
+    lines = []
+    for op in delta["ops"]:
+        if isinstance(op, str):
+            lines.extend(op.split("\n"))
+        else:
+            lines.extend(base_lines[op[0]:op[1]])
+
+    inverse = {renamed: target_id for target_id, renamed in delta.get("context_map", {}).items()}
+    content = _rename("\n".join(lines), inverse)
+
+    if hashlib.sha256(content.encode('utf-8')).hexdigest() != delta["target"]["sha256"]:
+        raise ValueError(f"Rebuilt content does not match the delta target {delta['target'].get('file')}")
+    return content
+
+
+def write_llm_delta(llm_path, base_path=None):
+    """
+    Write the delta of an LLM file against the previous filing next to it
+
+    Args:
+        llm_path: Path of the LLM file
+        base_path: Path of the base LLM file (default: previous_llm_file)
+
+    Returns:
+        Path of the delta, or None if the company has no previous filing
+    """
+    base_path = base_path or previous_llm_file(llm_path)
+    if base_path is None:
+        logging.info(f"No previous filing for {llm_path}; no delta written")
+        return None
+
+    base_content = rehydrate_llm_file(base_path)
+    target_content = rehydrate_llm_file(llm_path)
+
+    delta = build_llm_delta(base_content, target_content, base_name=os.path.basename(str(base_path)),
+                            target_name=os.path.basename(str(llm_path)))
+    path = delta_path(llm_path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False, separators=(",", ":"))
+
+    summary = delta["summary"]
+    logging.info(f"Wrote delta of {llm_path} against {delta['base']['file']}: {os.path.getsize(path):,} of "
+                 f"{delta['target']['size']:,} bytes, {summary['facts']['new_or_changed']} new or changed facts, "
+                 f"{len(summary['contexts']['new'])} new contexts")
+    return path
+
+
+def load_llm_delta(path):
+    """
+    Load a delta
+
+    Args:
+        path: Path of the delta, or of the LLM file it belongs to
+
+    Returns:
+        Delta dictionary
+    """
+    path = str(path)
+    if path.endswith(".txt"):
+        path = delta_path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def reconstruct_llm_file(path, base_path=None):
+    """
+    Rebuild an LLM file from its delta and the base filing
+
+    Args:
+        path: Path of the delta, or of the LLM file it belongs to
+        base_path: Path of the base LLM file (default: the file named in the
+            delta, in the delta's directory)
+
+    Returns:
+        Content of the LLM file, with stored text blocks put back
+    """
+    delta = load_llm_delta(path)
+    base_path = base_path or os.path.join(os.path.dirname(str(path)), delta["base"]["file"])
+    return apply_llm_delta(rehydrate_llm_file(base_path), delta)
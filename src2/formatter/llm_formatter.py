@@ -2,6 +2,22 @@
 LLM Formatter Module
 
 Responsible for converting parsed XBRL data and narrative content to LLM-friendly format.
+
+The sections after the context dictionary are produced independently and
+assembled in document order; the financial statements and narrative sections
+can be produced in a process pool (LLM_FORMATTING in config).
+
+The compact output profile (LLM_FORMATTING["profile"]) writes each fact once,
+in the fact table of fact_table.py, and refers to facts by ID in the
+financial statements and the individual facts section.
+
+Saved files get a byte-offset section index (section_index.py) so readers can
+fetch one section without reading the whole file, and optionally token-budgeted
+chunks with a manifest (llm_chunker.py, LLM_CHUNKING in config). Narrative
+text already stored by an earlier filing can be written as a reference to a
+shared content-addressed store (text_block_store.py, TEXT_BLOCK_STORE in config),
+and a delta against the company's previous filing written next to the file
+(llm_delta.py, LLM_DELTA in config).
 """
 
 import os
@@ -9,6 +25,7 @@ import logging
 import json
 import re
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from .normalize_value import normalize_value, safe_parse_decimals
 from .context_extractor import extract_contexts_from_html, map_contexts_to_periods
 from .context_format_handler import extract_period_info
@@ -16,6 +33,23 @@ from .financial_statement_organizer import organize_financial_statements
 from .normalized_financial_mapper import NormalizedFinancialMapper
 from .file_size_optimizer import FileSizeOptimizer
 from .xbrl_mapping_integration import xbrl_mapping_integration
+from .fact_table import assign_fact_ids, format_fact_table
+from .section_index import write_section_index
+from .llm_chunker import write_llm_chunks
+from .text_block_store import TextBlockStore
+from .llm_delta import write_llm_delta
+from ..config import LLM_FORMATTING, LLM_CHUNKING, TEXT_BLOCK_STORE, LLM_DELTA
+from ..sec.instrumentation import span
+from ..sec.section_segmenter import FORM_10K_SECTIONS, FORM_10Q_SECTIONS
+
+# Narrative sections in output order: the 10-K and 10-Q Items of the section
+# segmenter's ID table (so every section it finds is formatted), then common
+# MD&A subsections
+PRIORITY_SECTIONS = (
+    list(FORM_10K_SECTIONS.values())
+    + [section_id for part in FORM_10Q_SECTIONS.values() for section_id in part.values()]
+    + ["MANAGEMENT_DISCUSSION", "RESULTS_OF_OPERATIONS", "LIQUIDITY_AND_CAPITAL", "CRITICAL_ACCOUNTING"]
+)
 
 def safe_parse_decimals(decimals):
     '''Safely parse decimals value, handling 'INF' special case'''
@@ -28,6 +62,393 @@ def safe_parse_decimals(decimals):
     except (ValueError, TypeError):
         return None  # Return None for unparseable values
 
+def new_integrity_counts():
+    """Zeroed data integrity counts of one section producer."""
+    return {
+        "xbrl_tables_created": 0,
+        "tables_detected": 0,
+        "tables_included": 0,
+        "total_table_rows": 0,
+        "narrative_paragraphs": 0,
+        "included_paragraphs": 0,
+        "section_tables": {}
+    }
+
+def format_financial_statements(parsed_xbrl, fact_references=False):
+    """
+    Produce the financial statements section, organized by the financial
+    statement organizer
+
+    Args:
+        parsed_xbrl: Parsed XBRL data
+        fact_references: Show fact IDs instead of values (compact profile)
+
+    Returns:
+        Tuple of (output lines, data integrity counts)
+    """
+    output = []
+    integrity = new_integrity_counts()
+
+    # Organize financial statements
+    financial_statements = organize_financial_statements(parsed_xbrl, fact_references)
+
+    # Add financial statements to the output
+    if financial_statements:
+        output.append("")
+        output.append("@FINANCIAL_STATEMENTS_SECTION")
+        output.append("")
+
+        # Add each financial statement
+        for statement_type, statement_lines in financial_statements.items():
+            output.extend(statement_lines)
+            output.append("")
+            output.append("-" * 80)  # Add a separator between statements
+            output.append("")
+
+        # Update data integrity metrics
+        integrity["xbrl_tables_created"] = len(financial_statements)
+        integrity["tables_detected"] += len(financial_statements)
+        integrity["tables_included"] += len(financial_statements)
+
+        # Count total rows in all statements
+        total_rows = sum(len(statement_lines) for statement_lines in financial_statements.values())
+        integrity["total_table_rows"] += total_rows
+
+    return output, integrity
+
+def format_facts_section(parsed_xbrl):
+    """
+    Produce the facts section (facts by context, then concept blocks)
+
+    Args:
+        parsed_xbrl: Parsed XBRL data
+
+    Returns:
+        Tuple of (output lines, data integrity counts)
+    """
+    output = []
+
+    # Track facts by context reference to build tables
+    facts_by_context = {}
+    for fact in parsed_xbrl.get("facts", []):
+        context_ref = fact.get("context_ref", "")
+        if context_ref not in facts_by_context:
+            facts_by_context[context_ref] = []
+        facts_by_context[context_ref].append(fact)
+
+    # Add facts section
+    output.append("")
+    output.append("@FACTS_SECTION")
+    output.append("")
+
+    # Check if we have any facts to add
+    if parsed_xbrl.get("facts", []):
+        # Add facts organized by context
+        for context_ref, facts_list in facts_by_context.items():
+            if facts_list:
+                output.append(f"@CONTEXT: {context_ref}")
+
+                # Group facts by prefix
+                facts_by_prefix = {}
+                for fact in facts_list:
+                    concept = fact.get("concept", "")
+                    prefix = concept.split(":")[0] if ":" in concept else ""
+
+                    if prefix not in facts_by_prefix:
+                        facts_by_prefix[prefix] = []
+                    facts_by_prefix[prefix].append(fact)
+
+                # Add facts for each prefix
+                for prefix, prefix_facts in facts_by_prefix.items():
+                    if prefix:
+                        output.append(f"@PREFIX: {prefix}")
+
+                    # Add facts
+                    for fact in prefix_facts:
+                        concept = fact.get("concept", "")
+                        value = fact.get("value", "")
+                        unit = fact.get("unit_ref", "")
+
+                        # Remove prefix from concept if it matches the current prefix
+                        if prefix and concept.startswith(f"{prefix}:"):
+                            concept = concept.split(":", 1)[1]
+
+                        # Add fact
+                        if unit:
+                            output.append(f"{concept}|{value}|{unit}")
+                        else:
+                            output.append(f"{concept}|{value}")
+
+        # Also add individual facts as concept blocks for hierarchy extraction
+        output.append("")
+        output.append("@CONCEPT_BLOCKS")
+        output.append("")
+
+        # Add concept blocks for each fact
+        for fact in parsed_xbrl.get("facts", []):
+            concept = fact.get("concept", "")
+            value = fact.get("value", "")
+            unit_ref = fact.get("unit_ref", "")
+            context_ref = fact.get("context_ref", "")
+
+            # Get context information
+            context = parsed_xbrl.get("contexts", {}).get(context_ref, {})
+            period = context.get("period", {})
+
+            # Determine date type and dates
+            if "instant" in period:
+                date_type = "INSTANT"
+                date = period.get("instant", "")
+                output.append(f"@CONCEPT: {concept}")
+                output.append(f"@VALUE: {value}")
+                output.append(f"@UNIT_REF: {unit_ref}")
+                output.append(f"@CONTEXT_REF: {context_ref}")
+                output.append(f"@DATE_TYPE: {date_type}")
+                output.append(f"@DATE: {date}")
+                output.append("")
+            elif "startDate" in period and "endDate" in period:
+                date_type = "DURATION"
+                start_date = period.get("startDate", "")
+                end_date = period.get("endDate", "")
+                output.append(f"@CONCEPT: {concept}")
+                output.append(f"@VALUE: {value}")
+                output.append(f"@UNIT_REF: {unit_ref}")
+                output.append(f"@CONTEXT_REF: {context_ref}")
+                output.append(f"@DATE_TYPE: {date_type}")
+                output.append(f"@START_DATE: {start_date}")
+                output.append(f"@END_DATE: {end_date}")
+                output.append("")
+    else:
+        # No facts to add, just add a placeholder
+        output.append("@CONTEXT_REFERENCE_GUIDE")
+        output.append("This section provides a consolidated reference for all time periods used in this document.")
+        output.append("")
+
+    return output, new_integrity_counts()
+
+def format_fact_table_section(parsed_xbrl):
+    """
+    Produce the fact table that replaces the facts section and concept
+    blocks in the compact profile
+
+    Args:
+        parsed_xbrl: Parsed XBRL data with fact IDs
+
+    Returns:
+        Tuple of (output lines, data integrity counts)
+    """
+    return format_fact_table(parsed_xbrl), new_integrity_counts()
+
+def determine_financial_section(concept):
+    """Financial section of the individual facts section for a concept."""
+    concept_lower = concept.lower()
+    if any(term in concept_lower for term in ["revenue", "sales", "income", "earnings", "eps", "expense", "cost"]):
+        return "INCOME_STATEMENT"
+    elif any(term in concept_lower for term in ["asset", "liability", "equity", "debt", "cash and", "inventory", "payable", "receivable"]):
+        return "BALANCE_SHEET"
+    elif any(term in concept_lower for term in ["cashflow", "cash flow", "financing", "investing", "operating"]):
+        return "CASH_FLOW"
+    elif any(term in concept_lower for term in ["stockholder", "shareholder", "comprehensive", "retained earnings"]):
+        return "EQUITY_STATEMENT"
+    else:
+        return "OTHER_FINANCIAL"
+
+def format_fact_references(parsed_xbrl):
+    """
+    Produce the individual facts section of the compact profile: the IDs of
+    the facts of each financial section, in concept order
+
+    Args:
+        parsed_xbrl: Parsed XBRL data with fact IDs
+
+    Returns:
+        Tuple of (output lines, data integrity counts)
+    """
+    output = ["", "@INDIVIDUAL_FACTS_SECTION", ""]
+
+    financial_sections = {
+        "INCOME_STATEMENT": [],
+        "BALANCE_SHEET": [],
+        "CASH_FLOW": [],
+        "EQUITY_STATEMENT": [],
+        "OTHER_FINANCIAL": []
+    }
+    for fact in parsed_xbrl.get("facts", []):
+        financial_sections[determine_financial_section(fact.get("concept", ""))].append(fact)
+
+    for section_name, section_facts in financial_sections.items():
+        if section_facts:
+            sorted_section_facts = sorted(section_facts, key=lambda x: x.get("concept", ""))
+            output.append(f"@SECTION: {section_name}")
+            output.append(f"@FACT_IDS: {', '.join(fact['fact_id'] for fact in sorted_section_facts)}")
+            output.append("")
+
+    return output, new_integrity_counts()
+
+def format_narrative_section(section_id, section_data):
+    """
+    Produce one narrative section: its substantive paragraphs (at most five)
+    and all of its tables
+
+    Args:
+        section_id: Section ID
+        section_data: Dictionary with the section name and text
+
+    Returns:
+        Tuple of (output lines, data integrity counts)
+    """
+    output = []
+    integrity = new_integrity_counts()
+
+    output.append(f"@SECTION: {section_id}")
+    output.append(f"@SECTION_TITLE: {section_data['name']}")
+    output.append("")
+
+    # Process text into manageable chunks
+    text = section_data['text']
+
+    # Split by paragraphs
+    paragraphs = re.split(r'\n\s*\n', text)
+
+    # Separate tables and narrative text
+    tables = []
+    narrative_paragraphs = []
+
+    # For data integrity tracking
+    section_id_safe = section_id.replace(" ", "_")
+    if section_id_safe not in integrity["section_tables"]:
+        integrity["section_tables"][section_id_safe] = {
+            "detected": 0,
+            "included": 0,
+            "rows": 0
+        }
+
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        # Comprehensive table detection
+        is_table = False
+        detection_method = "none"
+
+        # Method 1: Check for explicit table markers (pipe/tab)
+        if '|' in paragraph or '\t' in paragraph:
+            is_table = True
+            detection_method = "explicit_markers"
+
+        # Method 2: Check for aligned columns with financial indicators
+        elif any(financial_marker in paragraph for financial_marker in ['$', '%', '(Dollars', '(in millions', 'Three Months Ended']):
+            # Check for aligned numeric data - common in financial tables
+            lines = paragraph.split('\n')
+            if len(lines) >= 2:  # Need at least 2 rows to be a table
+                # Look for aligned numbers or currency symbols
+                numeric_pattern = r'[\s\d\$\(\)\.,%-]+'
+                aligned_positions = []
+
+                # Find positions of numbers in first line to check alignment
+                for match in re.finditer(r'\$\d+|\d+\.\d+|\(\d+\)|\d+%', lines[0]):
+                    aligned_positions.append((match.start(), match.end()))
+
+                # Check for numbers or currency symbols at similar positions in other lines
+                if aligned_positions:
+                    alignment_count = 0
+                    for line in lines[1:]:
+                        for start, end in aligned_positions:
+                            # Allow for some flexibility in position (±5 chars)
+                            if start >= 5 and end <= len(line) + 5:
+                                nearby_text = line[max(0, start-5):min(len(line), end+5)]
+                                if re.search(r'\$\d+|\d+\.\d+|\(\d+\)|\d+%', nearby_text):
+                                    alignment_count += 1
+
+                    # If we have good alignment, it's probably a table
+                    if alignment_count >= len(lines) - 1:
+                        is_table = True
+                        detection_method = "financial_indicators"
+
+        # Method 3: Detect space-delimited tables with column headers and consistent structure
+        elif len(paragraph.split('\n')) >= 3:  # Need header + at least 2 data rows
+            lines = paragraph.split('\n')
+
+            # Count spaces to detect column boundaries in first 2 lines
+            space_positions_1 = [i for i, char in enumerate(lines[0]) if char == ' ' and i > 0 and lines[0][i-1] != ' ']
+            if len(lines) > 1:
+                space_positions_2 = [i for i, char in enumerate(lines[1]) if char == ' ' and i > 0 and lines[1][i-1] != ' ']
+
+                # If space positions are similar in multiple lines, likely a table with aligned columns
+                matching_positions = 0
+                for pos1 in space_positions_1:
+                    for pos2 in space_positions_2:
+                        if abs(pos1 - pos2) <= 3:  # Allow slight misalignment
+                            matching_positions += 1
+
+                if matching_positions >= 2:  # At least 2 columns align
+                    is_table = True
+                    detection_method = "space_alignment"
+
+        # Add to appropriate category and update data integrity metrics
+        if is_table:
+            tables.append(paragraph)
+            line_count = len(paragraph.split('\n'))
+
+            # Update data integrity metrics
+            integrity["tables_detected"] += 1
+            integrity["total_table_rows"] += line_count
+            integrity["section_tables"][section_id_safe]["detected"] += 1
+            integrity["section_tables"][section_id_safe]["rows"] += line_count
+
+            # Log detection of important tables for verification
+            if any(financial_term in paragraph.lower() for financial_term in
+                  ["balance sheet", "income statement", "cash flow", "statement of operations"]):
+                logging.info(f"Detected important financial table in {section_id} using {detection_method}")
+        elif len(paragraph) >= 100:  # Only collect substantive paragraphs
+            narrative_paragraphs.append(paragraph)
+            integrity["narrative_paragraphs"] += 1
+
+    # For narrative text, select important paragraphs (limit quantity to keep file size reasonable)
+    # Focus on first few paragraphs which often contain key information
+    important_paragraphs = []
+    paragraph_count = 0
+
+    for paragraph in narrative_paragraphs:
+        important_paragraphs.append(paragraph)
+        paragraph_count += 1
+
+        # Update integrity metric
+        integrity["included_paragraphs"] += 1
+
+        # Limit paragraphs per section for narrative text only
+        if paragraph_count >= 5:
+            break
+
+    # Add selected narrative paragraphs
+    for paragraph in important_paragraphs:
+        output.append(f"@NARRATIVE_TEXT: {paragraph}")
+        output.append("")
+
+    # Add ALL tables with 100% fidelity - no filtering or summarization
+    for table in tables:
+        output.append(f"@TABLE_CONTENT: {table}")
+        output.append("")
+
+        # Update integrity metrics for included tables
+        integrity["tables_included"] += 1
+        integrity["section_tables"][section_id_safe]["included"] += 1
+
+    return output, integrity
+
+def _producer_result(future, producer, *args):
+    """
+    Result of a section producer started in the process pool, or of running
+    it in this process when there is no pool (or the pool failed)
+    """
+    if future is not None:
+        try:
+            return future.result()
+        except Exception as e:
+            logging.warning(f"Section producer {producer.__name__} failed in the process pool, running in process: {str(e)}")
+    return producer(*args)
+
 class LLMFormatter:
     """
     Format parsed XBRL data and narrative content for optimal LLM input
@@ -46,23 +467,23 @@ class LLMFormatter:
             "ITEM_1C_CYBERSECURITY": "Cybersecurity",
             "ITEM_2_PROPERTIES": "Properties",
             "ITEM_3_LEGAL_PROCEEDINGS": "Legal Proceedings",
-            "ITEM_4_MINE_SAFETY": "Mine Safety Disclosures",
+            "ITEM_4_MINE_SAFETY_DISCLOSURES": "Mine Safety Disclosures",
             "ITEM_5_MARKET": "Market for Registrant's Common Equity and Related Stockholder Matters",
-            "ITEM_6_SELECTED_FINANCIAL": "Selected Financial Data",
+            "ITEM_6_SELECTED_FINANCIAL_DATA": "Selected Financial Data",
             "ITEM_7_MD_AND_A": "Management's Discussion and Analysis",
             "ITEM_7A_MARKET_RISK": "Quantitative and Qualitative Disclosures About Market Risk",
             "ITEM_8_FINANCIAL_STATEMENTS": "Financial Statements and Supplementary Data",
-            "ITEM_9_CHANGES_ACCOUNTANTS": "Changes in and Disagreements with Accountants",
+            "ITEM_9_DISAGREEMENTS": "Changes in and Disagreements with Accountants",
             "ITEM_9A_CONTROLS": "Controls and Procedures",
             "ITEM_9B_OTHER_INFORMATION": "Other Information",
             "ITEM_9C_FOREIGN_JURISDICTIONS": "Disclosure Regarding Foreign Jurisdictions",
             "ITEM_10_DIRECTORS": "Directors, Executive Officers and Corporate Governance",
             "ITEM_11_EXECUTIVE_COMPENSATION": "Executive Compensation",
             "ITEM_12_SECURITY_OWNERSHIP": "Security Ownership of Certain Beneficial Owners and Management",
-            "ITEM_13_RELATED_TRANSACTIONS": "Certain Relationships and Related Transactions",
-            "ITEM_14_PRINCIPAL_ACCOUNTANT": "Principal Accountant Fees and Services",
+            "ITEM_13_RELATIONSHIPS": "Certain Relationships and Related Transactions",
+            "ITEM_14_ACCOUNTANT_FEES": "Principal Accountant Fees and Services",
             "ITEM_15_EXHIBITS": "Exhibits, Financial Statement Schedules",
-            "ITEM_16_FORM_10K_SUMMARY": "Form 10-K Summary",
+            "ITEM_16_SUMMARY": "Form 10-K Summary",
 
             # Form 10-Q Items
             "ITEM_1_FINANCIAL_STATEMENTS": "Financial Statements",
@@ -104,7 +525,8 @@ class LLMFormatter:
         # Integrate XBRL mapping
         try:
             # Use our XBRL mapping integration to enhance the parsed XBRL data
-            parsed_xbrl = xbrl_mapping_integration.integrate_xbrl_mapping(parsed_xbrl, filing_metadata)
+            with span("xbrl_mapping"):
+                parsed_xbrl = xbrl_mapping_integration.integrate_xbrl_mapping(parsed_xbrl, filing_metadata)
 
             # If we have LLM-friendly output from our XBRL mapping integration, use it
             if "llm_friendly_output" in parsed_xbrl:
@@ -116,51 +538,7 @@ class LLMFormatter:
 
         # Define priority sections at the very beginning to ensure it's available throughout the method
         # Include all possible 10-K and 10-Q sections
-        priority_sections = [
-            # Form 10-K main Items (in order)
-            "ITEM_1_BUSINESS",
-            "ITEM_1A_RISK_FACTORS",
-            "ITEM_1B_UNRESOLVED_STAFF_COMMENTS",
-            "ITEM_1C_CYBERSECURITY",
-            "ITEM_2_PROPERTIES",
-            "ITEM_3_LEGAL_PROCEEDINGS",
-            "ITEM_4_MINE_SAFETY_DISCLOSURES",
-            "ITEM_5_MARKET",
-            "ITEM_6_SELECTED_FINANCIAL_DATA",
-            "ITEM_7_MD_AND_A",
-            "ITEM_7A_MARKET_RISK",
-            "ITEM_8_FINANCIAL_STATEMENTS",
-            "ITEM_9_DISAGREEMENTS",
-            "ITEM_9A_CONTROLS",
-            "ITEM_9B_OTHER_INFORMATION",
-            "ITEM_9C_FOREIGN_JURISDICTIONS",
-            "ITEM_10_DIRECTORS",
-            "ITEM_11_EXECUTIVE_COMPENSATION",
-            "ITEM_12_SECURITY_OWNERSHIP",
-            "ITEM_13_RELATIONSHIPS",
-            "ITEM_14_ACCOUNTANT_FEES",
-            "ITEM_15_EXHIBITS",
-            "ITEM_16_SUMMARY",
-
-            # Form 10-Q main Items (in order)
-            "ITEM_1_FINANCIAL_STATEMENTS",
-            "ITEM_2_MD_AND_A",
-            "ITEM_3_MARKET_RISK",
-            "ITEM_4_CONTROLS",
-            "ITEM_1_LEGAL_PROCEEDINGS",
-            "ITEM_1A_RISK_FACTORS_Q",
-            "ITEM_2_UNREGISTERED_SALES",
-            "ITEM_3_DEFAULTS",
-            "ITEM_4_MINE_SAFETY_Q",
-            "ITEM_5_OTHER_INFORMATION_Q",
-            "ITEM_6_EXHIBITS_Q",
-
-            # Common MD&A subsections
-            "MANAGEMENT_DISCUSSION",
-            "RESULTS_OF_OPERATIONS",
-            "LIQUIDITY_AND_CAPITAL",
-            "CRITICAL_ACCOUNTING"
-        ]
+        priority_sections = list(PRIORITY_SECTIONS)
 
         # Initialize data integrity tracking
         self.data_integrity = {
@@ -200,6 +578,8 @@ class LLMFormatter:
             output.append(f"@FISCAL_YEAR: {fiscal_year}")
         if fiscal_period:
             output.append(f"@FISCAL_PERIOD: {fiscal_period}")
+        if LLM_FORMATTING.get("profile", "full") == "compact":
+            output.append("@OUTPUT_PROFILE: compact")
 
         # Add structure metadata headers
         output.append("")
@@ -274,7 +654,8 @@ class LLMFormatter:
             if html_content:
                 try:
                     # Use the context extractor module to extract contexts
-                    extracted_contexts = extract_contexts_from_html(html_content, filing_metadata)
+                    with span("html_contexts", bytes_read=len(html_content)):
+                        extracted_contexts = extract_contexts_from_html(html_content, filing_metadata)
 
                     if extracted_contexts:
                         # Update the contexts in parsed_xbrl
@@ -964,1650 +1345,1526 @@ class LLMFormatter:
             except Exception as e:
                 logging.warning(f"Could not extract sections from text file: {str(e)}")
 
-        # Add key financial facts with improved organization using the financial statement organizer
-
         # Track table data for integrity checks
         self.data_integrity["xbrl_facts"] = len(parsed_xbrl.get("facts", []))
         self.data_integrity["xbrl_tables_created"] = 0
 
-        # Organize financial statements
-        financial_statements = organize_financial_statements(parsed_xbrl)
-
-        # Add financial statements to the output
-        if financial_statements:
-            output.append("")
-            output.append("@FINANCIAL_STATEMENTS_SECTION")
-            output.append("")
+        # Add the statement, fact, context guide and narrative sections in document order
+        sections = self._produce_sections(
+            parsed_xbrl, extracted_sections, priority_sections, context_map, context_code_map,
+            context_reference_guide, period_contexts, instant_contexts, filing_type
+        )
+        for section_lines, integrity in sections:
+            output.extend(section_lines)
+            self._add_integrity_counts(integrity)
 
-            # Add each financial statement
-            for statement_type, statement_lines in financial_statements.items():
-                output.extend(statement_lines)
-                output.append("")
-                output.append("-" * 80)  # Add a separator between statements
-                output.append("")
 
-            # Update data integrity metrics
-            self.data_integrity["xbrl_tables_created"] = len(financial_statements)
-            self.data_integrity["tables_detected"] += len(financial_statements)
-            self.data_integrity["tables_included"] += len(financial_statements)
+        # Add Data Integrity Report
+        output.append("@DATA_INTEGRITY_REPORT")
+        output.append("Table preservation metrics:")
+        output.append(f"- XBRL facts: {self.data_integrity.get('xbrl_facts', 0)}")
+        output.append(f"- XBRL tables created: {self.data_integrity.get('xbrl_tables_created', 0)}")
+        output.append(f"- Text tables detected: {self.data_integrity['tables_detected'] - self.data_integrity.get('xbrl_tables_created', 0)}")
+        output.append(f"- Total tables included: {self.data_integrity['tables_included']}")
+        if self.data_integrity['tables_detected'] > 0:
+            preservation_rate = 100 * self.data_integrity['tables_included'] / self.data_integrity['tables_detected']
+            output.append(f"- Table preservation rate: {preservation_rate:.1f}%")
+            # Warning if not all tables are preserved
+            if preservation_rate < 100:
+                output.append("WARNING: Not all tables were preserved!")
+        output.append(f"- Total table rows: {self.data_integrity['total_table_rows']}")
+        output.append(f"- Narrative paragraphs: {self.data_integrity['narrative_paragraphs']}")
+        output.append(f"- Narrative paragraphs included: {self.data_integrity['included_paragraphs']}")
 
-            # Count total rows in all statements
-            total_rows = sum(len(statement_lines) for statement_lines in financial_statements.values())
-            self.data_integrity["total_table_rows"] += total_rows
+        # Document section coverage report
+        output.append("")
+        output.append("@DOCUMENT_COVERAGE")
 
-        # Track facts by context reference to build tables
-        facts_by_context = {}
-        for fact in parsed_xbrl.get("facts", []):
-            context_ref = fact.get("context_ref", "")
-            if context_ref not in facts_by_context:
-                facts_by_context[context_ref] = []
-            facts_by_context[context_ref].append(fact)
+        # Use priority_sections defined at the beginning of the method
 
-        # Add facts section
-        output.append("")
-        output.append("@FACTS_SECTION")
-        output.append("")
+        # Check for new format with document_sections in filing_metadata
+        document_sections = {}
+        if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict) and "document_sections" in filing_metadata["html_content"]:
+            document_sections = filing_metadata["html_content"]["document_sections"]
 
-        # Check if we have any facts to add
-        if parsed_xbrl.get("facts", []):
-            # Add facts organized by context
-            for context_ref, facts_list in facts_by_context.items():
-                if facts_list:
-                    output.append(f"@CONTEXT: {context_ref}")
+        # Create lists of covered and missing sections, considering both extracted_sections and document_sections
+        covered_sections = []
+        # Check for direct exhibits flag from HTML processor
+        has_exhibits_flag = False
+        if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict):
+            has_exhibits_flag = filing_metadata["html_content"].get("has_exhibits_section", False)
+            if has_exhibits_flag:
+                logging.info("Found direct exhibits flag from HTML processor")
 
-                    # Group facts by prefix
-                    facts_by_prefix = {}
-                    for fact in facts_list:
-                        concept = fact.get("concept", "")
-                        prefix = concept.split(":")[0] if ":" in concept else ""
-
-                        if prefix not in facts_by_prefix:
-                            facts_by_prefix[prefix] = []
-                        facts_by_prefix[prefix].append(fact)
-
-                    # Add facts for each prefix
-                    for prefix, prefix_facts in facts_by_prefix.items():
-                        if prefix:
-                            output.append(f"@PREFIX: {prefix}")
-
-                        # Add facts
-                        for fact in prefix_facts:
-                            concept = fact.get("concept", "")
-                            value = fact.get("value", "")
-                            unit = fact.get("unit_ref", "")
-
-                            # Remove prefix from concept if it matches the current prefix
-                            if prefix and concept.startswith(f"{prefix}:"):
-                                concept = concept.split(":", 1)[1]
-
-                            # Add fact
-                            if unit:
-                                output.append(f"{concept}|{value}|{unit}")
-                            else:
-                                output.append(f"{concept}|{value}")
+        for section_id in priority_sections:
+            # Check standard section detection
+            if section_id in extracted_sections or section_id in document_sections:
+                covered_sections.append(section_id)
+            # Special handling for EXHIBITS section with alternative detection
+            elif section_id == "ITEM_15_EXHIBITS":
+                # Check for direct flag first
+                if has_exhibits_flag:
+                    covered_sections.append(section_id)
+                    logging.info("EXHIBITS section included through direct flag")
+                # Then check for alternative detection
+                elif document_sections:
+                    for section_key, section_info in document_sections.items():
+                        if section_key == "ITEM_15_EXHIBITS" and section_info.get("detected_as") == "exhibits_alternative":
+                            covered_sections.append(section_id)
+                            logging.info(f"EXHIBITS section included through alternative detection: {section_info.get('heading', '')}")
+                            break
+            # Special handling for 1B and 1C which often have minimal content
+            elif section_id in ["ITEM_1B_UNRESOLVED_STAFF_COMMENTS", "ITEM_1C_CYBERSECURITY"] and document_sections:
+                # Check for alternative detection with content pattern match
+                section_found = False
+                for section_key, section_info in document_sections.items():
+                    if section_key == section_id and section_info.get("detected_as") == "content_pattern_match":
+                        covered_sections.append(section_id)
+                        logging.info(f"{section_id} included through content pattern match: {section_info.get('heading', '')}")
+                        section_found = True
+                        break
 
-            # Also add individual facts as concept blocks for hierarchy extraction
-            output.append("")
-            output.append("@CONCEPT_BLOCKS")
-            output.append("")
+                # Last resort - check raw text for 1B/1C keywords if section not found above
+                if not section_found and "raw_html_text" in filing_metadata and filing_type == "10-K":
+                    raw_text = filing_metadata.get("raw_html_text", "")
+                    if section_id == "ITEM_1B_UNRESOLVED_STAFF_COMMENTS" and re.search(r'unresolved\s+staff\s+comments', raw_text, re.IGNORECASE):
+                        covered_sections.append(section_id)
+                        logging.info("Item 1B detected through raw text search")
+                    elif section_id == "ITEM_1C_CYBERSECURITY" and re.search(r'cybersecurity', raw_text, re.IGNORECASE):
+                        covered_sections.append(section_id)
+                        logging.info("Item 1C detected through raw text search")
 
-            # Add concept blocks for each fact
-            for fact in parsed_xbrl.get("facts", []):
-                concept = fact.get("concept", "")
-                value = fact.get("value", "")
-                unit_ref = fact.get("unit_ref", "")
-                context_ref = fact.get("context_ref", "")
-
-                # Get context information
-                context = parsed_xbrl.get("contexts", {}).get(context_ref, {})
-                period = context.get("period", {})
-
-                # Determine date type and dates
-                if "instant" in period:
-                    date_type = "INSTANT"
-                    date = period.get("instant", "")
-                    output.append(f"@CONCEPT: {concept}")
-                    output.append(f"@VALUE: {value}")
-                    output.append(f"@UNIT_REF: {unit_ref}")
-                    output.append(f"@CONTEXT_REF: {context_ref}")
-                    output.append(f"@DATE_TYPE: {date_type}")
-                    output.append(f"@DATE: {date}")
-                    output.append("")
-                elif "startDate" in period and "endDate" in period:
-                    date_type = "DURATION"
-                    start_date = period.get("startDate", "")
-                    end_date = period.get("endDate", "")
-                    output.append(f"@CONCEPT: {concept}")
-                    output.append(f"@VALUE: {value}")
-                    output.append(f"@UNIT_REF: {unit_ref}")
-                    output.append(f"@CONTEXT_REF: {context_ref}")
-                    output.append(f"@DATE_TYPE: {date_type}")
-                    output.append(f"@START_DATE: {start_date}")
-                    output.append(f"@END_DATE: {end_date}")
-                    output.append("")
-        else:
-            # No facts to add, just add a placeholder
-            output.append("@CONTEXT_REFERENCE_GUIDE")
-            output.append("This section provides a consolidated reference for all time periods used in this document.")
-            output.append("")
+        missing_sections = [section_id for section_id in priority_sections if section_id not in covered_sections]
 
-        # Add individual facts organized by section
-        output.append("")
-        output.append("@INDIVIDUAL_FACTS_SECTION")
-        output.append("")
+        if filing_type == "10-K":
+            # Define required sections for 10-K filings
+            required_10k_sections = [
+                "ITEM_1_BUSINESS",
+                "ITEM_1A_RISK_FACTORS",
+                "ITEM_2_PROPERTIES",
+                "ITEM_3_LEGAL_PROCEEDINGS",
+                "ITEM_7_MD_AND_A",
+                "ITEM_7A_MARKET_RISK",
+                "ITEM_8_FINANCIAL_STATEMENTS",
+                "ITEM_9A_CONTROLS",
+                "ITEM_10_DIRECTORS",
+                "ITEM_11_EXECUTIVE_COMPENSATION"
+                # "ITEM_15_EXHIBITS" - Removed from required as often non-standard in company filings
+            ]
 
-        # Organize facts by section and store for sorting later
-        financial_sections = {
-            "INCOME_STATEMENT": [],
-            "BALANCE_SHEET": [],
-            "CASH_FLOW": [],
-            "EQUITY_STATEMENT": [],
-            "OTHER_FINANCIAL": []
-        }
+            # Optional sections (may not be present depending on company)
+            optional_10k_sections = [
+                "ITEM_1B_UNRESOLVED_STAFF_COMMENTS",  # Only required for accelerated filers
+                "ITEM_1C_CYBERSECURITY",              # Added in 2023, not required before
+                "ITEM_4_MINE_SAFETY_DISCLOSURES",     # Only for mining companies
+                "ITEM_5_MARKET",                      # Sometimes combined with Item 6
+                "ITEM_6_SELECTED_FINANCIAL_DATA",     # No longer required since 2021
+                "ITEM_9_DISAGREEMENTS",               # Only if there were disagreements
+                "ITEM_9B_OTHER_INFORMATION",          # Only if there is other information
+                "ITEM_9C_FOREIGN_JURISDICTIONS",      # Only for companies with foreign operations
+                "ITEM_12_SECURITY_OWNERSHIP",         # Sometimes combined with other sections
+                "ITEM_13_RELATIONSHIPS",              # Sometimes limited or combined
+                "ITEM_14_ACCOUNTANT_FEES",            # Sometimes combined with Item 9
+                "ITEM_15_EXHIBITS",                   # Made optional due to variation in reporting format
+                "ITEM_16_SUMMARY"                     # Optional summary
+            ]
 
-        # Helper function to determine section for a concept
-        def determine_section(concept):
-            concept_lower = concept.lower()
-            if any(term in concept_lower for term in ["revenue", "sales", "income", "earnings", "eps", "expense", "cost"]):
-                return "INCOME_STATEMENT"
-            elif any(term in concept_lower for term in ["asset", "liability", "equity", "debt", "cash and", "inventory", "payable", "receivable"]):
-                return "BALANCE_SHEET"
-            elif any(term in concept_lower for term in ["cashflow", "cash flow", "financing", "investing", "operating"]):
-                return "CASH_FLOW"
-            elif any(term in concept_lower for term in ["stockholder", "shareholder", "comprehensive", "retained earnings"]):
-                return "EQUITY_STATEMENT"
-            else:
-                return "OTHER_FINANCIAL"
+            # Calculate coverage percentage based on 10-K sections
+            # Only consider the main items for 10-K (skipping subsections)
+            main_10k_sections = [s for s in priority_sections if s.startswith("ITEM_") and not s.endswith("_Q")]
+            found_10k_sections = [s for s in covered_sections if s.startswith("ITEM_") and not s.endswith("_Q")]
 
-        # Categorize facts by financial section
-        for fact in parsed_xbrl.get("facts", []):
-            concept = fact.get("concept", "")
-            section = determine_section(concept)
-            financial_sections[section].append(fact)
+            # Calculate required vs optional coverage
+            covered_required = [s for s in covered_sections if s in required_10k_sections]
+            covered_optional = [s for s in covered_sections if s in optional_10k_sections]
 
-        # Add facts from each section
-        for section_name, section_facts in financial_sections.items():
-            if section_facts:
-                output.append(f"@SECTION: {section_name}")
-                output.append("")
+            if main_10k_sections:
+                # Calculate different coverage metrics
+                standard_coverage = (len(found_10k_sections) / len(main_10k_sections)) * 100
+                required_coverage = (len(covered_required) / len(required_10k_sections)) * 100
 
-                # Alternative approach for when context_map is empty or incomplete
-                # Group facts by their concept (name) for table rows
-                concepts_in_section = {}
-                for fact in section_facts:
-                    concept = fact.get("concept", "")
-                    if ":" in concept:
-                        # Get readable concept name
-                        concept_name = concept.split(":")[-1]
-                        # Make it more readable
-                        readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
-                    else:
-                        readable_name = concept
+                # Content-centric approach - focus on data completeness
+                # First, record the proportion of document content captured
+                raw_content = ""
+                if "raw_html_text_length" in filing_metadata:
+                    raw_content_length = filing_metadata["raw_html_text_length"]
+                    processed_content_length = len("\n".join(output))
 
-                    if readable_name not in concepts_in_section:
-                        concepts_in_section[readable_name] = []
-                    concepts_in_section[readable_name].append(fact)
+                    # Calculate text content coverage (more meaningful than section counting)
+                    # This accounts for whitespace differences and formatting
+                    text_coverage = min(100.0, (processed_content_length / max(1, raw_content_length)) * 100)
+                    # Store in data integrity metrics
+                    self.data_integrity["content_coverage"] = text_coverage
+                    output.append(f"Content Completeness: {text_coverage:.1f}% (by text volume)")
 
-                # Find most common contexts for columns (often periods like quarters or years)
-                context_counts = {}
-                for fact in section_facts:
-                    context_ref = fact.get("context_ref", "")
-                    if context_ref not in context_counts:
-                        context_counts[context_ref] = 0
-                    context_counts[context_ref] += 1
+                    # If content coverage is very high but section coverage is lower, suggest potential causes
+                    if text_coverage > 95.0 and required_coverage < 95.0:
+                        output.append("Note: High content coverage with lower section coverage may indicate non-standard section formatting")
 
-                # Sort contexts by frequency (most common first)
-                sorted_contexts = sorted(context_counts.items(), key=lambda x: x[1], reverse=True)
+                # Check for TOC-based actual sections
+                if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict) and "actual_sections" in filing_metadata["html_content"]:
+                    actual_sections = filing_metadata["html_content"]["actual_sections"]
 
-                # Get contexts with period information for columns
-                contexts_with_period = []
-                context_to_period_info = {}  # Store all context period info for reference
+                    # Ensure actual_sections is treated as a list consistently
+                    actual_sections_list = actual_sections
+                    if isinstance(actual_sections, dict):
+                        # If it's a dictionary, use the keys as the section list
+                        actual_sections_list = list(actual_sections.keys())
 
-                for context_ref, count in sorted_contexts:
-                    # Only include contexts that appear multiple times
-                    if count >= 3:  # At least 3 facts with this context
-                        # Try to get period info from the raw contexts
-                        if context_ref in parsed_xbrl.get("contexts", {}):
-                            context_info = parsed_xbrl["contexts"][context_ref]
-                            period_data = None
+                    # Find the overlap between covered sections and actual sections
+                    actually_covered = [s for s in covered_sections if s in actual_sections_list]
+                    actually_missed = [s for s in actual_sections_list if s not in covered_sections]
+                    actual_coverage = (len(actually_covered) / len(actual_sections_list)) * 100 if actual_sections_list else 0
 
-                            if "period" in context_info:
-                                period_info = context_info["period"]
+                    # Report section coverage (secondary metric)
+                    output.append(f"Document Structure Coverage: {actual_coverage:.1f}% ({len(actually_covered)}/{len(actual_sections_list)} TOC sections)")
 
-                                # Store all period info for later reference
-                                context_to_period_info[context_ref] = period_info
+                # Show standard metrics after the more informative ones
+                output.append(f"10-K Required Coverage: {required_coverage:.1f}% ({len(covered_required)}/{len(required_10k_sections)} required sections)")
+                output.append(f"10-K Standard Coverage: {standard_coverage:.1f}% ({len(found_10k_sections)}/{len(main_10k_sections)} standard sections)")
 
-                                if "instant" in period_info:
-                                    date_str = period_info['instant']
-                                    try:
-                                        date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
-                                        period_type = "Instant"
-                                        period_data = {
-                                            "date": date_obj,
-                                            "label": f"As of {date_obj.strftime('%b %d, %Y')}",
-                                            "year": date_obj.year,
-                                            "type": period_type,
-                                            "context_ref": context_ref,
-                                            "sort_key": f"{date_obj.year}{date_obj.month:02d}{date_obj.day:02d}"
-                                        }
-                                    except ValueError:
-                                        # If date parsing fails, use the original string
-                                        period_data = {
-                                            "date": date_str,
-                                            "label": f"As of {date_str}",
-                                            "year": date_str[:4],  # Assume YYYY-MM-DD format
-                                            "type": "Instant",
-                                            "context_ref": context_ref,
-                                            "sort_key": date_str.replace("-", "")
-                                        }
-                                elif "startDate" in period_info and "endDate" in period_info:
-                                    start_str = period_info['startDate']
-                                    end_str = period_info['endDate']
-                                    try:
-                                        start_date = datetime.datetime.strptime(start_str, "%Y-%m-%d")
-                                        end_date = datetime.datetime.strptime(end_str, "%Y-%m-%d")
-                                        delta = (end_date - start_date).days
+                # Show both metrics in a more readable way
+                output.append(f"Found Required: {len(covered_required)} of {len(required_10k_sections)} required sections")
+                if optional_10k_sections:
+                    output.append(f"Found Optional: {len(covered_optional)} of {len(optional_10k_sections)} optional sections")
 
-                                        # Determine if it's a quarter, year, or other period
-                                        if 88 <= delta <= 95:  # ~3 months (quarter)
-                                            quarter = (end_date.month + 2) // 3  # Calculate quarter from end month
-                                            period_type = "Quarter"
-                                            period_label = f"Q{quarter} {end_date.year}"
-                                        elif 360 <= delta <= 371:  # ~1 year
-                                            period_type = "Annual"
-                                            period_label = f"FY {end_date.year}"
-                                        elif 175 <= delta <= 190:  # ~6 months
-                                            period_type = "Semi-annual"
-                                            period_label = f"H1 {end_date.year}"
-                                        else:
-                                            period_type = "Period"
-                                            period_label = f"{start_date.strftime('%b %d')} - {end_date.strftime('%b %d, %Y')}"
+                # Show which sections were found (required first, then optional)
+                output.append("Required sections found: " + ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in covered_required]))
+                if covered_optional:
+                    output.append("Optional sections found: " + ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in covered_optional]))
 
-                                        period_data = {
-                                            "start_date": start_date,
-                                            "end_date": end_date,
-                                            "label": period_label,
-                                            "year": end_date.year,
-                                            "type": period_type,
-                                            "context_ref": context_ref,
-                                            "sort_key": f"{end_date.year}{end_date.month:02d}{end_date.day:02d}"
-                                        }
-                                    except ValueError:
-                                        # If date parsing fails, use the original strings
-                                        period_data = {
-                                            "start_date": start_str,
-                                            "end_date": end_str,
-                                            "label": f"{start_str} to {end_str}",
-                                            "year": end_str[:4],  # Assume YYYY-MM-DD format
-                                            "type": "Period",
-                                            "context_ref": context_ref,
-                                            "sort_key": end_str.replace("-", "")
-                                        }
+                # Show missing required sections (most important)
+                missing_required = [s for s in required_10k_sections if s not in covered_sections]
+                if missing_required:
+                    output.append(f"Missing required section(s): " +
+                                 ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in missing_required]))
 
-                            if period_data:
-                                contexts_with_period.append(period_data)
-                        else:
-                            # No context info, fallback to ID with count indicator
-                            contexts_with_period.append({
-                                "label": f"Context {context_ref}",
-                                "context_ref": context_ref,
-                                "type": "Unknown",
-                                "sort_key": f"Z{context_ref}",  # 'Z' prefix to sort after known dates
-                                "year": 9999  # High value to sort at the end
-                            })
+                # Track alternative detection for improved metrics
+                alternative_detected = []
+                for section_id, section_info in document_sections.items():
+                    if section_info.get("detected_as") == "exhibits_alternative":
+                        alternative_detected.append(section_id)
 
-                # Sort contexts chronologically (earliest to latest)
-                contexts_with_period.sort(key=lambda x: x.get("sort_key", ""))
+                # Update data integrity metrics
+                self.data_integrity["sections_detected"] = len(document_sections)
+                self.data_integrity["sections_included"] = len(covered_sections)
+                self.data_integrity["alternative_sections_detected"] = len(alternative_detected)
 
-                # Convert to the format needed for table creation
-                top_contexts = [(ctx["context_ref"], ctx["label"]) for ctx in contexts_with_period]
+                # Add explanatory note about section detection
+                output.append("Note: Companies may combine sections, use different formatting, or omit optional sections")
 
-                # Create a context reference mapping for the table header
-                context_mapping = {}
-                for ctx in contexts_with_period:
-                    context_mapping[ctx["context_ref"]] = ctx["label"]
+                # If alternative detection was used, add information about detection method
+                if alternative_detected:
+                    output.append(f"Note: {len(alternative_detected)} section(s) detected using alternative methods for non-standard formatting")
 
-                # Only create a table if we have enough contexts and concepts
-                if len(top_contexts) >= 2 and len(concepts_in_section) >= 3:
-                    # Identify the years covered in this table
-                    years_covered = sorted(set([ctx.get("year") for ctx in contexts_with_period if "year" in ctx]))
-                    period_types = sorted(set([ctx.get("type") for ctx in contexts_with_period if "type" in ctx]))
+        elif filing_type == "10-Q":
+            # Calculate coverage percentage based on 10-Q sections
+            main_10q_sections = [s for s in priority_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
+                "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
+            ])]
+            found_10q_sections = [s for s in covered_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
+                "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
+            ])]
 
-                    # Create descriptive table header
-                    if years_covered and len(years_covered) <= 5:  # Reasonable number to display
-                        years_str = ", ".join([str(year) for year in years_covered])
-                        header = f"{section_name.replace('_', ' ')} TABLE ({years_str})"
-                    else:
-                        header = f"{section_name.replace('_', ' ')} TABLE"
+            if main_10q_sections:
+                coverage_pct = (len(found_10q_sections) / len(main_10q_sections)) * 100
+                output.append(f"10-Q Coverage: {coverage_pct:.1f}% of standard sections found")
 
-                    output.append(f"@TABLE_CONTENT: {header}")
+                # Items found
+                output.append(f"Found {len(found_10q_sections)} of {len(main_10q_sections)} standard 10-Q sections:")
+                output.append(", ".join([s.replace("ITEM_", "Item ").replace("_Q", "").replace("_", " ") for s in found_10q_sections]))
 
-                    # Add a period guide for this table if we have good period info
-                    if len(contexts_with_period) > 0 and any("type" in ctx for ctx in contexts_with_period):
-                        period_guide = []
+                # Items not found (might be absent in the original document)
+                if missing_sections:
+                    missing_10q = [s for s in missing_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
+                        "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
+                    ])]
+                    if missing_10q:
+                        output.append(f"Missing {len(missing_10q)} section(s):")
+                        output.append(", ".join([s.replace("ITEM_", "Item ").replace("_Q", "").replace("_", " ") for s in missing_10q]))
+                        output.append("Note: Missing sections may not exist in the original document")
 
-                        # Group contexts by type
-                        period_by_type = {}
-                        for ctx in contexts_with_period:
-                            if "type" in ctx and ctx["type"] != "Unknown":
-                                if ctx["type"] not in period_by_type:
-                                    period_by_type[ctx["type"]] = []
-                                period_by_type[ctx["type"]].append(ctx)
+        output.append("")
 
-                        # Add period reference information
-                        for period_type in ["Annual", "Quarter", "Semi-annual", "Instant", "Period"]:
-                            if period_type in period_by_type:
-                                periods = period_by_type[period_type]
-                                if period_type == "Annual":
-                                    periods_str = ", ".join([f"{p['label']}" for p in periods])
-                                    period_guide.append(f"Annual periods: {periods_str}")
-                                elif period_type == "Quarter":
-                                    periods_str = ", ".join([f"{p['label']}" for p in periods])
-                                    period_guide.append(f"Quarterly periods: {periods_str}")
-                                elif period_type == "Instant":
-                                    if len(periods) <= 4:  # Keep it concise
-                                        periods_str = ", ".join([f"{p['label']}" for p in periods])
-                                        period_guide.append(f"As of dates: {periods_str}")
+        # Enhanced Context Reference Guide and Data Dictionary
+        # This entire section was moved to earlier in the file
+        # to properly populate the context reference guide
 
-                        # Add the period guide if we have useful information
-                        if period_guide:
-                            output.append("Period reference: " + "; ".join(period_guide))
+        # The verification section is now added independently
+        output.append("@VERIFICATION_KEYS:")
+        output.append("These formulas can be used to verify data consistency:")
 
-                    # Build enhanced table with explicit context references
-                    table_rows = []
+        # Only add verification formulas if we have context information
+        if context_reference_guide:
+            # Sort the context labels by year and period
+            sorted_labels = sorted(context_reference_guide.keys())
 
-                    # Add table metadata
-                    table_rows.append(f"@TABLE_TYPE: {section_name.replace('_', ' ')}")
+            # Group contexts by year for formula creation
+            years = {}
+            for label in sorted_labels:
+                info = context_reference_guide[label]
+                if "category" in info:
+                    category = info["category"]
+                    if "_" in category:
+                        year = category.split("_")[1]
+                        if year not in years:
+                            years[year] = []
+                        years[year].append((info["code"], label))
 
-                    # Add verification key if available
-                    if "Revenues" in section_name or "Revenue" in section_name:
-                        verification_contexts = []
-                        for context_ref, _ in top_contexts:
-                            if context_ref in context_code_map:
-                                verification_contexts.append(context_code_map[context_ref])
-                        if verification_contexts:
-                            table_rows.append(f"@VERIFICATION: Total_Revenue = Sum_of_Revenue_Components for contexts: {', '.join(verification_contexts)}")
+            # Create verification formulas by year
+            for year, contexts in years.items():
+                if contexts:
+                    codes = [code for code, _ in contexts]
 
-                    # Add standardized header structure with Key column
-                    header_row = "Concept | Key"
-                    for _, context_label in top_contexts:
-                        header_row += f" | {context_label}"
-                    table_rows.append(header_row)
-
-                    # Add separator row
-                    separator = "-" * len("Concept") + " | " + "-" * len("Key")
-                    for context_label in [label for _, label in top_contexts]:
-                        separator += f" | {'-' * len(context_label)}"
-                    table_rows.append(separator)
-
-                    # Analyze XBRL facts to identify hierarchical relationships
-                    # Extract hierarchy information from facts and XBRL structure
-                    concept_hierarchies = {}
-                    subtotal_items = {}
-                    parent_child_map = {}
-
-                    # First pass: identify potential total/subtotal items
-                    for concept_name, facts in concepts_in_section.items():
-                        concept_lower = concept_name.lower()
-                        # Identify likely subtotal or total items based on naming patterns
-                        is_total = False
-                        if "total" in concept_lower or "subtotal" in concept_lower:
-                            is_total = True
-                        elif any(concept_lower.startswith(prefix) for prefix in ["gross", "net", "operating", "consolidated"]):
-                            is_total = True
-
-                        # Mark items that are likely to be subtotals
-                        if is_total:
-                            subtotal_items[concept_name] = {
-                                "level": 0,  # Will be adjusted in the second pass
-                                "children": [],
-                                "facts": facts
-                            }
-
-                    # Second pass: identify parent-child relationships
-                    for subtotal_name in subtotal_items:
-                        subtotal_lower = subtotal_name.lower()
+                    # Get the semantic codes too for clarity
+                    semantic_codes = []
+                    for code, _ in contexts:
+                        for _, info in context_reference_guide.items():
+                            if info.get("code") == code and "semantic_code" in info:
+                                semantic_codes.append(info["semantic_code"])
+                                break
 
-                        # Find child items that belong to this subtotal
-                        # Example: "Total Revenue" would match with items containing "revenue"
-                        base_term = None
-                        if "total" in subtotal_lower:
-                            base_term = subtotal_lower.replace("total", "").strip()
-                        elif "subtotal" in subtotal_lower:
-                            base_term = subtotal_lower.replace("subtotal", "").strip()
+                    # Show formulas with both short codes and semantic codes
+                    context_ref = f"contexts: {', '.join(codes)}"
+                    if semantic_codes:
+                        context_ref += f" ({', '.join(semantic_codes)})"
 
-                        if base_term:
-                            for concept_name in concepts_in_section:
-                                if concept_name != subtotal_name and base_term in concept_name.lower():
-                                    # This is likely a child of the subtotal
-                                    subtotal_items[subtotal_name]["children"].append(concept_name)
-                                    # Track parent-child relationship
-                                    parent_child_map[concept_name] = subtotal_name
+                    output.append(f"- Revenue_{year} = Product_Revenue_{year} + Service_Revenue_{year} ({context_ref})")
+                    output.append(f"- Gross_Profit_{year} = Revenue_{year} - Cost_of_Revenue_{year} ({context_ref})")
+                    output.append(f"- Operating_Income_{year} = Gross_Profit_{year} - Operating_Expenses_{year} ({context_ref})")
+        else:
+            output.append("- No context information available for formula verification")
 
-                    # Sort concepts for hierarchical organization with levels based on relationships
-                    # Group related concepts together
-                    organized_concepts = {}
-                    for concept_name, facts in concepts_in_section.items():
-                        # Look for parent categories
-                        concept_lower = concept_name.lower()
-                        if "revenue" in concept_lower or "sales" in concept_lower:
-                            category = "Revenue"
-                        elif "cost" in concept_lower or "expense" in concept_lower:
-                            category = "Expenses"
-                        elif "profit" in concept_lower or "margin" in concept_lower:
-                            category = "Profit"
-                        elif "asset" in concept_lower:
-                            category = "Assets"
-                        elif "liabilit" in concept_lower:
-                            category = "Liabilities"
-                        elif "equity" in concept_lower:
-                            category = "Equity"
-                        elif "income" in concept_lower or "earnings" in concept_lower:
-                            category = "Income"
-                        elif "cash" in concept_lower or "flow" in concept_lower:
-                            category = "Cash_Flow"
-                        else:
-                            category = "Other"
+        output.append("")
 
-                        # Determine this concept's hierarchical level
-                        # Level 0 is a root, Level 1 is a subtotal, Level 2+ are detail items
-                        hierarchy_level = 0
+        # First list period contexts (fiscal years, quarters)
+        output.append("@PERIOD_CONTEXTS")
+        if context_reference_guide:
+            sorted_labels = sorted(context_reference_guide.keys())
+            period_labels = [label for label in sorted_labels if context_reference_guide[label]["type"] == "period"]
+            if period_labels:
+                for label in period_labels:
+                    context_info = context_reference_guide[label]
+                    code = context_info.get('code', "Unknown")
+                    semantic_code = context_info.get('semantic_code', code)
+                    segment = context_info.get('segment', 'Consolidated')
 
-                        # Check if this is a total/subtotal
-                        if concept_name in subtotal_items:
-                            hierarchy_level = 1
-                        # Check if this is a child of a subtotal
-                        elif concept_name in parent_child_map:
-                            hierarchy_level = 2
+                    # Create a more descriptive entry with all available information
+                    output.append(f"- {label}: {context_info['description']} (code: {code}, semantic: {semantic_code}, segment: {segment})")
+            else:
+                output.append("No period contexts found in this filing")
+        else:
+            output.append("No detailed period context information available")
+        output.append("")
 
-                        # Store hierarchy information with the concept
-                        concept_hierarchies[concept_name] = {
-                            "level": hierarchy_level,
-                            "parent": parent_child_map.get(concept_name, None),
-                            "is_total": concept_name in subtotal_items,
-                            "category": category
-                        }
+        # Then list instant contexts (balance sheet dates)
+        output.append("@INSTANT_CONTEXTS")
+        if context_reference_guide:
+            sorted_labels = sorted(context_reference_guide.keys())
+            instant_labels = [label for label in sorted_labels if context_reference_guide[label]["type"] == "instant"]
+            if instant_labels:
+                for label in instant_labels:
+                    context_info = context_reference_guide[label]
+                    code = context_info.get('code', "Unknown")
+                    semantic_code = context_info.get('semantic_code', code)
+                    segment = context_info.get('segment', 'Consolidated')
+                    statement_type = context_info.get('statement_type', 'Unknown')
 
-                        if category not in organized_concepts:
-                            organized_concepts[category] = []
-                        # Include hierarchy level with concept data
-                        organized_concepts[category].append((concept_name, facts, hierarchy_level))
+                    # Create a more descriptive entry with all available information
+                    output.append(f"- {label}: {context_info['description']} (code: {code}, semantic: {semantic_code}, segment: {segment}, statement: {statement_type})")
+            else:
+                output.append("No instant contexts found in this filing")
+        else:
+            output.append("No detailed instant context information available")
+        output.append("")
 
-                    # Add data rows with hierarchical organization
-                    for category in ["Revenue", "Expenses", "Profit", "Income", "Assets", "Liabilities", "Equity", "Cash_Flow", "Other"]:
-                        if category in organized_concepts:
-                            # Add category header
-                            if len(organized_concepts[category]) > 1:
-                                category_row = f"<{category}>"
-                                for _ in range(len(top_contexts) + 1):  # +1 for Key column
-                                    category_row += " | "
-                                table_rows.append(category_row)
+        # Add a mapping of fiscal periods to calendar periods if fiscal year info is available
+        if fiscal_year and fiscal_period:
+            output.append("@FISCAL_CALENDAR_MAPPING")
+            output.append(f"- Fiscal Year {fiscal_year} corresponds to filing period ending {period_end}")
+            if fiscal_period in ["Q1", "Q2", "Q3", "Q4"]:
+                output.append(f"- {fiscal_period} is a quarterly period within Fiscal Year {fiscal_year}")
+            elif fiscal_period == "annual":
+                output.append(f"- This document represents the annual (10-K) filing for Fiscal Year {fiscal_year}")
+            output.append("")
 
-                            # Sort items to ensure parent items come before children
-                            sorted_concepts = sorted(
-                                organized_concepts[category],
-                                key=lambda x: (concept_hierarchies[x[0]]["level"], 0 if concept_hierarchies[x[0]]["is_total"] else 1)
-                            )
+        # Add example extraction section
+        output.append("@EXAMPLE_EXTRACTION")
+        output.append("Example of how to extract and format data from this document:")
+        output.append("")
+        output.append("```python")
+        output.append("# Extract revenue information for specific period with hierarchy awareness")
+        output.append("def extract_revenue(document, context_code):")
+        output.append("    # Find the Revenue section")
+        output.append("    revenue_section = find_section(document, '<Revenue>')")
+        output.append("    ")
+        output.append("    # Extract all line items with their context codes")
+        output.append("    revenue_data = {}")
+        output.append("    totals = {}")
+        output.append("    parent_child_map = {}")
+        output.append("    ")
+        output.append("    # First pass: collect all items and identify parent-child relationships")
+        output.append("    for line in revenue_section:")
+        output.append("        if context_code in line.split('|')[1].strip():")
+        output.append("            columns = line.split('|')")
+        output.append("            raw_item_name = columns[0].strip()")
+        output.append("            ")
+        output.append("            # Parse hierarchy information")
+        output.append("            if raw_item_name.startswith('@TOTAL:'):")
+        output.append("                # This is a total item")
+        output.append("                item_name = raw_item_name.replace('@TOTAL:', '').strip()")
+        output.append("                is_total = True")
+        output.append("                level = 0  # Top level")
+        output.append("            elif raw_item_name.startswith('@SUBTOTAL:'):")
+        output.append("                # This is a subtotal item")
+        output.append("                item_name = raw_item_name.replace('@SUBTOTAL:', '').strip()")
+        output.append("                is_total = True")
+        output.append("                level = 1  # Mid level")
+        output.append("            elif '@CHILD_OF:' in raw_item_name:")
+        output.append("                # This is a child item, extract its parent")
+        output.append("                parts = raw_item_name.split('@CHILD_OF:')")
+        output.append("                item_name = parts[0].replace('↳', '').strip()")
+        output.append("                parent_name = parts[1].strip()")
+        output.append("                parent_child_map[item_name] = parent_name")
+        output.append("                is_total = False")
+        output.append("                level = 2  # Child level")
+        output.append("            else:")
+        output.append("                # Regular item")
+        output.append("                item_name = raw_item_name.strip()")
+        output.append("                is_total = False")
+        output.append("                level = 1  # Base level")
+        output.append("            ")
+        output.append("            # Find the value corresponding to the context code")
+        output.append("            value = get_value_for_context(columns, context_code)")
+        output.append("            ")
+        output.append("            # Store with hierarchy information")
+        output.append("            if is_total:")
+        output.append("                totals[item_name] = {")
+        output.append("                    'value': value,")
+        output.append("                    'level': level,")
+        output.append("                    'components': []  # Will be filled in second pass")
+        output.append("                }")
+        output.append("            else:")
+        output.append("                revenue_data[item_name] = {")
+        output.append("                    'value': value,")
+        output.append("                    'level': level,")
+        output.append("                    'parent': parent_child_map.get(item_name)")
+        output.append("                }")
+        output.append("    ")
+        output.append("    # Second pass: associate children with their parent totals")
+        output.append("    for item_name, item_data in revenue_data.items():")
+        output.append("        parent = item_data.get('parent')")
+        output.append("        if parent and parent in totals:")
+        output.append("            totals[parent]['components'].append(item_name)")
+        output.append("    ")
+        output.append("    # Combine the data structures")
+        output.append("    result = {")
+        output.append("        'line_items': revenue_data,")
+        output.append("        'totals': totals,")
+        output.append("        # Include verification formulas")
+        output.append("        'verify': {")
+        output.append("            'sum_components': 'Sum of all components should equal the total',")
+        output.append("            'formula': 'Total_Revenue = Product_Revenue + Service_Revenue + Other_Revenue'")
+        output.append("        }")
+        output.append("    }")
+        output.append("    return result")
+        output.append("```")
+        output.append("")
 
-                            # Add items in this category
-                            for concept_tuple in sorted_concepts:
-                                concept_name = concept_tuple[0]
-                                facts = concept_tuple[1]
-                                hierarchy_level = concept_tuple[2] if len(concept_tuple) > 2 else 0
+        output.append("Example hierarchical data format for extraction:")
+        output.append("")
+        output.append("```json")
+        output.append("{")
+        output.append("  \"line_items\": {")
+        output.append("    \"Product_Revenue\": {")
+        output.append("      \"value\": 72480,")
+        output.append("      \"level\": 1,")
+        output.append("      \"parent\": \"Total_Revenue\"")
+        output.append("    },")
+        output.append("    \"Service_Revenue\": {")
+        output.append("      \"value\": 16320,")
+        output.append("      \"level\": 1,")
+        output.append("      \"parent\": \"Total_Revenue\"")
+        output.append("    },")
+        output.append("    \"Automotive_Revenue\": {")
+        output.append("      \"value\": 52300,")
+        output.append("      \"level\": 2,")
+        output.append("      \"parent\": \"Product_Revenue\"")
+        output.append("    },")
+        output.append("    \"Energy_Revenue\": {")
+        output.append("      \"value\": 20180,")
+        output.append("      \"level\": 2,")
+        output.append("      \"parent\": \"Product_Revenue\"")
+        output.append("    }")
+        output.append("  },")
+        output.append("  \"totals\": {")
+        output.append("    \"Total_Revenue\": {")
+        output.append("      \"value\": 88800,")
+        output.append("      \"level\": 0,")
+        output.append("      \"components\": [\"Product_Revenue\", \"Service_Revenue\"],")
+        output.append("      \"contexts\": {")
+        output.append("        \"c-1\": 88800,           // Using short code")
+        output.append("        \"FY2023\": 88800,        // Using semantic code")
+        output.append("        \"Consolidated_2023\": 88800  // Using segment information")
+        output.append("      }")
+        output.append("    },")
+        output.append("    \"Product_Revenue\": {")
+        output.append("      \"value\": 72480,")
+        output.append("      \"level\": 1,")
+        output.append("      \"components\": [\"Automotive_Revenue\", \"Energy_Revenue\"]")
+        output.append("    }")
+        output.append("  },")
+        output.append("  \"verify\": {")
+        output.append("    \"equations\": [")
+        output.append("      \"Total_Revenue = Product_Revenue + Service_Revenue\",")
+        output.append("      \"Product_Revenue = Automotive_Revenue + Energy_Revenue\"")
+        output.append("    ],")
+        output.append("    \"verified\": true")
+        output.append("  },")
+        output.append("  \"metadata\": {")
+        output.append("    \"statement_type\": \"Income_Statement\",")
+        output.append("    \"period\": \"FY2023\",")
+        output.append("    \"hierarchical\": true")
+        output.append("  }")
+        output.append("}")
+        output.append("```")
+        output.append("")
+        output.append("Note: This hierarchical structure makes parent-child relationships explicit, enabling accurate calculation and validation of totals. The hierarchy levels indicate:")
+        output.append("- Level 0: Main totals (like Total Revenue)")
+        output.append("- Level 1: Major categories (like Product Revenue)")
+        output.append("- Level 2: Subcategories (like Automotive Revenue)")
+        output.append("")
+        output.append("You can use either the numeric short codes (c-1, c-2) or the semantic codes (FY2023, BS_2023_12_31) to access context values. The semantic codes are more descriptive and self-explanatory.")
 
-                                # Create a mapping from context to fact for this concept
-                                context_to_fact = {fact.get("context_ref", ""): fact for fact in facts}
+        return "\n".join(output)
 
-                                # Only add rows that have data in at least one of our top contexts
-                                if any(context_ref in context_to_fact for context_ref, _ in top_contexts):
-                                    # Get hierarchy info for this concept
-                                    concept_info = concept_hierarchies.get(concept_name, {})
-                                    is_total = concept_info.get("is_total", False)
-                                    parent = concept_info.get("parent", None)
+    def _produce_sections(self, parsed_xbrl, extracted_sections, priority_sections, context_map,
+                          context_code_map, context_reference_guide, period_contexts, instant_contexts,
+                          filing_type):
+        """
+        Produce the sections that follow the units section
 
-                                    # Apply formatting based on hierarchy
-                                    if is_total:
-                                        # Format total items (make them stand out)
-                                        if hierarchy_level == 1:
-                                            # Level 1 totals (main line totals)
-                                            row = f"@TOTAL: {concept_name}"
-                                        else:
-                                            # Lower level subtotals
-                                            row = f"@SUBTOTAL: {concept_name}"
-                                    elif parent:
-                                        # Child items with indentation based on hierarchy level
-                                        indentation = "  " * hierarchy_level
-                                        row = f"{indentation}↳ {concept_name} @CHILD_OF: {parent}"
-                                    else:
-                                        # Regular line items with basic indentation
-                                        if len(organized_concepts[category]) > 1:
-                                            row = f"  {concept_name}"
-                                        else:
-                                            row = concept_name
+        The financial statements and the narrative sections only depend on
+        the parsed XBRL data and the section text, so with more than one
+        LLM_FORMATTING worker they are produced in a process pool while the
+        facts and context reference sections are produced here. The
+        individual facts section only falls back to context tables when no
+        statement was created, so it follows the statements.
 
-                                    # Add enhanced context key reference with semantic codes
-                                    context_keys = []
-                                    semantic_keys = []
-                                    for context_ref, _ in top_contexts:
-                                        if context_ref in context_to_fact:
-                                            if context_ref in context_code_map:
-                                                context_keys.append(context_code_map[context_ref])
+        In the compact profile, the facts section and concept blocks are
+        replaced by the fact table, and the statements and individual facts
+        section refer to facts by ID.
 
-                                            # Add semantic code if available
-                                            code = context_code_map.get(context_ref, "")
-                                            if code:
-                                                for label, info in context_reference_guide.items():
-                                                    if info.get("code") == code and "semantic_code" in info:
-                                                        semantic_keys.append(info["semantic_code"])
-                                                        break
+        Args:
+            parsed_xbrl: Parsed XBRL data
+            extracted_sections: Narrative sections by section ID
+            priority_sections: Section IDs in document order
+            context_map: Context ID to readable label
+            context_code_map: Context ID to context code
+            context_reference_guide: Context details by readable label
+            period_contexts: Duration contexts
+            instant_contexts: Instant contexts
+            filing_type: Type of filing (10-K, 10-Q)
 
-                                    # First show the short code (c-1, c-2) for backward compatibility
-                                    if context_keys:
-                                        row += f" | {','.join(context_keys)}"
-                                    else:
-                                        row += " | -"
+        Returns:
+            List of (output lines, data integrity counts) tuples in document order
+        """
+        narrative_ids = [section_id for section_id in priority_sections if section_id in extracted_sections]
+        workers = LLM_FORMATTING.get("workers", 1)
+        compact = LLM_FORMATTING.get("profile", "full") == "compact"
+        if compact:
+            parsed_xbrl = assign_fact_ids(parsed_xbrl)
+        facts_count = len(parsed_xbrl.get("facts", []))
+
+        executor = None
+        if workers > 1 and facts_count >= LLM_FORMATTING.get("min_parallel_facts", 1000):
+            logging.info(f"Formatting {facts_count} facts and {len(narrative_ids)} narrative sections with {workers} processes")
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            except Exception as e:
+                logging.warning(f"Could not start formatting processes, formatting sequentially: {str(e)}")
 
-                                    # Then add a comment with the semantic codes that are more descriptive
-                                    if semantic_keys:
-                                        row += f" # {','.join(semantic_keys)}"
+        try:
+            statements_future = None
+            narrative_futures = [None] * len(narrative_ids)
+            if executor is not None:
+                statements_future = executor.submit(format_financial_statements, parsed_xbrl, compact)
+                narrative_futures = [
+                    executor.submit(format_narrative_section, section_id, extracted_sections[section_id])
+                    for section_id in narrative_ids
+                ]
+
+            with span("facts_section", facts=facts_count):
+                if compact:
+                    facts_section = format_fact_table_section(parsed_xbrl)
+                else:
+                    facts_section = format_facts_section(parsed_xbrl)
+            with span("context_reference_guide", contexts=len(context_code_map)):
+                reference_guide = self._format_context_reference_guide(
+                    parsed_xbrl, period_contexts, instant_contexts, context_code_map, filing_type
+                )
+            # With a pool, these spans time the wait for the producer processes
+            with span("financial_statements"):
+                statements = _producer_result(statements_future, format_financial_statements, parsed_xbrl, compact)
+            with span("individual_facts", tables=statements[1]["xbrl_tables_created"]):
+                if compact:
+                    individual_facts = format_fact_references(parsed_xbrl)
+                else:
+                    individual_facts = self._format_individual_facts(
+                        parsed_xbrl, context_map, context_code_map, context_reference_guide,
+                        statements[1]["xbrl_tables_created"]
+                    )
+            with span("narrative_sections", sections=len(narrative_ids)):
+                narratives = [
+                    _producer_result(future, format_narrative_section, section_id, extracted_sections[section_id])
+                    for future, section_id in zip(narrative_futures, narrative_ids)
+                ]
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        return [statements, facts_section, individual_facts, reference_guide] + narratives
+
+    def _add_integrity_counts(self, counts):
+        """Add the data integrity counts of a section producer to the totals."""
+        for key, value in counts.items():
+            if key != "section_tables":
+                self.data_integrity[key] += value
+                continue
+            for section_id, section_counts in value.items():
+                totals = self.data_integrity["section_tables"].setdefault(
+                    section_id, {"detected": 0, "included": 0, "rows": 0}
+                )
+                for name, count in section_counts.items():
+                    totals[name] += count
+
+    def _format_individual_facts(self, parsed_xbrl, context_map, context_code_map,
+                                 context_reference_guide, tables_created):
+        """
+        Produce the individual facts section: facts by financial section, each
+        with a table of its most common contexts
 
-                                    # Add values for each context with consistent units and scaling
-                                    for context_ref, _ in top_contexts:
-                                        if context_ref in context_to_fact:
-                                            fact = context_to_fact[context_ref]
-                                            value = fact.get("value", "")
-                                            unit_ref = fact.get("unit_ref", "")
-                                            decimals = fact.get("decimals", "")
+        Args:
+            parsed_xbrl: Parsed XBRL data
+            context_map: Context ID to readable label (quarter labels of the
+                fallback context tables are rewritten)
+            context_code_map: Context ID to context code
+            context_reference_guide: Context details by readable label
+            tables_created: Number of financial statements created
 
-                                            # Format value with appropriate scale indicator
-                                            try:
-                                                # Add currency symbol if available
-                                                if unit_ref and unit_ref.lower() == "usd":
-                                                    # Only add $ if it's not already there
-                                                    if not value.startswith("$"):
-                                                        formatted_value = f"${value}"
-                                                    else:
-                                                        formatted_value = value
+        Returns:
+            Tuple of (output lines, data integrity counts)
+        """
+        output = []
+        integrity = new_integrity_counts()
 
-                                                    # Add scale indicator if specified
-                                                    if decimals and safe_parse_decimals(decimals) == -6:
-                                                        formatted_value += " [M]"  # Millions
-                                                    elif decimals and safe_parse_decimals(decimals) == -3:
-                                                        formatted_value += " [K]"  # Thousands
-                                                    elif decimals and safe_parse_decimals(decimals) == -9:
-                                                        formatted_value += " [B]"  # Billions
-                                                elif unit_ref and unit_ref.lower() == "shares":
-                                                    formatted_value = f"{value} shares"
-                                                else:
-                                                    formatted_value = value
 
-                                                row += f" | {formatted_value}"
-                                            except:
-                                                # Fallback if formatting fails
-                                                # Add scale indicators to values in fallback context-based tables
-                                                # Format value with appropriate scaling
-                                                unit_ref = fact.get("unit_ref", "")
-                                                decimals = fact.get("decimals", "")
+        # Add individual facts organized by section
+        output.append("")
+        output.append("@INDIVIDUAL_FACTS_SECTION")
+        output.append("")
 
-                                                if unit_ref and unit_ref.lower() == "usd":
-                                                    # Add currency symbol if needed
-                                                    if not value.startswith("$"):
-                                                        formatted_value = f"${value}"
-                                                    else:
-                                                        formatted_value = value
+        # Organize facts by section and store for sorting later
+        financial_sections = {
+            "INCOME_STATEMENT": [],
+            "BALANCE_SHEET": [],
+            "CASH_FLOW": [],
+            "EQUITY_STATEMENT": [],
+            "OTHER_FINANCIAL": []
+        }
 
-                                                    # Add scale indicator
-                                                    if decimals and safe_parse_decimals(decimals) == -6:
-                                                        formatted_value += " [M]"  # Millions
-                                                    elif decimals and safe_parse_decimals(decimals) == -3:
-                                                        formatted_value += " [K]"  # Thousands
-                                                    elif decimals and safe_parse_decimals(decimals) == -9:
-                                                        formatted_value += " [B]"  # Billions
-                                                elif unit_ref and unit_ref.lower() == "shares":
-                                                    formatted_value = f"{value} shares"
-                                                else:
-                                                    formatted_value = value
+        # Categorize facts by financial section
+        for fact in parsed_xbrl.get("facts", []):
+            concept = fact.get("concept", "")
+            section = determine_financial_section(concept)
+            financial_sections[section].append(fact)
 
-                                                row += f" | {formatted_value}"
-                                        else:
-                                            row += " | -"
-                                    table_rows.append(row)
+        # Add facts from each section
+        for section_name, section_facts in financial_sections.items():
+            if section_facts:
+                output.append(f"@SECTION: {section_name}")
+                output.append("")
 
-                            # Close category with proper XML syntax if we added a category header
-                            if len(organized_concepts[category]) > 1:
-                                end_category = f"</{category}>"
-                                for _ in range(len(top_contexts) + 1):  # +1 for Key column
-                                    end_category += " | "
-                                table_rows.append(end_category)
+                # Alternative approach for when context_map is empty or incomplete
+                # Group facts by their concept (name) for table rows
+                concepts_in_section = {}
+                for fact in section_facts:
+                    concept = fact.get("concept", "")
+                    if ":" in concept:
+                        # Get readable concept name
+                        concept_name = concept.split(":")[-1]
+                        # Make it more readable
+                        readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
+                    else:
+                        readable_name = concept
 
-                    # Only add the table if it actually has data rows
-                    if len(table_rows) > 2:  # Header + separator + at least one data row
-                        output.append("\n".join(table_rows))
-                        output.append("")
+                    if readable_name not in concepts_in_section:
+                        concepts_in_section[readable_name] = []
+                    concepts_in_section[readable_name].append(fact)
 
-                        # Update data integrity metrics
-                        self.data_integrity["xbrl_tables_created"] += 1
-                        self.data_integrity["tables_detected"] += 1
-                        self.data_integrity["tables_included"] += 1
-                        self.data_integrity["total_table_rows"] += len(table_rows)
+                # Find most common contexts for columns (often periods like quarters or years)
+                context_counts = {}
+                for fact in section_facts:
+                    context_ref = fact.get("context_ref", "")
+                    if context_ref not in context_counts:
+                        context_counts[context_ref] = 0
+                    context_counts[context_ref] += 1
 
-                # Keep the original context-based approach as a fallback
-                if context_map and not self.data_integrity["xbrl_tables_created"]:
-                    # Group related facts into tables by context
-                    related_contexts = {}
-                    context_period_mapping = {}
+                # Sort contexts by frequency (most common first)
+                sorted_contexts = sorted(context_counts.items(), key=lambda x: x[1], reverse=True)
 
-                    # Process context map for year and period extraction
-                    for context_ref, context_label in context_map.items():
-                        # Extract year from context label (e.g. "FY2023" -> "2023")
-                        year_match = re.search(r'(\d{4})', context_label)
-                        if year_match:
-                            year = year_match.group(1)
+                # Get contexts with period information for columns
+                contexts_with_period = []
+                context_to_period_info = {}  # Store all context period info for reference
 
-                            # Try to determine period type
-                            period_type = "Unknown"
-                            if "FY" in context_label or "Annual" in context_label:
-                                period_type = "Annual"
-                            elif "Q1" in context_label or "Q2" in context_label or "Q3" in context_label or "Q4" in context_label:
-                                period_type = "Quarter"
-                                quarter_match = re.search(r'Q([1-4])', context_label)
-                                quarter = quarter_match.group(1) if quarter_match else ""
-                                # Enhance the context label to be more descriptive
-                                if quarter:
-                                    context_map[context_ref] = f"Q{quarter} {year}"
-                            elif "As of" in context_label:
-                                period_type = "Instant"
+                for context_ref, count in sorted_contexts:
+                    # Only include contexts that appear multiple times
+                    if count >= 3:  # At least 3 facts with this context
+                        # Try to get period info from the raw contexts
+                        if context_ref in parsed_xbrl.get("contexts", {}):
+                            context_info = parsed_xbrl["contexts"][context_ref]
+                            period_data = None
 
-                            # Store in our mapping
-                            context_period_mapping[context_ref] = {
-                                "year": year,
-                                "label": context_map[context_ref],
-                                "type": period_type,
-                                "sort_key": f"{year}{period_type}{context_ref}"  # For sorting
-                            }
+                            if "period" in context_info:
+                                period_info = context_info["period"]
 
-                            # Group by year for tables
-                            key = f"{section_name}_{year}"
-                            if key not in related_contexts:
-                                related_contexts[key] = []
-                            if context_ref not in related_contexts[key]:
-                                related_contexts[key].append(context_ref)
+                                # Store all period info for later reference
+                                context_to_period_info[context_ref] = period_info
 
-                    # Generate tables for each group of related contexts (typically by year)
-                    for key, contexts in related_contexts.items():
-                        # For each table, collect relevant facts
-                        table_facts = []
-                        for context_ref in contexts:
-                            for fact in section_facts:
-                                if fact.get("context_ref") == context_ref:
-                                    table_facts.append(fact)
+                                if "instant" in period_info:
+                                    date_str = period_info['instant']
+                                    try:
+                                        date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+                                        period_type = "Instant"
+                                        period_data = {
+                                            "date": date_obj,
+                                            "label": f"As of {date_obj.strftime('%b %d, %Y')}",
+                                            "year": date_obj.year,
+                                            "type": period_type,
+                                            "context_ref": context_ref,
+                                            "sort_key": f"{date_obj.year}{date_obj.month:02d}{date_obj.day:02d}"
+                                        }
+                                    except ValueError:
+                                        # If date parsing fails, use the original string
+                                        period_data = {
+                                            "date": date_str,
+                                            "label": f"As of {date_str}",
+                                            "year": date_str[:4],  # Assume YYYY-MM-DD format
+                                            "type": "Instant",
+                                            "context_ref": context_ref,
+                                            "sort_key": date_str.replace("-", "")
+                                        }
+                                elif "startDate" in period_info and "endDate" in period_info:
+                                    start_str = period_info['startDate']
+                                    end_str = period_info['endDate']
+                                    try:
+                                        start_date = datetime.datetime.strptime(start_str, "%Y-%m-%d")
+                                        end_date = datetime.datetime.strptime(end_str, "%Y-%m-%d")
+                                        delta = (end_date - start_date).days
 
-                        # Check if we have enough facts to create a meaningful table
-                        if len(table_facts) >= 3:
-                            # Extract year from key for better header
-                            year_match = re.search(r'_(\d{4})$', key)
-                            year = year_match.group(1) if year_match else ""
+                                        # Determine if it's a quarter, year, or other period
+                                        if 88 <= delta <= 95:  # ~3 months (quarter)
+                                            quarter = (end_date.month + 2) // 3  # Calculate quarter from end month
+                                            period_type = "Quarter"
+                                            period_label = f"Q{quarter} {end_date.year}"
+                                        elif 360 <= delta <= 371:  # ~1 year
+                                            period_type = "Annual"
+                                            period_label = f"FY {end_date.year}"
+                                        elif 175 <= delta <= 190:  # ~6 months
+                                            period_type = "Semi-annual"
+                                            period_label = f"H1 {end_date.year}"
+                                        else:
+                                            period_type = "Period"
+                                            period_label = f"{start_date.strftime('%b %d')} - {end_date.strftime('%b %d, %Y')}"
 
-                            # Create descriptive table header
-                            if year:
-                                header = f"{section_name.replace('_', ' ')} TABLE ({year})"
-                            else:
-                                header = f"{section_name.replace('_', ' ')} TABLE - {key}"
+                                        period_data = {
+                                            "start_date": start_date,
+                                            "end_date": end_date,
+                                            "label": period_label,
+                                            "year": end_date.year,
+                                            "type": period_type,
+                                            "context_ref": context_ref,
+                                            "sort_key": f"{end_date.year}{end_date.month:02d}{end_date.day:02d}"
+                                        }
+                                    except ValueError:
+                                        # If date parsing fails, use the original strings
+                                        period_data = {
+                                            "start_date": start_str,
+                                            "end_date": end_str,
+                                            "label": f"{start_str} to {end_str}",
+                                            "year": end_str[:4],  # Assume YYYY-MM-DD format
+                                            "type": "Period",
+                                            "context_ref": context_ref,
+                                            "sort_key": end_str.replace("-", "")
+                                        }
 
-                            output.append(f"@TABLE_CONTENT: {header}")
+                            if period_data:
+                                contexts_with_period.append(period_data)
+                        else:
+                            # No context info, fallback to ID with count indicator
+                            contexts_with_period.append({
+                                "label": f"Context {context_ref}",
+                                "context_ref": context_ref,
+                                "type": "Unknown",
+                                "sort_key": f"Z{context_ref}",  # 'Z' prefix to sort after known dates
+                                "year": 9999  # High value to sort at the end
+                            })
 
-                            # Add period reference for this table if we have good info
-                            period_types_in_table = set()
-                            for context_ref in contexts:
-                                if context_ref in context_period_mapping:
-                                    period_types_in_table.add(context_period_mapping[context_ref]["type"])
+                # Sort contexts chronologically (earliest to latest)
+                contexts_with_period.sort(key=lambda x: x.get("sort_key", ""))
 
-                            if period_types_in_table:
-                                period_guide = []
-                                for period_type in ["Annual", "Quarter", "Instant"]:
-                                    if period_type in period_types_in_table:
-                                        periods = [ctx for ctx_ref, ctx in context_period_mapping.items()
-                                                if ctx_ref in contexts and ctx["type"] == period_type]
-                                        if periods:
-                                            periods_str = ", ".join([ctx["label"] for ctx in periods])
-                                            period_guide.append(f"{period_type} periods: {periods_str}")
+                # Convert to the format needed for table creation
+                top_contexts = [(ctx["context_ref"], ctx["label"]) for ctx in contexts_with_period]
 
-                                if period_guide:
-                                    output.append("Period reference: " + "; ".join(period_guide))
+                # Create a context reference mapping for the table header
+                context_mapping = {}
+                for ctx in contexts_with_period:
+                    context_mapping[ctx["context_ref"]] = ctx["label"]
 
-                            # Extract relevant periods/contexts for columns and sort chronologically
-                            column_contexts = []
-                            for context_ref in contexts:
-                                if context_ref in context_map:
-                                    sort_key = context_period_mapping.get(context_ref, {}).get("sort_key", context_ref)
-                                    column_contexts.append((context_ref, context_map[context_ref], sort_key))
+                # Only create a table if we have enough contexts and concepts
+                if len(top_contexts) >= 2 and len(concepts_in_section) >= 3:
+                    # Identify the years covered in this table
+                    years_covered = sorted(set([ctx.get("year") for ctx in contexts_with_period if "year" in ctx]))
+                    period_types = sorted(set([ctx.get("type") for ctx in contexts_with_period if "type" in ctx]))
 
-                            # Sort column_contexts chronologically
-                            column_contexts.sort(key=lambda x: x[2])
+                    # Create descriptive table header
+                    if years_covered and len(years_covered) <= 5:  # Reasonable number to display
+                        years_str = ", ".join([str(year) for year in years_covered])
+                        header = f"{section_name.replace('_', ' ')} TABLE ({years_str})"
+                    else:
+                        header = f"{section_name.replace('_', ' ')} TABLE"
 
-                            # Convert to the format expected by the rest of the code
-                            column_contexts = [(ctx[0], ctx[1]) for ctx in column_contexts]
+                    output.append(f"@TABLE_CONTENT: {header}")
 
-                            # Group facts by concept for rows
-                            facts_by_concept = {}
-                            for fact in table_facts:
-                                concept = fact.get("concept", "")
-                                if ":" in concept:
-                                    # Get readable concept name
-                                    concept_name = concept.split(":")[-1]
-                                    # Make it more readable
-                                    readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
-                                else:
-                                    readable_name = concept
+                    # Add a period guide for this table if we have good period info
+                    if len(contexts_with_period) > 0 and any("type" in ctx for ctx in contexts_with_period):
+                        period_guide = []
 
-                                if readable_name not in facts_by_concept:
-                                    facts_by_concept[readable_name] = {}
+                        # Group contexts by type
+                        period_by_type = {}
+                        for ctx in contexts_with_period:
+                            if "type" in ctx and ctx["type"] != "Unknown":
+                                if ctx["type"] not in period_by_type:
+                                    period_by_type[ctx["type"]] = []
+                                period_by_type[ctx["type"]].append(ctx)
 
-                                context_ref = fact.get("context_ref", "")
-                                facts_by_concept[readable_name][context_ref] = fact
+                        # Add period reference information
+                        for period_type in ["Annual", "Quarter", "Semi-annual", "Instant", "Period"]:
+                            if period_type in period_by_type:
+                                periods = period_by_type[period_type]
+                                if period_type == "Annual":
+                                    periods_str = ", ".join([f"{p['label']}" for p in periods])
+                                    period_guide.append(f"Annual periods: {periods_str}")
+                                elif period_type == "Quarter":
+                                    periods_str = ", ".join([f"{p['label']}" for p in periods])
+                                    period_guide.append(f"Quarterly periods: {periods_str}")
+                                elif period_type == "Instant":
+                                    if len(periods) <= 4:  # Keep it concise
+                                        periods_str = ", ".join([f"{p['label']}" for p in periods])
+                                        period_guide.append(f"As of dates: {periods_str}")
 
-                            # Build table
-                            table_rows = []
+                        # Add the period guide if we have useful information
+                        if period_guide:
+                            output.append("Period reference: " + "; ".join(period_guide))
 
-                            # Add header row with column contexts
-                            header_row = "Concept"
-                            for _, context_label in column_contexts:
-                                header_row += f" | {context_label}"
-                            table_rows.append(header_row)
+                    # Build enhanced table with explicit context references
+                    table_rows = []
 
-                            # Add separator row
-                            separator = "-" * len("Concept")
-                            for context_label in [label for _, label in column_contexts]:
-                                separator += f" | {'-' * len(context_label)}"
-                            table_rows.append(separator)
+                    # Add table metadata
+                    table_rows.append(f"@TABLE_TYPE: {section_name.replace('_', ' ')}")
 
-                            # Add data rows
-                            for concept_name, context_facts in facts_by_concept.items():
-                                row = concept_name
-                                for context_ref, _ in column_contexts:
-                                    if context_ref in context_facts:
-                                        value = context_facts[context_ref].get("value", "")
-                                        # Add currency symbol if available
-                                        unit_ref = context_facts[context_ref].get("unit_ref", "")
-                                        if unit_ref and unit_ref.lower() == "usd":
-                                            # Only add $ if it's not already there
-                                            if not value.startswith("$"):
-                                                value = f"${value}"
-                                        row += f" | {value}"
-                                    else:
-                                        row += " | -"
-                                table_rows.append(row)
+                    # Add verification key if available
+                    if "Revenues" in section_name or "Revenue" in section_name:
+                        verification_contexts = []
+                        for context_ref, _ in top_contexts:
+                            if context_ref in context_code_map:
+                                verification_contexts.append(context_code_map[context_ref])
+                        if verification_contexts:
+                            table_rows.append(f"@VERIFICATION: Total_Revenue = Sum_of_Revenue_Components for contexts: {', '.join(verification_contexts)}")
 
-                            # Add the table
-                            output.append("\n".join(table_rows))
-                            output.append("")
+                    # Add standardized header structure with Key column
+                    header_row = "Concept | Key"
+                    for _, context_label in top_contexts:
+                        header_row += f" | {context_label}"
+                    table_rows.append(header_row)
 
-                            # Update data integrity metrics
-                            self.data_integrity["xbrl_tables_created"] += 1
-                            self.data_integrity["tables_detected"] += 1
-                            self.data_integrity["tables_included"] += 1
-                            self.data_integrity["total_table_rows"] += len(table_rows)
+                    # Add separator row
+                    separator = "-" * len("Concept") + " | " + "-" * len("Key")
+                    for context_label in [label for _, label in top_contexts]:
+                        separator += f" | {'-' * len(context_label)}"
+                    table_rows.append(separator)
 
-                # Sort facts within section
-                sorted_section_facts = sorted(section_facts, key=lambda x: x.get("concept", ""))
+                    # Analyze XBRL facts to identify hierarchical relationships
+                    # Extract hierarchy information from facts and XBRL structure
+                    concept_hierarchies = {}
+                    subtotal_items = {}
+                    parent_child_map = {}
 
-                # Add facts with improved readability
-                for fact in sorted_section_facts:
-                    concept = fact.get("concept", "")
-                    output.append(f"@CONCEPT: {concept}")
+                    # First pass: identify potential total/subtotal items
+                    for concept_name, facts in concepts_in_section.items():
+                        concept_lower = concept_name.lower()
+                        # Identify likely subtotal or total items based on naming patterns
+                        is_total = False
+                        if "total" in concept_lower or "subtotal" in concept_lower:
+                            is_total = True
+                        elif any(concept_lower.startswith(prefix) for prefix in ["gross", "net", "operating", "consolidated"]):
+                            is_total = True
 
-                    # Add readable name for custom elements
-                    if ":" in concept and not concept.startswith("us-gaap:"):
-                        # This is likely a custom taxonomy element
-                        concept_name = concept.split(":")[-1]
-                        # Make it more readable by converting camelCase to words
-                        readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
-                        output.append(f"@COMMON_NAME: {readable_name}")
+                        # Mark items that are likely to be subtotals
+                        if is_total:
+                            subtotal_items[concept_name] = {
+                                "level": 0,  # Will be adjusted in the second pass
+                                "children": [],
+                                "facts": facts
+                            }
 
-                    output.append(f"@VALUE: {fact.get('value', '')}")
+                    # Second pass: identify parent-child relationships
+                    for subtotal_name in subtotal_items:
+                        subtotal_lower = subtotal_name.lower()
 
-                    # Include units and decimals
-                    if fact.get("unit_ref"):
-                        output.append(f"@UNIT_REF: {fact.get('unit_ref', '')}")
-                    if fact.get("decimals"):
-                        output.append(f"@DECIMALS: {fact.get('decimals', '')}")
+                        # Find child items that belong to this subtotal
+                        # Example: "Total Revenue" would match with items containing "revenue"
+                        base_term = None
+                        if "total" in subtotal_lower:
+                            base_term = subtotal_lower.replace("total", "").strip()
+                        elif "subtotal" in subtotal_lower:
+                            base_term = subtotal_lower.replace("subtotal", "").strip()
 
-                    # Use human-readable context labels
-                    # Note: context references can be either "context_ref" or "contextRef" (camelCase)
-                    context_ref = fact.get("context_ref", fact.get("contextRef", ""))
-                    if context_ref in context_map:
-                        output.append(f"@CONTEXT_REF: {context_ref} | @CONTEXT: {context_map[context_ref]}")
-                    else:
-                        output.append(f"@CONTEXT_REF: {context_ref}")
+                        if base_term:
+                            for concept_name in concepts_in_section:
+                                if concept_name != subtotal_name and base_term in concept_name.lower():
+                                    # This is likely a child of the subtotal
+                                    subtotal_items[subtotal_name]["children"].append(concept_name)
+                                    # Track parent-child relationship
+                                    parent_child_map[concept_name] = subtotal_name
 
-                    try:
-                        # First priority: Check context data from parsed XBRL
-                        context_data = parsed_xbrl.get("contexts", {}).get(context_ref, {})
-                        period_info = context_data.get("period", {})
+                    # Sort concepts for hierarchical organization with levels based on relationships
+                    # Group related concepts together
+                    organized_concepts = {}
+                    for concept_name, facts in concepts_in_section.items():
+                        # Look for parent categories
+                        concept_lower = concept_name.lower()
+                        if "revenue" in concept_lower or "sales" in concept_lower:
+                            category = "Revenue"
+                        elif "cost" in concept_lower or "expense" in concept_lower:
+                            category = "Expenses"
+                        elif "profit" in concept_lower or "margin" in concept_lower:
+                            category = "Profit"
+                        elif "asset" in concept_lower:
+                            category = "Assets"
+                        elif "liabilit" in concept_lower:
+                            category = "Liabilities"
+                        elif "equity" in concept_lower:
+                            category = "Equity"
+                        elif "income" in concept_lower or "earnings" in concept_lower:
+                            category = "Income"
+                        elif "cash" in concept_lower or "flow" in concept_lower:
+                            category = "Cash_Flow"
+                        else:
+                            category = "Other"
 
-                        if "startDate" in period_info and "endDate" in period_info:
-                            # This is a duration context from parsed data
-                            output.append(f"@DATE_TYPE: Duration")
-                            output.append(f"@START_DATE: {period_info['startDate']}")
-                            output.append(f"@END_DATE: {period_info['endDate']}")
-                        elif "instant" in period_info:
-                            # This is an instant context from parsed data
-                            output.append(f"@DATE_TYPE: Instant")
-                            output.append(f"@DATE: {period_info['instant']}")
-                        # Check for simple context IDs (c-1, c-2, etc.) used by NVDA 2025+
-                        elif re.match(r'^c-\d+$', context_ref):
-                            # Check if we have HTML-extracted context information
-                            if context_ref in self.context_mapping_from_html:
-                                html_period_info = self.context_mapping_from_html[context_ref]
-                                logging.info(f"Found HTML context info for {context_ref}: {html_period_info}")
+                        # Determine this concept's hierarchical level
+                        # Level 0 is a root, Level 1 is a subtotal, Level 2+ are detail items
+                        hierarchy_level = 0
 
-                                if "startDate" in html_period_info and "endDate" in html_period_info:
-                                    # Duration context from HTML
-                                    output.append(f"@DATE_TYPE: Duration")
-                                    output.append(f"@START_DATE: {html_period_info['startDate']}")
-                                    output.append(f"@END_DATE: {html_period_info['endDate']}")
-                                elif "instant" in html_period_info:
-                                    # Instant context from HTML
-                                    output.append(f"@DATE_TYPE: Instant")
-                                    output.append(f"@DATE: {html_period_info['instant']}")
-                                else:
-                                    logging.warning(f"Context {context_ref} has HTML mapping but no dates: {html_period_info}")
-                            else:
-                                # Try to find the context in parsed_xbrl.contexts
-                                if context_ref in parsed_xbrl.get("contexts", {}):
-                                    context_data = parsed_xbrl["contexts"][context_ref]
-                                    period_info = context_data.get("period", {})
+                        # Check if this is a total/subtotal
+                        if concept_name in subtotal_items:
+                            hierarchy_level = 1
+                        # Check if this is a child of a subtotal
+                        elif concept_name in parent_child_map:
+                            hierarchy_level = 2
 
-                                    if "startDate" in period_info and "endDate" in period_info:
-                                        # Duration context from parsed_xbrl
-                                        output.append(f"@DATE_TYPE: Duration")
-                                        output.append(f"@START_DATE: {period_info['startDate']}")
-                                        output.append(f"@END_DATE: {period_info['endDate']}")
-                                        logging.info(f"Used period info from parsed_xbrl for {context_ref}")
-                                    elif "instant" in period_info:
-                                        # Instant context from parsed_xbrl
-                                        output.append(f"@DATE_TYPE: Instant")
-                                        output.append(f"@DATE: {period_info['instant']}")
-                                        logging.info(f"Used period info from parsed_xbrl for {context_ref}")
-                                    else:
-                                        logging.warning(f"Context {context_ref} found in parsed_xbrl but has no dates: {period_info}")
-                                else:
-                                    logging.warning(f"Context {context_ref} not found in HTML context mapping or parsed_xbrl. Available contexts in HTML mapping: {len(self.context_mapping_from_html)}")
-                        else:
-                            # Second priority: Check for embedded dates in context_ref ID
+                        # Store hierarchy information with the concept
+                        concept_hierarchies[concept_name] = {
+                            "level": hierarchy_level,
+                            "parent": parent_child_map.get(concept_name, None),
+                            "is_total": concept_name in subtotal_items,
+                            "category": category
+                        }
 
-                            # Use the context format handler to extract period info from the context ID
-                            period_info = extract_period_info(context_ref)
+                        if category not in organized_concepts:
+                            organized_concepts[category] = []
+                        # Include hierarchy level with concept data
+                        organized_concepts[category].append((concept_name, facts, hierarchy_level))
 
-                            if period_info:
-                                if "startDate" in period_info and "endDate" in period_info:
-                                    # Duration context
-                                    output.append(f"@DATE_TYPE: Duration")
-                                    output.append(f"@START_DATE: {period_info['startDate']}")
-                                    output.append(f"@END_DATE: {period_info['endDate']}")
-                                elif "instant" in period_info:
-                                    # Instant context
-                                    output.append(f"@DATE_TYPE: Instant")
-                                    output.append(f"@DATE: {period_info['instant']}")
-                    except Exception as e:
-                        # Catch any errors to prevent breaking the existing pipeline
-                        logging.warning(f"Error extracting date information from context: {context_ref}. Error: {str(e)}")
-                        # Continue processing without date information
+                    # Add data rows with hierarchical organization
+                    for category in ["Revenue", "Expenses", "Profit", "Income", "Assets", "Liabilities", "Equity", "Cash_Flow", "Other"]:
+                        if category in organized_concepts:
+                            # Add category header
+                            if len(organized_concepts[category]) > 1:
+                                category_row = f"<{category}>"
+                                for _ in range(len(top_contexts) + 1):  # +1 for Key column
+                                    category_row += " | "
+                                table_rows.append(category_row)
 
-                    output.append("")
+                            # Sort items to ensure parent items come before children
+                            sorted_concepts = sorted(
+                                organized_concepts[category],
+                                key=lambda x: (concept_hierarchies[x[0]]["level"], 0 if concept_hierarchies[x[0]]["is_total"] else 1)
+                            )
 
-        # Add the @CONTEXT_REFERENCE_GUIDE section
-        output.append("@CONTEXT_REFERENCE_GUIDE")
-        output.append("This section provides a consolidated reference for all time periods used in this document.")
-        output.append("")
+                            # Add items in this category
+                            for concept_tuple in sorted_concepts:
+                                concept_name = concept_tuple[0]
+                                facts = concept_tuple[1]
+                                hierarchy_level = concept_tuple[2] if len(concept_tuple) > 2 else 0
 
-        # Add Data Dictionary Header
-        output.append("@DATA_DICTIONARY:")
-        output.append("Context_Code | Semantic_Code | Category | Type | Segment | Period | Description")
-        output.append("------------|---------------|----------|------|---------|--------|------------")
+                                # Create a mapping from context to fact for this concept
+                                context_to_fact = {fact.get("context_ref", ""): fact for fact in facts}
 
-        # Sort period contexts by date for better readability
-        period_contexts.sort(key=lambda x: x["start_date"])
-        instant_contexts.sort(key=lambda x: x["date"])
+                                # Only add rows that have data in at least one of our top contexts
+                                if any(context_ref in context_to_fact for context_ref, _ in top_contexts):
+                                    # Get hierarchy info for this concept
+                                    concept_info = concept_hierarchies.get(concept_name, {})
+                                    is_total = concept_info.get("is_total", False)
+                                    parent = concept_info.get("parent", None)
 
-        # Add all contexts to the guide
+                                    # Apply formatting based on hierarchy
+                                    if is_total:
+                                        # Format total items (make them stand out)
+                                        if hierarchy_level == 1:
+                                            # Level 1 totals (main line totals)
+                                            row = f"@TOTAL: {concept_name}"
+                                        else:
+                                            # Lower level subtotals
+                                            row = f"@SUBTOTAL: {concept_name}"
+                                    elif parent:
+                                        # Child items with indentation based on hierarchy level
+                                        indentation = "  " * hierarchy_level
+                                        row = f"{indentation}↳ {concept_name} @CHILD_OF: {parent}"
+                                    else:
+                                        # Regular line items with basic indentation
+                                        if len(organized_concepts[category]) > 1:
+                                            row = f"  {concept_name}"
+                                        else:
+                                            row = concept_name
 
-        # Extract context information directly from context IDs if we have facts but no contexts
-        if not period_contexts and not instant_contexts and parsed_xbrl.get("facts"):
-            # Extract unique context IDs from facts
-            context_refs = set()
-            for fact in parsed_xbrl.get("facts", []):
-                context_ref = fact.get("context_ref", fact.get("contextRef", ""))
-                if context_ref:
-                    context_refs.add(context_ref)
+                                    # Add enhanced context key reference with semantic codes
+                                    context_keys = []
+                                    semantic_keys = []
+                                    for context_ref, _ in top_contexts:
+                                        if context_ref in context_to_fact:
+                                            if context_ref in context_code_map:
+                                                context_keys.append(context_code_map[context_ref])
 
-            # Try to extract dates from context IDs
-            for i, context_ref in enumerate(sorted(context_refs)):
-                # Use the context format handler to extract period info
-                period_info = extract_period_info(context_ref)
+                                            # Add semantic code if available
+                                            code = context_code_map.get(context_ref, "")
+                                            if code:
+                                                for label, info in context_reference_guide.items():
+                                                    if info.get("code") == code and "semantic_code" in info:
+                                                        semantic_keys.append(info["semantic_code"])
+                                                        break
 
-                if period_info:
-                    if "startDate" in period_info and "endDate" in period_info:
-                        # Duration context
-                        code = f"P{i+1}"
-                        context_code_map[context_ref] = code
+                                    # First show the short code (c-1, c-2) for backward compatibility
+                                    if context_keys:
+                                        row += f" | {','.join(context_keys)}"
+                                    else:
+                                        row += " | -"
 
-                        formatted_start = period_info["startDate"]
-                        formatted_end = period_info["endDate"]
+                                    # Then add a comment with the semantic codes that are more descriptive
+                                    if semantic_keys:
+                                        row += f" # {','.join(semantic_keys)}"
 
-                        semantic_code = f"Duration_{formatted_start}_{formatted_end}"
-                        category = self._get_fiscal_category(formatted_start, formatted_end, filing_type)
+                                    # Add values for each context with consistent units and scaling
+                                    for context_ref, _ in top_contexts:
+                                        if context_ref in context_to_fact:
+                                            fact = context_to_fact[context_ref]
+                                            value = fact.get("value", "")
+                                            unit_ref = fact.get("unit_ref", "")
+                                            decimals = fact.get("decimals", "")
 
-                        # Add to output
-                        output.append(f"{code} | {semantic_code} | {category} | Duration | Consolidated | {formatted_start} to {formatted_end} | Period from {formatted_start} to {formatted_end}")
+                                            # Format value with appropriate scale indicator
+                                            try:
+                                                # Add currency symbol if available
+                                                if unit_ref and unit_ref.lower() == "usd":
+                                                    # Only add $ if it's not already there
+                                                    if not value.startswith("$"):
+                                                        formatted_value = f"${value}"
+                                                    else:
+                                                        formatted_value = value
 
-                    elif "instant" in period_info:
-                        # Instant context
-                        code = f"I{i+1}"
-                        context_code_map[context_ref] = code
+                                                    # Add scale indicator if specified
+                                                    if decimals and safe_parse_decimals(decimals) == -6:
+                                                        formatted_value += " [M]"  # Millions
+                                                    elif decimals and safe_parse_decimals(decimals) == -3:
+                                                        formatted_value += " [K]"  # Thousands
+                                                    elif decimals and safe_parse_decimals(decimals) == -9:
+                                                        formatted_value += " [B]"  # Billions
+                                                elif unit_ref and unit_ref.lower() == "shares":
+                                                    formatted_value = f"{value} shares"
+                                                else:
+                                                    formatted_value = value
 
-                        formatted_date = period_info["instant"]
+                                                row += f" | {formatted_value}"
+                                            except:
+                                                # Fallback if formatting fails
+                                                # Add scale indicators to values in fallback context-based tables
+                                                # Format value with appropriate scaling
+                                                unit_ref = fact.get("unit_ref", "")
+                                                decimals = fact.get("decimals", "")
 
-                        semantic_code = f"Instant_{formatted_date}"
-                        category = self._get_fiscal_category(formatted_date, formatted_date, filing_type)
+                                                if unit_ref and unit_ref.lower() == "usd":
+                                                    # Add currency symbol if needed
+                                                    if not value.startswith("$"):
+                                                        formatted_value = f"${value}"
+                                                    else:
+                                                        formatted_value = value
 
-                        # Add to output
-                        output.append(f"{code} | {semantic_code} | {category} | Instant | Consolidated | {formatted_date} | As of {formatted_date}")
+                                                    # Add scale indicator
+                                                    if decimals and safe_parse_decimals(decimals) == -6:
+                                                        formatted_value += " [M]"  # Millions
+                                                    elif decimals and safe_parse_decimals(decimals) == -3:
+                                                        formatted_value += " [K]"  # Thousands
+                                                    elif decimals and safe_parse_decimals(decimals) == -9:
+                                                        formatted_value += " [B]"  # Billions
+                                                elif unit_ref and unit_ref.lower() == "shares":
+                                                    formatted_value = f"{value} shares"
+                                                else:
+                                                    formatted_value = value
 
-        elif period_contexts or instant_contexts:
-            for i, context in enumerate(period_contexts):
-                code = f"P{i+1}"
-                context_code_map[context["context_id"]] = code
-                semantic_code = f"Duration_{context['start_date']}_{context['end_date']}"
-                # Get fiscal year/quarter info if available
-                category = self._get_fiscal_category(context["start_date"], context["end_date"], filing_type)
-                output.append(f"{code} | {semantic_code} | {category} | Duration | {context['segment']} | {context['start_date']} to {context['end_date']} | {context['description']}")
+                                                row += f" | {formatted_value}"
+                                        else:
+                                            row += " | -"
+                                    table_rows.append(row)
 
-            for i, context in enumerate(instant_contexts):
-                code = f"I{i+1}"
-                context_code_map[context["context_id"]] = code
-                semantic_code = f"Instant_{context['date']}"
-                # Get fiscal period info if available
-                category = self._get_fiscal_category(context["date"], context["date"], filing_type)
-                output.append(f"{code} | {semantic_code} | {category} | Instant | {context['segment']} | {context['date']} | {context['description']}")
-        else:
-            output.append("Note: No detailed context information available for this filing")
+                            # Close category with proper XML syntax if we added a category header
+                            if len(organized_concepts[category]) > 1:
+                                end_category = f"</{category}>"
+                                for _ in range(len(top_contexts) + 1):  # +1 for Key column
+                                    end_category += " | "
+                                table_rows.append(end_category)
 
-        output.append("")
+                    # Only add the table if it actually has data rows
+                    if len(table_rows) > 2:  # Header + separator + at least one data row
+                        output.append("\n".join(table_rows))
+                        output.append("")
 
-        # Add Verification Keys section
-        output.append("@VERIFICATION_KEYS:")
-        output.append("These formulas can be used to verify data consistency:")
-        if period_contexts or instant_contexts:
-            # This is where you could add formulas that help verify data consistency
-            output.append("- Current Assets + Non-Current Assets = Total Assets")
-            output.append("- Current Liabilities + Non-Current Liabilities + Equity = Total Liabilities and Equity")
-            output.append("- Gross Profit = Revenue - Cost of Revenue")
-            output.append("- Net Income = Revenue - Expenses + Other Income/Expenses - Taxes")
-        else:
-            output.append("- No context information available for formula verification")
+                        # Update data integrity metrics
+                        integrity["xbrl_tables_created"] += 1
+                        integrity["tables_detected"] += 1
+                        integrity["tables_included"] += 1
+                        integrity["total_table_rows"] += len(table_rows)
 
-        output.append("")
+                # Keep the original context-based approach as a fallback
+                if context_map and not (tables_created + integrity["xbrl_tables_created"]):
+                    # Group related facts into tables by context
+                    related_contexts = {}
+                    context_period_mapping = {}
 
-        # Add Period Contexts section
-        output.append("@PERIOD_CONTEXTS")
-        if period_contexts:
-            for context in period_contexts:
-                output.append(f"{context_code_map[context['context_id']]}: {context['description']}")
-                if context['segment']:
-                    output.append(f"  Segment: {context['segment']}")
-        else:
-            output.append("No detailed period context information available")
+                    # Process context map for year and period extraction
+                    for context_ref, context_label in context_map.items():
+                        # Extract year from context label (e.g. "FY2023" -> "2023")
+                        year_match = re.search(r'(\d{4})', context_label)
+                        if year_match:
+                            year = year_match.group(1)
 
-        output.append("")
+                            # Try to determine period type
+                            period_type = "Unknown"
+                            if "FY" in context_label or "Annual" in context_label:
+                                period_type = "Annual"
+                            elif "Q1" in context_label or "Q2" in context_label or "Q3" in context_label or "Q4" in context_label:
+                                period_type = "Quarter"
+                                quarter_match = re.search(r'Q([1-4])', context_label)
+                                quarter = quarter_match.group(1) if quarter_match else ""
+                                # Enhance the context label to be more descriptive
+                                if quarter:
+                                    context_map[context_ref] = f"Q{quarter} {year}"
+                            elif "As of" in context_label:
+                                period_type = "Instant"
 
-        # Add Instant Contexts section
-        output.append("@INSTANT_CONTEXTS")
-        if instant_contexts:
-            for context in instant_contexts:
-                output.append(f"{context_code_map[context['context_id']]}: {context['description']}")
-                if context['segment']:
-                    output.append(f"  Segment: {context['segment']}")
-        else:
-            output.append("No detailed instant context information available")
+                            # Store in our mapping
+                            context_period_mapping[context_ref] = {
+                                "year": year,
+                                "label": context_map[context_ref],
+                                "type": period_type,
+                                "sort_key": f"{year}{period_type}{context_ref}"  # For sorting
+                            }
 
-        output.append("")
+                            # Group by year for tables
+                            key = f"{section_name}_{year}"
+                            if key not in related_contexts:
+                                related_contexts[key] = []
+                            if context_ref not in related_contexts[key]:
+                                related_contexts[key].append(context_ref)
 
-        # Add Example Extraction section
-        output.append("@EXAMPLE_EXTRACTION")
-        output.append("Example of how to extract and format data from this document:")
-        if period_contexts or instant_contexts:
-            output.append("```")
-            output.append("// Example of extracting Revenue for the most recent period")
-            output.append("const revenue = extractData('Revenue', 'FY2023');")
-            output.append("```")
-        else:
-            output.append("No context examples available")
+                    # Generate tables for each group of related contexts (typically by year)
+                    for key, contexts in related_contexts.items():
+                        # For each table, collect relevant facts
+                        table_facts = []
+                        for context_ref in contexts:
+                            for fact in section_facts:
+                                if fact.get("context_ref") == context_ref:
+                                    table_facts.append(fact)
 
-        output.append("")
+                        # Check if we have enough facts to create a meaningful table
+                        if len(table_facts) >= 3:
+                            # Extract year from key for better header
+                            year_match = re.search(r'_(\d{4})$', key)
+                            year = year_match.group(1) if year_match else ""
 
-        # Add narrative sections
-        if extracted_sections:
-            # Priority sections are now defined earlier for coverage calculation
-            # Use the same priority order for section processing
-
-            # Process sections in priority order
-            for section_id in priority_sections:
-                if section_id in extracted_sections:
-                    section_data = extracted_sections[section_id]
-                    output.append(f"@SECTION: {section_id}")
-                    output.append(f"@SECTION_TITLE: {section_data['name']}")
-                    output.append("")
+                            # Create descriptive table header
+                            if year:
+                                header = f"{section_name.replace('_', ' ')} TABLE ({year})"
+                            else:
+                                header = f"{section_name.replace('_', ' ')} TABLE - {key}"
 
-                    # Process text into manageable chunks
-                    text = section_data['text']
+                            output.append(f"@TABLE_CONTENT: {header}")
 
-                    # Split by paragraphs
-                    paragraphs = re.split(r'\n\s*\n', text)
+                            # Add period reference for this table if we have good info
+                            period_types_in_table = set()
+                            for context_ref in contexts:
+                                if context_ref in context_period_mapping:
+                                    period_types_in_table.add(context_period_mapping[context_ref]["type"])
 
-                    # Separate tables and narrative text
-                    tables = []
-                    narrative_paragraphs = []
+                            if period_types_in_table:
+                                period_guide = []
+                                for period_type in ["Annual", "Quarter", "Instant"]:
+                                    if period_type in period_types_in_table:
+                                        periods = [ctx for ctx_ref, ctx in context_period_mapping.items()
+                                                if ctx_ref in contexts and ctx["type"] == period_type]
+                                        if periods:
+                                            periods_str = ", ".join([ctx["label"] for ctx in periods])
+                                            period_guide.append(f"{period_type} periods: {periods_str}")
 
-                    # For data integrity tracking
-                    section_id_safe = section_id.replace(" ", "_")
-                    if section_id_safe not in self.data_integrity["section_tables"]:
-                        self.data_integrity["section_tables"][section_id_safe] = {
-                            "detected": 0,
-                            "included": 0,
-                            "rows": 0
-                        }
+                                if period_guide:
+                                    output.append("Period reference: " + "; ".join(period_guide))
 
-                    for paragraph in paragraphs:
-                        paragraph = paragraph.strip()
-                        if not paragraph:
-                            continue
-
-                        # Comprehensive table detection
-                        is_table = False
-                        detection_method = "none"
-
-                        # Method 1: Check for explicit table markers (pipe/tab)
-                        if '|' in paragraph or '\t' in paragraph:
-                            is_table = True
-                            detection_method = "explicit_markers"
-
-                        # Method 2: Check for aligned columns with financial indicators
-                        elif any(financial_marker in paragraph for financial_marker in ['$', '%', '(Dollars', '(in millions', 'Three Months Ended']):
-                            # Check for aligned numeric data - common in financial tables
-                            lines = paragraph.split('\n')
-                            if len(lines) >= 2:  # Need at least 2 rows to be a table
-                                # Look for aligned numbers or currency symbols
-                                numeric_pattern = r'[\s\d\$\(\)\.,%-]+'
-                                aligned_positions = []
-
-                                # Find positions of numbers in first line to check alignment
-                                for match in re.finditer(r'\$\d+|\d+\.\d+|\(\d+\)|\d+%', lines[0]):
-                                    aligned_positions.append((match.start(), match.end()))
-
-                                # Check for numbers or currency symbols at similar positions in other lines
-                                if aligned_positions:
-                                    alignment_count = 0
-                                    for line in lines[1:]:
-                                        for start, end in aligned_positions:
-                                            # Allow for some flexibility in position (±5 chars)
-                                            if start >= 5 and end <= len(line) + 5:
-                                                nearby_text = line[max(0, start-5):min(len(line), end+5)]
-                                                if re.search(r'\$\d+|\d+\.\d+|\(\d+\)|\d+%', nearby_text):
-                                                    alignment_count += 1
-
-                                    # If we have good alignment, it's probably a table
-                                    if alignment_count >= len(lines) - 1:
-                                        is_table = True
-                                        detection_method = "financial_indicators"
-
-                        # Method 3: Detect space-delimited tables with column headers and consistent structure
-                        elif len(paragraph.split('\n')) >= 3:  # Need header + at least 2 data rows
-                            lines = paragraph.split('\n')
-
-                            # Count spaces to detect column boundaries in first 2 lines
-                            space_positions_1 = [i for i, char in enumerate(lines[0]) if char == ' ' and i > 0 and lines[0][i-1] != ' ']
-                            if len(lines) > 1:
-                                space_positions_2 = [i for i, char in enumerate(lines[1]) if char == ' ' and i > 0 and lines[1][i-1] != ' ']
-
-                                # If space positions are similar in multiple lines, likely a table with aligned columns
-                                matching_positions = 0
-                                for pos1 in space_positions_1:
-                                    for pos2 in space_positions_2:
-                                        if abs(pos1 - pos2) <= 3:  # Allow slight misalignment
-                                            matching_positions += 1
-
-                                if matching_positions >= 2:  # At least 2 columns align
-                                    is_table = True
-                                    detection_method = "space_alignment"
-
-                        # Add to appropriate category and update data integrity metrics
-                        if is_table:
-                            tables.append(paragraph)
-                            line_count = len(paragraph.split('\n'))
+                            # Extract relevant periods/contexts for columns and sort chronologically
+                            column_contexts = []
+                            for context_ref in contexts:
+                                if context_ref in context_map:
+                                    sort_key = context_period_mapping.get(context_ref, {}).get("sort_key", context_ref)
+                                    column_contexts.append((context_ref, context_map[context_ref], sort_key))
 
-                            # Update data integrity metrics
-                            self.data_integrity["tables_detected"] += 1
-                            self.data_integrity["total_table_rows"] += line_count
-                            self.data_integrity["section_tables"][section_id_safe]["detected"] += 1
-                            self.data_integrity["section_tables"][section_id_safe]["rows"] += line_count
-
-                            # Log detection of important tables for verification
-                            if any(financial_term in paragraph.lower() for financial_term in
-                                  ["balance sheet", "income statement", "cash flow", "statement of operations"]):
-                                logging.info(f"Detected important financial table in {section_id} using {detection_method}")
-                        elif len(paragraph) >= 100:  # Only collect substantive paragraphs
-                            narrative_paragraphs.append(paragraph)
-                            self.data_integrity["narrative_paragraphs"] += 1
-
-                    # For narrative text, select important paragraphs (limit quantity to keep file size reasonable)
-                    # Focus on first few paragraphs which often contain key information
-                    important_paragraphs = []
-                    paragraph_count = 0
-
-                    for paragraph in narrative_paragraphs:
-                        important_paragraphs.append(paragraph)
-                        paragraph_count += 1
-
-                        # Update integrity metric
-                        self.data_integrity["included_paragraphs"] += 1
-
-                        # Limit paragraphs per section for narrative text only
-                        if paragraph_count >= 5:
-                            break
+                            # Sort column_contexts chronologically
+                            column_contexts.sort(key=lambda x: x[2])
 
-                    # Add selected narrative paragraphs
-                    for paragraph in important_paragraphs:
-                        output.append(f"@NARRATIVE_TEXT: {paragraph}")
-                        output.append("")
+                            # Convert to the format expected by the rest of the code
+                            column_contexts = [(ctx[0], ctx[1]) for ctx in column_contexts]
 
-                    # Add ALL tables with 100% fidelity - no filtering or summarization
-                    for table in tables:
-                        output.append(f"@TABLE_CONTENT: {table}")
-                        output.append("")
+                            # Group facts by concept for rows
+                            facts_by_concept = {}
+                            for fact in table_facts:
+                                concept = fact.get("concept", "")
+                                if ":" in concept:
+                                    # Get readable concept name
+                                    concept_name = concept.split(":")[-1]
+                                    # Make it more readable
+                                    readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
+                                else:
+                                    readable_name = concept
 
-                        # Update integrity metrics for included tables
-                        self.data_integrity["tables_included"] += 1
-                        self.data_integrity["section_tables"][section_id_safe]["included"] += 1
+                                if readable_name not in facts_by_concept:
+                                    facts_by_concept[readable_name] = {}
 
-        # Add Data Integrity Report
-        output.append("@DATA_INTEGRITY_REPORT")
-        output.append("Table preservation metrics:")
-        output.append(f"- XBRL facts: {self.data_integrity.get('xbrl_facts', 0)}")
-        output.append(f"- XBRL tables created: {self.data_integrity.get('xbrl_tables_created', 0)}")
-        output.append(f"- Text tables detected: {self.data_integrity['tables_detected'] - self.data_integrity.get('xbrl_tables_created', 0)}")
-        output.append(f"- Total tables included: {self.data_integrity['tables_included']}")
-        if self.data_integrity['tables_detected'] > 0:
-            preservation_rate = 100 * self.data_integrity['tables_included'] / self.data_integrity['tables_detected']
-            output.append(f"- Table preservation rate: {preservation_rate:.1f}%")
-            # Warning if not all tables are preserved
-            if preservation_rate < 100:
-                output.append("WARNING: Not all tables were preserved!")
-        output.append(f"- Total table rows: {self.data_integrity['total_table_rows']}")
-        output.append(f"- Narrative paragraphs: {self.data_integrity['narrative_paragraphs']}")
-        output.append(f"- Narrative paragraphs included: {self.data_integrity['included_paragraphs']}")
+                                context_ref = fact.get("context_ref", "")
+                                facts_by_concept[readable_name][context_ref] = fact
 
-        # Document section coverage report
-        output.append("")
-        output.append("@DOCUMENT_COVERAGE")
+                            # Build table
+                            table_rows = []
 
-        # Use priority_sections defined at the beginning of the method
+                            # Add header row with column contexts
+                            header_row = "Concept"
+                            for _, context_label in column_contexts:
+                                header_row += f" | {context_label}"
+                            table_rows.append(header_row)
 
-        # Check for new format with document_sections in filing_metadata
-        document_sections = {}
-        if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict) and "document_sections" in filing_metadata["html_content"]:
-            document_sections = filing_metadata["html_content"]["document_sections"]
+                            # Add separator row
+                            separator = "-" * len("Concept")
+                            for context_label in [label for _, label in column_contexts]:
+                                separator += f" | {'-' * len(context_label)}"
+                            table_rows.append(separator)
 
-        # Create lists of covered and missing sections, considering both extracted_sections and document_sections
-        covered_sections = []
-        # Check for direct exhibits flag from HTML processor
-        has_exhibits_flag = False
-        if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict):
-            has_exhibits_flag = filing_metadata["html_content"].get("has_exhibits_section", False)
-            if has_exhibits_flag:
-                logging.info("Found direct exhibits flag from HTML processor")
+                            # Add data rows
+                            for concept_name, context_facts in facts_by_concept.items():
+                                row = concept_name
+                                for context_ref, _ in column_contexts:
+                                    if context_ref in context_facts:
+                                        value = context_facts[context_ref].get("value", "")
+                                        # Add currency symbol if available
+                                        unit_ref = context_facts[context_ref].get("unit_ref", "")
+                                        if unit_ref and unit_ref.lower() == "usd":
+                                            # Only add $ if it's not already there
+                                            if not value.startswith("$"):
+                                                value = f"${value}"
+                                        row += f" | {value}"
+                                    else:
+                                        row += " | -"
+                                table_rows.append(row)
 
-        for section_id in priority_sections:
-            # Check standard section detection
-            if section_id in extracted_sections or section_id in document_sections:
-                covered_sections.append(section_id)
-            # Special handling for EXHIBITS section with alternative detection
-            elif section_id == "ITEM_15_EXHIBITS":
-                # Check for direct flag first
-                if has_exhibits_flag:
-                    covered_sections.append(section_id)
-                    logging.info("EXHIBITS section included through direct flag")
-                # Then check for alternative detection
-                elif document_sections:
-                    for section_key, section_info in document_sections.items():
-                        if section_key == "ITEM_15_EXHIBITS" and section_info.get("detected_as") == "exhibits_alternative":
-                            covered_sections.append(section_id)
-                            logging.info(f"EXHIBITS section included through alternative detection: {section_info.get('heading', '')}")
-                            break
-            # Special handling for 1B and 1C which often have minimal content
-            elif section_id in ["ITEM_1B_UNRESOLVED_STAFF_COMMENTS", "ITEM_1C_CYBERSECURITY"] and document_sections:
-                # Check for alternative detection with content pattern match
-                section_found = False
-                for section_key, section_info in document_sections.items():
-                    if section_key == section_id and section_info.get("detected_as") == "content_pattern_match":
-                        covered_sections.append(section_id)
-                        logging.info(f"{section_id} included through content pattern match: {section_info.get('heading', '')}")
-                        section_found = True
-                        break
+                            # Add the table
+                            output.append("\n".join(table_rows))
+                            output.append("")
 
-                # Last resort - check raw text for 1B/1C keywords if section not found above
-                if not section_found and "raw_html_text" in filing_metadata and filing_type == "10-K":
-                    raw_text = filing_metadata.get("raw_html_text", "")
-                    if section_id == "ITEM_1B_UNRESOLVED_STAFF_COMMENTS" and re.search(r'unresolved\s+staff\s+comments', raw_text, re.IGNORECASE):
-                        covered_sections.append(section_id)
-                        logging.info("Item 1B detected through raw text search")
-                    elif section_id == "ITEM_1C_CYBERSECURITY" and re.search(r'cybersecurity', raw_text, re.IGNORECASE):
-                        covered_sections.append(section_id)
-                        logging.info("Item 1C detected through raw text search")
+                            # Update data integrity metrics
+                            integrity["xbrl_tables_created"] += 1
+                            integrity["tables_detected"] += 1
+                            integrity["tables_included"] += 1
+                            integrity["total_table_rows"] += len(table_rows)
 
-        missing_sections = [section_id for section_id in priority_sections if section_id not in covered_sections]
+                # Sort facts within section
+                sorted_section_facts = sorted(section_facts, key=lambda x: x.get("concept", ""))
 
-        if filing_type == "10-K":
-            # Define required sections for 10-K filings
-            required_10k_sections = [
-                "ITEM_1_BUSINESS",
-                "ITEM_1A_RISK_FACTORS",
-                "ITEM_2_PROPERTIES",
-                "ITEM_3_LEGAL_PROCEEDINGS",
-                "ITEM_7_MD_AND_A",
-                "ITEM_7A_MARKET_RISK",
-                "ITEM_8_FINANCIAL_STATEMENTS",
-                "ITEM_9A_CONTROLS",
-                "ITEM_10_DIRECTORS",
-                "ITEM_11_EXECUTIVE_COMPENSATION"
-                # "ITEM_15_EXHIBITS" - Removed from required as often non-standard in company filings
-            ]
+                # Add facts with improved readability
+                for fact in sorted_section_facts:
+                    concept = fact.get("concept", "")
+                    output.append(f"@CONCEPT: {concept}")
 
-            # Optional sections (may not be present depending on company)
-            optional_10k_sections = [
-                "ITEM_1B_UNRESOLVED_STAFF_COMMENTS",  # Only required for accelerated filers
-                "ITEM_1C_CYBERSECURITY",              # Added in 2023, not required before
-                "ITEM_4_MINE_SAFETY_DISCLOSURES",     # Only for mining companies
-                "ITEM_5_MARKET",                      # Sometimes combined with Item 6
-                "ITEM_6_SELECTED_FINANCIAL_DATA",     # No longer required since 2021
-                "ITEM_9_DISAGREEMENTS",               # Only if there were disagreements
-                "ITEM_9B_OTHER_INFORMATION",          # Only if there is other information
-                "ITEM_9C_FOREIGN_JURISDICTIONS",      # Only for companies with foreign operations
-                "ITEM_12_SECURITY_OWNERSHIP",         # Sometimes combined with other sections
-                "ITEM_13_RELATIONSHIPS",              # Sometimes limited or combined
-                "ITEM_14_ACCOUNTANT_FEES",            # Sometimes combined with Item 9
-                "ITEM_15_EXHIBITS",                   # Made optional due to variation in reporting format
-                "ITEM_16_SUMMARY"                     # Optional summary
-            ]
+                    # Add readable name for custom elements
+                    if ":" in concept and not concept.startswith("us-gaap:"):
+                        # This is likely a custom taxonomy element
+                        concept_name = concept.split(":")[-1]
+                        # Make it more readable by converting camelCase to words
+                        readable_name = re.sub(r'([a-z])([A-Z])', r'\1 \2', concept_name).title()
+                        output.append(f"@COMMON_NAME: {readable_name}")
 
-            # Calculate coverage percentage based on 10-K sections
-            # Only consider the main items for 10-K (skipping subsections)
-            main_10k_sections = [s for s in priority_sections if s.startswith("ITEM_") and not s.endswith("_Q")]
-            found_10k_sections = [s for s in covered_sections if s.startswith("ITEM_") and not s.endswith("_Q")]
+                    output.append(f"@VALUE: {fact.get('value', '')}")
 
-            # Calculate required vs optional coverage
-            covered_required = [s for s in covered_sections if s in required_10k_sections]
-            covered_optional = [s for s in covered_sections if s in optional_10k_sections]
+                    # Include units and decimals
+                    if fact.get("unit_ref"):
+                        output.append(f"@UNIT_REF: {fact.get('unit_ref', '')}")
+                    if fact.get("decimals"):
+                        output.append(f"@DECIMALS: {fact.get('decimals', '')}")
 
-            if main_10k_sections:
-                # Calculate different coverage metrics
-                standard_coverage = (len(found_10k_sections) / len(main_10k_sections)) * 100
-                required_coverage = (len(covered_required) / len(required_10k_sections)) * 100
+                    # Use human-readable context labels
+                    # Note: context references can be either "context_ref" or "contextRef" (camelCase)
+                    context_ref = fact.get("context_ref", fact.get("contextRef", ""))
+                    if context_ref in context_map:
+                        output.append(f"@CONTEXT_REF: {context_ref} | @CONTEXT: {context_map[context_ref]}")
+                    else:
+                        output.append(f"@CONTEXT_REF: {context_ref}")
 
-                # Content-centric approach - focus on data completeness
-                # First, record the proportion of document content captured
-                raw_content = ""
-                if "raw_html_text_length" in filing_metadata:
-                    raw_content_length = filing_metadata["raw_html_text_length"]
-                    processed_content_length = len("\n".join(output))
+                    try:
+                        # First priority: Check context data from parsed XBRL
+                        context_data = parsed_xbrl.get("contexts", {}).get(context_ref, {})
+                        period_info = context_data.get("period", {})
 
-                    # Calculate text content coverage (more meaningful than section counting)
-                    # This accounts for whitespace differences and formatting
-                    text_coverage = min(100.0, (processed_content_length / max(1, raw_content_length)) * 100)
-                    # Store in data integrity metrics
-                    self.data_integrity["content_coverage"] = text_coverage
-                    output.append(f"Content Completeness: {text_coverage:.1f}% (by text volume)")
+                        if "startDate" in period_info and "endDate" in period_info:
+                            # This is a duration context from parsed data
+                            output.append(f"@DATE_TYPE: Duration")
+                            output.append(f"@START_DATE: {period_info['startDate']}")
+                            output.append(f"@END_DATE: {period_info['endDate']}")
+                        elif "instant" in period_info:
+                            # This is an instant context from parsed data
+                            output.append(f"@DATE_TYPE: Instant")
+                            output.append(f"@DATE: {period_info['instant']}")
+                        # Check for simple context IDs (c-1, c-2, etc.) used by NVDA 2025+
+                        elif re.match(r'^c-\d+$', context_ref):
+                            # Check if we have HTML-extracted context information
+                            if context_ref in self.context_mapping_from_html:
+                                html_period_info = self.context_mapping_from_html[context_ref]
+                                logging.info(f"Found HTML context info for {context_ref}: {html_period_info}")
 
-                    # If content coverage is very high but section coverage is lower, suggest potential causes
-                    if text_coverage > 95.0 and required_coverage < 95.0:
-                        output.append("Note: High content coverage with lower section coverage may indicate non-standard section formatting")
+                                if "startDate" in html_period_info and "endDate" in html_period_info:
+                                    # Duration context from HTML
+                                    output.append(f"@DATE_TYPE: Duration")
+                                    output.append(f"@START_DATE: {html_period_info['startDate']}")
+                                    output.append(f"@END_DATE: {html_period_info['endDate']}")
+                                elif "instant" in html_period_info:
+                                    # Instant context from HTML
+                                    output.append(f"@DATE_TYPE: Instant")
+                                    output.append(f"@DATE: {html_period_info['instant']}")
+                                else:
+                                    logging.warning(f"Context {context_ref} has HTML mapping but no dates: {html_period_info}")
+                            else:
+                                # Try to find the context in parsed_xbrl.contexts
+                                if context_ref in parsed_xbrl.get("contexts", {}):
+                                    context_data = parsed_xbrl["contexts"][context_ref]
+                                    period_info = context_data.get("period", {})
 
-                # Check for TOC-based actual sections
-                if "html_content" in filing_metadata and isinstance(filing_metadata["html_content"], dict) and "actual_sections" in filing_metadata["html_content"]:
-                    actual_sections = filing_metadata["html_content"]["actual_sections"]
+                                    if "startDate" in period_info and "endDate" in period_info:
+                                        # Duration context from parsed_xbrl
+                                        output.append(f"@DATE_TYPE: Duration")
+                                        output.append(f"@START_DATE: {period_info['startDate']}")
+                                        output.append(f"@END_DATE: {period_info['endDate']}")
+                                        logging.info(f"Used period info from parsed_xbrl for {context_ref}")
+                                    elif "instant" in period_info:
+                                        # Instant context from parsed_xbrl
+                                        output.append(f"@DATE_TYPE: Instant")
+                                        output.append(f"@DATE: {period_info['instant']}")
+                                        logging.info(f"Used period info from parsed_xbrl for {context_ref}")
+                                    else:
+                                        logging.warning(f"Context {context_ref} found in parsed_xbrl but has no dates: {period_info}")
+                                else:
+                                    logging.warning(f"Context {context_ref} not found in HTML context mapping or parsed_xbrl. Available contexts in HTML mapping: {len(self.context_mapping_from_html)}")
+                        else:
+                            # Second priority: Check for embedded dates in context_ref ID
 
-                    # Ensure actual_sections is treated as a list consistently
-                    actual_sections_list = actual_sections
-                    if isinstance(actual_sections, dict):
-                        # If it's a dictionary, use the keys as the section list
-                        actual_sections_list = list(actual_sections.keys())
+                            # Use the context format handler to extract period info from the context ID
+                            period_info = extract_period_info(context_ref)
 
-                    # Find the overlap between covered sections and actual sections
-                    actually_covered = [s for s in covered_sections if s in actual_sections_list]
-                    actually_missed = [s for s in actual_sections_list if s not in covered_sections]
-                    actual_coverage = (len(actually_covered) / len(actual_sections_list)) * 100 if actual_sections_list else 0
+                            if period_info:
+                                if "startDate" in period_info and "endDate" in period_info:
+                                    # Duration context
+                                    output.append(f"@DATE_TYPE: Duration")
+                                    output.append(f"@START_DATE: {period_info['startDate']}")
+                                    output.append(f"@END_DATE: {period_info['endDate']}")
+                                elif "instant" in period_info:
+                                    # Instant context
+                                    output.append(f"@DATE_TYPE: Instant")
+                                    output.append(f"@DATE: {period_info['instant']}")
+                    except Exception as e:
+                        # Catch any errors to prevent breaking the existing pipeline
+                        logging.warning(f"Error extracting date information from context: {context_ref}. Error: {str(e)}")
+                        # Continue processing without date information
 
-                    # Report section coverage (secondary metric)
-                    output.append(f"Document Structure Coverage: {actual_coverage:.1f}% ({len(actually_covered)}/{len(actual_sections_list)} TOC sections)")
+                    output.append("")
 
-                # Show standard metrics after the more informative ones
-                output.append(f"10-K Required Coverage: {required_coverage:.1f}% ({len(covered_required)}/{len(required_10k_sections)} required sections)")
-                output.append(f"10-K Standard Coverage: {standard_coverage:.1f}% ({len(found_10k_sections)}/{len(main_10k_sections)} standard sections)")
+        return output, integrity
 
-                # Show both metrics in a more readable way
-                output.append(f"Found Required: {len(covered_required)} of {len(required_10k_sections)} required sections")
-                if optional_10k_sections:
-                    output.append(f"Found Optional: {len(covered_optional)} of {len(optional_10k_sections)} optional sections")
+    def _format_context_reference_guide(self, parsed_xbrl, period_contexts, instant_contexts,
+                                        context_code_map, filing_type):
+        """
+        Produce the context reference guide, verification keys, context lists
+        and extraction example
 
-                # Show which sections were found (required first, then optional)
-                output.append("Required sections found: " + ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in covered_required]))
-                if covered_optional:
-                    output.append("Optional sections found: " + ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in covered_optional]))
+        Args:
+            parsed_xbrl: Parsed XBRL data
+            period_contexts: Duration contexts
+            instant_contexts: Instant contexts
+            context_code_map: Context ID to context code
+            filing_type: Type of filing (10-K, 10-Q)
 
-                # Show missing required sections (most important)
-                missing_required = [s for s in required_10k_sections if s not in covered_sections]
-                if missing_required:
-                    output.append(f"Missing required section(s): " +
-                                 ", ".join([s.replace("ITEM_", "Item ").replace("_", " ") for s in missing_required]))
+        Returns:
+            Tuple of (output lines, data integrity counts)
+        """
+        output = []
 
-                # Track alternative detection for improved metrics
-                alternative_detected = []
-                for section_id, section_info in document_sections.items():
-                    if section_info.get("detected_as") == "exhibits_alternative":
-                        alternative_detected.append(section_id)
+        # The guide numbers contexts P1, I1, ... for itself; the tables of the
+        # individual facts section keep the context codes
+        context_code_map = dict(context_code_map)
 
-                # Update data integrity metrics
-                self.data_integrity["sections_detected"] = len(document_sections)
-                self.data_integrity["sections_included"] = len(covered_sections)
-                self.data_integrity["alternative_sections_detected"] = len(alternative_detected)
+        # Add the @CONTEXT_REFERENCE_GUIDE section
+        output.append("@CONTEXT_REFERENCE_GUIDE")
+        output.append("This section provides a consolidated reference for all time periods used in this document.")
+        output.append("")
 
-                # Add explanatory note about section detection
-                output.append("Note: Companies may combine sections, use different formatting, or omit optional sections")
+        # Add Data Dictionary Header
+        output.append("@DATA_DICTIONARY:")
+        output.append("Context_Code | Semantic_Code | Category | Type | Segment | Period | Description")
+        output.append("------------|---------------|----------|------|---------|--------|------------")
 
-                # If alternative detection was used, add information about detection method
-                if alternative_detected:
-                    output.append(f"Note: {len(alternative_detected)} section(s) detected using alternative methods for non-standard formatting")
+        # Sort period contexts by date for better readability
+        period_contexts.sort(key=lambda x: x["start_date"])
+        instant_contexts.sort(key=lambda x: x["date"])
 
-        elif filing_type == "10-Q":
-            # Calculate coverage percentage based on 10-Q sections
-            main_10q_sections = [s for s in priority_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
-                "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
-            ])]
-            found_10q_sections = [s for s in covered_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
-                "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
-            ])]
+        # Add all contexts to the guide
 
-            if main_10q_sections:
-                coverage_pct = (len(found_10q_sections) / len(main_10q_sections)) * 100
-                output.append(f"10-Q Coverage: {coverage_pct:.1f}% of standard sections found")
+        # Extract context information directly from context IDs if we have facts but no contexts
+        if not period_contexts and not instant_contexts and parsed_xbrl.get("facts"):
+            # Extract unique context IDs from facts
+            context_refs = set()
+            for fact in parsed_xbrl.get("facts", []):
+                context_ref = fact.get("context_ref", fact.get("contextRef", ""))
+                if context_ref:
+                    context_refs.add(context_ref)
 
-                # Items found
-                output.append(f"Found {len(found_10q_sections)} of {len(main_10q_sections)} standard 10-Q sections:")
-                output.append(", ".join([s.replace("ITEM_", "Item ").replace("_Q", "").replace("_", " ") for s in found_10q_sections]))
+            # Try to extract dates from context IDs
+            for i, context_ref in enumerate(sorted(context_refs)):
+                # Use the context format handler to extract period info
+                period_info = extract_period_info(context_ref)
 
-                # Items not found (might be absent in the original document)
-                if missing_sections:
-                    missing_10q = [s for s in missing_sections if s.startswith("ITEM_") and (s.endswith("_Q") or s in [
-                        "ITEM_1_FINANCIAL_STATEMENTS", "ITEM_2_MD_AND_A", "ITEM_3_MARKET_RISK", "ITEM_4_CONTROLS"
-                    ])]
-                    if missing_10q:
-                        output.append(f"Missing {len(missing_10q)} section(s):")
-                        output.append(", ".join([s.replace("ITEM_", "Item ").replace("_Q", "").replace("_", " ") for s in missing_10q]))
-                        output.append("Note: Missing sections may not exist in the original document")
+                if period_info:
+                    if "startDate" in period_info and "endDate" in period_info:
+                        # Duration context
+                        code = f"P{i+1}"
+                        context_code_map[context_ref] = code
 
-        output.append("")
+                        formatted_start = period_info["startDate"]
+                        formatted_end = period_info["endDate"]
 
-        # Enhanced Context Reference Guide and Data Dictionary
-        # This entire section was moved to earlier in the file
-        # to properly populate the context reference guide
+                        semantic_code = f"Duration_{formatted_start}_{formatted_end}"
+                        category = self._get_fiscal_category(formatted_start, formatted_end, filing_type)
 
-        # The verification section is now added independently
-        output.append("@VERIFICATION_KEYS:")
-        output.append("These formulas can be used to verify data consistency:")
+                        # Add to output
+                        output.append(f"{code} | {semantic_code} | {category} | Duration | Consolidated | {formatted_start} to {formatted_end} | Period from {formatted_start} to {formatted_end}")
 
-        # Only add verification formulas if we have context information
-        if context_reference_guide:
-            # Sort the context labels by year and period
-            sorted_labels = sorted(context_reference_guide.keys())
+                    elif "instant" in period_info:
+                        # Instant context
+                        code = f"I{i+1}"
+                        context_code_map[context_ref] = code
 
-            # Group contexts by year for formula creation
-            years = {}
-            for label in sorted_labels:
-                info = context_reference_guide[label]
-                if "category" in info:
-                    category = info["category"]
-                    if "_" in category:
-                        year = category.split("_")[1]
-                        if year not in years:
-                            years[year] = []
-                        years[year].append((info["code"], label))
+                        formatted_date = period_info["instant"]
 
-            # Create verification formulas by year
-            for year, contexts in years.items():
-                if contexts:
-                    codes = [code for code, _ in contexts]
+                        semantic_code = f"Instant_{formatted_date}"
+                        category = self._get_fiscal_category(formatted_date, formatted_date, filing_type)
+
+                        # Add to output
+                        output.append(f"{code} | {semantic_code} | {category} | Instant | Consolidated | {formatted_date} | As of {formatted_date}")
+
+        elif period_contexts or instant_contexts:
+            for i, context in enumerate(period_contexts):
+                code = f"P{i+1}"
+                context_code_map[context["context_id"]] = code
+                semantic_code = f"Duration_{context['start_date']}_{context['end_date']}"
+                # Get fiscal year/quarter info if available
+                category = self._get_fiscal_category(context["start_date"], context["end_date"], filing_type)
+                output.append(f"{code} | {semantic_code} | {category} | Duration | {context['segment']} | {context['start_date']} to {context['end_date']} | {context['description']}")
 
-                    # Get the semantic codes too for clarity
-                    semantic_codes = []
-                    for code, _ in contexts:
-                        for _, info in context_reference_guide.items():
-                            if info.get("code") == code and "semantic_code" in info:
-                                semantic_codes.append(info["semantic_code"])
-                                break
+            for i, context in enumerate(instant_contexts):
+                code = f"I{i+1}"
+                context_code_map[context["context_id"]] = code
+                semantic_code = f"Instant_{context['date']}"
+                # Get fiscal period info if available
+                category = self._get_fiscal_category(context["date"], context["date"], filing_type)
+                output.append(f"{code} | {semantic_code} | {category} | Instant | {context['segment']} | {context['date']} | {context['description']}")
+        else:
+            output.append("Note: No detailed context information available for this filing")
 
-                    # Show formulas with both short codes and semantic codes
-                    context_ref = f"contexts: {', '.join(codes)}"
-                    if semantic_codes:
-                        context_ref += f" ({', '.join(semantic_codes)})"
+        output.append("")
 
-                    output.append(f"- Revenue_{year} = Product_Revenue_{year} + Service_Revenue_{year} ({context_ref})")
-                    output.append(f"- Gross_Profit_{year} = Revenue_{year} - Cost_of_Revenue_{year} ({context_ref})")
-                    output.append(f"- Operating_Income_{year} = Gross_Profit_{year} - Operating_Expenses_{year} ({context_ref})")
+        # Add Verification Keys section
+        output.append("@VERIFICATION_KEYS:")
+        output.append("These formulas can be used to verify data consistency:")
+        if period_contexts or instant_contexts:
+            # This is where you could add formulas that help verify data consistency
+            output.append("- Current Assets + Non-Current Assets = Total Assets")
+            output.append("- Current Liabilities + Non-Current Liabilities + Equity = Total Liabilities and Equity")
+            output.append("- Gross Profit = Revenue - Cost of Revenue")
+            output.append("- Net Income = Revenue - Expenses + Other Income/Expenses - Taxes")
         else:
             output.append("- No context information available for formula verification")
 
         output.append("")
 
-        # First list period contexts (fiscal years, quarters)
+        # Add Period Contexts section
         output.append("@PERIOD_CONTEXTS")
-        if context_reference_guide:
-            sorted_labels = sorted(context_reference_guide.keys())
-            period_labels = [label for label in sorted_labels if context_reference_guide[label]["type"] == "period"]
-            if period_labels:
-                for label in period_labels:
-                    context_info = context_reference_guide[label]
-                    code = context_info.get('code', "Unknown")
-                    semantic_code = context_info.get('semantic_code', code)
-                    segment = context_info.get('segment', 'Consolidated')
-
-                    # Create a more descriptive entry with all available information
-                    output.append(f"- {label}: {context_info['description']} (code: {code}, semantic: {semantic_code}, segment: {segment})")
-            else:
-                output.append("No period contexts found in this filing")
+        if period_contexts:
+            for context in period_contexts:
+                output.append(f"{context_code_map[context['context_id']]}: {context['description']}")
+                if context['segment']:
+                    output.append(f"  Segment: {context['segment']}")
         else:
             output.append("No detailed period context information available")
+
         output.append("")
 
-        # Then list instant contexts (balance sheet dates)
+        # Add Instant Contexts section
         output.append("@INSTANT_CONTEXTS")
-        if context_reference_guide:
-            sorted_labels = sorted(context_reference_guide.keys())
-            instant_labels = [label for label in sorted_labels if context_reference_guide[label]["type"] == "instant"]
-            if instant_labels:
-                for label in instant_labels:
-                    context_info = context_reference_guide[label]
-                    code = context_info.get('code', "Unknown")
-                    semantic_code = context_info.get('semantic_code', code)
-                    segment = context_info.get('segment', 'Consolidated')
-                    statement_type = context_info.get('statement_type', 'Unknown')
-
-                    # Create a more descriptive entry with all available information
-                    output.append(f"- {label}: {context_info['description']} (code: {code}, semantic: {semantic_code}, segment: {segment}, statement: {statement_type})")
-            else:
-                output.append("No instant contexts found in this filing")
+        if instant_contexts:
+            for context in instant_contexts:
+                output.append(f"{context_code_map[context['context_id']]}: {context['description']}")
+                if context['segment']:
+                    output.append(f"  Segment: {context['segment']}")
         else:
             output.append("No detailed instant context information available")
-        output.append("")
 
-        # Add a mapping of fiscal periods to calendar periods if fiscal year info is available
-        if fiscal_year and fiscal_period:
-            output.append("@FISCAL_CALENDAR_MAPPING")
-            output.append(f"- Fiscal Year {fiscal_year} corresponds to filing period ending {period_end}")
-            if fiscal_period in ["Q1", "Q2", "Q3", "Q4"]:
-                output.append(f"- {fiscal_period} is a quarterly period within Fiscal Year {fiscal_year}")
-            elif fiscal_period == "annual":
-                output.append(f"- This document represents the annual (10-K) filing for Fiscal Year {fiscal_year}")
-            output.append("")
+        output.append("")
 
-        # Add example extraction section
+        # Add Example Extraction section
         output.append("@EXAMPLE_EXTRACTION")
         output.append("Example of how to extract and format data from this document:")
-        output.append("")
-        output.append("```python")
-        output.append("# Extract revenue information for specific period with hierarchy awareness")
-        output.append("def extract_revenue(document, context_code):")
-        output.append("    # Find the Revenue section")
-        output.append("    revenue_section = find_section(document, '<Revenue>')")
-        output.append("    ")
-        output.append("    # Extract all line items with their context codes")
-        output.append("    revenue_data = {}")
-        output.append("    totals = {}")
-        output.append("    parent_child_map = {}")
-        output.append("    ")
-        output.append("    # First pass: collect all items and identify parent-child relationships")
-        output.append("    for line in revenue_section:")
-        output.append("        if context_code in line.split('|')[1].strip():")
-        output.append("            columns = line.split('|')")
-        output.append("            raw_item_name = columns[0].strip()")
-        output.append("            ")
-        output.append("            # Parse hierarchy information")
-        output.append("            if raw_item_name.startswith('@TOTAL:'):")
-        output.append("                # This is a total item")
-        output.append("                item_name = raw_item_name.replace('@TOTAL:', '').strip()")
-        output.append("                is_total = True")
-        output.append("                level = 0  # Top level")
-        output.append("            elif raw_item_name.startswith('@SUBTOTAL:'):")
-        output.append("                # This is a subtotal item")
-        output.append("                item_name = raw_item_name.replace('@SUBTOTAL:', '').strip()")
-        output.append("                is_total = True")
-        output.append("                level = 1  # Mid level")
-        output.append("            elif '@CHILD_OF:' in raw_item_name:")
-        output.append("                # This is a child item, extract its parent")
-        output.append("                parts = raw_item_name.split('@CHILD_OF:')")
-        output.append("                item_name = parts[0].replace('↳', '').strip()")
-        output.append("                parent_name = parts[1].strip()")
-        output.append("                parent_child_map[item_name] = parent_name")
-        output.append("                is_total = False")
-        output.append("                level = 2  # Child level")
-        output.append("            else:")
-        output.append("                # Regular item")
-        output.append("                item_name = raw_item_name.strip()")
-        output.append("                is_total = False")
-        output.append("                level = 1  # Base level")
-        output.append("            ")
-        output.append("            # Find the value corresponding to the context code")
-        output.append("            value = get_value_for_context(columns, context_code)")
-        output.append("            ")
-        output.append("            # Store with hierarchy information")
-        output.append("            if is_total:")
-        output.append("                totals[item_name] = {")
-        output.append("                    'value': value,")
-        output.append("                    'level': level,")
-        output.append("                    'components': []  # Will be filled in second pass")
-        output.append("                }")
-        output.append("            else:")
-        output.append("                revenue_data[item_name] = {")
-        output.append("                    'value': value,")
-        output.append("                    'level': level,")
-        output.append("                    'parent': parent_child_map.get(item_name)")
-        output.append("                }")
-        output.append("    ")
-        output.append("    # Second pass: associate children with their parent totals")
-        output.append("    for item_name, item_data in revenue_data.items():")
-        output.append("        parent = item_data.get('parent')")
-        output.append("        if parent and parent in totals:")
-        output.append("            totals[parent]['components'].append(item_name)")
-        output.append("    ")
-        output.append("    # Combine the data structures")
-        output.append("    result = {")
-        output.append("        'line_items': revenue_data,")
-        output.append("        'totals': totals,")
-        output.append("        # Include verification formulas")
-        output.append("        'verify': {")
-        output.append("            'sum_components': 'Sum of all components should equal the total',")
-        output.append("            'formula': 'Total_Revenue = Product_Revenue + Service_Revenue + Other_Revenue'")
-        output.append("        }")
-        output.append("    }")
-        output.append("    return result")
-        output.append("```")
-        output.append("")
+        if period_contexts or instant_contexts:
+            output.append("```")
+            output.append("// Example of extracting Revenue for the most recent period")
+            output.append("const revenue = extractData('Revenue', 'FY2023');")
+            output.append("```")
+        else:
+            output.append("No context examples available")
 
-        output.append("Example hierarchical data format for extraction:")
-        output.append("")
-        output.append("```json")
-        output.append("{")
-        output.append("  \"line_items\": {")
-        output.append("    \"Product_Revenue\": {")
-        output.append("      \"value\": 72480,")
-        output.append("      \"level\": 1,")
-        output.append("      \"parent\": \"Total_Revenue\"")
-        output.append("    },")
-        output.append("    \"Service_Revenue\": {")
-        output.append("      \"value\": 16320,")
-        output.append("      \"level\": 1,")
-        output.append("      \"parent\": \"Total_Revenue\"")
-        output.append("    },")
-        output.append("    \"Automotive_Revenue\": {")
-        output.append("      \"value\": 52300,")
-        output.append("      \"level\": 2,")
-        output.append("      \"parent\": \"Product_Revenue\"")
-        output.append("    },")
-        output.append("    \"Energy_Revenue\": {")
-        output.append("      \"value\": 20180,")
-        output.append("      \"level\": 2,")
-        output.append("      \"parent\": \"Product_Revenue\"")
-        output.append("    }")
-        output.append("  },")
-        output.append("  \"totals\": {")
-        output.append("    \"Total_Revenue\": {")
-        output.append("      \"value\": 88800,")
-        output.append("      \"level\": 0,")
-        output.append("      \"components\": [\"Product_Revenue\", \"Service_Revenue\"],")
-        output.append("      \"contexts\": {")
-        output.append("        \"c-1\": 88800,           // Using short code")
-        output.append("        \"FY2023\": 88800,        // Using semantic code")
-        output.append("        \"Consolidated_2023\": 88800  // Using segment information")
-        output.append("      }")
-        output.append("    },")
-        output.append("    \"Product_Revenue\": {")
-        output.append("      \"value\": 72480,")
-        output.append("      \"level\": 1,")
-        output.append("      \"components\": [\"Automotive_Revenue\", \"Energy_Revenue\"]")
-        output.append("    }")
-        output.append("  },")
-        output.append("  \"verify\": {")
-        output.append("    \"equations\": [")
-        output.append("      \"Total_Revenue = Product_Revenue + Service_Revenue\",")
-        output.append("      \"Product_Revenue = Automotive_Revenue + Energy_Revenue\"")
-        output.append("    ],")
-        output.append("    \"verified\": true")
-        output.append("  },")
-        output.append("  \"metadata\": {")
-        output.append("    \"statement_type\": \"Income_Statement\",")
-        output.append("    \"period\": \"FY2023\",")
-        output.append("    \"hierarchical\": true")
-        output.append("  }")
-        output.append("}")
-        output.append("```")
-        output.append("")
-        output.append("Note: This hierarchical structure makes parent-child relationships explicit, enabling accurate calculation and validation of totals. The hierarchy levels indicate:")
-        output.append("- Level 0: Main totals (like Total Revenue)")
-        output.append("- Level 1: Major categories (like Product Revenue)")
-        output.append("- Level 2: Subcategories (like Automotive Revenue)")
         output.append("")
-        output.append("You can use either the numeric short codes (c-1, c-2) or the semantic codes (FY2023, BS_2023_12_31) to access context values. The semantic codes are more descriptive and self-explanatory.")
 
-        return "\n".join(output)
+        return output, new_integrity_counts()
 
     def _get_segment_info(self, context):
         """Extract segment information from context in a readable format."""
@@ -2710,13 +2967,14 @@ class LLMFormatter:
             logging.info(f"Adding normalized financial statements to {output_path}")
             try:
                 normalized_mapper = NormalizedFinancialMapper()
-                # Use a more conservative approach for 10-K filings
-                if is_10k:
-                    logging.info("Using conservative mapping for 10-K filing to prevent recursion errors")
-                    # Skip complex mapping operations for 10-K filings
-                    llm_content = normalized_mapper.map_facts_to_financial_statements(llm_content, max_depth=2, max_children=5)
-                else:
-                    llm_content = normalized_mapper.map_facts_to_financial_statements(llm_content)
+                with span("normalized_statements"):
+                    # Use a more conservative approach for 10-K filings
+                    if is_10k:
+                        logging.info("Using conservative mapping for 10-K filing to prevent recursion errors")
+                        # Skip complex mapping operations for 10-K filings
+                        llm_content = normalized_mapper.map_facts_to_financial_statements(llm_content, max_depth=2, max_children=5)
+                    else:
+                        llm_content = normalized_mapper.map_facts_to_financial_statements(llm_content)
             except RecursionError as re:
                 logging.warning(f"Recursion error during financial statement mapping: {str(re)}")
                 logging.info("Proceeding with original content without financial statement mapping")
@@ -2726,9 +2984,17 @@ class LLMFormatter:
 
             # Optimize file size
             logging.info(f"Optimizing file size for {output_path}")
+            text_blocks = None
             try:
-                optimizer = FileSizeOptimizer()
-                optimized_content = optimizer.optimize(llm_content)
+                text_block_store = TextBlockStore() if TEXT_BLOCK_STORE.get("enabled", False) else None
+                optimizer = FileSizeOptimizer(
+                    text_block_store=text_block_store,
+                    ticker=filing_metadata.get('ticker'),
+                    filing_id=filing_metadata.get('accession_number') or os.path.basename(output_path)
+                )
+                with span("size_optimization"):
+                    optimized_content = optimizer.optimize(llm_content)
+                text_blocks = optimizer.text_block_result
 
                 # Calculate size reduction
                 optimized_size = len(optimized_content.encode('utf-8'))
@@ -2745,13 +3011,48 @@ class LLMFormatter:
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(optimized_content)
 
+            # Byte offsets of the sections, so readers can fetch one section
+            section_index = None
+            if LLM_FORMATTING.get("section_index", True):
+                try:
+                    with span("section_index"):
+                        section_index = write_section_index(optimized_content, output_path)
+                except Exception as e:
+                    logging.warning(f"Error writing section index: {str(e)}")
+
+            # Section-aligned chunks within a token budget, with a manifest
+            chunk_manifest = None
+            if LLM_CHUNKING.get("enabled", False):
+                try:
+                    with span("llm_chunks"):
+                        chunk_manifest = write_llm_chunks(optimized_content, output_path, LLM_CHUNKING.get("max_tokens", 32000))
+                except Exception as e:
+                    logging.warning(f"Error writing LLM chunks: {str(e)}")
+
+            # Only the new or changed lines against the company's previous filing
+            llm_delta = None
+            if LLM_DELTA.get("enabled", False):
+                try:
+                    with span("llm_delta"):
+                        llm_delta = write_llm_delta(output_path)
+                except Exception as e:
+                    logging.warning(f"Error writing LLM delta: {str(e)}")
+
             return {
                 "success": True,
                 "path": output_path,
                 "size": os.path.getsize(output_path),
                 "original_size": original_size,
                 "optimized_size": optimized_size,
-                "size_reduction_percent": size_reduction
+                "size_reduction_percent": size_reduction,
+                "section_index_path": section_index,
+                "chunk_manifest_path": chunk_manifest,
+                "delta_path": llm_delta,
+                "text_blocks": {
+                    "referenced": len(text_blocks["referenced"]),
+                    "stored": len(text_blocks["stored"]),
+                    "bytes_saved": text_blocks["bytes_saved"]
+                } if text_blocks else None
             }
         except Exception as e:
             logging.error(f"Error saving LLM format: {str(e)}")
@@ -12,6 +12,7 @@ from typing import Dict, List, Any, Set, Optional, Tuple
 from collections import defaultdict
 from .financial_validator import FinancialValidator
 from .xbrl_hierarchy import XBRLHierarchyExtractor
+from .fact_table import read_fact_table
 
 class NormalizedFinancialMapper:
     """
@@ -90,6 +91,19 @@ class NormalizedFinancialMapper:
         """
         facts = []
 
+        # Compact files have every fact in the fact table
+        fact_table = read_fact_table(content)
+        if fact_table is not None:
+            for fact in fact_table["facts"].values():
+                facts.append({
+                    'concept': fact['concept'],
+                    'value': fact['value'],
+                    'context_ref': fact['context_ref'],
+                    'unit': fact['unit_ref']
+                })
+            self.logger.info(f"Read {len(facts)} facts from @FACT_TABLE")
+            return facts
+
         # Look for @FACTS section
         facts_match = re.search(r'@FACTS.*?(?=\n\n@SECTION:|\n\n@NARRATIVE_TEXT:|\Z)', content, re.DOTALL)
         if facts_match:
@@ -431,6 +445,14 @@ class NormalizedFinancialMapper:
         """
         raw_facts = []
 
+        # Compact files have no concept blocks, only the fact table
+        fact_table = read_fact_table(content)
+        if fact_table is not None:
+            return [
+                {'name': fact['concept'], 'value': fact['value'], 'contextRef': fact['context_ref']}
+                for fact in fact_table["facts"].values()
+            ]
+
         # Extract @CONCEPT blocks
         concept_blocks = re.finditer(r'@CONCEPT: ([^\n]+)\n@VALUE: ([^\n]+)\n@UNIT_REF: ([^\n]+)\n@CONTEXT_REF: ([^\n|]+)(?:\|@CONTEXT: ([^\n]+))?\n@DATE_TYPE: ([^\n]+)(?:\n@(?:DATE|START_DATE): ([^\n]+))?(?:\n@END_DATE: ([^\n]+))?', content)
 
@@ -0,0 +1,280 @@
+"""
+Section Index Module
+
+Byte-offset index of a saved LLM file, written next to it by
+save_llm_format (AAPL_10-K_2024_llm.txt -> AAPL_10-K_2024_llm.idx.json,
+llm.txt -> llm.idx.json in GCS). Readers look a section up in the index and
+read only its bytes, with mmap locally or a range read in GCS, instead of
+scanning the whole file.
+
+Indexed spans (offsets and lengths in bytes of the UTF-8 file):
+
+- sections: named sections (@SEC:/@SECTION:, @STATEMENT:, @FS:/
+  @FINANCIAL_STATEMENT:), each up to the next section or block, and the
+  top-level blocks (@DD_CONTEXTS, @FACTS_SECTION, ...), each up to the next
+  block, in file order. Names may repeat (e.g. "Other" in several statements).
+- context_dictionary: the @DD_CONTEXTS block of the file size optimizer
+- fact_table: the fact table of compact files, with its unit and context
+  dictionaries and rows
+
+Spans are read with the text of the text block store put back (see
+text_block_store.py), as the offsets are those of the file as written.
+"""
+
+import os
+import re
+import json
+import mmap
+import logging
+
+from .text_block_store import REFERENCE_PREFIX, TextBlockStore, rehydrate_text_blocks
+
+SECTION_INDEX_VERSION = 1
+
+# Top-level blocks of LLM files; other bare @MARKER lines are part of a block
+BLOCK_MARKERS = {
+    "TEXT_BLOCKS", "DD_CONTEXTS", "NORMALIZED_FINANCIAL_DATA", "UNITS_AND_SCALING",
+    "FINANCIAL_STATEMENTS_SECTION", "FACTS_SECTION", "INDIVIDUAL_FACTS_SECTION",
+    "CONCEPT_BLOCKS", "FACT_TABLE", "CONTEXT_REFERENCE_GUIDE", "DATA_INTEGRITY_REPORT",
+    "DOCUMENT_COVERAGE", "FISCAL_CALENDAR_MAPPING"
+}
+
+# Header lines: named sections, the document metadata header and bare markers
+_HEADER_PATTERN = re.compile(
+    rb'^@(?:(SEC|SECTION|STATEMENT|FS|FINANCIAL_STATEMENT): ?([^\n]*)|(DOCUMENT): [^\n]*|([A-Z_]+))$',
+    re.MULTILINE
+)
+_FACT_TABLE_PARTS = {b"@FACT_UNITS": "units", b"@FACT_CONTEXTS": "contexts"}
+
+
+def section_index_path(llm_path):
+    """
+    Path of the section index of an LLM file (local path or GCS object name)
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        Path of the index, as a string
+    """
+    llm_path = str(llm_path)
+    base = llm_path[:-len(".txt")] if llm_path.endswith(".txt") else llm_path
+    return f"{base}.idx.json"
+
+
+def _span(start, end):
+    return {"offset": start, "length": end - start}
+
+
+def _index_fact_table(data, start):
+    """Spans of the fact table starting at the given offset."""
+    end_marker = data.find(b"\n@END_FACT_TABLE", start)
+    end = len(data) if end_marker < 0 else data.find(b"\n", end_marker + 1)
+    end = len(data) if end < 0 else end + 1
+
+    fact_table = _span(start, end)
+    parts = []
+    position = start
+    while position < end:
+        line_end = data.find(b"\n", position, end)
+        line_end = end if line_end < 0 else line_end
+        line = data[position:line_end]
+        if line in _FACT_TABLE_PARTS or line.startswith(b"@FACT_COLUMNS") or line.startswith(b"@END_FACT_TABLE"):
+            parts.append((line, position, line_end + 1))
+        position = line_end + 1
+
+    # Each part runs from the line after its marker to the next marker
+    for (marker, _, body_start), following in zip(parts, parts[1:]):
+        span = _span(body_start, following[1])
+        if marker in _FACT_TABLE_PARTS:
+            fact_table[_FACT_TABLE_PARTS[marker]] = span
+        elif marker.startswith(b"@FACT_COLUMNS"):
+            span["count"] = data.count(b"\n", body_start, following[1])
+            fact_table["rows"] = span
+
+    return fact_table, end
+
+
+def build_section_index(content):
+    """
+    Build the section index of LLM file content
+
+    Args:
+        content: Content of the LLM file, as written
+
+    Returns:
+        Dictionary with version, file_size, sections, context_dictionary and
+        fact_table (None when absent)
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+
+    sections = []
+    fact_table = None
+    open_section = None
+    open_block = None
+    skip_until = 0
+
+    def close(entry, end):
+        if entry is not None:
+            entry["length"] = end - entry["offset"]
+
+    for match in _HEADER_PATTERN.finditer(data):
+        start = match.start()
+        if start < skip_until:
+            continue
+
+        named_tag, name, document, marker = match.groups()
+        if named_tag:
+            close(open_section, start)
+            open_section = {"tag": named_tag.decode(), "name": name.decode('utf-8').strip(), "offset": start}
+            sections.append(open_section)
+            continue
+
+        marker = (document or marker).decode()
+        if marker != "DOCUMENT" and marker not in BLOCK_MARKERS:
+            continue
+
+        close(open_section, start)
+        close(open_block, start)
+        open_section = None
+        open_block = {"tag": marker, "name": marker, "offset": start}
+        sections.append(open_block)
+
+        if marker == "FACT_TABLE":
+            fact_table, skip_until = _index_fact_table(data, start)
+
+    close(open_section, len(data))
+    close(open_block, len(data))
+
+    context_dictionary = next(
+        ({"offset": entry["offset"], "length": entry["length"]} for entry in sections if entry["tag"] == "DD_CONTEXTS"),
+        None
+    )
+
+    return {
+        "version": SECTION_INDEX_VERSION,
+        "file_size": len(data),
+        "sections": sections,
+        "context_dictionary": context_dictionary,
+        "fact_table": fact_table
+    }
+
+
+def write_section_index(content, llm_path):
+    """
+    Write the section index of an LLM file next to it
+
+    Args:
+        content: Content of the LLM file, as written
+        llm_path: Path of the LLM file
+
+    Returns:
+        Path of the index
+    """
+    index = build_section_index(content)
+    index_path = section_index_path(llm_path)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def load_section_index(llm_path):
+    """
+    Load the section index of an LLM file
+
+    Args:
+        llm_path: Path of the LLM file
+
+    Returns:
+        The index, or None if it is missing, unreadable or does not match
+        the size of the file
+    """
+    index_path = section_index_path(llm_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read section index {index_path}: {str(e)}")
+        return None
+
+    if index.get("version") != SECTION_INDEX_VERSION or index.get("file_size") != os.path.getsize(llm_path):
+        logging.info(f"Ignoring stale section index {index_path}")
+        return None
+    return index
+
+
+def find_sections(index, name, tag=None):
+    """
+    Sections of an index with the given name
+
+    Args:
+        index: Section index
+        name: Section name (e.g. "BALANCE_SHEET", "ITEM_7_MD_AND_A", "DD_CONTEXTS")
+        tag: Only sections with this tag (e.g. "SEC", "STATEMENT") (optional)
+
+    Returns:
+        List of section entries in file order
+    """
+    return [
+        entry for entry in index.get("sections", [])
+        if entry["name"] == name and (tag is None or entry["tag"] == tag)
+    ]
+
+
+def read_spans(llm_path, spans, store=None):
+    """
+    Read byte spans of an LLM file through a memory map
+
+    Args:
+        llm_path: Path of the LLM file
+        spans: Entries with offset and length
+        store: TextBlockStore the file's text block references are read from
+            (default: the configured store, opened only if a span has references)
+
+    Returns:
+        List of decoded span contents, with stored text blocks put back
+
+    Raises:
+        KeyError: If a referenced text block is not in the store
+    """
+    with open(llm_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ["" for _ in spans]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            texts = [
+                data[span["offset"]:span["offset"] + span["length"]].decode('utf-8')
+                for span in spans
+            ]
+
+    if any(REFERENCE_PREFIX in text for text in texts):
+        store = store or TextBlockStore()
+        texts = [rehydrate_text_blocks(text, store) for text in texts]
+    return texts
+
+
+def read_section(llm_path, name, tag=None, index=None):
+    """
+    Read one section of an LLM file through its section index
+
+    Args:
+        llm_path: Path of the LLM file
+        name: Section name
+        tag: Section tag (optional)
+        index: Section index, loaded if not given (optional)
+
+    Returns:
+        Content of the first section with the name, or None if the file has
+        no usable index or no such section
+    """
+    if index is None:
+        index = load_section_index(llm_path)
+    if index is None:
+        return None
+    entries = find_sections(index, name, tag)
+    if not entries:
+        return None
+    return read_spans(llm_path, entries[:1])[0]
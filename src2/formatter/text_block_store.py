@@ -0,0 +1,389 @@
+"""
+Text Block Store Module
+
+Content-addressed store of the narrative and policy text of LLM files, shared
+across filings (TEXT_BLOCK_STORE in config). Accounting policies, risk
+factors and boilerplate repeat nearly verbatim across a company's quarters
+and years; FileSizeOptimizer._deduplicate_text_blocks only removes repeats
+within one document.
+
+With the store enabled, the optimizer stores the text of each narrative line
+(@NT:, @POLICY_TEXT:, @TEXT_REF:, the @TITLE:/@TEXT: lines of @TEXT_BLOCKS,
+and the @VALUE: lines of text block facts, which hold the accounting
+policies) under its content hash. Text already stored by an earlier
+filing is written as a reference instead:
+
+    @TEXT_REF: @STORED:3f9a0c...|tb-2
+
+Text seen for the first time stays inline, so the first filing holding a
+block is complete on its own; its repeats within the filing are references.
+The store records the first filing of each block, so reprocessing that
+filing writes the same file again. Scope "company" references only blocks the
+same ticker stored before; "global" references blocks of any company.
+
+rehydrate_text_blocks / rehydrate_llm_file put the stored text back, giving
+the document as it would have been written without the store. In GCS the
+blocks referenced by uploaded files are kept once each, as
+text_blocks/<key>.txt (GCPStorage.read_llm_file rehydrates from them).
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from ..config import TEXT_BLOCK_STORE, PROCESSED_DATA_DIR
+
+# Seconds to wait for another writer to release the store lock
+BUSY_TIMEOUT = 30.0
+
+# Hex digits of the SHA-256 content hash used as block key
+KEY_LENGTH = 32
+
+# GCS prefix of the referenced blocks
+GCS_TEXT_BLOCK_PREFIX = "text_blocks"
+
+REFERENCE_PREFIX = "@STORED:"
+REFERENCE_PATTERN = re.compile(re.escape(REFERENCE_PREFIX) + rf'([0-9a-f]{{{KEY_LENGTH}}})')
+
+# Narrative lines: tag and text (only text of at least min_chars is stored,
+# so short fact values stay inline)
+NARRATIVE_LINE_PATTERN = re.compile(
+    r'^(@(?:NT|NARRATIVE_TEXT|POLICY_TEXT|TEXT_REF|VALUE): |tb-\d+\|@TITLE: | +@TEXT: )(.+)$',
+    re.MULTILINE
+)
+
+# In-document block ID ending @TEXT_REF lines, kept out of the stored text
+BLOCK_ID_SUFFIX = re.compile(r'\|tb-\d+$')
+
+
+def block_key(text):
+    """
+    Content hash identifying a text block
+
+    Args:
+        text: Block text
+
+    Returns:
+        Hex digest of KEY_LENGTH characters
+    """
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()[:KEY_LENGTH]
+
+
+def text_block_object_name(key):
+    """
+    GCS object name of a stored block
+
+    Args:
+        key: Block key
+
+    Returns:
+        Object name under GCS_TEXT_BLOCK_PREFIX
+    """
+    return f"{GCS_TEXT_BLOCK_PREFIX}/{key}.txt"
+
+
+class TextBlockStore:
+    """
+    SQLite store of text blocks keyed by content hash, with the companies
+    whose filings hold each block and the first filing that stored it
+    (overall and per company).
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Open (and create if needed) a text block store.
+
+        Args:
+            db_path: Path to the SQLite database file (default:
+                TEXT_BLOCK_STORE["store_path"], or text_blocks.sqlite under
+                the processed data directory)
+        """
+        db_path = db_path or TEXT_BLOCK_STORE.get("store_path") or os.path.join(PROCESSED_DATA_DIR, "text_blocks.sqlite")
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+            "first_filing TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS company_blocks ("
+            "ticker TEXT NOT NULL, key TEXT NOT NULL, first_filing TEXT, PRIMARY KEY (ticker, key)) WITHOUT ROWID"
+        )
+        # Stores created before the first filing was recorded per company
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(company_blocks)")]
+        if "first_filing" not in columns:
+            conn.execute("ALTER TABLE company_blocks ADD COLUMN first_filing TEXT")
+
+    def _connection(self):
+        """Get this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def stored_keys(self, keys, ticker=None):
+        """
+        Keys that are stored
+
+        Args:
+            keys: Block keys
+            ticker: Only count blocks stored for this company (optional)
+
+        Returns:
+            Set of the keys that are stored (for the company, if given)
+        """
+        return set(self.first_filings(keys, ticker=ticker))
+
+    def first_filings(self, keys, ticker=None):
+        """
+        First filing that stored each stored block
+
+        Args:
+            keys: Block keys
+            ticker: Only count blocks stored for this company, and give the
+                company's first filing holding each (optional)
+
+        Returns:
+            Dict of key to filing identifier (None if it was not recorded)
+            for the keys that are stored (for the company, if given)
+        """
+        found = {}
+        keys = list(keys)
+        conn = self._connection()
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            if ticker:
+                rows = conn.execute(
+                    f"SELECT key, first_filing FROM company_blocks WHERE ticker = ? AND key IN ({placeholders})",
+                    [ticker] + batch
+                )
+            else:
+                rows = conn.execute(f"SELECT key, first_filing FROM blocks WHERE key IN ({placeholders})", batch)
+            found.update(rows)
+        return found
+
+    def get_many(self, keys):
+        """
+        Look up stored blocks.
+
+        Args:
+            keys: Block keys
+
+        Returns:
+            Dict of key to block text for the keys that are stored
+        """
+        found = {}
+        keys = list(keys)
+        conn = self._connection()
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(
+                f"SELECT key, text FROM blocks WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def put_many(self, blocks, ticker=None, filing_id=None):
+        """
+        Store blocks and record them for a company.
+
+        Args:
+            blocks: Dict of key to block text
+            ticker: Company whose filing holds the blocks (optional)
+            filing_id: Filing that stored the blocks first (optional)
+
+        Returns:
+            Keys of the blocks that were not stored before
+        """
+        if not blocks:
+            return []
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self.stored_keys(blocks)
+            new_keys = [key for key in blocks if key not in existing]
+            conn.executemany(
+                "INSERT OR IGNORE INTO blocks (key, text, size, first_filing, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, blocks[key], len(blocks[key].encode('utf-8', 'surrogatepass')), filing_id, now) for key in new_keys]
+            )
+            if ticker:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO company_blocks (ticker, key, first_filing) VALUES (?, ?, ?)",
+                    [(ticker, key, filing_id) for key in blocks]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return new_keys
+
+    def stats(self):
+        """
+        Size of the store
+
+        Returns:
+            Dict with the number of blocks, their total bytes and the number of companies
+        """
+        conn = self._connection()
+        blocks, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blocks").fetchone()
+        companies = conn.execute("SELECT COUNT(DISTINCT ticker) FROM company_blocks").fetchone()[0]
+        return {"blocks": blocks, "bytes": size, "companies": companies}
+
+    def clear(self):
+        """Remove all stored blocks."""
+        conn = self._connection()
+        conn.execute("DELETE FROM company_blocks")
+        conn.execute("DELETE FROM blocks")
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def reference_stored_blocks(content, store, ticker=None, filing_id=None, scope=None, min_chars=None):
+    """
+    Replace narrative text stored by earlier filings, or repeated in the
+    document, with references, and store the new text
+
+    Args:
+        content: Optimized LLM content
+        store: TextBlockStore
+        ticker: Company of the filing
+        filing_id: Filing identifier recorded with new blocks; blocks this
+            filing stored first stay inline when it is processed again (optional)
+        scope: "company" or "global" (default: TEXT_BLOCK_STORE["scope"])
+        min_chars: Shortest text stored (default: TEXT_BLOCK_STORE["min_chars"])
+
+    Returns:
+        Dict with the content, the keys of the referenced blocks and of the
+        newly stored blocks, and the bytes saved
+    """
+    scope = scope or TEXT_BLOCK_STORE.get("scope", "company")
+    min_chars = TEXT_BLOCK_STORE.get("min_chars", 256) if min_chars is None else min_chars
+    result = {"content": content, "referenced": [], "stored": [], "bytes_saved": 0}
+
+    # The reference marker must be unambiguous for rehydration
+    if REFERENCE_PREFIX in content:
+        logging.warning(f"Content already contains {REFERENCE_PREFIX}; not referencing stored text blocks")
+        return result
+
+    # Text of the narrative lines, as (start, end) of the text and its key
+    spans = []
+    blocks = {}
+    for match in NARRATIVE_LINE_PATTERN.finditer(content):
+        text_start, text_end = match.span(2)
+        suffix = BLOCK_ID_SUFFIX.search(content, text_start, text_end)
+        if suffix:
+            text_end = suffix.start()
+        if text_end - text_start >= min_chars:
+            text = content[text_start:text_end]
+            key = block_key(text)
+            blocks.setdefault(key, text)
+            spans.append((text_start, text_end, key))
+    if not blocks:
+        return result
+
+    # Text stored before by another filing is referenced; text this filing
+    # stored first is treated as new, so reprocessing it gives the same output
+    first_filings = store.first_filings(blocks, ticker=ticker if scope == "company" else None)
+    stored = {key for key, first_filing in first_filings.items() if filing_id is None or first_filing != filing_id}
+
+    # New text is written inline once, and referenced where it repeats in the document
+    parts = []
+    position = 0
+    inline = set()
+    referenced = set()
+    for text_start, text_end, key in spans:
+        if key in stored or key in inline:
+            parts.append(content[position:text_start])
+            parts.append(f"{REFERENCE_PREFIX}{key}")
+            position = text_end
+            referenced.add(key)
+        else:
+            inline.add(key)
+    parts.append(content[position:])
+    referenced_content = "".join(parts)
+
+    result["stored"] = store.put_many(blocks, ticker=ticker, filing_id=filing_id)
+    result["content"] = referenced_content
+    result["referenced"] = sorted(referenced)
+    result["bytes_saved"] = len(content.encode('utf-8')) - len(referenced_content.encode('utf-8'))
+    logging.info(f"Text block store: {len(referenced)} of {len(blocks)} blocks referenced, "
+                 f"{len(result['stored'])} newly stored, {result['bytes_saved']:,} bytes saved")
+    return result
+
+
+def referenced_keys(content):
+    """
+    Keys of the stored blocks a document references
+
+    Args:
+        content: LLM content
+
+    Returns:
+        List of keys, in order of first reference
+    """
+    return list(dict.fromkeys(REFERENCE_PATTERN.findall(content)))
+
+
+def rehydrate_text_blocks(content, store):
+    """
+    Put the stored text back in place of the references of a document
+
+    Args:
+        content: LLM content with references to stored blocks
+        store: TextBlockStore, or a dict of key to block text
+
+    Returns:
+        The content as written without the store
+
+    Raises:
+        KeyError: If a referenced block is not in the store
+    """
+    keys = referenced_keys(content)
+    if not keys:
+        return content
+
+    blocks = store.get_many(keys) if isinstance(store, TextBlockStore) else {key: store[key] for key in keys if key in store}
+    missing = [key for key in keys if key not in blocks]
+    if missing:
+        raise KeyError(f"{len(missing)} referenced text blocks are not stored: {', '.join(missing[:5])}")
+
+    return REFERENCE_PATTERN.sub(lambda match: blocks[match.group(1)], content)
+
+
+def rehydrate_llm_file(llm_path, store=None):
+    """
+    Read an LLM file with the stored text put back
+
+    Args:
+        llm_path: Path of the LLM file
+        store: TextBlockStore (default: the configured store)
+
+    Returns:
+        The full content of the file
+    """
+    with open(llm_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if REFERENCE_PREFIX not in content:
+        return content
+    return rehydrate_text_blocks(content, store or TextBlockStore())
@@ -9,6 +9,104 @@ import re
 import logging
 from typing import Dict, List, Any, Set, Tuple, Optional
 
+# Parent and child name suffixes of the pattern-based hierarchy used when no
+# presentation network is available
+HIERARCHY_PATTERNS = [
+    # Assets patterns
+    ("Assets", ["AssetsCurrent", "AssetsNoncurrent"]),
+    ("AssetsCurrent", ["CashAndCashEquivalents", "ShortTermInvestments", "AccountsReceivable", "Inventory"]),
+    ("AssetsNoncurrent", ["PropertyPlantAndEquipment", "Goodwill", "IntangibleAssets"]),
+
+    # Liabilities patterns
+    ("Liabilities", ["LiabilitiesCurrent", "LiabilitiesNoncurrent"]),
+    ("LiabilitiesCurrent", ["AccountsPayable", "AccruedLiabilities", "CustomerDeposits", "DeferredRevenue"]),
+    ("LiabilitiesNoncurrent", ["LongTermDebt", "DeferredTaxLiabilities", "LeaseLiability"]),
+
+    # Equity patterns
+    ("StockholdersEquity", ["CommonStock", "AdditionalPaidInCapital", "RetainedEarnings", "AccumulatedOtherComprehensiveIncome"]),
+
+    # Income statement patterns
+    ("Revenues", ["RevenueFromContractWithCustomer", "InterestIncome", "OtherIncome"]),
+    ("CostsAndExpenses", ["CostOfGoodsAndServicesSold", "ResearchAndDevelopmentExpense", "SellingGeneralAndAdministrativeExpense"])
+]
+
+# (parent suffix, child suffix) pairs that make a concept the child of another
+# concept of the same statement type
+PARENT_CHILD_PATTERNS = [
+    # Assets and sub-categories
+    ("Assets", "AssetsCurrent"),
+    ("Assets", "AssetsNoncurrent"),
+    ("Assets", "CashAndCashEquivalents"),
+    ("Assets", "Inventory"),
+
+    # Liabilities and sub-categories
+    ("Liabilities", "LiabilitiesCurrent"),
+    ("Liabilities", "LiabilitiesNoncurrent"),
+    ("Liabilities", "AccountsPayable"),
+    ("Liabilities", "DeferredIncomeTaxLiabilities"),
+
+    # Equity and sub-categories
+    ("StockholdersEquity", "CommonStock"),
+    ("StockholdersEquity", "RetainedEarnings"),
+    ("StockholdersEquity", "AccumulatedOtherComprehensiveIncome"),
+
+    # Income statement items
+    ("Revenues", "RevenueFromContractWithCustomer"),
+    ("CostsAndExpenses", "CostOfGoodsAndServicesSold"),
+    ("CostsAndExpenses", "OperatingExpenses"),
+
+    # Cash flow items
+    ("NetCashProvidedByUsedInOperatingActivities", "DepreciationAndAmortization"),
+    ("NetCashProvidedByUsedInInvestingActivities", "PaymentsToAcquirePropertyPlantAndEquipment")
+]
+
+
+class SuffixIndex:
+    """
+    Finds which of a fixed set of suffixes a name ends with.
+
+    Looks up one slice of the name per distinct suffix length instead of
+    testing every suffix.
+    """
+
+    def __init__(self, suffixes):
+        self.suffixes = set(suffixes)
+        self.lengths = sorted({len(suffix) for suffix in self.suffixes})
+
+    def matches(self, name: str) -> List[str]:
+        """Suffixes the name ends with."""
+        size = len(name)
+        return [name[size - length:] for length in self.lengths
+                if length <= size and name[size - length:] in self.suffixes]
+
+
+class PrefixTrie:
+    """
+    Character trie of names, for finding the names that are proper prefixes
+    of a given name in one walk over that name.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, name: str, value: Any) -> None:
+        """Add a value under a name."""
+        node = self.root
+        for char in name:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+
+    def proper_prefixes(self, name: str) -> List[Any]:
+        """Values of all names that are prefixes of name and shorter than it."""
+        found = []
+        node = self.root
+        for char in name:
+            found.extend(node.get(None, ()))
+            node = node.get(char)
+            if node is None:
+                break
+        return found
+
 
 class XBRLHierarchyExtractor:
     """
@@ -339,47 +437,35 @@ class XBRLHierarchyExtractor:
             concepts: Set of all concept names
             hierarchy: The hierarchy dictionary to update
         """
-        # Common patterns across companies
-        patterns = [
-            # Assets patterns
-            ("Assets", ["AssetsCurrent", "AssetsNoncurrent"]),
-            ("AssetsCurrent", ["CashAndCashEquivalents", "ShortTermInvestments", "AccountsReceivable", "Inventory"]),
-            ("AssetsNoncurrent", ["PropertyPlantAndEquipment", "Goodwill", "IntangibleAssets"]),
-
-            # Liabilities patterns
-            ("Liabilities", ["LiabilitiesCurrent", "LiabilitiesNoncurrent"]),
-            ("LiabilitiesCurrent", ["AccountsPayable", "AccruedLiabilities", "CustomerDeposits", "DeferredRevenue"]),
-            ("LiabilitiesNoncurrent", ["LongTermDebt", "DeferredTaxLiabilities", "LeaseLiability"]),
-
-            # Equity patterns
-            ("StockholdersEquity", ["CommonStock", "AdditionalPaidInCapital", "RetainedEarnings", "AccumulatedOtherComprehensiveIncome"]),
-
-            # Income statement patterns
-            ("Revenues", ["RevenueFromContractWithCustomer", "InterestIncome", "OtherIncome"]),
-            ("CostsAndExpenses", ["CostOfGoodsAndServicesSold", "ResearchAndDevelopmentExpense", "SellingGeneralAndAdministrativeExpense"])
-        ]
-
-        for parent_suffix, child_suffixes in patterns:
-            # Find all concepts that end with the parent suffix
-            parent_concepts = [c for c in concepts if c.split(":")[-1].endswith(parent_suffix)]
-
-            for parent in parent_concepts:
+        # Index the concepts by the pattern suffixes they end with, keeping the
+        # set order, instead of scanning all concepts for every suffix
+        suffix_index = SuffixIndex(
+            [parent_suffix for parent_suffix, _ in HIERARCHY_PATTERNS] +
+            [child_suffix for _, child_suffixes in HIERARCHY_PATTERNS for child_suffix in child_suffixes]
+        )
+        concepts_by_suffix = {suffix: [] for suffix in suffix_index.suffixes}
+        for concept in concepts:
+            for suffix in suffix_index.matches(concept.split(":")[-1]):
+                concepts_by_suffix[suffix].append(concept)
+
+        for parent_suffix, child_suffixes in HIERARCHY_PATTERNS:
+            # All concepts that end with the parent suffix
+            for parent in concepts_by_suffix[parent_suffix]:
                 if parent not in hierarchy["presentation"]:
                     hierarchy["presentation"][parent] = []
+                children = hierarchy["presentation"][parent]
 
-                # Find all concepts that end with any of the child suffixes
-                for child_suffix in child_suffixes:
-                    child_concepts = [c for c in concepts if c.split(":")[-1].endswith(child_suffix)]
+                # Determine statement type based on naming patterns
+                statement_type = self._determine_statement_type_from_name(parent)
 
-                    for child in child_concepts:
+                # All concepts that end with any of the child suffixes
+                for child_suffix in child_suffixes:
+                    for child in concepts_by_suffix[child_suffix]:
                         if child != parent:  # Avoid self-references
-                            hierarchy["presentation"][parent].append({
+                            children.append({
                                 "child": child,
-                                "order": len(hierarchy["presentation"][parent])
+                                "order": len(children)
                             })
-
-                            # Determine statement type based on naming patterns
-                            statement_type = self._determine_statement_type_from_name(parent)
                             hierarchy["statement_mapping"][parent] = statement_type
                             hierarchy["statement_mapping"][child] = statement_type
 
@@ -421,35 +507,54 @@ class XBRLHierarchyExtractor:
             if concept:
                 concepts.add(concept)
 
-        # Identify potential parent-child relationships based on naming patterns
+        # Concepts are compared within their statement type only. Each group
+        # indexes its concepts by name prefix and by pattern parent suffix, so
+        # a concept's candidate parents are looked up instead of tested against
+        # every other concept
+        statement_mapping = hierarchy["statement_mapping"]
+        rank = {}
+        groups = {}
         for concept in concepts:
-            # Skip concepts that don't have a statement type
-            if concept not in hierarchy["statement_mapping"]:
-                continue
-
-            statement_type = hierarchy["statement_mapping"][concept]
-
-            # Check for potential parent concepts
-            for parent_concept in concepts:
-                # Skip if same concept or parent doesn't have a statement type
-                if parent_concept == concept or parent_concept not in hierarchy["statement_mapping"]:
-                    continue
-
-                parent_statement_type = hierarchy["statement_mapping"][parent_concept]
-
-                # Skip if different statement types
-                if parent_statement_type != statement_type:
-                    continue
+            rank[concept] = len(rank)
+            if concept in statement_mapping:
+                groups.setdefault(statement_mapping[concept], []).append(concept)
+
+        parent_suffixes = SuffixIndex([parent_suffix for parent_suffix, _ in PARENT_CHILD_PATTERNS])
+        child_suffixes = SuffixIndex([child_suffix for _, child_suffix in PARENT_CHILD_PATTERNS])
+        parent_suffixes_by_child = {}
+        for parent_suffix, child_suffix in PARENT_CHILD_PATTERNS:
+            parent_suffixes_by_child.setdefault(child_suffix, []).append(parent_suffix)
+
+        parents_of = {}
+        for group in groups.values():
+            prefixes = PrefixTrie()
+            concepts_by_parent_suffix = {}
+            for concept in group:
+                name = concept.split(":")[-1]
+                prefixes.add(name, concept)
+                for suffix in parent_suffixes.matches(name):
+                    concepts_by_parent_suffix.setdefault(suffix, []).append(concept)
+
+            for concept in group:
+                name = concept.split(":")[-1]
+                parents = set(prefixes.proper_prefixes(name))
+                for child_suffix in child_suffixes.matches(name):
+                    for parent_suffix in parent_suffixes_by_child[child_suffix]:
+                        parents.update(concepts_by_parent_suffix.get(parent_suffix, ()))
+                parents.discard(concept)
+                if parents:
+                    parents_of[concept] = parents
+
+        # Add the relationships in the order of the pairwise comparison
+        for concept in concepts:
+            for parent_concept in sorted(parents_of.get(concept, ()), key=rank.__getitem__):
+                if parent_concept not in hierarchy["presentation"]:
+                    hierarchy["presentation"][parent_concept] = []
 
-                # Check if concept is a child of parent based on naming patterns
-                if self._is_child_of(concept, parent_concept):
-                    if parent_concept not in hierarchy["presentation"]:
-                        hierarchy["presentation"][parent_concept] = []
-
-                    hierarchy["presentation"][parent_concept].append({
-                        "child": concept,
-                        "order": len(hierarchy["presentation"][parent_concept])
-                    })
+                hierarchy["presentation"][parent_concept].append({
+                    "child": concept,
+                    "order": len(hierarchy["presentation"][parent_concept])
+                })
 
     def _is_child_of(self, concept: str, parent_concept: str) -> bool:
         """
@@ -471,35 +576,7 @@ class XBRLHierarchyExtractor:
             return True
 
         # Check for common parent-child patterns
-        parent_child_patterns = [
-            # Assets and sub-categories
-            ("Assets", "AssetsCurrent"),
-            ("Assets", "AssetsNoncurrent"),
-            ("Assets", "CashAndCashEquivalents"),
-            ("Assets", "Inventory"),
-
-            # Liabilities and sub-categories
-            ("Liabilities", "LiabilitiesCurrent"),
-            ("Liabilities", "LiabilitiesNoncurrent"),
-            ("Liabilities", "AccountsPayable"),
-            ("Liabilities", "DeferredIncomeTaxLiabilities"),
-
-            # Equity and sub-categories
-            ("StockholdersEquity", "CommonStock"),
-            ("StockholdersEquity", "RetainedEarnings"),
-            ("StockholdersEquity", "AccumulatedOtherComprehensiveIncome"),
-
-            # Income statement items
-            ("Revenues", "RevenueFromContractWithCustomer"),
-            ("CostsAndExpenses", "CostOfGoodsAndServicesSold"),
-            ("CostsAndExpenses", "OperatingExpenses"),
-
-            # Cash flow items
-            ("NetCashProvidedByUsedInOperatingActivities", "DepreciationAndAmortization"),
-            ("NetCashProvidedByUsedInInvestingActivities", "PaymentsToAcquirePropertyPlantAndEquipment")
-        ]
-
-        for p_pattern, c_pattern in parent_child_patterns:
+        for p_pattern, c_pattern in PARENT_CHILD_PATTERNS:
             if parent_name.endswith(p_pattern) and concept_name.endswith(c_pattern):
                 return True
 
@@ -512,19 +589,21 @@ class XBRLHierarchyExtractor:
         Args:
             hierarchy: The hierarchy dictionary to update
         """
+        # Get all child concepts
+        children = set()
+        for parent, child_list in hierarchy["presentation"].items():
+            for child_info in child_list:
+                children.add(child_info["child"])
+
+        # Group the concepts by statement type
+        concepts_by_type = {}
+        for concept, st in hierarchy["statement_mapping"].items():
+            concepts_by_type.setdefault(st, set()).add(concept)
+
         # For each statement type, find concepts that aren't children of any other concept
         for statement_type in ["Balance_Sheet", "Income_Statement", "Cash_Flow_Statement", "Statement_Of_Equity"]:
             # Get all concepts for this statement type
-            concepts = set()
-            for concept, st in hierarchy["statement_mapping"].items():
-                if st == statement_type:
-                    concepts.add(concept)
-
-            # Get all child concepts
-            children = set()
-            for parent, child_list in hierarchy["presentation"].items():
-                for child_info in child_list:
-                    children.add(child_info["child"])
+            concepts = concepts_by_type.get(statement_type, set())
 
             # Top-level concepts are those that aren't children of any other concept
             top_level = concepts - children
@@ -17,6 +17,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Import main pipeline
 from .pipeline import SECFilingPipeline
+from .instrumentation import BatchProfile, write_batch_profile
 
 class BatchSECPipeline:
     """
@@ -35,6 +36,8 @@ class BatchSECPipeline:
                      Including:
                      - force_upload: Override GCS existence checks
                      - amendments_only: Process only amended filings (10-K/A, 10-Q/A)
+                     - incremental: Only rerun stages whose fingerprints changed
+                     - batch_metadata_writes: Buffer Firestore metadata and commit it in batches
         """
         # Extract specialized flags
         self.force_upload = kwargs.pop("force_upload", False)
@@ -49,8 +52,16 @@ class BatchSECPipeline:
         # Extract save_intermediate flag
         self.save_intermediate = kwargs.pop("save_intermediate", False)
 
+        # Extract batch_metadata_writes flag
+        batch_metadata_writes = kwargs.pop("batch_metadata_writes", True)
+
         # Pass remaining kwargs to pipeline
         self.pipeline = SECFilingPipeline(**kwargs)
+
+        # Commit Firestore metadata in batches instead of one round trip per filing
+        if batch_metadata_writes and self.pipeline.gcp_storage:
+            self.pipeline.gcp_storage.enable_metadata_batching()
+
         logging.info("Initialized Batch SEC Pipeline")
 
     def process_filings_by_years(self, ticker, start_year, end_year,
@@ -135,6 +146,19 @@ class BatchSECPipeline:
             fiscal_year_end_month = 12  # Default to calendar year end
             fiscal_year_end_day = 31
 
+        # Generated fiscal calendar from the company's fiscal year end rule (if known)
+        generated_calendar = None
+        try:
+            from src2.sec.fiscal import fiscal_registry
+            from src2.sec.fiscal.calendar_generator import generate_fiscal_calendar
+
+            fiscal_rule = fiscal_registry.get_fiscal_year_end_rule(ticker)
+            if fiscal_rule:
+                generated_calendar = generate_fiscal_calendar(fiscal_rule)
+                logging.info(f"Using generated fiscal calendar for {ticker}: {fiscal_rule}")
+        except Exception as e:
+            logging.warning(f"Could not generate fiscal calendar for {ticker}: {str(e)}")
+
         # Calculate current fiscal year
         # For companies with fiscal year ending early in the calendar year (like NVDA in January),
         # we need special handling
@@ -213,6 +237,19 @@ class BatchSECPipeline:
         if current_fiscal_quarter < 0:
             current_fiscal_quarter += 4
 
+        # The generated calendar knows the exact period boundaries, including
+        # 52/53-week years, so prefer it over the month arithmetic above
+        if generated_calendar:
+            last_period = generated_calendar.last_period_on_or_before(current_date)
+            if last_period:
+                _, last_fiscal_year, last_fiscal_period = last_period
+                if last_fiscal_period == "annual":
+                    current_fiscal_year = int(last_fiscal_year) + 1
+                    current_fiscal_quarter = 0
+                else:
+                    current_fiscal_year = int(last_fiscal_year)
+                    current_fiscal_quarter = int(last_fiscal_period[1])
+
         # Convert to 1-based for logging
         logging.info(f"Processing fiscal year filings for {ticker} from {start_year} to {end_year}")
         logging.info(f"Current date: {current_date.strftime('%Y-%m-%d')}")
@@ -400,11 +437,16 @@ class BatchSECPipeline:
                         # Update calendar_months to only include the expected period end month
                         calendar_months = [period_end_month]
 
-                        # Special case for NVIDIA FY2023 Q1 - include both April and May
-                        if ticker == "NVDA" and fiscal_year == 2023 and q == 1:
-                            if period_end_month == 4:  # April
-                                calendar_months = [4, 5]  # Include both April and May
-                                logging.info(f"SPECIAL HANDLING: For NVIDIA FY2023 Q1, including both April and May as valid period end months")
+                        # 52/53-week calendars can end a quarter in the month after the
+                        # nominal one (e.g. NVIDIA FY2023 Q1 ended May 1), so also accept
+                        # the month of the generated period end date
+                        if generated_calendar:
+                            generated_end = generated_calendar.period_end_date(fiscal_year, f"Q{q}")
+                            if generated_end and int(generated_end[:4]) == calendar_year:
+                                generated_month = int(generated_end[5:7])
+                                if generated_month != period_end_month:
+                                    calendar_months = sorted({period_end_month, generated_month})
+                                    logging.info(f"Generated calendar: {ticker} FY{fiscal_year} Q{q} ends {generated_end}")
 
                         logging.info(f"Mapped {ticker} FY{fiscal_year} Q{q} to calendar year {calendar_year}, months {calendar_months}")
                     else:
@@ -431,39 +473,56 @@ class BatchSECPipeline:
         for filing in filings_to_process:
             logging.info(f"  - {filing['ticker']} {filing['filing_type']} ({filing['year']}) index: {filing['filing_index']}")
 
-        # Process filings (either sequentially or in parallel)
-        if max_workers <= 1 or len(filings_to_process) <= 1:
-            # Process sequentially
-            logging.info("Processing filings sequentially")
-            for filing_info in filings_to_process:
-                result = self._process_single_filing(filing_info)
-                results["filings_processed"].append(result)
+        # List the company's existing GCS objects once, so per-filing existence
+        # checks do not each need a round trip
+        if filings_to_process and self.pipeline.gcp_storage and self.pipeline.gcp_storage.is_enabled():
+            self.pipeline.gcp_storage.prefetch_existing(f"companies/{ticker}/")
 
-                # Add short delay between filings to respect SEC rate limits
-                time.sleep(1)
-        else:
-            # Process in parallel with ThreadPoolExecutor
-            logging.info(f"Processing filings in parallel with {max_workers} workers")
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_filing = {
-                    executor.submit(self._process_single_filing, filing_info): filing_info
-                    for filing_info in filings_to_process
-                }
+        try:
+            # Process filings (either sequentially or in parallel)
+            if max_workers <= 1 or len(filings_to_process) <= 1:
+                # Process sequentially
+                logging.info("Processing filings sequentially")
+                for filing_info in filings_to_process:
+                    result = self._process_single_filing(filing_info)
+                    results["filings_processed"].append(result)
+
+                    # Add short delay between filings to respect SEC rate limits
+                    time.sleep(1)
+            else:
+                # Process in parallel with ThreadPoolExecutor
+                logging.info(f"Processing filings in parallel with {max_workers} workers")
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_filing = {
+                        executor.submit(self._process_single_filing, filing_info): filing_info
+                        for filing_info in filings_to_process
+                    }
 
-                for future in as_completed(future_to_filing):
-                    filing_info = future_to_filing[future]
-                    try:
-                        result = future.result()
-                        results["filings_processed"].append(result)
-                    except Exception as e:
-                        logging.error(f"Error processing {filing_info['ticker']} {filing_info['filing_type']} for {filing_info['year']}: {str(e)}")
-                        results["filings_processed"].append({
-                            "ticker": filing_info["ticker"],
-                            "filing_type": filing_info["filing_type"],
-                            "year": filing_info["year"],
-                            "error": str(e),
-                            "status": "error"
-                        })
+                    for future in as_completed(future_to_filing):
+                        filing_info = future_to_filing[future]
+                        try:
+                            result = future.result()
+                            results["filings_processed"].append(result)
+                        except Exception as e:
+                            logging.error(f"Error processing {filing_info['ticker']} {filing_info['filing_type']} for {filing_info['year']}: {str(e)}")
+                            results["filings_processed"].append({
+                                "ticker": filing_info["ticker"],
+                                "filing_type": filing_info["filing_type"],
+                                "year": filing_info["year"],
+                                "error": str(e),
+                                "status": "error"
+                            })
+        finally:
+            # Commit any Firestore metadata still buffered, also when processing
+            # fails or is interrupted; failures of the flushes made during the run
+            # (timer or buffer size) are in the writer stats
+            metadata_stats = None
+            if self.pipeline.gcp_storage:
+                metadata_flush = self.pipeline.gcp_storage.flush_metadata()
+                metadata_stats = metadata_flush.get("stats")
+                failed_documents = (metadata_stats or metadata_flush).get("failed_documents", 0)
+                if failed_documents:
+                    logging.error(f"Failed to commit {failed_documents} Firestore metadata documents")
 
         # Calculate summary statistics
         successful_filings = sum(1 for f in results["filings_processed"] if f.get("status") == "success")
@@ -476,6 +535,19 @@ class BatchSECPipeline:
             "failed_filings": failed_filings,
             "total_time_seconds": time.time() - results["start_time"]
         }
+        if metadata_stats is not None:
+            results["summary"]["metadata_writes"] = metadata_stats
+
+        # Aggregate the filing profiles by span, to show where the batch spent its time
+        batch_profile = BatchProfile({"ticker": ticker})
+        for filing in results["filings_processed"]:
+            batch_profile.add(filing.get("profile"))
+        if batch_profile.profiles:
+            results["summary"]["instrumentation"] = batch_profile.summary()
+            write_batch_profile(batch_profile, self.pipeline.instrumentation_dir)
+            for top_span in results["summary"]["instrumentation"]["top_spans"][:5]:
+                logging.info(f"  {top_span['span']}: {top_span['wall_seconds']:.2f}s wall, "
+                             f"{top_span['cpu_seconds']:.2f}s CPU in {top_span['calls']} calls")
 
         logging.info(f"Batch processing complete: {successful_filings}/{len(results['filings_processed'])} filings processed successfully")
 
@@ -2305,6 +2377,10 @@ def main():
                         help="Force upload of files even if they already exist in GCS (useful for initial load)")
     parser.add_argument("--save-intermediate", action="store_true", default=False,
                         help="Save intermediate files locally (default: False)")
+    parser.add_argument("--incremental", action="store_true", default=False,
+                        help="Only rerun stages whose input or code fingerprints changed (default: False)")
+    parser.add_argument("--no-batch-metadata", dest="batch_metadata_writes", action="store_false", default=True,
+                        help="Write Firestore metadata one document at a time instead of in batches")
 
     args = parser.parse_args()
 
@@ -2329,7 +2405,9 @@ def main():
         gcp_project=args.gcp_project,
         force_upload=args.force_upload,  # Pass the force_upload flag
         amendments_only=args.amendments_only,  # Pass the amendments_only flag
-        save_intermediate=args.save_intermediate  # Pass the save_intermediate flag
+        save_intermediate=args.save_intermediate,  # Pass the save_intermediate flag
+        incremental=args.incremental,  # Pass the incremental flag
+        batch_metadata_writes=args.batch_metadata_writes
     )
 
     # Process filings
@@ -2379,6 +2457,18 @@ def main():
         print(f"Failed: {results['summary']['failed_filings']}")
         print(f"Amended Filings: {len(amended_filings)}")
         print(f"Total Time: {results['summary']['total_time_seconds']:.2f} seconds")
+        metadata_writes = results['summary'].get('metadata_writes')
+        if metadata_writes:
+            print(f"Firestore Metadata: {metadata_writes['documents_written']} written, "
+                  f"{metadata_writes['failed_documents']} failed")
+
+        # Print where the time went
+        instrumentation = results['summary'].get('instrumentation')
+        if instrumentation:
+            print("\nTime by stage (all filings):")
+            for top_span in instrumentation["top_spans"]:
+                print(f"  {top_span['span']}: {top_span['wall_seconds']:.2f}s wall, "
+                      f"{top_span['cpu_seconds']:.2f}s CPU ({top_span['calls']} calls)")
 
         # Print details of any amended filings
         if amended_filings:
@@ -19,12 +19,16 @@ import random
 from bs4 import BeautifulSoup
 
 # Import from config
-from src2.config import SEC_BASE_URL, RAW_DATA_DIR
+from src2.config import SEC_BASE_URL, RAW_DATA_DIR, CALCULATION_VALIDATION
 
 # Constants
 SEC_RATE_LIMIT = 10  # Maximum requests per second allowed
 DEFAULT_TIMEOUT = 30  # Default timeout in seconds
 
+# Data files of the filing index saved next to the primary document, for the
+# calculation check (calculation linkbase and extension schema)
+XBRL_SUPPORT_FILE_TYPES = ("EX-101.CAL", "EX-101.SCH")
+
 class SECDownloader:
     """
     SEC-compliant file downloader with rate limiting and proper headers.
@@ -760,6 +764,10 @@ class SECDownloader:
                         
                         # Store the path
                         result["doc_path"] = str(primary_doc_path)
+
+                        # Download the calculation linkbase and schema for the calculation check
+                        if CALCULATION_VALIDATION.get("enabled", True):
+                            result["xbrl_support_paths"] = self._download_xbrl_support_files(soup, index_url, filing_dir)
                         
                         # Update the filing_info with the actual document URL
                         filing_info["primary_doc_url"] = primary_doc_url
@@ -782,6 +790,41 @@ class SECDownloader:
         
         return result
 
+    def _download_xbrl_support_files(self, soup, index_url, filing_dir):
+        """
+        Download the calculation linkbase and schema listed in a filing index.
+
+        Args:
+            soup: Parsed filing index page
+            index_url: URL of the index page (base of relative links)
+            filing_dir: Directory of the filing's downloaded files
+
+        Returns:
+            List of paths of the files (already downloaded files are kept)
+        """
+        paths = []
+        for row in soup.select("table.tableFile tr"):
+            cells = [cell.get_text().strip() for cell in row.find_all('td')]
+            link = row.find('a', href=True)
+            if not link or not any(cell in XBRL_SUPPORT_FILE_TYPES for cell in cells):
+                continue
+
+            file_url = link['href']
+            file_name = file_url.split('/')[-1]
+            if not file_name:
+                continue
+            if not file_url.startswith(('/', 'http://', 'https://')):
+                file_url = f"{'/'.join(index_url.split('/')[:-1])}/{file_url}"
+
+            file_path = Path(filing_dir) / file_name
+            try:
+                if not file_path.exists():
+                    self.download_file(file_url, file_path)
+                paths.append(str(file_path))
+            except Exception as e:
+                logging.warning(f"Could not download XBRL file {file_name}: {str(e)}")
+        return paths
+
     def get_company_filings(self, ticker=None, cik=None, filing_type="10-K", count=1):
         """
         Get recent filings for a company.
@@ -15,6 +15,9 @@ import time
 from pathlib import Path
 from bs4 import BeautifulSoup
 
+from .section_segmenter import flatten_html, segment_text, spans_to_document_sections, section_index
+from .instrumentation import span as profile_span
+
 class SECExtractor:
     """
     SEC filing text extractor for rendered iXBRL documents.
@@ -39,189 +42,123 @@ class SECExtractor:
 
         logging.info(f"Initialized SEC extractor with output dir: {self.output_dir}")
 
-    def extract_document_sections(self, html_content):
+    def _parse_html(self, html_content):
+        """Parse HTML and remove script and style elements."""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for script in soup(["script", "style"]):
+            script.extract()
+        return soup
+
+    def segment_document(self, html_content, filing_type=None):
         """
-        Extract document sections from HTML content.
+        Parse an HTML document once and split it into Item sections.
 
         Args:
             html_content: HTML content of rendered document
+            filing_type: Filing type ("10-K", "10-Q"); detected from the cover page if not given
 
         Returns:
-            Dictionary of document sections
+            Dictionary with the parsed soup, flattened text and section spans
         """
+        with profile_span("parse_html", bytes_read=len(html_content)):
+            soup = self._parse_html(html_content)
+        with profile_span("flatten_html"):
+            text = flatten_html(soup)
+        with profile_span("segment_text", chars=len(text)):
+            spans = segment_text(text, filing_type)
+        return {
+            'soup': soup,
+            'text': text,
+            'spans': spans
+        }
+
+    def _sections_from_segments(self, segments, html_content):
+        """Build the section dictionary returned by extract_document_sections."""
         sections = {}
 
-        try:
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-
-            # Extract document title
-            title = soup.find('title')
-            if title:
-                sections['title'] = title.get_text().strip()
-
-            # Look for common 10-K/10-Q section patterns
-            item_patterns = [
-                # 10-K items
-                {'pattern': r'Item\s+1[A]?\.?\s*Business', 'key': 'ITEM_1_BUSINESS'},
-                {'pattern': r'Item\s+1A\.?\s*Risk\s+Factors', 'key': 'ITEM_1A_RISK_FACTORS'},
-                {'pattern': r'Item\s+1B\.?\s*Unresolved\s+Staff\s+Comments', 'key': 'ITEM_1B_UNRESOLVED_COMMENTS'},
-                {'pattern': r'Item\s+2\.?\s*Properties', 'key': 'ITEM_2_PROPERTIES'},
-                {'pattern': r'Item\s+3\.?\s*Legal\s+Proceedings', 'key': 'ITEM_3_LEGAL_PROCEEDINGS'},
-                {'pattern': r'Item\s+4\.?\s*Mine\s+Safety\s+Disclosures', 'key': 'ITEM_4_MINE_SAFETY'},
-                {'pattern': r'Item\s+5\.?\s*Market\s+for\s+Registrant', 'key': 'ITEM_5_MARKET'},
-                {'pattern': r'Item\s+6\.?\s*Selected\s+Financial\s+Data', 'key': 'ITEM_6_FINANCIAL_DATA'},
-                {'pattern': r'Item\s+7\.?\s*Management.*Discussion', 'key': 'ITEM_7_MD_AND_A'},
-                {'pattern': r'Item\s+7A\.?\s*Quantitative\s+and\s+Qualitative', 'key': 'ITEM_7A_MARKET_RISK'},
-                {'pattern': r'Item\s+8\.?\s*Financial\s+Statements', 'key': 'ITEM_8_FINANCIAL_STATEMENTS'},
-                {'pattern': r'Item\s+9\.?\s*Changes\s+in\s+and\s+Disagreements', 'key': 'ITEM_9_DISAGREEMENTS'},
-                {'pattern': r'Item\s+9A\.?\s*Controls\s+and\s+Procedures', 'key': 'ITEM_9A_CONTROLS'},
-                {'pattern': r'Item\s+9B\.?\s*Other\s+Information', 'key': 'ITEM_9B_OTHER_INFORMATION'},
-                {'pattern': r'Item\s+10\.?\s*Directors', 'key': 'ITEM_10_DIRECTORS'},
-                {'pattern': r'Item\s+11\.?\s*Executive\s+Compensation', 'key': 'ITEM_11_EXECUTIVE_COMPENSATION'},
-                {'pattern': r'Item\s+12\.?\s*Security\s+Ownership', 'key': 'ITEM_12_SECURITY_OWNERSHIP'},
-                {'pattern': r'Item\s+13\.?\s*Certain\s+Relationships', 'key': 'ITEM_13_RELATIONSHIPS'},
-                {'pattern': r'Item\s+14\.?\s*Principal\s+Accountant\s+Fees', 'key': 'ITEM_14_ACCOUNTANT_FEES'},
-                {'pattern': r'Item\s+15\.?\s*Exhibits', 'key': 'ITEM_15_EXHIBITS'},
-
-                # 10-Q items
-                {'pattern': r'Item\s+1\.?\s*Financial\s+Statements', 'key': 'ITEM_1_FINANCIAL_STATEMENTS'},
-                {'pattern': r'Item\s+2\.?\s*Management.*Discussion', 'key': 'ITEM_2_MD_AND_A'},
-                {'pattern': r'Item\s+3\.?\s*Quantitative\s+and\s+Qualitative', 'key': 'ITEM_3_MARKET_RISK'},
-                {'pattern': r'Item\s+4\.?\s*Controls\s+and\s+Procedures', 'key': 'ITEM_4_CONTROLS'},
-
-                # Parts
-                {'pattern': r'Part\s+I', 'key': 'PART_I'},
-                {'pattern': r'Part\s+II', 'key': 'PART_II'},
-                {'pattern': r'Part\s+III', 'key': 'PART_III'},
-                {'pattern': r'Part\s+IV', 'key': 'PART_IV'},
-
-                # Financial statement sections
-                {'pattern': r'Consolidated\s+Balance\s+Sheets?', 'key': 'BALANCE_SHEETS'},
-                {'pattern': r'Consolidated\s+Statements?\s+of\s+Operations', 'key': 'INCOME_STATEMENTS'},
-                {'pattern': r'Consolidated\s+Statements?\s+of\s+Cash\s+Flows', 'key': 'CASH_FLOW_STATEMENTS'},
-                {'pattern': r'Consolidated\s+Statements?\s+of\s+Stockholders\'\s+Equity', 'key': 'EQUITY_STATEMENTS'},
-                {'pattern': r'Notes\s+to\s+.*Financial\s+Statements', 'key': 'NOTES_TO_FINANCIAL_STATEMENTS'}
-            ]
-
-            # Find all headings
-            headings = []
-            for tag in ['h1', 'h2', 'h3', 'h4', 'strong', 'b', 'p', 'div']:
-                elements = soup.find_all(tag)
-                for element in elements:
-                    text = element.get_text().strip()
-                    if text and len(text) > 5 and len(text) < 100:  # Filter out too short or too long
-                        headings.append({
-                            'text': text,
-                            'element': element
-                        })
-
-            # Match headings to section patterns
-            for heading in headings:
-                heading_text = heading['text']
-                for pattern in item_patterns:
-                    if re.search(pattern['pattern'], heading_text, re.IGNORECASE):
-                        sections[pattern['key']] = {
-                            'heading': heading_text,
-                            'element': heading['element']
-                        }
-                        break
-
-            # Sort sections by their appearance in the document
-            sorted_sections = {}
-            for key, info in sections.items():
-                if key != 'title' and 'element' in info:
-                    # Get position in document (line number or index)
-                    position = info['element'].sourceline if hasattr(info['element'], 'sourceline') else 0
-                    sorted_sections[key] = {
-                        'heading': info['heading'],
-                        'position': position
-                    }
-
-            # Add document statistics
-            sections['stats'] = {
-                'word_count': len(soup.get_text().split()),
-                'section_count': len(sorted_sections),
-                'html_size': len(html_content)
+        # Extract document title
+        title = segments['soup'].find('title')
+        if title:
+            sections['title'] = title.get_text().strip()
+
+        for span in segments['spans']:
+            sections[span.section_id] = {
+                'heading': span.heading,
+                'part': span.part,
+                'start': span.start,
+                'end': span.end
             }
 
-            logging.info(f"Extracted {len(sorted_sections)} document sections")
+        # Add document statistics
+        sections['stats'] = {
+            'word_count': len(segments['text'].split()),
+            'section_count': len(segments['spans']),
+            'html_size': len(html_content)
+        }
+        return sections
+
+    def extract_document_sections(self, html_content, filing_type=None):
+        """
+        Extract document sections from HTML content.
+
+        Args:
+            html_content: HTML content of rendered document
+            filing_type: Filing type ("10-K", "10-Q"); detected if not given
+
+        Returns:
+            Dictionary of document sections
+        """
+        try:
+            segments = self.segment_document(html_content, filing_type)
+            sections = self._sections_from_segments(segments, html_content)
+
+            logging.info(f"Extracted {len(segments['spans'])} document sections")
             return sections
 
         except Exception as e:
             logging.error(f"Error extracting document sections: {str(e)}")
             return {'error': str(e)}
 
-    def extract_text_with_sections(self, html_content):
+    def _format_text_with_sections(self, segments, sections):
+        """Format the document title, section guide and full text of a segmented document."""
+        formatted_text = []
+
+        # Add document title
+        if 'title' in sections:
+            formatted_text.append(f"@DOCUMENT: {sections['title']}")
+            formatted_text.append("")
+
+        # Add section guide (spans are already in document order)
+        formatted_text.append("@SECTION_GUIDE")
+        for span in segments['spans']:
+            formatted_text.append(f"  {span.section_id}: {span.heading}")
+        formatted_text.append("")
+
+        # Get full text (cleaned)
+        lines = (line.strip() for line in segments['text'].splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        full_text = '\n'.join(chunk for chunk in chunks if chunk)
+
+        # Add full text
+        formatted_text.append(full_text)
+
+        return '\n'.join(formatted_text)
+
+    def extract_text_with_sections(self, html_content, filing_type=None):
         """
         Extract text with section markers from HTML content.
 
         Args:
             html_content: HTML content of rendered document
+            filing_type: Filing type ("10-K", "10-Q"); detected if not given
 
         Returns:
             Extracted text with section markers
         """
         try:
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-
-            # Extract document sections
-            sections = self.extract_document_sections(html_content)
-
-            # Get basic text
-            text = soup.get_text()
-
-            # Clean up whitespace
-            text = re.sub(r'\n+', '\n', text)  # Remove multiple newlines
-            text = re.sub(r'\s+', ' ', text)   # Replace multiple spaces with single space
-
-            # Format with section markers
-            formatted_text = []
-
-            # Add document title
-            if 'title' in sections:
-                formatted_text.append(f"@DOCUMENT: {sections['title']}")
-                formatted_text.append("")
-
-            # Extract text by section using element positions
-            sorted_sections = {}
-            for key, info in sections.items():
-                if key != 'title' and key != 'stats' and 'element' in info:
-                    # Get position in document (line number or index)
-                    position = info['element'].sourceline if hasattr(info['element'], 'sourceline') else 0
-                    sorted_sections[key] = {
-                        'heading': info['heading'],
-                        'position': position
-                    }
-
-            # Sort sections by position
-            sorted_sections = dict(sorted(sorted_sections.items(), key=lambda x: x[1]['position']))
-
-            # Add section guide
-            formatted_text.append("@SECTION_GUIDE")
-            for key, info in sorted_sections.items():
-                formatted_text.append(f"  {key}: {info['heading']}")
-            formatted_text.append("")
-
-            # Get full text (cleaned)
-            full_text = soup.get_text()
-            lines = (line.strip() for line in full_text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            full_text = '\n'.join(chunk for chunk in chunks if chunk)
-
-            # Add full text
-            formatted_text.append(full_text)
-
-            return '\n'.join(formatted_text)
+            segments = self.segment_document(html_content, filing_type)
+            sections = self._sections_from_segments(segments, html_content)
+            return self._format_text_with_sections(segments, sections)
 
         except Exception as e:
             logging.error(f"Error extracting text with sections: {str(e)}")
@@ -231,6 +168,10 @@ class SECExtractor:
         """
         Process an SEC filing and extract text with sections.
 
+        The document is parsed and segmented once; the section guide, the
+        narrative sections for the LLM formatter and the section index for
+        filing metadata all come from the same section spans.
+
         Args:
             html_path: Path to HTML file
             metadata: Optional filing metadata
@@ -244,11 +185,13 @@ class SECExtractor:
             with open(html_path, 'r', encoding='utf-8') as f:
                 html_content = f.read()
 
-            # Extract sections for use by the LLM formatter
-            document_sections = self.extract_document_sections(html_content)
+            # Parse and segment the document once
+            filing_type = metadata.get('filing_type') if metadata else None
+            segments = self.segment_document(html_content, filing_type)
+            document_sections = self._sections_from_segments(segments, html_content)
 
             # Extract text with sections
-            extracted_text = self.extract_text_with_sections(html_content)
+            extracted_text = self._format_text_with_sections(segments, document_sections)
 
             # Add metadata header if provided
             if metadata:
@@ -268,71 +211,8 @@ class SECExtractor:
             file_size = len(extracted_text.encode('utf-8'))
             logging.info(f"Extracted content size: {file_size} bytes")
 
-            # Prepare narrative sections for LLM formatter
-            processed_sections = {}
-
-            # Extract text for each section
-            soup = BeautifulSoup(html_content, 'html.parser')
-            raw_text = soup.get_text()
-
-            # Process sections that have elements with text content
-            for key, info in document_sections.items():
-                if key not in ('title', 'stats') and 'element' in info:
-                    # Get the element for this section
-                    section_element = info['element']
-
-                    # Extract text from this element and siblings until next section
-                    section_text = ""
-
-                    try:
-                        # Get the section text
-                        next_sibling = section_element.next_sibling
-                        while next_sibling:
-                            # Add text from this sibling
-                            if hasattr(next_sibling, 'get_text'):
-                                sibling_text = next_sibling.get_text().strip()
-                                if sibling_text:
-                                    section_text += sibling_text + "\n\n"
-                            # Move to next sibling
-                            next_sibling = next_sibling.next_sibling
-
-                            # Stop at next section header
-                            if hasattr(next_sibling, 'name') and next_sibling.name in ['h1', 'h2', 'h3', 'h4'] and len(next_sibling.get_text().strip()) > 5:
-                                break
-
-                        # Add section to processed sections
-                        if section_text:
-                            processed_sections[key] = {
-                                "heading": info['heading'],
-                                "text": section_text.strip()
-                            }
-                            logging.info(f"Extracted section text for {key} ({len(section_text)} chars)")
-                    except Exception as e:
-                        logging.warning(f"Error extracting text for section {key}: {str(e)}")
-
-            # If we couldn't extract sections properly, try to get some key sections from the raw text
-            if len(processed_sections) < 2:
-                logging.info("Using fallback method to extract narrative sections from raw text")
-
-                # Define commonly used section titles and patterns
-                section_patterns = {
-                    "ITEM_1_BUSINESS": r"(?:ITEM|Item)\s+1\.?\s*Business(.*?)(?:ITEM|Item)\s+1A",
-                    "ITEM_1A_RISK_FACTORS": r"(?:ITEM|Item)\s+1A\.?\s*Risk\s+Factors(.*?)(?:ITEM|Item)\s+1B",
-                    "ITEM_7_MD_AND_A": r"(?:ITEM|Item)\s+7\.?\s*Management.*Discussion(.*?)(?:ITEM|Item)\s+7A",
-                    "ITEM_2_MD_AND_A": r"(?:ITEM|Item)\s+2\.?\s*Management.*Discussion(.*?)(?:ITEM|Item)\s+3"
-                }
-
-                for section_id, pattern in section_patterns.items():
-                    match = re.search(pattern, raw_text, re.DOTALL | re.IGNORECASE)
-                    if match and match.group(1):
-                        section_text = match.group(1).strip()
-                        if len(section_text) > 500:  # Only keep substantial sections
-                            readable_name = section_id.replace("_", " ").title()
-                            processed_sections[section_id] = {
-                                "heading": readable_name,
-                                "text": section_text
-                            }
-                            logging.info(f"Extracted fallback section {section_id} ({len(section_text)} chars)")
+            # Prepare narrative sections for LLM formatter from the section spans
+            processed_sections = spans_to_document_sections(segments['text'], segments['spans'])
 
             # Log sections found
             logging.info(f"Extracted {len(processed_sections)} document sections with text content")
@@ -344,7 +224,8 @@ class SECExtractor:
                 'file_size': file_size,
                 'file_size_mb': file_size / (1024 * 1024),
                 'word_count': len(extracted_text.split()),
-                'document_sections': processed_sections  # Add sections for LLM formatter
+                'document_sections': processed_sections,  # Add sections for LLM formatter
+                'section_index': section_index(segments['spans'])  # Section spans for filing metadata
             }
 
         except Exception as e:
@@ -376,13 +257,28 @@ class SECExtractor:
 
             # Use our new XBRL facts extractor
             from src2.xbrl.xbrl_facts_extractor import extract_facts_from_html
+            from src2.xbrl.xbrl_cache import CACHE_FILENAME, load_cached_facts, save_cached_facts
 
             # Determine the output path for the raw XBRL JSON
             html_file_path = Path(html_path)
             output_json_path = html_file_path.parent / "_xbrl_raw.json"
+            cache_path = html_file_path.parent / CACHE_FILENAME
+
+            # Reuse facts from the binary cache if the document is unchanged
+            with profile_span("facts_cache"):
+                xbrl_facts = load_cached_facts(cache_path, html_path)
+            if xbrl_facts is not None:
+                logging.info(f"Loaded {len(xbrl_facts)} inline XBRL facts from cache {cache_path}")
+                if not output_json_path.exists():
+                    with open(output_json_path, 'w', encoding='utf-8') as f_json:
+                        json.dump(xbrl_facts, f_json, indent=2)
+                return xbrl_facts
 
             # Extract facts and save to JSON file
-            xbrl_facts = extract_facts_from_html(html_path, output_json_path)
+            with profile_span("extract_facts"):
+                xbrl_facts = extract_facts_from_html(html_path, output_json_path)
+            with profile_span("facts_cache_save"):
+                save_cached_facts(cache_path, html_path, xbrl_facts)
 
             logging.info(f"Extracted {len(xbrl_facts)} inline XBRL facts and saved to {output_json_path}")
 
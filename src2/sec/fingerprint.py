@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Filing Build Fingerprints
+
+This module records, per processed filing, a fingerprint of its inputs
+(source document hashes) and of the code that produced each stage, so the
+pipeline can run incrementally and rebuild only the stages whose inputs or
+code version changed.
+"""
+
+import os
+import json
+import glob
+import logging
+import hashlib
+import datetime
+from pathlib import Path
+
+from src2 import config
+from src2.xbrl.xbrl_cache import write_xbrl_cache, read_xbrl_cache, XBRLCacheError
+
+# Bump to invalidate all recorded fingerprints (e.g. when the record layout changes)
+FINGERPRINT_VERSION = "1"
+
+# Source directory of the src2 package
+SRC2_DIR = Path(__file__).resolve().parent.parent
+
+# Code that determines the output of each stage. A change to any of these files
+# changes the stage fingerprint and forces that stage (and later ones) to rerun.
+STAGE_CODE_PATTERNS = {
+    "parse": [
+        "sec/extractor.py",
+        "sec/section_segmenter.py",
+        "xbrl/*.py"
+    ],
+    "llm_format": [
+        "formatter/*.py",
+        "storage/token_estimator.py"
+    ]
+}
+
+# Settings (config dictionary and keys) that determine the output of each stage.
+# They are read on every fingerprint, so settings changed at run time count too.
+# Settings that only affect speed or locations (workers, paths, cache bounds)
+# are left out, so changing them does not force a rebuild.
+STAGE_CONFIG_KEYS = {
+    "parse": [
+        ("HTML_TEXT_EXTRACTION", ("engine",))
+    ],
+    "llm_format": [
+        ("LLM_FORMATTING", ("profile", "section_index")),
+        ("LLM_CHUNKING", ("enabled", "max_tokens")),
+        ("TOKEN_ESTIMATION", ("method", "encoding")),
+        ("LLM_DELTA", ("enabled", "min_copy_bytes")),
+        ("TEXT_BLOCK_STORE", ("enabled", "scope", "min_chars"))
+    ]
+}
+
+# Parsed XBRL cache file name within a filing's fingerprint directory
+PARSED_FILENAME = "parsed.nxbc"
+
+# Download result fields that are safe to reuse on an incremental run
+REUSABLE_DOWNLOAD_FIELDS = ("doc_path", "xbrl_path", "idx_path", "index_path", "doc_url")
+
+_code_fingerprints = {}
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 hash of a file.
+
+    Args:
+        path: Path to the file
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest of the file content
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def combine_fingerprints(*parts):
+    """
+    Combine several fingerprint strings into one.
+
+    Args:
+        *parts: Fingerprint strings (None is treated as empty)
+
+    Returns:
+        Hex digest of the combined parts
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update((part or "").encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def get_code_fingerprint(stage):
+    """
+    Get the fingerprint of the source code that determines a stage's output.
+
+    The fingerprint is computed once per process from the stage's source files.
+
+    Args:
+        stage: Stage name (a key of STAGE_CODE_PATTERNS)
+
+    Returns:
+        Hex digest of the stage's source files
+    """
+    if stage in _code_fingerprints:
+        return _code_fingerprints[stage]
+
+    hasher = hashlib.sha256()
+    hasher.update(FINGERPRINT_VERSION.encode("utf-8"))
+
+    for pattern in STAGE_CODE_PATTERNS.get(stage, []):
+        for path in sorted(glob.glob(str(SRC2_DIR / pattern))):
+            hasher.update(os.path.relpath(path, SRC2_DIR).encode("utf-8"))
+            try:
+                hasher.update(hash_file(path).encode("utf-8"))
+            except OSError as e:
+                logging.warning(f"Could not hash source file {path}: {str(e)}")
+
+    _code_fingerprints[stage] = hasher.hexdigest()
+    return _code_fingerprints[stage]
+
+
+def get_config_fingerprint(stage):
+    """
+    Get the fingerprint of the settings that determine a stage's output.
+
+    Args:
+        stage: Stage name (a key of STAGE_CONFIG_KEYS)
+
+    Returns:
+        Hex digest of a canonical dump of the stage's settings
+    """
+    settings = {}
+    for name, keys in STAGE_CONFIG_KEYS.get(stage, []):
+        values = getattr(config, name, {})
+        settings[name] = {key: values.get(key) for key in keys}
+    dump = json.dumps(settings, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(dump.encode("utf-8")).hexdigest()
+
+
+def compute_stage_fingerprints(source_hash):
+    """
+    Compute the fingerprint of every stage for a given source document.
+
+    Each stage fingerprint covers the stage's code and settings and chains the
+    previous one, so a change to an earlier stage's inputs, code or settings
+    invalidates all later stages as well.
+
+    Args:
+        source_hash: Hash of the downloaded source document
+
+    Returns:
+        Dictionary of stage name to fingerprint
+    """
+    parse_fingerprint = combine_fingerprints(
+        source_hash, get_code_fingerprint("parse"), get_config_fingerprint("parse"))
+    format_fingerprint = combine_fingerprints(
+        parse_fingerprint, get_code_fingerprint("llm_format"), get_config_fingerprint("llm_format"))
+
+    return {
+        "download": source_hash,
+        "parse": parse_fingerprint,
+        "llm_format": format_fingerprint
+    }
+
+
+class FilingFingerprintStore:
+    """
+    Store of per-filing build records and cached parsed XBRL data.
+
+    Records are kept under <output_dir>/.fingerprints/<TICKER>/ keyed by
+    accession number, next to the parsed XBRL data they describe (stored in
+    the compact binary format of src2.xbrl.xbrl_cache).
+    """
+
+    def __init__(self, output_dir):
+        """
+        Initialize the fingerprint store.
+
+        Args:
+            output_dir: Pipeline output directory
+        """
+        self.base_dir = Path(output_dir) / ".fingerprints"
+
+    def _filing_dir(self, ticker, accession_number):
+        acc_no_dashes = str(accession_number).replace('-', '')
+        return self.base_dir / str(ticker).upper() / acc_no_dashes
+
+    def _write_json(self, path, data):
+        """Write JSON atomically so concurrent readers never see a partial file."""
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+
+    def load_record(self, ticker, accession_number):
+        """
+        Load the build record of a filing.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+
+        Returns:
+            Record dictionary or None if the filing has not been built
+        """
+        record_path = self._filing_dir(ticker, accession_number) / "record.json"
+        if not record_path.exists():
+            return None
+
+        try:
+            with open(record_path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read build record {record_path}: {str(e)}")
+            return None
+
+        if record.get("version") != FINGERPRINT_VERSION:
+            return None
+        return record
+
+    def save_record(self, ticker, accession_number, record):
+        """
+        Save the build record of a filing.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+            record: Record dictionary
+        """
+        record = dict(record)
+        record["version"] = FINGERPRINT_VERSION
+        record["updated_at"] = datetime.datetime.now().isoformat()
+        self._write_json(self._filing_dir(ticker, accession_number) / "record.json", record)
+
+    def save_parsed(self, ticker, accession_number, xbrl_data, metadata):
+        """
+        Cache the parsed XBRL data and formatter metadata of a filing.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+            xbrl_data: Parsed XBRL data passed to the LLM formatter
+            metadata: Filing metadata passed to the LLM formatter
+        """
+        write_xbrl_cache(self._filing_dir(ticker, accession_number) / PARSED_FILENAME, xbrl_data, metadata)
+
+    def load_parsed(self, ticker, accession_number):
+        """
+        Load the cached parsed XBRL data and formatter metadata of a filing.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+
+        Returns:
+            Tuple of (xbrl_data, metadata) or None if not cached
+        """
+        parsed_path = self._filing_dir(ticker, accession_number) / PARSED_FILENAME
+        if not parsed_path.exists():
+            return None
+
+        try:
+            return read_xbrl_cache(parsed_path)
+        except (XBRLCacheError, OSError) as e:
+            logging.warning(f"Could not read parsed XBRL cache {parsed_path}: {str(e)}")
+            return None
+
+    def has_parsed(self, ticker, accession_number):
+        """Check whether parsed XBRL data is cached for a filing."""
+        return (self._filing_dir(ticker, accession_number) / PARSED_FILENAME).exists()
+
+    def plan(self, ticker, accession_number, upload_required=False):
+        """
+        Decide which stages of a filing need to be rebuilt.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+            upload_required: Outputs are uploaded (GCP storage configured), so a
+                build whose upload did not succeed is not up to date
+
+        Returns:
+            Dictionary with:
+            - action: "skip" (up to date), "reformat" (rerun formatting from cached
+              parsed XBRL), "reparse" (reuse the download, rerun render and later
+              stages) or "full" (rerun everything)
+            - record: Existing build record (None for "full")
+            - fingerprints: Current stage fingerprints (None for "full")
+            - reason: Human-readable reason for the decision
+        """
+        record = self.load_record(ticker, accession_number)
+        if not record:
+            return {"action": "full", "record": None, "fingerprints": None, "reason": "no build record"}
+
+        doc_path = record.get("download", {}).get("doc_path")
+        if not doc_path or not os.path.exists(doc_path):
+            return {"action": "full", "record": record, "fingerprints": None, "reason": "source document missing"}
+
+        try:
+            source_hash = hash_file(doc_path)
+        except OSError as e:
+            return {"action": "full", "record": record, "fingerprints": None, "reason": f"source unreadable: {e}"}
+
+        recorded = record.get("fingerprints", {})
+        fingerprints = compute_stage_fingerprints(source_hash)
+
+        if recorded.get("download") != fingerprints["download"]:
+            return {"action": "full", "record": record, "fingerprints": None, "reason": "source document changed"}
+
+        if recorded.get("parse") != fingerprints["parse"]:
+            return {"action": "reparse", "record": record, "fingerprints": fingerprints, "reason": "parser code or settings changed"}
+
+        if not self.has_parsed(ticker, accession_number):
+            return {"action": "reparse", "record": record, "fingerprints": fingerprints, "reason": "parsed XBRL cache missing"}
+
+        if recorded.get("llm_format") != fingerprints["llm_format"]:
+            return {"action": "reformat", "record": record, "fingerprints": fingerprints, "reason": "formatter code or settings changed"}
+
+        llm_path = record.get("llm_path")
+        if not llm_path or not os.path.exists(llm_path):
+            return {"action": "reformat", "record": record, "fingerprints": fingerprints, "reason": "LLM output missing"}
+
+        if hash_file(llm_path) != record.get("llm_sha256"):
+            return {"action": "reformat", "record": record, "fingerprints": fingerprints, "reason": "LLM output modified"}
+
+        if upload_required and record.get("uploaded") is not True:
+            return {"action": "reformat", "record": record, "fingerprints": fingerprints, "reason": "upload not completed"}
+
+        return {"action": "skip", "record": record, "fingerprints": fingerprints, "reason": "up to date"}
+
+    def record_build(self, ticker, accession_number, download_result, llm_path, uploaded=None):
+        """
+        Record a successful build of a filing.
+
+        Args:
+            ticker: Company ticker
+            accession_number: Filing accession number
+            download_result: Result of the download stage
+            llm_path: Path to the generated LLM file
+            uploaded: Whether the LLM file was uploaded (None if uploads are not configured)
+
+        Returns:
+            The saved record, or None if it could not be recorded
+        """
+        doc_path = download_result.get("doc_path")
+        if not doc_path or not os.path.exists(doc_path) or not os.path.exists(str(llm_path)):
+            return None
+
+        try:
+            record = {
+                "ticker": ticker,
+                "accession_number": accession_number,
+                "download": {
+                    key: str(download_result[key])
+                    for key in REUSABLE_DOWNLOAD_FIELDS if download_result.get(key)
+                },
+                "fingerprints": compute_stage_fingerprints(hash_file(doc_path)),
+                "llm_path": str(llm_path),
+                "llm_sha256": hash_file(llm_path),
+                "uploaded": uploaded
+            }
+            self.save_record(ticker, accession_number, record)
+            return record
+        except Exception as e:
+            logging.warning(f"Could not record build for {ticker} {accession_number}: {str(e)}")
+            return None
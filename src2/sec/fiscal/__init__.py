@@ -1,2 +1,5 @@
 # src2/sec/fiscal/__init__.py
-from .company_fiscal import CompanyFiscalCalendar, FiscalCalendarRegistry, fiscal_registry
\ No newline at end of file
+from .company_fiscal import CompanyFiscalCalendar, FiscalCalendarRegistry, fiscal_registry
+from .fiscal_store import FiscalStore
+from .calendar_generator import FiscalYearEndRule, GeneratedFiscalCalendar, generate_fiscal_calendar
+from .bulk_resolver import BulkFiscalResult, resolve_fiscal_periods, resolve_filing_records
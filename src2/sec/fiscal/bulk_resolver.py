@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Bulk Fiscal Period Resolution
+
+Resolves fiscal years and periods for many (ticker, period_end_date,
+filing_type) rows in one vectorized pass, for planning runs and for
+re-tagging existing filing metadata. Rows are grouped by ticker and looked
+up with NumPy binary search against each company's explicit period end date
+mappings and its generated fiscal calendar, giving the same answers as
+FiscalCalendarRegistry.determine_fiscal_period without building a
+FiscalPeriodInfo and logging for every row.
+
+Results are columnar (one NumPy array per field) with an error code per row.
+"""
+
+import datetime
+
+import numpy as np
+
+from .fiscal_data import validate_period_end_date, FiscalDataError
+from .calendar_generator import (
+    DEFAULT_START_YEAR, DEFAULT_YEARS_AHEAD, DEFAULT_TOLERANCE_DAYS, generate_fiscal_calendar
+)
+
+# Error codes
+OK = 0
+INVALID_DATE = 1
+NO_CALENDAR = 2
+NO_MAPPING = 3
+
+ERROR_MESSAGES = {
+    OK: None,
+    INVALID_DATE: "Invalid period_end_date",
+    NO_CALENDAR: "No fiscal calendar found",
+    NO_MAPPING: "No mapping found for period end date"
+}
+
+_generated_arrays = {}
+
+
+def _parse_dates(period_end_dates):
+    """
+    Parse period end dates into a datetime64[D] array (NaT where invalid).
+
+    ISO dates are parsed in one vectorized conversion; only rows in other
+    formats go through validate_period_end_date.
+    """
+    values = np.asarray(period_end_dates, dtype=object)
+    try:
+        return values.astype("datetime64[D]")
+    except (ValueError, TypeError):
+        pass
+
+    parsed = np.empty(len(values), dtype="datetime64[D]")
+    for index, value in enumerate(values):
+        try:
+            parsed[index] = np.datetime64(validate_period_end_date(str(value)) if value else "NaT", "D")
+        except (FiscalDataError, ValueError, TypeError):
+            parsed[index] = np.datetime64("NaT")
+    return parsed
+
+
+def _mapping_arrays(period_end_dates):
+    """Sorted date, fiscal year and fiscal period arrays of explicit mappings."""
+    if not period_end_dates:
+        return None
+    items = sorted(period_end_dates.items())
+    dates = np.array([date for date, _ in items], dtype="datetime64[D]")
+    years = np.array([str(info.get("fiscal_year")) for _, info in items])
+    periods = np.array([str(info.get("fiscal_period")) for _, info in items])
+    return dates, years, periods
+
+
+def _generated_calendar_arrays(rule, dates):
+    """Sorted arrays of a generated calendar that covers all given dates."""
+    valid = dates[~np.isnat(dates)]
+    if len(valid) == 0:
+        return None
+
+    # Generate a calendar covering the earliest and latest date
+    first_year = int(str(valid.min())[:4]) - 1
+    last_year = int(str(valid.max())[:4]) + 1
+    generated = generate_fiscal_calendar(
+        rule,
+        min(first_year, DEFAULT_START_YEAR),
+        max(last_year, datetime.date.today().year + DEFAULT_YEARS_AHEAD)
+    )
+
+    key = (rule.key(), generated.start_year, generated.end_year)
+    arrays = _generated_arrays.get(key)
+    if arrays is None:
+        arrays = (
+            np.array([iso_date for iso_date, _, _ in generated.periods], dtype="datetime64[D]"),
+            np.array([fiscal_year for _, fiscal_year, _ in generated.periods]),
+            np.array([fiscal_period for _, _, fiscal_period in generated.periods])
+        )
+        _generated_arrays[key] = arrays
+    return arrays
+
+
+def _nearest(sorted_dates, dates):
+    """Index of and distance in days to the nearest sorted date for each date."""
+    right = np.searchsorted(sorted_dates, dates)
+    right = np.clip(right, 0, len(sorted_dates) - 1)
+    left = np.clip(right - 1, 0, len(sorted_dates) - 1)
+
+    right_distance = np.abs((sorted_dates[right] - dates).astype(np.int64))
+    left_distance = np.abs((sorted_dates[left] - dates).astype(np.int64))
+    use_left = left_distance < right_distance
+
+    return np.where(use_left, left, right), np.where(use_left, left_distance, right_distance)
+
+
+class BulkFiscalResult:
+    """
+    Columnar result of bulk fiscal period resolution.
+
+    Attributes (NumPy arrays, one entry per input row):
+        ticker: Upper-case ticker
+        period_end_date: Parsed period end date (datetime64[D], NaT if invalid)
+        filing_type: Filing type ("" if not given)
+        fiscal_year: Fiscal year ("" if unresolved)
+        fiscal_period: Fiscal period ("" if unresolved)
+        error_code: OK, INVALID_DATE, NO_CALENDAR or NO_MAPPING
+        generated: True if resolved from the generated calendar
+        distance_days: Days between the date and the matched period end
+    """
+
+    COLUMNS = ("ticker", "period_end_date", "filing_type", "fiscal_year", "fiscal_period",
+               "error_code", "generated", "distance_days")
+
+    def __init__(self, **columns):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.ticker)
+
+    @property
+    def resolved(self):
+        """Boolean mask of rows that were resolved."""
+        return self.error_code == OK
+
+    def summary(self):
+        """
+        Count rows per error code.
+
+        Returns:
+            Dict of error name to row count
+        """
+        names = {OK: "ok", INVALID_DATE: "invalid_date", NO_CALENDAR: "no_calendar", NO_MAPPING: "no_mapping"}
+        counts = np.bincount(self.error_code, minlength=len(names))
+        return {names[code]: int(counts[code]) for code in names}
+
+    def to_dict(self):
+        """Columns as a dictionary of arrays."""
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    def to_records(self):
+        """
+        Convert to one dictionary per row, in the shape of determine_fiscal_period results.
+
+        Returns:
+            List of dictionaries
+        """
+        records = []
+        for index in range(len(self)):
+            code = int(self.error_code[index])
+            date = self.period_end_date[index]
+            record = {
+                "ticker": str(self.ticker[index]),
+                "period_end_date": None if np.isnat(date) else str(date),
+                "filing_type": str(self.filing_type[index]) or None,
+                "fiscal_year": str(self.fiscal_year[index]) or None,
+                "fiscal_period": str(self.fiscal_period[index]) or None
+            }
+            if code != OK:
+                record["error"] = ERROR_MESSAGES[code]
+                record["error_code"] = code
+            records.append(record)
+        return records
+
+
+def resolve_fiscal_periods(tickers, period_end_dates, filing_types=None, registry=None,
+                           tolerance_days=DEFAULT_TOLERANCE_DAYS, infer_rules=True):
+    """
+    Resolve fiscal years and periods for many filings at once.
+
+    Args:
+        tickers: Sequence of ticker symbols
+        period_end_dates: Sequence of period end dates (YYYY-MM-DD preferred)
+        filing_types: Optional sequence of filing types ("10-K", "10-Q")
+        registry: FiscalCalendarRegistry to use (defaults to the global registry)
+        tolerance_days: Maximum distance to a generated period end date
+        infer_rules: Infer the fiscal year end rule of companies without one from
+            their 10-K rows, as determine_fiscal_period does (in memory only;
+            bulk resolution never stores rules)
+
+    Returns:
+        BulkFiscalResult
+    """
+    if registry is None:
+        from .company_fiscal import fiscal_registry as registry
+
+    tickers = np.char.upper(np.asarray(tickers, dtype=str))
+    dates = _parse_dates(period_end_dates)
+    count = len(tickers)
+    if len(dates) != count:
+        raise ValueError("tickers and period_end_dates must have the same length")
+
+    if filing_types is None:
+        filing_types = np.full(count, "", dtype="<U6")
+    else:
+        filing_types = np.asarray([filing_type or "" for filing_type in filing_types], dtype=str)
+
+    fiscal_years = np.full(count, "", dtype="<U8")
+    fiscal_periods = np.full(count, "", dtype="<U6")
+    error_codes = np.full(count, NO_CALENDAR, dtype=np.int8)
+    generated = np.zeros(count, dtype=bool)
+    distances = np.zeros(count, dtype=np.int32)
+
+    invalid = np.isnat(dates)
+    error_codes[invalid] = INVALID_DATE
+
+    unique_tickers, inverse = np.unique(tickers, return_inverse=True)
+    for ticker_index, ticker in enumerate(unique_tickers):
+        rows = np.nonzero((inverse == ticker_index) & ~invalid)[0]
+        if len(rows) == 0:
+            continue
+        ticker = str(ticker)
+        row_dates = dates[rows]
+
+        calendar = registry.get_calendar(ticker)
+
+        # Learn the fiscal year end rule from a 10-K row, as the per-filing path does
+        if infer_rules and (not calendar or not calendar.rule):
+            annual_rows = rows[filing_types[rows] == "10-K"]
+            mapped = calendar.period_end_dates if calendar else {}
+            unmapped_annual = [str(dates[row]) for row in annual_rows if str(dates[row]) not in mapped]
+            if unmapped_annual:
+                registry.infer_fiscal_year_end_rule(ticker, unmapped_annual[0])
+                calendar = registry.get_calendar(ticker)
+
+        if not calendar:
+            continue
+
+        pending = np.ones(len(rows), dtype=bool)
+
+        # Exact matches against explicit mappings
+        mapping = _mapping_arrays(calendar.period_end_dates)
+        if mapping is not None:
+            mapped_dates, mapped_years, mapped_periods = mapping
+            nearest, distance = _nearest(mapped_dates, row_dates)
+            exact = distance == 0
+            fiscal_years[rows[exact]] = mapped_years[nearest[exact]]
+            fiscal_periods[rows[exact]] = mapped_periods[nearest[exact]]
+            error_codes[rows[exact]] = OK
+            pending &= ~exact
+
+        # Nearest period end of the generated calendar
+        if calendar.rule and pending.any():
+            arrays = _generated_calendar_arrays(calendar.rule, row_dates[pending])
+            if arrays is not None:
+                generated_dates, generated_years, generated_periods = arrays
+                pending_rows = rows[pending]
+                nearest, distance = _nearest(generated_dates, row_dates[pending])
+                match = distance <= tolerance_days
+                fiscal_years[pending_rows[match]] = generated_years[nearest[match]]
+                fiscal_periods[pending_rows[match]] = generated_periods[nearest[match]]
+                error_codes[pending_rows[match]] = OK
+                generated[pending_rows[match]] = True
+                distances[pending_rows[match]] = distance[match]
+                pending[np.nonzero(pending)[0][match]] = False
+
+        error_codes[rows[pending]] = NO_MAPPING
+
+    return BulkFiscalResult(
+        ticker=tickers,
+        period_end_date=dates,
+        filing_type=filing_types,
+        fiscal_year=fiscal_years,
+        fiscal_period=fiscal_periods,
+        error_code=error_codes,
+        generated=generated,
+        distance_days=distances
+    )
+
+
+def resolve_filing_records(records, registry=None, **kwargs):
+    """
+    Resolve fiscal periods for filing metadata records (e.g. Firestore documents).
+
+    Args:
+        records: Sequence of dictionaries with "ticker" (or "company_ticker"),
+            "period_end_date" and optionally "filing_type"
+        registry: FiscalCalendarRegistry to use (defaults to the global registry)
+        **kwargs: Passed to resolve_fiscal_periods
+
+    Returns:
+        BulkFiscalResult in the order of the records
+    """
+    tickers = [record.get("ticker") or record.get("company_ticker") or "" for record in records]
+    dates = [record.get("period_end_date") for record in records]
+    filing_types = [record.get("filing_type") for record in records]
+    return resolve_fiscal_periods(tickers, dates, filing_types, registry=registry, **kwargs)
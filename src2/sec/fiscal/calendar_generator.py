@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Fiscal Calendar Generator
+
+Generates every period end date of a company's fiscal calendar from its
+fiscal year end rule, instead of relying on hand-maintained date mappings.
+
+Supported rules:
+- Fixed date: the fiscal year ends on the same date every year (e.g. June 30),
+  and quarters end on the same day three, six and nine months earlier.
+- 52/53-week: the fiscal year ends on the last given weekday of a month (e.g.
+  the last Saturday of September) or on that weekday nearest the month end.
+  Quarters are 13 weeks long; in 53-week years one quarter gets 14 weeks.
+
+Generated calendars keep a hash table of period end dates for exact lookups
+and a sorted array of date ordinals for nearest-date binary search, so
+resolving a period end date is O(1) (exact) or O(log n) (nearest).
+"""
+
+import bisect
+import calendar
+import datetime
+import functools
+
+FIXED = "fixed"
+LAST_WEEKDAY = "last_weekday"
+NEAREST_WEEKDAY = "nearest_weekday"
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Default span of generated calendars (EDGAR full-text filings start in 1993)
+DEFAULT_START_YEAR = 1993
+DEFAULT_YEARS_AHEAD = 5
+
+# Maximum distance in days between a reported period end date and a generated
+# one for the nearest-date lookup to accept it (quarters are ~91 days apart)
+DEFAULT_TOLERANCE_DAYS = 7
+
+
+class FiscalYearEndRule:
+    """
+    Rule that determines the last day of each fiscal year.
+    """
+
+    def __init__(self, month, day=None, kind=FIXED, weekday=None, extra_week_quarter=4, fiscal_year_offset=0):
+        """
+        Initialize the rule
+
+        Args:
+            month (int): Month in which the fiscal year ends (1-12)
+            day (int, optional): Day of the fixed fiscal year end (FIXED rules;
+                values past the month end mean the last day of the month)
+            kind (str): FIXED, LAST_WEEKDAY or NEAREST_WEEKDAY
+            weekday (int or str, optional): Weekday the fiscal year ends on for
+                52/53-week rules (0=Monday ... 6=Sunday, or a weekday name)
+            extra_week_quarter (int): Quarter that gets the 14th week in 53-week years
+            fiscal_year_offset (int): Added to the calendar year of the fiscal year
+                end to get the fiscal year label (0 for nearly all companies)
+        """
+        if kind not in (FIXED, LAST_WEEKDAY, NEAREST_WEEKDAY):
+            raise ValueError(f"Unknown fiscal year end rule kind: {kind}")
+        if not 1 <= int(month) <= 12:
+            raise ValueError(f"Invalid fiscal year end month: {month}")
+
+        if isinstance(weekday, str):
+            weekday = WEEKDAYS.index(weekday.lower())
+        if kind != FIXED and weekday is None:
+            raise ValueError("52/53-week fiscal year end rules require a weekday")
+
+        self.month = int(month)
+        self.day = int(day) if day else 31
+        self.kind = kind
+        self.weekday = weekday
+        self.extra_week_quarter = int(extra_week_quarter)
+        self.fiscal_year_offset = int(fiscal_year_offset)
+
+        # A fixed year end on the last day of its month means quarters end on month ends too
+        if self.day >= calendar.monthrange(2001, self.month)[1]:
+            self.day = 31
+
+    def __repr__(self):
+        if self.kind == FIXED:
+            return f"FiscalYearEndRule(fixed {self.month:02d}-{self.day:02d})"
+        return f"FiscalYearEndRule({self.kind} {WEEKDAYS[self.weekday]} of month {self.month})"
+
+    def __eq__(self, other):
+        return isinstance(other, FiscalYearEndRule) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        """Hashable identity of the rule."""
+        return (self.kind, self.month, self.day, self.weekday, self.extra_week_quarter, self.fiscal_year_offset)
+
+    def to_dict(self):
+        """Convert to dictionary for storage"""
+        return {
+            "kind": self.kind,
+            "month": self.month,
+            "day": self.day,
+            "weekday": self.weekday,
+            "extra_week_quarter": self.extra_week_quarter,
+            "fiscal_year_offset": self.fiscal_year_offset
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create from dictionary"""
+        return cls(
+            month=data["month"],
+            day=data.get("day"),
+            kind=data.get("kind", FIXED),
+            weekday=data.get("weekday"),
+            extra_week_quarter=data.get("extra_week_quarter", 4),
+            fiscal_year_offset=data.get("fiscal_year_offset", 0)
+        )
+
+    @classmethod
+    def infer(cls, fiscal_year_end_date):
+        """
+        Infer a rule from one known fiscal year end (e.g. a 10-K period end date).
+
+        Month-end dates give a fixed rule; dates in the last week of a month give
+        a "last weekday of the month" rule, and dates in the first days of a month
+        give a "weekday nearest the end of the previous month" rule.
+
+        Args:
+            fiscal_year_end_date (str or date): Fiscal year end date
+
+        Returns:
+            FiscalYearEndRule
+        """
+        date = _to_date(fiscal_year_end_date)
+        days_in_month = calendar.monthrange(date.year, date.month)[1]
+
+        if date.day == days_in_month:
+            return cls(month=date.month, day=31)
+        if date.day > days_in_month - 7:
+            return cls(month=date.month, kind=LAST_WEEKDAY, weekday=date.weekday())
+        if date.day <= 3:
+            previous_month = 12 if date.month == 1 else date.month - 1
+            return cls(month=previous_month, kind=NEAREST_WEEKDAY, weekday=date.weekday())
+        return cls(month=date.month, day=date.day)
+
+    def fiscal_year_end(self, year):
+        """
+        Get the fiscal year end date that falls in (or next to) a calendar year.
+
+        Args:
+            year (int): Calendar year of the fiscal year end month
+
+        Returns:
+            datetime.date
+        """
+        days_in_month = calendar.monthrange(year, self.month)[1]
+        month_end = datetime.date(year, self.month, days_in_month)
+
+        if self.kind == FIXED:
+            return datetime.date(year, self.month, min(self.day, days_in_month))
+
+        last_weekday = month_end - datetime.timedelta(days=(month_end.weekday() - self.weekday) % 7)
+        if self.kind == LAST_WEEKDAY:
+            return last_weekday
+
+        # NEAREST_WEEKDAY: the weekday closest to the month end (may be in the next month)
+        next_weekday = last_weekday + datetime.timedelta(days=7)
+        if (next_weekday - month_end) < (month_end - last_weekday):
+            return next_weekday
+        return last_weekday
+
+    def quarter_ends(self, year):
+        """
+        Get the period end dates of the fiscal year ending in a calendar year.
+
+        Args:
+            year (int): Calendar year of the fiscal year end month
+
+        Returns:
+            List of (date, fiscal_period) for Q1, Q2, Q3 and the annual period
+        """
+        fiscal_year_end = self.fiscal_year_end(year)
+
+        if self.kind == FIXED:
+            periods = []
+            for quarter in (1, 2, 3):
+                months_before_end = 12 - 3 * quarter
+                month_index = (year * 12 + self.month - 1) - months_before_end
+                q_year, q_month = divmod(month_index, 12)
+                q_month += 1
+                days_in_month = calendar.monthrange(q_year, q_month)[1]
+                periods.append((datetime.date(q_year, q_month, min(self.day, days_in_month)), f"Q{quarter}"))
+            periods.append((fiscal_year_end, "annual"))
+            return periods
+
+        previous_end = self.fiscal_year_end(year - 1)
+        is_53_week_year = (fiscal_year_end - previous_end).days == 371
+
+        periods = []
+        for quarter in (1, 2, 3):
+            weeks = 13 * quarter
+            if is_53_week_year and quarter >= self.extra_week_quarter:
+                weeks += 1
+            periods.append((previous_end + datetime.timedelta(weeks=weeks), f"Q{quarter}"))
+        periods.append((fiscal_year_end, "annual"))
+        return periods
+
+
+def _to_date(value):
+    """Convert a YYYY-MM-DD string, date or datetime to a date."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+class GeneratedFiscalCalendar:
+    """
+    All period end dates of a fiscal year end rule over a range of years.
+    """
+
+    def __init__(self, rule, start_year, end_year):
+        """
+        Generate the calendar
+
+        Args:
+            rule (FiscalYearEndRule): Fiscal year end rule
+            start_year (int): First calendar year of fiscal year ends to generate
+            end_year (int): Last calendar year of fiscal year ends to generate
+        """
+        self.rule = rule
+        self.start_year = start_year
+        self.end_year = end_year
+
+        # Hashed lookup: ISO date -> (fiscal_year, fiscal_period)
+        self.lookup = {}
+        # Sorted arrays for nearest-date search
+        self.ordinals = []
+        self.periods = []
+
+        entries = []
+        for year in range(start_year, end_year + 1):
+            fiscal_year = str(year + rule.fiscal_year_offset)
+            for date, fiscal_period in rule.quarter_ends(year):
+                entries.append((date.toordinal(), date.isoformat(), fiscal_year, fiscal_period))
+        entries.sort()
+
+        for ordinal, iso_date, fiscal_year, fiscal_period in entries:
+            self.lookup[iso_date] = (fiscal_year, fiscal_period)
+            self.ordinals.append(ordinal)
+            self.periods.append((iso_date, fiscal_year, fiscal_period))
+
+        # Reverse lookup: (fiscal_year, fiscal_period) -> ISO date
+        self.by_period = {(fy, fp): iso_date for iso_date, fy, fp in self.periods}
+
+    def __len__(self):
+        return len(self.periods)
+
+    @property
+    def period_end_dates(self):
+        """Period end dates in the registry mapping format."""
+        return {
+            iso_date: {"fiscal_year": fiscal_year, "fiscal_period": fiscal_period}
+            for iso_date, fiscal_year, fiscal_period in self.periods
+        }
+
+    def covers(self, date):
+        """Check whether a date is inside the generated range."""
+        return bool(self.ordinals) and self.ordinals[0] - 366 <= _to_date(date).toordinal() <= self.ordinals[-1] + 366
+
+    def resolve(self, period_end_date, tolerance_days=DEFAULT_TOLERANCE_DAYS):
+        """
+        Resolve a period end date to its fiscal year and period.
+
+        Args:
+            period_end_date (str or date): Period end date (YYYY-MM-DD)
+            tolerance_days (int): Maximum distance to the nearest generated
+                period end date (0 for exact matches only)
+
+        Returns:
+            dict with fiscal_year, fiscal_period, period_end_date (the generated
+            date), exact and distance_days, or None if no period end is close enough
+        """
+        if isinstance(period_end_date, str) and period_end_date in self.lookup:
+            fiscal_year, fiscal_period = self.lookup[period_end_date]
+            return {
+                "fiscal_year": fiscal_year,
+                "fiscal_period": fiscal_period,
+                "period_end_date": period_end_date,
+                "exact": True,
+                "distance_days": 0
+            }
+
+        try:
+            ordinal = _to_date(period_end_date).toordinal()
+        except (ValueError, TypeError):
+            return None
+
+        index = bisect.bisect_left(self.ordinals, ordinal)
+        best = None
+        for candidate in (index - 1, index):
+            if 0 <= candidate < len(self.ordinals):
+                distance = abs(self.ordinals[candidate] - ordinal)
+                if best is None or distance < best[1]:
+                    best = (candidate, distance)
+
+        if best is None or best[1] > tolerance_days:
+            return None
+
+        iso_date, fiscal_year, fiscal_period = self.periods[best[0]]
+        return {
+            "fiscal_year": fiscal_year,
+            "fiscal_period": fiscal_period,
+            "period_end_date": iso_date,
+            "exact": best[1] == 0,
+            "distance_days": best[1]
+        }
+
+    def period_end_date(self, fiscal_year, fiscal_period):
+        """
+        Get the period end date of a fiscal period.
+
+        Args:
+            fiscal_year (str or int): Fiscal year
+            fiscal_period (str): "Q1", "Q2", "Q3" or "annual"
+
+        Returns:
+            ISO date string, or None if outside the generated range
+        """
+        return self.by_period.get((str(fiscal_year), fiscal_period))
+
+    def last_period_on_or_before(self, date):
+        """
+        Get the most recent period that ended on or before a date.
+
+        Args:
+            date (str or date): Reference date
+
+        Returns:
+            Tuple of (iso_date, fiscal_year, fiscal_period), or None
+        """
+        index = bisect.bisect_right(self.ordinals, _to_date(date).toordinal())
+        return self.periods[index - 1] if index else None
+
+
+@functools.lru_cache(maxsize=1024)
+def _generate(rule_key, start_year, end_year):
+    kind, month, day, weekday, extra_week_quarter, fiscal_year_offset = rule_key
+    rule = FiscalYearEndRule(month, day=day, kind=kind, weekday=weekday,
+                             extra_week_quarter=extra_week_quarter, fiscal_year_offset=fiscal_year_offset)
+    return GeneratedFiscalCalendar(rule, start_year, end_year)
+
+
+def generate_fiscal_calendar(rule, start_year=None, end_year=None):
+    """
+    Generate (or get the cached) calendar of a fiscal year end rule.
+
+    Args:
+        rule (FiscalYearEndRule): Fiscal year end rule
+        start_year (int, optional): First year (default DEFAULT_START_YEAR)
+        end_year (int, optional): Last year (default DEFAULT_YEARS_AHEAD past the current year)
+
+    Returns:
+        GeneratedFiscalCalendar
+    """
+    if start_year is None:
+        start_year = DEFAULT_START_YEAR
+    if end_year is None:
+        end_year = datetime.date.today().year + DEFAULT_YEARS_AHEAD
+    return _generate(rule.key(), start_year, end_year)
+
+
+def get_calendar_for_date(rule, period_end_date):
+    """
+    Get a generated calendar of a rule that covers a date.
+
+    Args:
+        rule (FiscalYearEndRule): Fiscal year end rule
+        period_end_date (str or date): Date that must be covered
+
+    Returns:
+        GeneratedFiscalCalendar
+    """
+    generated = generate_fiscal_calendar(rule)
+    if generated.covers(period_end_date):
+        return generated
+
+    year = _to_date(period_end_date).year
+    return generate_fiscal_calendar(rule, min(year - 1, DEFAULT_START_YEAR), max(year + 1, generated.end_year))
+
+
+# Fiscal year end rules of companies with pre-defined calendars
+KNOWN_FISCAL_YEAR_END_RULES = {
+    # Apple: last Saturday of September; the 14th week of a 53-week year is in Q1
+    "AAPL": FiscalYearEndRule(month=9, kind=LAST_WEEKDAY, weekday="saturday", extra_week_quarter=1),
+    # NVIDIA: last Sunday of January; the 14th week of a 53-week year is in Q4
+    "NVDA": FiscalYearEndRule(month=1, kind=LAST_WEEKDAY, weekday="sunday", extra_week_quarter=4),
+    # Microsoft: June 30
+    "MSFT": FiscalYearEndRule(month=6, day=30),
+    # Alphabet and Tesla: calendar year
+    "GOOGL": FiscalYearEndRule(month=12, day=31),
+    "TSLA": FiscalYearEndRule(month=12, day=31)
+}
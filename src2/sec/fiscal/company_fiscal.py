@@ -7,26 +7,36 @@ Each company has a complete set of period end dates mapped to specific fiscal pe
 """
 
 import os
-import json
 import logging
 import datetime
+import threading
 from pathlib import Path
 
+from .fiscal_store import FiscalStore
+from .calendar_generator import FiscalYearEndRule, KNOWN_FISCAL_YEAR_END_RULES, get_calendar_for_date
+
 class CompanyFiscalCalendar:
     """
-    Company fiscal calendar using explicit period end date mappings
+    Company fiscal calendar using explicit period end date mappings, with a
+    generated calendar (from the fiscal year end rule) for dates not mapped
     """
 
-    def __init__(self, ticker, fiscal_data):
+    def __init__(self, ticker, fiscal_data, rule=None, rule_inferred=False):
         """
         Initialize with complete fiscal mapping data
 
         Args:
             ticker (str): Company ticker symbol
             fiscal_data (dict): Complete fiscal data including period_end_dates mapping
+            rule (FiscalYearEndRule, optional): Fiscal year end rule used to resolve
+                dates that have no explicit mapping
+            rule_inferred (bool): Whether the rule was inferred from a single 10-K
+                period end date rather than known or set explicitly
         """
         self.ticker = ticker.upper()
         self.period_end_dates = fiscal_data.get("period_end_dates", {})
+        self.rule = rule
+        self.rule_inferred = rule_inferred
 
     def to_dict(self):
         """Convert to dictionary for storage"""
@@ -75,6 +85,19 @@ class CompanyFiscalCalendar:
                 "validated_date": validated_date,
                 "validated": True
             }
+
+        # Fall back to the calendar generated from the fiscal year end rule
+        generated = self.resolve_generated(validated_date)
+        if generated:
+            return {
+                "fiscal_year": generated["fiscal_year"],
+                "fiscal_period": generated["fiscal_period"],
+                "validated_date": validated_date,
+                "validated": True,
+                "generated": True,
+                "generated_period_end_date": generated["period_end_date"],
+                "distance_days": generated["distance_days"]
+            }
         else:
             error_msg = f"No mapping found for period end date: {validated_date}"
             logging.error(error_msg)
@@ -87,6 +110,21 @@ class CompanyFiscalCalendar:
             }
 
 
+    def resolve_generated(self, period_end_date):
+        """
+        Resolve a period end date with the calendar generated from the fiscal year end rule
+
+        Args:
+            period_end_date (str): Period end date in YYYY-MM-DD format
+
+        Returns:
+            dict or None: Generated match (see GeneratedFiscalCalendar.resolve)
+        """
+        if not self.rule:
+            return None
+        return get_calendar_for_date(self.rule, period_end_date).resolve(period_end_date)
+
+
 class FiscalCalendarRegistry:
     """
     Registry for company fiscal calendars using explicit period end date mappings
@@ -274,14 +312,19 @@ class FiscalCalendarRegistry:
         }
     }
 
-    def __init__(self, registry_path=None):
+    def __init__(self, registry_path=None, store_path=None):
         """
         Initialize the registry
 
         Args:
-            registry_path (str, optional): Path to registry JSON file
+            registry_path (str, optional): Path to legacy registry JSON file,
+                imported into the store on first use
+            store_path (str, optional): Path to the SQLite fiscal store
+                (defaults to the registry path with a .db suffix)
         """
         self.registry = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
 
         # Set default registry path if not provided
         if not registry_path:
@@ -290,48 +333,75 @@ class FiscalCalendarRegistry:
         else:
             self.registry_path = Path(registry_path)
 
+        self.store_path = Path(store_path) if store_path else self.registry_path.with_suffix(".db")
+        self.store = None
+
         # Load the registry
         self._load_registry()
 
     def _load_registry(self):
-        """Load registry from pre-defined calendars and JSON file"""
+        """Load pre-defined calendars and open the store (stored calendars load lazily)"""
         # First load pre-defined calendars
         for ticker, calendar_data in self.COMPANY_CALENDARS.items():
             self.registry[ticker] = CompanyFiscalCalendar(
                 ticker=ticker,
-                fiscal_data=calendar_data
+                fiscal_data={"period_end_dates": dict(calendar_data["period_end_dates"])}
             )
 
-        # Then load from JSON file if it exists
-        if os.path.exists(self.registry_path):
-            try:
-                with open(self.registry_path, 'r') as f:
-                    registry_data = json.load(f)
-
-                for ticker, data in registry_data.items():
-                    # Only add if not already in registry
-                    if ticker not in self.registry:
-                        self.registry[ticker] = CompanyFiscalCalendar.from_dict(data)
-
-                logging.info(f"Loaded fiscal calendars for {len(self.registry)} companies")
-            except Exception as e:
-                logging.error(f"Error loading fiscal registry: {str(e)}")
-
-    def save_registry(self):
-        """Save registry to JSON file"""
+        # Then open the store, importing the legacy JSON file if there is one
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.registry_path), exist_ok=True)
+            self.store = FiscalStore(self.store_path)
+            self.store.import_json(self.registry_path, "calendars")
+        except Exception as e:
+            logging.error(f"Error opening fiscal store {self.store_path}: {str(e)}")
+            self.store = None
+
+    def _load_calendar(self, ticker):
+        """Merge a company's stored mappings and year end rule into the registry the first time it is used"""
+        with self._lock:
+            if ticker in self._loaded:
+                return
+
+            stored = None
+            rule = KNOWN_FISCAL_YEAR_END_RULES.get(ticker)
+            rule_inferred = False
+            if self.store is not None:
+                try:
+                    stored = self.store.get_period_end_dates(ticker)
+                    if rule is None:
+                        rule_data = self.store.get_rule(ticker)
+                        rule = FiscalYearEndRule.from_dict(rule_data) if rule_data else None
+                        rule_inferred = bool(rule_data and rule_data.get("inferred"))
+                except Exception as e:
+                    logging.error(f"Error loading fiscal calendar for {ticker}: {str(e)}")
+                    return
+            self._loaded.add(ticker)
+
+            if not stored and not rule:
+                return
+
+            calendar = self.registry.get(ticker)
+            if calendar is None:
+                calendar = CompanyFiscalCalendar(ticker=ticker, fiscal_data={"period_end_dates": stored or {}})
+                self.registry[ticker] = calendar
+            elif stored:
+                # Pre-defined mappings take precedence over stored ones
+                for period_end_date, info in stored.items():
+                    calendar.period_end_dates.setdefault(period_end_date, info)
+
+            if calendar.rule is None:
+                calendar.rule = rule
+                calendar.rule_inferred = rule_inferred
 
-            # Convert all calendars to dictionaries
-            registry_data = {
-                ticker: calendar.to_dict()
-                for ticker, calendar in self.registry.items()
-            }
+    def save_registry(self):
+        """Save all loaded calendars to the store"""
+        if self.store is None:
+            logging.error("Error saving fiscal registry: fiscal store not available")
+            return False
 
-            # Save to file
-            with open(self.registry_path, 'w') as f:
-                json.dump(registry_data, f, indent=2)
+        try:
+            for ticker, calendar in list(self.registry.items()):
+                self.store.upsert_period_end_dates(ticker, calendar.period_end_dates)
 
             logging.info(f"Saved fiscal registry with {len(self.registry)} companies")
             return True
@@ -350,6 +420,8 @@ class FiscalCalendarRegistry:
             CompanyFiscalCalendar or None: The company's fiscal calendar
         """
         ticker = ticker.upper()
+        if ticker not in self._loaded:
+            self._load_calendar(ticker)
         return self.registry.get(ticker)
 
     def add_period_end_date(self, ticker, period_end_date, fiscal_year, fiscal_period):
@@ -384,8 +456,16 @@ class FiscalCalendarRegistry:
             "fiscal_period": fiscal_period
         }
 
-        # Save the registry
-        return self.save_registry()
+        # Save only this mapping
+        if self.store is None:
+            logging.error("Error saving fiscal mapping: fiscal store not available")
+            return False
+        try:
+            self.store.upsert_period_end_date(ticker, period_end_date, fiscal_year, fiscal_period)
+            return True
+        except Exception as e:
+            logging.error(f"Error saving fiscal mapping for {ticker} {period_end_date}: {str(e)}")
+            return False
 
     def add_calendar(self, ticker, period_end_dates):
         """
@@ -400,15 +480,114 @@ class FiscalCalendarRegistry:
         """
         ticker = ticker.upper()
 
+        existing = self.get_calendar(ticker)
         calendar = CompanyFiscalCalendar(
             ticker=ticker,
-            fiscal_data={"period_end_dates": period_end_dates}
+            fiscal_data={"period_end_dates": period_end_dates},
+            rule=existing.rule if existing else None,
+            rule_inferred=existing.rule_inferred if existing else False
         )
 
         self.registry[ticker] = calendar
-        self.save_registry()
+        self._loaded.add(ticker)
+
+        # Replace this company's stored mappings in one transaction
+        if self.store is not None:
+            try:
+                self.store.upsert_period_end_dates(ticker, period_end_dates, replace=True)
+            except Exception as e:
+                logging.error(f"Error saving fiscal calendar for {ticker}: {str(e)}")
         return calendar
 
+    def get_fiscal_year_end_rule(self, ticker):
+        """
+        Get the fiscal year end rule of a company
+
+        Args:
+            ticker (str): Company ticker symbol
+
+        Returns:
+            FiscalYearEndRule or None
+        """
+        calendar = self.get_calendar(ticker)
+        return calendar.rule if calendar else None
+
+    def set_fiscal_year_end_rule(self, ticker, rule):
+        """
+        Set the fiscal year end rule of a company, so all its period end dates
+        resolve without explicit mappings
+
+        Args:
+            ticker (str): Company ticker symbol
+            rule (FiscalYearEndRule): Fiscal year end rule
+
+        Returns:
+            bool: True if successful
+        """
+        ticker = ticker.upper()
+        calendar = self.get_calendar(ticker)
+        if not calendar:
+            calendar = CompanyFiscalCalendar(ticker=ticker, fiscal_data={"period_end_dates": {}})
+            self.registry[ticker] = calendar
+        calendar.rule = rule
+        calendar.rule_inferred = False
+
+        return self._save_rule(ticker, rule.to_dict())
+
+    def infer_fiscal_year_end_rule(self, ticker, fiscal_year_end_date):
+        """
+        Infer the fiscal year end rule of a company without one from a 10-K
+        period end date, in memory only
+
+        One unusual filing could give a wrong rule, so an inferred rule is not
+        stored here; the pipeline stores it with save_inferred_rule once it has
+        processed the filing.
+
+        Args:
+            ticker (str): Company ticker symbol
+            fiscal_year_end_date (str): Period end date of a 10-K (YYYY-MM-DD)
+
+        Returns:
+            FiscalYearEndRule: The inferred rule
+        """
+        ticker = ticker.upper()
+        rule = FiscalYearEndRule.infer(fiscal_year_end_date)
+        logging.info(f"Inferred fiscal year end rule for {ticker} from 10-K period end {fiscal_year_end_date}: {rule}")
+
+        calendar = self.get_calendar(ticker)
+        if not calendar:
+            calendar = CompanyFiscalCalendar(ticker=ticker, fiscal_data={"period_end_dates": {}})
+            self.registry[ticker] = calendar
+        calendar.rule = rule
+        calendar.rule_inferred = True
+        return rule
+
+    def save_inferred_rule(self, ticker):
+        """
+        Store a company's inferred fiscal year end rule, marked as inferred
+
+        Args:
+            ticker (str): Company ticker symbol
+
+        Returns:
+            bool: True if an inferred rule was stored
+        """
+        calendar = self.get_calendar(ticker)
+        if not calendar or not calendar.rule or not calendar.rule_inferred:
+            return False
+        return self._save_rule(ticker.upper(), dict(calendar.rule.to_dict(), inferred=True))
+
+    def _save_rule(self, ticker, rule_data):
+        """Write a fiscal year end rule dictionary to the store"""
+        if self.store is None:
+            return False
+        try:
+            self.store.upsert_rule(ticker, rule_data)
+            return True
+        except Exception as e:
+            logging.error(f"Error saving fiscal year end rule for {ticker}: {str(e)}")
+            return False
+
     def determine_fiscal_period(self, ticker, period_end_date, filing_type=None):
         """
         Determine fiscal year and period for a company and specific period end date
@@ -453,6 +632,14 @@ class FiscalCalendarRegistry:
         # Step 2: Get the company's fiscal calendar
         calendar = self.get_calendar(ticker)
 
+        # A 10-K period end date is a fiscal year end, which is enough to
+        # generate the calendar of a company seen for the first time (the rule
+        # is kept in memory; see infer_fiscal_year_end_rule)
+        if (not calendar or not calendar.rule) and filing_type == "10-K":
+            if not calendar or normalized_date not in calendar.period_end_dates:
+                self.infer_fiscal_year_end_rule(ticker, normalized_date)
+                calendar = self.get_calendar(ticker)
+
         if not calendar:
             error_msg = f"No fiscal calendar found for {ticker}. Please add this company to the fiscal registry."
             logging.error(error_msg)
@@ -482,11 +669,13 @@ class FiscalCalendarRegistry:
                 fiscal_period=fiscal_period,
                 filing_type=filing_type,
                 source="company_fiscal_registry",
-                confidence=1.0,  # Highest confidence for explicit mappings
+                # Highest confidence for explicit mappings and exact generated dates
+                confidence=1.0 if not calendar_result.get("distance_days") else 0.9,
                 metadata={
                     "origin": "company_fiscal_registry",
                     "validated": True,
-                    "registry_lookup": True
+                    "registry_lookup": True,
+                    "generated_calendar": calendar_result.get("generated", False)
                 }
             )
 
@@ -11,12 +11,14 @@ fiscal periods across companies with different fiscal calendars. It works by:
 4. Providing consistent period naming across the entire system
 """
 
-import os
-import json
 import logging
 import datetime
 import re
 from collections import Counter, defaultdict
+from pathlib import Path
+
+from .fiscal_store import FiscalStore
+from .calendar_generator import get_calendar_for_date
 
 class FiscalSignal:
     """A piece of evidence about a company's fiscal period"""
@@ -573,6 +575,22 @@ class CompanyFiscalModel:
         if not period_end_date_str:
             return {"fiscal_year": None, "fiscal_period": None}
         
+        # Companies with a fiscal year end rule (known, stored or inferred by the
+        # fiscal registry) resolve from the generated calendar
+        from .company_fiscal import fiscal_registry
+        rule = fiscal_registry.get_fiscal_year_end_rule(self.ticker)
+        if rule:
+            try:
+                generated = get_calendar_for_date(rule, period_end_date_str).resolve(period_end_date_str)
+            except (ValueError, TypeError):
+                generated = None
+            # A 10-K always reports the annual period, even for an off-calendar date
+            if generated and (filing_type != "10-K" or generated["fiscal_period"] == "annual"):
+                return {
+                    "fiscal_year": generated["fiscal_year"],
+                    "fiscal_period": generated["fiscal_period"]
+                }
+        
         try:
             period_end = datetime.datetime.strptime(period_end_date_str, '%Y-%m-%d')
         except (ValueError, TypeError):
@@ -675,43 +693,42 @@ class FiscalPeriodManager:
     Provides a standardized interface for all fiscal period operations.
     """
     
-    def __init__(self, storage_path="data/fiscal_models.json"):
+    def __init__(self, storage_path="data/fiscal_models.json", store_path=None):
         """
         Initialize the manager
         
         Args:
-            storage_path (str): Path to store the fiscal models
+            storage_path (str): Path of the legacy JSON models file, imported
+                into the store on first use
+            store_path (str, optional): Path to the SQLite fiscal store
+                (defaults to storage_path with a .db suffix)
         """
         self.storage_path = storage_path
+        self.store_path = store_path or str(Path(storage_path).with_suffix(".db"))
+        self.store = None
         self.models = {}
         self.last_updated = datetime.datetime.now()
         self._load_registry()
     
     def _load_registry(self):
-        """Load models from storage"""
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
-                    
-                for ticker, model_data in data.items():
-                    self.models[ticker] = CompanyFiscalModel.from_dict(model_data)
-                    
-                logging.info(f"Loaded fiscal models for {len(self.models)} companies")
-            except Exception as e:
-                logging.error(f"Error loading fiscal models: {str(e)}")
-                self.models = {}
-        else:
-            os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-            self.models = {}
+        """Open the model store (models are loaded lazily per ticker)"""
+        try:
+            self.store = FiscalStore(self.store_path)
+            self.store.import_json(self.storage_path, "models")
+        except Exception as e:
+            logging.error(f"Error opening fiscal model store {self.store_path}: {str(e)}")
+            self.store = None
+        self.models = {}
     
     def save_registry(self):
-        """Save models to storage"""
+        """Save all loaded models to storage"""
+        if self.store is None:
+            logging.error("Error saving fiscal models: fiscal store not available")
+            return False
+
         try:
-            data = {ticker: model.to_dict() for ticker, model in self.models.items()}
-            
-            with open(self.storage_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            for ticker, model in list(self.models.items()):
+                self.store.upsert_model(ticker, model.to_dict())
                 
             self.last_updated = datetime.datetime.now()
             logging.info(f"Saved fiscal models for {len(self.models)} companies")
@@ -724,7 +741,13 @@ class FiscalPeriodManager:
         """Get a company's fiscal model"""
         ticker = ticker.upper()
         if ticker not in self.models:
-            self.models[ticker] = CompanyFiscalModel(ticker)
+            model_data = None
+            if self.store is not None:
+                try:
+                    model_data = self.store.get_model(ticker)
+                except Exception as e:
+                    logging.error(f"Error loading fiscal model for {ticker}: {str(e)}")
+            self.models[ticker] = CompanyFiscalModel.from_dict(model_data) if model_data else CompanyFiscalModel(ticker)
         return self.models[ticker]
     
     def update_model(self, ticker, filing_metadata):
@@ -739,10 +762,30 @@ class FiscalPeriodManager:
             dict: Updated fiscal information
         """
         ticker = ticker.upper()
-        model = self.get_model(ticker)
-        fiscal_info = model.update_from_filing(filing_metadata)
-        self.save_registry()
-        return fiscal_info
+
+        if self.store is None:
+            model = self.get_model(ticker)
+            return model.update_from_filing(filing_metadata)
+
+        # Apply the filing to the latest stored model and save it in one
+        # transaction, so parallel workers do not lose each other's updates
+        updated = {}
+
+        def apply(model_data):
+            model = CompanyFiscalModel.from_dict(model_data) if model_data else CompanyFiscalModel(ticker)
+            updated["fiscal_info"] = model.update_from_filing(filing_metadata)
+            updated["model"] = model
+            return model.to_dict()
+
+        try:
+            self.store.update_model(ticker, apply)
+            self.models[ticker] = updated["model"]
+            self.last_updated = datetime.datetime.now()
+            return updated["fiscal_info"]
+        except Exception as e:
+            logging.error(f"Error saving fiscal model for {ticker}: {str(e)}")
+            model = self.get_model(ticker)
+            return model.update_from_filing(filing_metadata)
     
     def determine_fiscal_period(self, ticker, period_end_date, filing_type="10-Q"):
         """
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Fiscal Data Store
+
+Transactional storage for fiscal calendars, fiscal year end rules and fiscal
+models, backed by SQLite in WAL mode. Rows are keyed by ticker, so adding a
+mapping or updating one company's model writes only that company's rows
+instead of rewriting a JSON file with every company in it, and several
+processes can read and write the store at the same time.
+
+Legacy JSON files (fiscal_calendars.json, fiscal_models.json) are imported
+the first time a store is opened next to them.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import datetime
+import threading
+from pathlib import Path
+
+# Seconds to wait for another writer to release its lock
+BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS period_end_dates (
+    ticker TEXT NOT NULL,
+    period_end_date TEXT NOT NULL,
+    fiscal_year TEXT NOT NULL,
+    fiscal_period TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (ticker, period_end_date)
+);
+CREATE TABLE IF NOT EXISTS fiscal_models (
+    ticker TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fiscal_year_end_rules (
+    ticker TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    imported_at TEXT NOT NULL
+);
+"""
+
+
+class FiscalStore:
+    """
+    SQLite-backed store of fiscal calendars, year end rules and fiscal models.
+
+    Each thread gets its own connection. Writes run in short IMMEDIATE
+    transactions, so concurrent writers queue on the database lock instead
+    of overwriting each other's changes.
+    """
+
+    def __init__(self, db_path):
+        """
+        Open (and create if needed) a fiscal store.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        """Get this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements):
+        """Run (sql, params) statements in one write transaction."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Fiscal calendars
+
+    def get_period_end_dates(self, ticker):
+        """
+        Get the period end date mappings of a company.
+
+        Args:
+            ticker: Company ticker symbol
+
+        Returns:
+            Dict of period end date to {"fiscal_year", "fiscal_period"}, or
+            None if the company has no stored mappings
+        """
+        rows = self._connection().execute(
+            "SELECT period_end_date, fiscal_year, fiscal_period FROM period_end_dates WHERE ticker = ?",
+            (ticker.upper(),)
+        ).fetchall()
+
+        if not rows:
+            return None
+        return {
+            period_end_date: {"fiscal_year": fiscal_year, "fiscal_period": fiscal_period}
+            for period_end_date, fiscal_year, fiscal_period in rows
+        }
+
+    def upsert_period_end_date(self, ticker, period_end_date, fiscal_year, fiscal_period):
+        """
+        Add or replace one period end date mapping.
+
+        Args:
+            ticker: Company ticker symbol
+            period_end_date: Period end date in YYYY-MM-DD format
+            fiscal_year: Fiscal year (e.g., "2023")
+            fiscal_period: Fiscal period (e.g., "Q1", "annual")
+        """
+        self.upsert_period_end_dates(ticker, {
+            period_end_date: {"fiscal_year": fiscal_year, "fiscal_period": fiscal_period}
+        })
+
+    def upsert_period_end_dates(self, ticker, period_end_dates, replace=False):
+        """
+        Add or replace several period end date mappings in one transaction.
+
+        Args:
+            ticker: Company ticker symbol
+            period_end_dates: Dict of period end date to fiscal info
+            replace: Remove the company's other mappings first
+        """
+        ticker = ticker.upper()
+        now = datetime.datetime.now().isoformat()
+
+        statements = []
+        if replace:
+            statements.append(("DELETE FROM period_end_dates WHERE ticker = ?", (ticker,)))
+        for period_end_date, info in period_end_dates.items():
+            statements.append((
+                "INSERT INTO period_end_dates (ticker, period_end_date, fiscal_year, fiscal_period, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (ticker, period_end_date) DO UPDATE SET "
+                "fiscal_year = excluded.fiscal_year, fiscal_period = excluded.fiscal_period, "
+                "updated_at = excluded.updated_at",
+                (ticker, period_end_date, str(info.get("fiscal_year")), str(info.get("fiscal_period")), now)
+            ))
+        self._write(statements)
+
+    def calendar_tickers(self):
+        """List the tickers that have stored period end date mappings."""
+        rows = self._connection().execute("SELECT DISTINCT ticker FROM period_end_dates ORDER BY ticker").fetchall()
+        return [row[0] for row in rows]
+
+    # Fiscal models
+
+    def get_model(self, ticker):
+        """
+        Get the stored fiscal model of a company.
+
+        Args:
+            ticker: Company ticker symbol
+
+        Returns:
+            Model dictionary, or None if not stored
+        """
+        row = self._connection().execute(
+            "SELECT data FROM fiscal_models WHERE ticker = ?", (ticker.upper(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert_model(self, ticker, model_data):
+        """
+        Add or replace the fiscal model of a company.
+
+        Args:
+            ticker: Company ticker symbol
+            model_data: Model dictionary
+        """
+        self._write([self._model_statement(ticker, model_data)])
+
+    def update_model(self, ticker, update):
+        """
+        Read, modify and write a company's model in one transaction, so
+        concurrent updates of the same company are applied one after another.
+
+        Args:
+            ticker: Company ticker symbol
+            update: Function taking the stored model dictionary (or None) and
+                returning the new model dictionary
+
+        Returns:
+            The new model dictionary
+        """
+        ticker = ticker.upper()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM fiscal_models WHERE ticker = ?", (ticker,)).fetchone()
+            model_data = update(json.loads(row[0]) if row else None)
+            conn.execute(*self._model_statement(ticker, model_data))
+            conn.execute("COMMIT")
+            return model_data
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _model_statement(self, ticker, model_data):
+        return (
+            "INSERT INTO fiscal_models (ticker, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (ticker) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (ticker.upper(), json.dumps(model_data, separators=(",", ":"), default=str), datetime.datetime.now().isoformat())
+        )
+
+    def model_tickers(self):
+        """List the tickers that have a stored fiscal model."""
+        rows = self._connection().execute("SELECT ticker FROM fiscal_models ORDER BY ticker").fetchall()
+        return [row[0] for row in rows]
+
+    # Fiscal year end rules
+
+    def get_rule(self, ticker):
+        """
+        Get the stored fiscal year end rule of a company.
+
+        Args:
+            ticker: Company ticker symbol
+
+        Returns:
+            Rule dictionary (see FiscalYearEndRule.to_dict), or None if not stored
+        """
+        row = self._connection().execute(
+            "SELECT data FROM fiscal_year_end_rules WHERE ticker = ?", (ticker.upper(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert_rule(self, ticker, rule_data):
+        """
+        Add or replace the fiscal year end rule of a company.
+
+        Args:
+            ticker: Company ticker symbol
+            rule_data: Rule dictionary
+        """
+        self._write([(
+            "INSERT INTO fiscal_year_end_rules (ticker, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (ticker) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (ticker.upper(), json.dumps(rule_data, separators=(",", ":")), datetime.datetime.now().isoformat())
+        )])
+
+    # Legacy JSON import
+
+    def import_json(self, json_path, kind):
+        """
+        Import a legacy JSON registry file once.
+
+        Args:
+            json_path: Path to fiscal_calendars.json ("calendars") or
+                fiscal_models.json ("models")
+            kind: "calendars" or "models"
+
+        Returns:
+            Number of companies imported (0 if already imported or missing)
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+
+        source = f"{kind}:{json_path.resolve()}"
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading legacy fiscal data {json_path}: {str(e)}")
+            return 0
+
+        now = datetime.datetime.now().isoformat()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have imported the file while we were reading it
+            if conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+                conn.execute("ROLLBACK")
+                return 0
+
+            for ticker, entry in data.items():
+                if kind == "calendars":
+                    for period_end_date, info in entry.get("period_end_dates", {}).items():
+                        conn.execute(
+                            "INSERT OR IGNORE INTO period_end_dates "
+                            "(ticker, period_end_date, fiscal_year, fiscal_period, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (ticker.upper(), period_end_date, str(info.get("fiscal_year")),
+                             str(info.get("fiscal_period")), now)
+                        )
+                else:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO fiscal_models (ticker, data, updated_at) VALUES (?, ?, ?)",
+                        (ticker.upper(), json.dumps(entry, separators=(",", ":"), default=str), now)
+                    )
+            conn.execute("INSERT INTO imports (source, imported_at) VALUES (?, ?)", (source, now))
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logging.error(f"Error importing legacy fiscal data {json_path}: {str(e)}")
+            return 0
+
+        if data:
+            logging.info(f"Imported fiscal {kind} for {len(data)} companies from {json_path}")
+        return len(data)
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Pipeline Instrumentation
+
+Records where the processing time and memory of a filing go, as a tree of
+nested spans. Each span has its wall time, the CPU time of the processing
+thread, the growth of the process peak RSS, optionally the tracemalloc peak,
+and counters (bytes read and written, facts, contexts, tables, ...).
+
+A FilingProfile is activated for the thread that processes a filing. Code at
+any depth opens spans with span() and adds counters with count(); both do
+nothing when no profile is active, so library code can be instrumented
+unconditionally. Profiles are written as JSON lines (one line per span) or
+Prometheus text, and BatchProfile aggregates the profiles of a batch by span
+path.
+
+Memory figures are process-wide: with several filings processed at once in
+one process, they include the other filings' allocations. Work done in
+subprocesses (Arelle, process pools) shows up as wall time only.
+
+Settings come from INSTRUMENTATION in config.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import datetime
+import threading
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src2.config import INSTRUMENTATION
+
+# Prefix of the Prometheus metric names
+METRIC_PREFIX = "nativellm"
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_active = threading.local()
+_no_span = nullcontext()
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+_write_lock = threading.Lock()
+
+
+def _peak_rss():
+    """Peak resident set size of the process in bytes (0 if unavailable)."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+class Span:
+    """
+    One timed step of a filing's processing
+    """
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.path = f"{parent.path}/{name}" if parent else name
+        self.children = []
+        self.counters = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = 0
+        self.rss_growth_bytes = 0
+        self.traced_peak_bytes = None
+        self._traced_start = 0
+        self._traced_peak = 0
+
+    def start(self, trace_memory=False):
+        """Start timing the span."""
+        self._rss_start = _peak_rss()
+        if trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the parent's peak before resetting it for this span
+            if self.parent is not None:
+                self.parent._traced_peak = max(self.parent._traced_peak, peak)
+            tracemalloc.reset_peak()
+            self._traced_start = self._traced_peak = current
+            self.traced_peak_bytes = 0
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def stop(self):
+        """Stop timing the span."""
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self.peak_rss_bytes = _peak_rss()
+        self.rss_growth_bytes = self.peak_rss_bytes - self._rss_start
+        if self.traced_peak_bytes is not None and tracemalloc.is_tracing():
+            self._traced_peak = max(self._traced_peak, tracemalloc.get_traced_memory()[1])
+            self.traced_peak_bytes = self._traced_peak - self._traced_start
+            if self.parent is not None:
+                self.parent._traced_peak = max(self.parent._traced_peak, self._traced_peak)
+
+    def add(self, name, value=1):
+        """Add to a counter of the span."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def walk(self):
+        """Yield this span and all its descendants, depth first."""
+        stack = [self]
+        while stack:
+            span = stack.pop()
+            yield span
+            stack.extend(reversed(span.children))
+
+    def to_dict(self):
+        """Nested dictionary of the span and its children."""
+        data = {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "rss_growth_bytes": self.rss_growth_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes
+        }
+        if self.traced_peak_bytes is not None:
+            data["traced_peak_bytes"] = self.traced_peak_bytes
+        if self.counters:
+            data["counters"] = dict(self.counters)
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children]
+        return data
+
+
+class FilingProfile:
+    """
+    Span tree of one filing's processing
+
+    Use activate() around the processing; the root span "filing" covers it.
+    """
+
+    def __init__(self, labels=None, trace_memory=None):
+        """
+        Initialize the profile.
+
+        Args:
+            labels: Labels identifying the filing (ticker, filing_type,
+                accession_number, ...), added to every output record
+            trace_memory: Whether to trace allocations with tracemalloc
+                (defaults to config)
+        """
+        self.labels = {key: str(value) for key, value in (labels or {}).items() if value is not None}
+        self.trace_memory = INSTRUMENTATION.get("tracemalloc", False) if trace_memory is None else trace_memory
+        self.root = Span("filing")
+        self.started_at = None
+        self._stack = []
+
+    @contextmanager
+    def activate(self):
+        """Make this the active profile of the current thread while processing."""
+        global _tracemalloc_users, _tracemalloc_started
+        previous = getattr(_active, "profile", None)
+        if self.trace_memory:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_started = True
+                _tracemalloc_users += 1
+
+        _active.profile = self
+        self.started_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.root.start(self.trace_memory)
+        self._stack = [self.root]
+        try:
+            yield self
+        finally:
+            # Close spans left open by an exception
+            while self._stack:
+                self._stack.pop().stop()
+            _active.profile = previous
+            if self.trace_memory:
+                with _tracemalloc_lock:
+                    _tracemalloc_users -= 1
+                    # Leave tracing started by someone else running
+                    if _tracemalloc_users == 0 and _tracemalloc_started:
+                        tracemalloc.stop()
+                        _tracemalloc_started = False
+
+    @contextmanager
+    def span(self, name, **counters):
+        """
+        Time a step as a child of the innermost open span.
+
+        Args:
+            name: Span name (no "/")
+            **counters: Initial counters of the span
+        """
+        parent = self._stack[-1] if self._stack else self.root
+        child = Span(name, parent)
+        parent.children.append(child)
+        for counter, value in counters.items():
+            child.add(counter, value)
+        child.start(self.trace_memory)
+        self._stack.append(child)
+        try:
+            yield child
+        finally:
+            # Spans deeper than this one were closed by their own exits
+            while self._stack and self._stack[-1] is not child:
+                self._stack.pop().stop()
+            if self._stack:
+                self._stack.pop()
+            child.stop()
+
+    def count(self, name, value=1):
+        """Add to a counter of the innermost open span."""
+        (self._stack[-1] if self._stack else self.root).add(name, value)
+
+    def to_dict(self):
+        """Profile as a nested dictionary."""
+        return {
+            "labels": dict(self.labels),
+            "started_at": self.started_at,
+            "spans": self.root.to_dict()
+        }
+
+    def json_lines(self):
+        """
+        Profile as JSON lines, one record per span
+
+        Returns:
+            List of JSON strings
+        """
+        return span_records_to_json_lines(self.to_dict())
+
+    def prometheus(self):
+        """Profile as Prometheus text exposition format (spans summed by path)."""
+        return prometheus_text(aggregate_spans([self.to_dict()]), self.labels, batch=False)
+
+
+def span_records_to_json_lines(profile):
+    """
+    JSON lines of a profile dictionary (FilingProfile.to_dict), one per span
+
+    Args:
+        profile: Profile dictionary
+
+    Returns:
+        List of JSON strings
+    """
+    lines = []
+    stack = [(profile["spans"], "", 0)]
+    while stack:
+        span, parent_path, depth = stack.pop()
+        path = f"{parent_path}/{span['name']}" if parent_path else span["name"]
+        record = dict(profile.get("labels", {}))
+        record.update({
+            "started_at": profile.get("started_at"),
+            "span": path,
+            "depth": depth
+        })
+        record.update({key: value for key, value in span.items() if key not in ("name", "children")})
+        lines.append(json.dumps(record, sort_keys=True))
+        stack.extend((child, path, depth + 1) for child in reversed(span.get("children", [])))
+    return lines
+
+
+def aggregate_spans(profiles):
+    """
+    Sum the spans of profile dictionaries by span path
+
+    Args:
+        profiles: Profile dictionaries (FilingProfile.to_dict)
+
+    Returns:
+        Dictionary of span path to totals (calls, filings, wall and CPU
+        seconds, maximum wall seconds, maximum memory figures, counters),
+        in first-seen order
+    """
+    totals = {}
+    for profile in profiles:
+        seen = set()
+        stack = [(profile["spans"], "")]
+        while stack:
+            span, parent_path = stack.pop()
+            path = f"{parent_path}/{span['name']}" if parent_path else span["name"]
+            total = totals.get(path)
+            if total is None:
+                total = totals[path] = {
+                    "calls": 0,
+                    "filings": 0,
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "max_wall_seconds": 0.0,
+                    "max_rss_growth_bytes": 0,
+                    "max_peak_rss_bytes": 0,
+                    "max_traced_peak_bytes": None,
+                    "counters": {}
+                }
+            total["calls"] += 1
+            if path not in seen:
+                seen.add(path)
+                total["filings"] += 1
+            total["wall_seconds"] += span.get("wall_seconds", 0.0)
+            total["cpu_seconds"] += span.get("cpu_seconds", 0.0)
+            total["max_wall_seconds"] = max(total["max_wall_seconds"], span.get("wall_seconds", 0.0))
+            total["max_rss_growth_bytes"] = max(total["max_rss_growth_bytes"], span.get("rss_growth_bytes", 0))
+            total["max_peak_rss_bytes"] = max(total["max_peak_rss_bytes"], span.get("peak_rss_bytes", 0))
+            if span.get("traced_peak_bytes") is not None:
+                total["max_traced_peak_bytes"] = max(total["max_traced_peak_bytes"] or 0, span["traced_peak_bytes"])
+            for counter, value in span.get("counters", {}).items():
+                total["counters"][counter] = total["counters"].get(counter, 0) + value
+            stack.extend((child, path) for child in reversed(span.get("children", [])))
+    return totals
+
+
+def _label_value(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels):
+    """Prometheus label set."""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_text(totals, labels=None, batch=False):
+    """
+    Prometheus text exposition of aggregated spans
+
+    Args:
+        totals: Span totals from aggregate_spans
+        labels: Labels added to every sample
+        batch: Whether the totals cover a batch (adds call counts and maxima)
+
+    Returns:
+        Metrics text
+    """
+    labels = labels or {}
+    prefix = f"{METRIC_PREFIX}_batch_span" if batch else f"{METRIC_PREFIX}_span"
+    metrics = [
+        ("wall_seconds", "Wall time of the span in seconds", lambda total: total["wall_seconds"]),
+        ("cpu_seconds", "CPU time of the processing thread in the span in seconds", lambda total: total["cpu_seconds"]),
+        ("rss_growth_bytes", "Growth of the process peak RSS during the span in bytes", lambda total: total["max_rss_growth_bytes"]),
+        ("traced_peak_bytes", "Peak of traced Python allocations during the span in bytes", lambda total: total["max_traced_peak_bytes"])
+    ]
+    if batch:
+        metrics += [
+            ("calls", "Number of times the span was entered", lambda total: total["calls"]),
+            ("filings", "Number of filings in which the span was entered", lambda total: total["filings"]),
+            ("max_wall_seconds", "Longest wall time of the span in one call in seconds", lambda total: total["max_wall_seconds"])
+        ]
+
+    lines = []
+    for metric, description, value_of in metrics:
+        name = f"{prefix}_{metric}"
+        samples = [
+            f"{name}{_labels(dict(labels, span=path))} {round(value_of(total), 6)}"
+            for path, total in totals.items() if value_of(total) is not None
+        ]
+        if samples:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+
+    name = f"{prefix}_counter"
+    samples = [
+        f"{name}{_labels(dict(labels, span=path, counter=counter))} {value}"
+        for path, total in totals.items() for counter, value in total["counters"].items()
+    ]
+    if samples:
+        lines.append(f"# HELP {name} Counters recorded in the span (bytes, facts, contexts, tables, ...)")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class BatchProfile:
+    """
+    Aggregate of the filing profiles of a batch
+    """
+
+    def __init__(self, labels=None):
+        """
+        Initialize the batch profile.
+
+        Args:
+            labels: Labels identifying the batch (e.g. ticker)
+        """
+        self.labels = {key: str(value) for key, value in (labels or {}).items() if value is not None}
+        self.profiles = []
+
+    def add(self, profile):
+        """
+        Add a filing profile.
+
+        Args:
+            profile: FilingProfile or profile dictionary (None is ignored)
+        """
+        if profile is None:
+            return
+        self.profiles.append(profile.to_dict() if isinstance(profile, FilingProfile) else profile)
+
+    def totals(self):
+        """Span totals of the batch by span path (see aggregate_spans)."""
+        return aggregate_spans(self.profiles)
+
+    def summary(self, top=10):
+        """
+        Summary of the batch
+
+        Args:
+            top: Number of spans to list
+
+        Returns:
+            Dictionary with the number of filings, the peak RSS and the spans
+            with the most wall time (excluding the root span)
+        """
+        totals = self.totals()
+        root = totals.get("filing", {})
+        spans = sorted(
+            ((path, total) for path, total in totals.items() if path != "filing"),
+            key=lambda item: item[1]["wall_seconds"], reverse=True
+        )
+        return {
+            "filings": len(self.profiles),
+            "wall_seconds": round(root.get("wall_seconds", 0.0), 6),
+            "cpu_seconds": round(root.get("cpu_seconds", 0.0), 6),
+            "max_peak_rss_bytes": root.get("max_peak_rss_bytes", 0),
+            "top_spans": [
+                {
+                    "span": path,
+                    "calls": total["calls"],
+                    "wall_seconds": round(total["wall_seconds"], 6),
+                    "cpu_seconds": round(total["cpu_seconds"], 6),
+                    "max_wall_seconds": round(total["max_wall_seconds"], 6)
+                }
+                for path, total in spans[:top]
+            ]
+        }
+
+    def json_lines(self):
+        """Batch totals as JSON lines, one record per span path."""
+        lines = []
+        for path, total in self.totals().items():
+            record = dict(self.labels)
+            record.update(total)
+            record["span"] = path
+            lines.append(json.dumps(record, sort_keys=True))
+        return lines
+
+    def prometheus(self):
+        """Batch totals as Prometheus text exposition format."""
+        return prometheus_text(self.totals(), self.labels, batch=True)
+
+
+def current_profile():
+    """The active profile of the current thread, or None."""
+    return getattr(_active, "profile", None)
+
+
+def span(name, **counters):
+    """
+    Time a step in the active profile of the current thread
+
+    Usage: with span("parse_html", bytes_read=len(html)): ...
+
+    Args:
+        name: Span name (no "/")
+        **counters: Initial counters of the span
+
+    Returns:
+        Context manager (a no-op when no profile is active)
+    """
+    profile = getattr(_active, "profile", None)
+    if profile is None:
+        return _no_span
+    return profile.span(name, **counters)
+
+
+def count(name, value=1):
+    """
+    Add to a counter of the innermost open span of the active profile
+
+    Args:
+        name: Counter name
+        value: Amount to add
+    """
+    profile = getattr(_active, "profile", None)
+    if profile is not None:
+        profile.count(name, value)
+
+
+def _file_stem(labels):
+    """File name stem from profile labels."""
+    parts = [labels.get(key) for key in ("ticker", "filing_type", "accession_number", "fiscal_year", "fiscal_period")]
+    stem = "_".join(part for part in parts if part) or "filing"
+    return "".join(char if char.isalnum() or char in "-_." else "_" for char in stem)
+
+
+def write_profile(profile, output_dir, formats=None):
+    """
+    Write a filing profile
+
+    JSON lines are appended to profiles.jsonl; Prometheus text goes to
+    prometheus/<filing>.prom.
+
+    Args:
+        profile: FilingProfile
+        output_dir: Instrumentation output directory
+        formats: Output formats ("jsonl", "prometheus"; defaults to config)
+
+    Returns:
+        List of written paths
+    """
+    formats = INSTRUMENTATION.get("formats", ["jsonl"]) if formats is None else formats
+    output_dir = Path(output_dir)
+    written = []
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        if "jsonl" in formats:
+            path = output_dir / "profiles.jsonl"
+            lines = profile.json_lines()
+            with _write_lock:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write("\n".join(lines) + "\n")
+            written.append(str(path))
+        if "prometheus" in formats:
+            path = output_dir / "prometheus" / f"{_file_stem(profile.labels)}.prom"
+            os.makedirs(path.parent, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profile.prometheus())
+            written.append(str(path))
+    except OSError as e:
+        logging.warning(f"Could not write filing profile to {output_dir}: {str(e)}")
+    return written
+
+
+def write_batch_profile(batch_profile, output_dir, formats=None):
+    """
+    Write the aggregate of a batch
+
+    Args:
+        batch_profile: BatchProfile
+        output_dir: Instrumentation output directory
+        formats: Output formats ("jsonl", "prometheus"; defaults to config)
+
+    Returns:
+        List of written paths
+    """
+    formats = INSTRUMENTATION.get("formats", ["jsonl"]) if formats is None else formats
+    output_dir = Path(output_dir)
+    stem = f"batch_{_file_stem(batch_profile.labels)}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    written = []
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        if "jsonl" in formats:
+            path = output_dir / f"{stem}.jsonl"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(batch_profile.json_lines()) + "\n")
+            written.append(str(path))
+        if "prometheus" in formats:
+            path = output_dir / f"{stem}.prom"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(batch_profile.prometheus())
+            written.append(str(path))
+    except OSError as e:
+        logging.warning(f"Could not write batch profile to {output_dir}: {str(e)}")
+    return written
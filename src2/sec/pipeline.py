@@ -16,12 +16,17 @@ import re
 from pathlib import Path
 
 # Import from config
-from src2.config import RAW_DATA_DIR, PROCESSED_DATA_DIR
+from src2.config import RAW_DATA_DIR, PROCESSED_DATA_DIR, INSTRUMENTATION, CALCULATION_VALIDATION, FACT_STORE
 
 # Import from SEC modules
 from .downloader import SECDownloader
 from .renderer import ArelleRenderer
 from .extractor import SECExtractor
+from .fingerprint import FilingFingerprintStore
+from .instrumentation import FilingProfile, current_profile, span, count, write_profile
+
+# Filing information used to label filing profiles
+PROFILE_LABELS = ("ticker", "filing_type", "accession_number", "fiscal_year", "fiscal_period")
 
 class SECFilingPipeline:
     """
@@ -282,6 +287,11 @@ class SECFilingPipeline:
 
             if fiscal_year and fiscal_period:
                 logging.info(f"Successfully determined fiscal period from registry: Year={fiscal_year}, Period={fiscal_period}")
+
+                # Store a fiscal year end rule the registry inferred from this 10-K
+                # (lookups keep inferred rules in memory only)
+                if filing_type == "10-K" and fiscal_registry.save_inferred_rule(ticker):
+                    logging.info(f"Stored the inferred fiscal year end rule of {ticker}")
                 return (fiscal_year, fiscal_period, validation_metadata)
             else:
                 error_msg = fiscal_info.get("error", "Unknown error")
@@ -315,7 +325,7 @@ class SECFilingPipeline:
 
     def __init__(self, user_agent=None, contact_email=None,
                  output_dir="./sec_processed", temp_dir=None,
-                 gcp_bucket=None, gcp_project=None):
+                 gcp_bucket=None, gcp_project=None, incremental=False):
         """
         Initialize the SEC filing pipeline.
 
@@ -326,6 +336,7 @@ class SECFilingPipeline:
             temp_dir: Directory for temporary files
             gcp_bucket: GCS bucket name for upload (if None, skips upload)
             gcp_project: GCP project ID for upload
+            incremental: Only rerun stages whose input or code fingerprints changed
         """
         # Set up directories
         self.output_dir = Path(output_dir)
@@ -363,6 +374,7 @@ class SECFilingPipeline:
 
         self.renderer = ArelleRenderer(
             temp_dir=str(self.temp_dir / "arelle"),
+            cache_dir=str(self.temp_dir / "render_cache"),
             install_if_missing=True
         )
 
@@ -370,8 +382,55 @@ class SECFilingPipeline:
             output_dir=str(self.output_dir)
         )
 
+        # Build fingerprints for incremental reprocessing
+        self.incremental = incremental
+        self.fingerprint_store = FilingFingerprintStore(self.output_dir)
+        if self.incremental:
+            logging.info("INCREMENTAL MODE ENABLED - Only stages with changed inputs or code will be rerun")
+
+        # Per-filing profiles (spans with time, memory and counters)
+        self.instrumentation_dir = Path(INSTRUMENTATION.get("output_dir") or self.output_dir / "instrumentation")
+
         logging.info(f"Initialized SEC filing pipeline with output dir: {self.output_dir}")
 
+    def _profiled(self, filing_info, process):
+        """
+        Run a filing's processing with a profile active and attach the profile.
+
+        The profile is added to the result as "profile" and written to the
+        instrumentation directory. Nested calls (process_filing handing over
+        to process_filing_with_info) are recorded in the outer profile.
+
+        Args:
+            filing_info: Filing information the profile labels are taken from
+            process: Function processing the filing and returning its result
+
+        Returns:
+            Result of process
+        """
+        if not INSTRUMENTATION.get("enabled", True):
+            return process()
+
+        outer_profile = current_profile()
+        profile = outer_profile or FilingProfile()
+        if outer_profile is not None:
+            result = process()
+        else:
+            with profile.activate():
+                result = process()
+
+        # Label after processing: fiscal information is often only determined then
+        for key in PROFILE_LABELS:
+            if filing_info.get(key) is not None:
+                profile.labels[key] = str(filing_info[key])
+        if outer_profile is not None:
+            return result
+
+        if isinstance(result, dict):
+            result["profile"] = profile.to_dict()
+        write_profile(profile, self.instrumentation_dir)
+        return result
+
     def process_filing_with_info(self, filing_info, save_intermediate=False):
         """
         Process a filing using a pre-fetched filing_info dictionary.
@@ -383,6 +442,15 @@ class SECFilingPipeline:
         Returns:
             Dictionary with processing results and file paths
         """
+        return self._profiled(
+            filing_info,
+            lambda: self._process_filing_with_info(filing_info, save_intermediate)
+        )
+
+    def _process_filing_with_info(self, filing_info, save_intermediate=False):
+        """
+        Process a filing using a pre-fetched filing_info dictionary (see process_filing_with_info).
+        """
         start_time = time.time()
         ticker = filing_info.get("ticker")
         cik = filing_info.get("cik")
@@ -397,11 +465,42 @@ class SECFilingPipeline:
         }
 
         try:
+            # In incremental mode, decide which stages need to be rebuilt
+            plan = None
+            accession_number = filing_info.get("accession_number")
+            if self.incremental and ticker and accession_number:
+                with span("incremental_plan"):
+                    upload_required = bool(self.gcp_storage and self.gcp_storage.is_enabled())
+                    plan = self.fingerprint_store.plan(ticker, accession_number, upload_required=upload_required)
+                logging.info(f"Incremental plan for {ticker} {accession_number}: {plan['action']} ({plan['reason']})")
+                result["incremental"] = {
+                    "action": plan["action"],
+                    "reason": plan["reason"]
+                }
+
+                if plan["action"] == "skip":
+                    result["success"] = True
+                    result["skipped"] = True
+                    result["text_path"] = None
+                    result["llm_path"] = plan["record"]["llm_path"]
+                    result["total_time_seconds"] = time.time() - start_time
+                    return result
+
+                if plan["action"] == "reformat":
+                    return self._reformat_from_cache(plan, filing_info, result, start_time)
+
             # Skip the filing lookup since we already have it
             download_start = time.time()
 
-            # Download the filing
-            download_result = self.downloader.download_filing(filing_info)
+            if plan and plan["action"] == "reparse":
+                # Reuse the previously downloaded (and unchanged) source files
+                download_result = dict(plan["record"].get("download", {}))
+                download_result["reused"] = True
+                logging.info(f"Incremental: reusing downloaded document {download_result.get('doc_path')}")
+            else:
+                # Download the filing
+                with span("download"):
+                    download_result = self.downloader.download_filing(filing_info)
 
             # Add download stage to results
             result["stages"]["download"] = {
@@ -514,11 +613,13 @@ class SECFilingPipeline:
             # Continue with normal rendering
             try:
                 # Render to HTML
-                rendered_file = self.renderer.render_ixbrl(
-                    document_path,
-                    output_format="html",
-                    output_file=rendered_path
-                )
+                with span("render", bytes_read=os.path.getsize(document_path)):
+                    rendered_file = self.renderer.render_ixbrl(
+                        document_path,
+                        output_format="html",
+                        output_file=rendered_path
+                    )
+                    count("bytes_written", os.path.getsize(rendered_file))
 
                 render_result = {
                     "rendered_file": str(rendered_file),
@@ -598,9 +699,6 @@ class SECFilingPipeline:
 
         Helper method to avoid code duplication between process_filing and process_filing_with_info.
         """
-        # Import datetime at function scope to avoid reference errors
-        import datetime
-
         try:
             # Stage 3: Extract text
             logging.info(f"Stage 3: Extracting text from document")
@@ -619,10 +717,12 @@ class SECFilingPipeline:
 
             # Extract content from filing
             logging.info(f"Processing filing to extract content for LLM format")
-            extract_result = self.extractor.process_filing(
-                rendered_path,
-                metadata=metadata
-            )
+            with span("extract", bytes_read=os.path.getsize(rendered_path)):
+                extract_result = self.extractor.process_filing(
+                    rendered_path,
+                    metadata=metadata
+                )
+                count("sections", len(extract_result.get("document_sections", {})))
 
             # Add extraction stage to results
             result["stages"]["extract"] = {
@@ -634,7 +734,8 @@ class SECFilingPipeline:
             # Save document sections to metadata for LLM formatter
             if 'document_sections' in extract_result:
                 metadata['html_content'] = {
-                    'document_sections': extract_result['document_sections']
+                    'document_sections': extract_result['document_sections'],
+                    'section_index': extract_result.get('section_index', [])
                 }
                 logging.info(f"Added {len(extract_result['document_sections'])} document sections to metadata for LLM formatter")
 
@@ -649,9 +750,6 @@ class SECFilingPipeline:
             llm_result = {"success": False}
 
             try:
-                # Import LLM formatter
-                from src2.formatter.llm_formatter import llm_formatter
-
                 # Check for XBRL data in the filing
                 xbrl_path = None
                 doc_path = None
@@ -701,7 +799,9 @@ class SECFilingPipeline:
                         logging.info(f"Calling SECExtractor.extract_inline_xbrl for: {doc_path}")
                         try:
                             # Call the extractor method which now saves the raw JSON
-                            extracted_facts = self.extractor.extract_inline_xbrl(doc_path)
+                            with span("xbrl_facts", bytes_read=os.path.getsize(doc_path)):
+                                extracted_facts = self.extractor.extract_inline_xbrl(doc_path)
+                                count("facts", len(extracted_facts))
 
                             # Process the extracted facts (if needed for xbrl_data structure)
                             # NOTE: The original code built xbrl_data['facts'] directly.
@@ -726,22 +826,26 @@ class SECFilingPipeline:
                                 xbrl_data["facts"].append(fact)
                             logging.info(f"Successfully processed {len(xbrl_data['facts'])} facts from extractor.")
 
+                            # Check the facts against the calculation linkbase, if downloaded
+                            with span("calculation_check"):
+                                self._check_calculations(result, doc_path, extracted_facts)
+
                         except Exception as e:
                             logging.error(f"Error calling/processing SECExtractor.extract_inline_xbrl: {str(e)}")
                             # Continue with basic XBRL data or handle error
                         # ---- END MODIFIED CODE ----
 
-                    # Generate LLM format
-                    llm_content = llm_formatter.generate_llm_format(xbrl_data, metadata)
+                    # Cache parsed XBRL data so incremental runs can reformat without reparsing
+                    with span("parsed_cache"):
+                        self._save_parsed_cache(ticker, filing_info, xbrl_data, metadata)
 
-                    # Save LLM format
-                    save_result = llm_formatter.save_llm_format(llm_content, metadata, str(llm_path))
+                    # Generate and save LLM format
+                    llm_result = self._generate_llm_output(xbrl_data, metadata, llm_path)
 
-                    llm_result = {
-                        "success": save_result.get("success", False),
-                        "file_size": save_result.get("size", 0),
-                        "path": save_result.get("path", "")
-                    }
+                    # Append the numeric facts to the fact store
+                    if llm_result.get("success", False):
+                        with span("fact_store"):
+                            self._append_facts(ticker, filing_info, xbrl_data, metadata, llm_path)
                 else:
                     llm_result = {
                         "success": False,
@@ -767,293 +871,609 @@ class SECFilingPipeline:
                 result["warning"] = f"LLM formatting failed: {llm_result.get('error', 'Unknown error')}"
 
             # Stage 4: Upload to GCP (if configured)
-            if self.gcp_storage and self.gcp_storage.is_enabled():
-                logging.info(f"Stage 4: Uploading to GCP")
+            with span("upload"):
+                self._upload_outputs(result, llm_result, llm_path, ticker, filing_type, filing_info, metadata)
 
-                upload_start = time.time()
+            # Record build fingerprints so incremental runs can skip unchanged stages
+            if llm_result.get("success", False):
+                with span("record_build"):
+                    self._record_build(result, ticker, filing_info, llm_path)
 
-                # Extract year and quarter information
-                filing_date = filing_info.get("filing_date", "")
-                period_end_date = filing_info.get("period_end_date", "")
+            # Final result construction
+            result["success"] = "error" not in result
+            result["text_path"] = None  # No longer generating text.txt files
+            result["llm_path"] = str(llm_path) if llm_path and os.path.exists(llm_path) else None
+            result["total_time_seconds"] = time.time() - start_time
 
-                # Log for debugging
-                logging.info(f"Period end date: {period_end_date}, Filing date: {filing_date}")
+            return result
 
-                # Use the fiscal registry for all companies
-                fiscal_quarter = None
+        except Exception as e:
+            logging.error(f"Pipeline continuation error: {str(e)}")
+            result["error"] = str(e)
+            result["success"] = False
+            result["total_time_seconds"] = time.time() - start_time
+            return result
 
-                # Initialize fiscal_year and fiscal_quarter to prevent 'referenced before assignment' errors
-                # These will only be used if the fiscal_registry determination fails
-                fiscal_year = None
-                fiscal_quarter = None
+    def _generate_llm_output(self, xbrl_data, metadata, llm_path):
+        """
+        Generate the LLM format for parsed XBRL data and save it.
 
-                # If we have both ticker and period_end_date, use the fiscal registry
-                if ticker and period_end_date:
-                    # Make sure datetime is available in this scope
-                    import datetime
+        Returns:
+            Dictionary with the LLM formatting result
+        """
+        from src2.formatter.llm_formatter import llm_formatter
 
-                    # Use the fiscal registry from src2 for consistent fiscal calculations
-                    try:
-                        # Load document text for extraction if we have a document path
-                        document_text = None
+        # Generate LLM format
+        with span("llm_format", facts=len(xbrl_data.get("facts", []))):
+            llm_content = llm_formatter.generate_llm_format(xbrl_data, metadata)
 
-                        try:
-                            # Find the document path from the download result
-                            doc_path = None
-                            if "stages" in result and "download" in result["stages"]:
-                                download_result = result["stages"]["download"]["result"]
-                                if "doc_path" in download_result:
-                                    doc_path = download_result["doc_path"]
-
-                            # Try to read the document file
-                            if doc_path and os.path.exists(doc_path):
-                                with open(doc_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                    document_text = f.read()
-                                    logging.info(f"Read {len(document_text)} chars from {doc_path} for fiscal period extraction")
-                        except Exception as e:
-                            logging.warning(f"Could not read document text for GCS path extraction: {str(e)}")
+        # Save LLM format
+        with span("save_llm_format"):
+            save_result = llm_formatter.save_llm_format(llm_content, metadata, str(llm_path))
+            count("bytes_written", save_result.get("size", 0))
 
-                        # Use our centralized fiscal period determination function with the registry
-                        try:
-                            fiscal_year_new, fiscal_period_new, validation_metadata = self.determine_fiscal_period_from_registry(
-                                ticker, period_end_date, filing_type
-                            )
+        return {
+            "success": save_result.get("success", False),
+            "file_size": save_result.get("size", 0),
+            "path": save_result.get("path", "")
+        }
 
-                            # Use new values if available
-                            if fiscal_year_new:
-                                fiscal_year = fiscal_year_new
-                            if fiscal_period_new:
-                                fiscal_quarter = fiscal_period_new
+    def _check_calculations(self, result, doc_path, facts):
+        """
+        Check extracted facts against the calculation linkbase next to the document.
+        """
+        if not CALCULATION_VALIDATION.get("enabled", True):
+            return
 
-                                print(f"Using fiscal registry determination for {ticker}: period_end_date={period_end_date}, filing_type={filing_type} -> Year={fiscal_year}, Period={fiscal_quarter}")
-                        except Exception as e:
-                            print(f"Could not use fiscal registry: {str(e)}")
-                            # Set defaults if determination fails
-                            if fiscal_year is None:
-                                if filing_type == "10-K":
-                                    fiscal_year = period_end_date.split('-')[0] if period_end_date else str(datetime.datetime.now().year)
-                                    fiscal_quarter = "annual"
-                                    print(f"Using default values for 10-K: Year={fiscal_year}, Period={fiscal_quarter}")
-                                else:
-                                    # Safe default values to prevent "referenced before assignment" errors
-                                    fiscal_year = period_end_date.split('-')[0] if period_end_date else str(datetime.datetime.now().year)
-                                    fiscal_quarter = "Q?"
-                                    print(f"Using default values for 10-Q: Year={fiscal_year}, Period={fiscal_quarter}")
-                    except (ImportError, Exception) as e:
-                        logging.warning(f"Could not use fiscal registry: {str(e)}")
+        from src2.xbrl.calculation_validator import find_calculation_linkbase, validate_filing_calculations
 
-                # Construct GCS paths using the proper folder structure
-                # Try to use fiscal_period if it was determined
-                fiscal_period = fiscal_quarter  # For consistency with other code
+        filing_dir = os.path.dirname(doc_path)
+        if find_calculation_linkbase(filing_dir) is None:
+            return
 
-                # IMPORTANT: If fiscal_year isn't available, we need to extract it from the period_end_date
-                # This ensures we always use actual fiscal years in GCS paths, not accession numbers
-                if not fiscal_year and period_end_date:
-                    # Extract year from period_end_date as a fallback
-                    import re
-                    year_match = re.search(r'(\d{4})', period_end_date)
-                    if year_match:
-                        fiscal_year = year_match.group(1)
-                        logging.info(f"Extracted fiscal year {fiscal_year} from period_end_date for GCS path")
+        try:
+            check = validate_filing_calculations(filing_dir, facts)
+        except Exception as e:
+            logging.warning(f"Calculation check failed: {str(e)}")
+            return
 
-                # If we still don't have a fiscal year, use current year as last resort
-                if not fiscal_year:
-                    import datetime
-                    fiscal_year = str(datetime.datetime.now().year)
-                    logging.warning(f"No fiscal year determined, using current year {fiscal_year} for GCS path")
+        result["calculation_check"] = check
+        if check.get("inconsistent"):
+            logging.warning(f"{check['inconsistent']} calculation inconsistencies in {doc_path}")
 
-                if filing_type == "10-K" or fiscal_period == "annual":
-                    gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/llm.txt"
-                elif fiscal_period:
-                    gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/{fiscal_period}/llm.txt"
-                else:
-                    # Fallback to fiscal year only if we can't determine quarter
-                    gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/llm.txt"
+    def _save_parsed_cache(self, ticker, filing_info, xbrl_data, metadata):
+        """
+        Cache parsed XBRL data and formatter metadata for incremental reformatting.
+        """
+        accession_number = filing_info.get("accession_number")
+        if not ticker or not accession_number:
+            return
 
-                # Log the path for debugging
-                logging.info(f"Using GCS path: {gcs_llm_path}")
+        try:
+            self.fingerprint_store.save_parsed(ticker, accession_number, xbrl_data, metadata)
+        except Exception as e:
+            logging.warning(f"Could not cache parsed XBRL data: {str(e)}")
 
-                # Track upload results
-                upload_results = {
-                    "llm_upload": None,
-                    "metadata": None
-                }
+    def _append_facts(self, ticker, filing_info, xbrl_data, metadata, llm_path):
+        """
+        Append the numeric facts of a filing to the fact store.
+        """
+        if not FACT_STORE.get("enabled", False):
+            return
+        accession_number = filing_info.get("accession_number")
+        if not ticker or not accession_number:
+            return
 
-                llm_upload_result = None  # Initialize to prevent reference error
-                # Get LLM file size if it exists
-                llm_size = 0
-                if llm_result.get("success", False) and os.path.exists(str(llm_path)):
-                    llm_size = os.path.getsize(str(llm_path))
+        from src2.storage.fact_store import FactStore, filing_contexts, numeric_fact_rows, has_signs, extract_signed_facts
 
-                # Check if force_upload is enabled in the filing_info
-                force_upload = filing_info.get("force_upload", False)
+        try:
+            # The raw facts saved next to the document keep their format (fixed-zero, ...)
+            doc_path = metadata.get("doc_path")
+            raw_path = os.path.join(os.path.dirname(doc_path), "_xbrl_raw.json") if doc_path else None
+            if raw_path and os.path.exists(raw_path):
+                with open(raw_path, 'r', encoding='utf-8') as f:
+                    facts = json.load(f)
+            else:
+                facts = xbrl_data.get("facts", [])
 
-                # Check if this is an amended filing that should use a subdirectory
-                is_amended = filing_info.get("is_amended", False)
-                use_amendment_subdirectory = filing_info.get("use_amendment_subdirectory", False)
-
-                # Modify the GCS paths for amended filings to use "/a" subdirectory
-                if is_amended and use_amendment_subdirectory:
-                    # Create paths with "/a" subdirectory
-                    parts = gcs_llm_path.split("/")
-                    if len(parts) >= 3:
-                        # Insert "a" before the final component
-                        filename = parts[-1]  # llm.txt
-                        base_path = "/".join(parts[:-1])  # everything before the filename
-                        amended_gcs_llm_path = f"{base_path}/a/{filename}"
-
-                        # Update the path for this upload
-                        logging.info(f"Using amended filing path: {amended_gcs_llm_path}")
-                        gcs_llm_path = amended_gcs_llm_path
-
-                        # Store the amended path in the filing info for later reference
-                        filing_info["amended_gcs_llm_path"] = amended_gcs_llm_path
-
-                # Check if we should skip GCP upload entirely
-                # We now don't automatically skip amended filings - they go to a subdirectory
-                skip_gcp_upload = filing_info.get("skip_gcp_upload", False)
-
-                if skip_gcp_upload:
-                    if is_amended:
-                        logging.info(f"SKIPPING GCP UPLOAD for amended filing ({filing_info.get('original_filing_type', filing_type)})")
-
-                        # Store amended filing in amendments directory
-                        from pathlib import Path
-                        ticker = filing_info.get("ticker")
-                        fiscal_year = filing_info.get("fiscal_year")
-                        fiscal_period = filing_info.get("fiscal_period")
-                        amendments_dir = Path(output_dir) / ticker / "amendments"
-                        amendments_dir.mkdir(exist_ok=True, parents=True)
-
-                        # Determine appropriate file names
-                        filing_identifier = f"{ticker}_{filing_type}"
-                        if fiscal_year:
-                            filing_identifier += f"_{fiscal_year}"
-                        if fiscal_period and fiscal_period != "annual":
-                            filing_identifier += f"_{fiscal_period}"
-                        filing_identifier += "_amended"
-
-                        amended_llm_path = amendments_dir / f"{filing_identifier}_llm.txt"
-
-                        # Copy the llm file to the amendments directory
-                        import shutil
-                        try:
-                            if os.path.exists(llm_path):
-                                shutil.copy2(llm_path, amended_llm_path)
-                                logging.info(f"Stored amended filing in {amendments_dir}")
+            # Facts saved before the sign was extracted would store negatives as positive
+            if not has_signs(facts):
+                if not doc_path or not os.path.exists(doc_path):
+                    logging.warning(f"Facts of {ticker} {accession_number} have no signs, not stored in the fact store")
+                    return
+                facts = extract_signed_facts(doc_path)
 
-                            # Store the path in filing_info for reporting
-                            filing_info["amended_llm_path"] = str(amended_llm_path)
-                        except Exception as e:
-                            logging.warning(f"Failed to store amended filing in amendments directory: {e}")
+            contexts = filing_contexts(xbrl_data.get("contexts"), doc_path=doc_path, llm_path=str(llm_path))
+            stored = FactStore().append_filing({
+                "ticker": ticker,
+                "accession_number": accession_number,
+                "filing_type": filing_info.get("filing_type"),
+                "fiscal_year": filing_info.get("fiscal_year"),
+                "fiscal_period": filing_info.get("fiscal_period"),
+                "filing_date": filing_info.get("filing_date"),
+                "source": os.path.basename(str(llm_path))
+            }, numeric_fact_rows(facts, contexts))
+            count("facts_stored", stored)
+        except Exception as e:
+            logging.warning(f"Could not append facts to the fact store: {str(e)}")
 
-                        # Create a result for reporting
-                        text_upload_result = {
-                            "success": True,
-                            "skipped": True,
-                            "reason": "amended_filing"
-                        }
-                    else:
-                        logging.info(f"SKIPPING GCP UPLOAD as requested in filing_info")
-                        # Create a fake success result for consistency in the pipeline
-                        text_upload_result = {
-                            "success": True,
-                            "skipped": True,
-                            "reason": "skip_gcp_upload_flag"
-                        }
-                else:
-                    # Normal GCP upload flow
-                    # Check if file already exists in GCS
-                    files_exist = self.gcp_storage.check_files_exist([gcs_llm_path])
+    def _record_build(self, result, ticker, filing_info, llm_path):
+        """
+        Record input and code fingerprints of a successful build.
+
+        The upload status is recorded with them, so an incremental run retries
+        a build whose LLM file was not uploaded instead of skipping it.
+        """
+        accession_number = filing_info.get("accession_number")
+        if not ticker or not accession_number:
+            return
+
+        download_result = result.get("stages", {}).get("download", {}).get("result", {})
+        upload_stage = result.get("stages", {}).get("upload")
+        uploaded = None
+        if upload_stage is not None:
+            llm_upload_result = upload_stage.get("result", {}).get("llm_upload") or {}
+            uploaded = bool(upload_stage.get("success", False) and llm_upload_result.get("success", False))
+
+        record = self.fingerprint_store.record_build(ticker, accession_number, download_result, llm_path,
+                                                     uploaded=uploaded)
+        if record:
+            logging.info(f"Recorded build fingerprints for {ticker} {accession_number}"
+                         + ("" if uploaded is not False else " (upload not completed, retried on the next run)"))
+
+    def _upload_outputs(self, result, llm_result, llm_path, ticker, filing_type, filing_info, metadata):
+        """
+        Upload the LLM output to GCS and record filing metadata in Firestore.
+
+        Adds the "upload" stage to result when GCP storage is configured.
+        """
+        # Stage 4: Upload to GCP (if configured)
+        if self.gcp_storage and self.gcp_storage.is_enabled():
+            logging.info(f"Stage 4: Uploading to GCP")
+
+            upload_start = time.time()
+
+            # Extract year and quarter information
+            filing_date = filing_info.get("filing_date", "")
+            period_end_date = filing_info.get("period_end_date", "")
+
+            # Log for debugging
+            logging.info(f"Period end date: {period_end_date}, Filing date: {filing_date}")
+
+            # Use the fiscal registry for all companies
+            fiscal_quarter = None
+
+            # Initialize fiscal_year and fiscal_quarter to prevent 'referenced before assignment' errors
+            # These will only be used if the fiscal_registry determination fails
+            fiscal_year = None
+            fiscal_quarter = None
+
+            # If we have both ticker and period_end_date, use the fiscal registry
+            if ticker and period_end_date:
+                # Make sure datetime is available in this scope
+                import datetime
+
+                # Use the fiscal registry from src2 for consistent fiscal calculations
+                try:
+                    # Load document text for extraction if we have a document path
+                    document_text = None
+
+                    try:
+                        # Find the document path from the download result
+                        doc_path = None
+                        if "stages" in result and "download" in result["stages"]:
+                            download_result = result["stages"]["download"]["result"]
+                            if "doc_path" in download_result:
+                                doc_path = download_result["doc_path"]
+
+                        # Try to read the document file
+                        if doc_path and os.path.exists(doc_path):
+                            with open(doc_path, 'r', encoding='utf-8', errors='ignore') as f:
+                                document_text = f.read()
+                                logging.info(f"Read {len(document_text)} chars from {doc_path} for fiscal period extraction")
+                    except Exception as e:
+                        logging.warning(f"Could not read document text for GCS path extraction: {str(e)}")
+
+                    # Use our centralized fiscal period determination function with the registry
+                    try:
+                        fiscal_year_new, fiscal_period_new, validation_metadata = self.determine_fiscal_period_from_registry(
+                            ticker, period_end_date, filing_type
+                        )
 
-                    # Create a placeholder for text upload (for compatibility with existing code)
-                    # We no longer generate text.txt files
-                    logging.info(f"Skipping text file upload to GCS (text.txt functionality removed)")
+                        # Use new values if available
+                        if fiscal_year_new:
+                            fiscal_year = fiscal_year_new
+                        if fiscal_period_new:
+                            fiscal_quarter = fiscal_period_new
+
+                            print(f"Using fiscal registry determination for {ticker}: period_end_date={period_end_date}, filing_type={filing_type} -> Year={fiscal_year}, Period={fiscal_quarter}")
+                    except Exception as e:
+                        print(f"Could not use fiscal registry: {str(e)}")
+                        # Set defaults if determination fails
+                        if fiscal_year is None:
+                            if filing_type == "10-K":
+                                fiscal_year = period_end_date.split('-')[0] if period_end_date else str(datetime.datetime.now().year)
+                                fiscal_quarter = "annual"
+                                print(f"Using default values for 10-K: Year={fiscal_year}, Period={fiscal_quarter}")
+                            else:
+                                # Safe default values to prevent "referenced before assignment" errors
+                                fiscal_year = period_end_date.split('-')[0] if period_end_date else str(datetime.datetime.now().year)
+                                fiscal_quarter = "Q?"
+                                print(f"Using default values for 10-Q: Year={fiscal_year}, Period={fiscal_quarter}")
+                except (ImportError, Exception) as e:
+                    logging.warning(f"Could not use fiscal registry: {str(e)}")
+
+            # Construct GCS paths using the proper folder structure
+            # Try to use fiscal_period if it was determined
+            fiscal_period = fiscal_quarter  # For consistency with other code
+
+            # IMPORTANT: If fiscal_year isn't available, we need to extract it from the period_end_date
+            # This ensures we always use actual fiscal years in GCS paths, not accession numbers
+            if not fiscal_year and period_end_date:
+                # Extract year from period_end_date as a fallback
+                import re
+                year_match = re.search(r'(\d{4})', period_end_date)
+                if year_match:
+                    fiscal_year = year_match.group(1)
+                    logging.info(f"Extracted fiscal year {fiscal_year} from period_end_date for GCS path")
+
+            # If we still don't have a fiscal year, use current year as last resort
+            if not fiscal_year:
+                import datetime
+                fiscal_year = str(datetime.datetime.now().year)
+                logging.warning(f"No fiscal year determined, using current year {fiscal_year} for GCS path")
+
+            if filing_type == "10-K" or fiscal_period == "annual":
+                gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/llm.txt"
+            elif fiscal_period:
+                gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/{fiscal_period}/llm.txt"
+            else:
+                # Fallback to fiscal year only if we can't determine quarter
+                gcs_llm_path = f"companies/{ticker}/{filing_type}/{fiscal_year}/llm.txt"
+
+            # Log the path for debugging
+            logging.info(f"Using GCS path: {gcs_llm_path}")
+
+            # Track upload results
+            upload_results = {
+                "llm_upload": None,
+                "metadata": None
+            }
+
+            llm_upload_result = None  # Initialize to prevent reference error
+            # Get LLM file size if it exists
+            llm_size = 0
+            if llm_result.get("success", False) and os.path.exists(str(llm_path)):
+                llm_size = os.path.getsize(str(llm_path))
+
+            # Check if force_upload is enabled in the filing_info
+            force_upload = filing_info.get("force_upload", False)
+
+            # Check if this is an amended filing that should use a subdirectory
+            is_amended = filing_info.get("is_amended", False)
+            use_amendment_subdirectory = filing_info.get("use_amendment_subdirectory", False)
+
+            # Modify the GCS paths for amended filings to use "/a" subdirectory
+            if is_amended and use_amendment_subdirectory:
+                # Create paths with "/a" subdirectory
+                parts = gcs_llm_path.split("/")
+                if len(parts) >= 3:
+                    # Insert "a" before the final component
+                    filename = parts[-1]  # llm.txt
+                    base_path = "/".join(parts[:-1])  # everything before the filename
+                    amended_gcs_llm_path = f"{base_path}/a/{filename}"
+
+                    # Update the path for this upload
+                    logging.info(f"Using amended filing path: {amended_gcs_llm_path}")
+                    gcs_llm_path = amended_gcs_llm_path
+
+                    # Store the amended path in the filing info for later reference
+                    filing_info["amended_gcs_llm_path"] = amended_gcs_llm_path
+
+            # Check if we should skip GCP upload entirely
+            # We now don't automatically skip amended filings - they go to a subdirectory
+            skip_gcp_upload = filing_info.get("skip_gcp_upload", False)
+
+            if skip_gcp_upload:
+                if is_amended:
+                    logging.info(f"SKIPPING GCP UPLOAD for amended filing ({filing_info.get('original_filing_type', filing_type)})")
+
+                    # Store amended filing in amendments directory
+                    from pathlib import Path
+                    ticker = filing_info.get("ticker")
+                    fiscal_year = filing_info.get("fiscal_year")
+                    fiscal_period = filing_info.get("fiscal_period")
+                    amendments_dir = Path(output_dir) / ticker / "amendments"
+                    amendments_dir.mkdir(exist_ok=True, parents=True)
+
+                    # Determine appropriate file names
+                    filing_identifier = f"{ticker}_{filing_type}"
+                    if fiscal_year:
+                        filing_identifier += f"_{fiscal_year}"
+                    if fiscal_period and fiscal_period != "annual":
+                        filing_identifier += f"_{fiscal_period}"
+                    filing_identifier += "_amended"
+
+                    amended_llm_path = amendments_dir / f"{filing_identifier}_llm.txt"
+
+                    # Copy the llm file to the amendments directory
+                    import shutil
+                    try:
+                        if os.path.exists(llm_path):
+                            shutil.copy2(llm_path, amended_llm_path)
+                            from src2.formatter.section_index import section_index_path
+                            if os.path.exists(section_index_path(llm_path)):
+                                shutil.copy2(section_index_path(llm_path), section_index_path(amended_llm_path))
+                            logging.info(f"Stored amended filing in {amendments_dir}")
+
+                        # Store the path in filing_info for reporting
+                        filing_info["amended_llm_path"] = str(amended_llm_path)
+                    except Exception as e:
+                        logging.warning(f"Failed to store amended filing in amendments directory: {e}")
+
+                    # Create a result for reporting
                     text_upload_result = {
                         "success": True,
                         "skipped": True,
-                        "reason": "text_files_disabled"
+                        "reason": "amended_filing"
                     }
+                else:
+                    logging.info(f"SKIPPING GCP UPLOAD as requested in filing_info")
+                    # Create a fake success result for consistency in the pipeline
+                    text_upload_result = {
+                        "success": True,
+                        "skipped": True,
+                        "reason": "skip_gcp_upload_flag"
+                    }
+            else:
+                # Normal GCP upload flow
+                # Check if file already exists in GCS
+                files_exist = self.gcp_storage.check_files_exist([gcs_llm_path])
 
-                # Add text upload result
-                upload_results["text_upload"] = text_upload_result
+                # Create a placeholder for text upload (for compatibility with existing code)
+                # We no longer generate text.txt files
+                logging.info(f"Skipping text file upload to GCS (text.txt functionality removed)")
+                text_upload_result = {
+                    "success": True,
+                    "skipped": True,
+                    "reason": "text_files_disabled"
+                }
 
-                # Handle LLM file separately with force_upload flag
-                if llm_result.get("success", False) and os.path.exists(str(llm_path)):
-                    if files_exist.get(gcs_llm_path, False) and not force_upload:
-                        logging.info(f"LLM file already exists in GCS: {gcs_llm_path}")
-                        llm_upload_result = {
-                            "success": True,
-                            "gcs_path": gcs_llm_path,
-                            "already_exists": True
-                        }
-                    else:
-                        if files_exist.get(gcs_llm_path, False) and force_upload:
-                            logging.info(f"Force upload: LLM file exists but uploading again: {gcs_llm_path}")
-                        else:
-                            logging.info(f"Uploading LLM file to GCS: {gcs_llm_path}")
-                        llm_upload_result = self.gcp_storage.upload_file(str(llm_path), gcs_llm_path)
+            # Add text upload result
+            upload_results["text_upload"] = text_upload_result
 
-                    # Add LLM upload result
-                    upload_results["llm_upload"] = llm_upload_result
+            # Handle LLM file separately with force_upload flag
+            if llm_result.get("success", False) and os.path.exists(str(llm_path)):
+                if files_exist.get(gcs_llm_path, False) and not force_upload:
+                    logging.info(f"LLM file already exists in GCS: {gcs_llm_path}")
+                    llm_upload_result = {
+                        "success": True,
+                        "gcs_path": gcs_llm_path,
+                        "already_exists": True
+                    }
+                else:
+                    if files_exist.get(gcs_llm_path, False) and force_upload:
+                        logging.info(f"Force upload: LLM file exists but uploading again: {gcs_llm_path}")
+                    else:
+                        logging.info(f"Uploading LLM file to GCS: {gcs_llm_path}")
+                    # Existence was checked above, so skip the second check in upload_file
+                    llm_upload_result = self.gcp_storage.upload_file(str(llm_path), gcs_llm_path, force=True)
+                    self._upload_llm_sidecars(llm_path, gcs_llm_path, llm_upload_result, upload_results)
+
+                # Add LLM upload result
+                upload_results["llm_upload"] = llm_upload_result
+
+            # Update metadata in Firestore if text upload was successful
+            if text_upload_result.get("success", False):
+                # Add Firestore metadata
+                metadata_update = {}
+
+                # Text file functionality has been removed
+                metadata_update["text_size"] = 0
+                metadata_update["text_file_skipped"] = True
+
+                # Add LLM path if it was uploaded successfully
+                if llm_upload_result and llm_upload_result.get("success", False):
+                    metadata_update["llm_path"] = gcs_llm_path
+                    metadata_update["llm_size"] = llm_size
+                    if llm_upload_result.get("section_index_path"):
+                        metadata_update["section_index_path"] = llm_upload_result["section_index_path"]
+                    if llm_upload_result.get("chunk_manifest_path"):
+                        metadata_update["chunk_manifest_path"] = llm_upload_result["chunk_manifest_path"]
+                    if llm_upload_result.get("delta_path"):
+                        metadata_update["delta_path"] = llm_upload_result["delta_path"]
+                    metadata_update["local_llm_path"] = str(llm_path)  # Add local path for token counting
+                    logging.info(f"Adding local LLM path for token counting: {str(llm_path)}")
+
+                # Update Firestore
+                metadata_result = self.gcp_storage.add_filing_metadata(
+                    metadata,
+                    **metadata_update
+                )
 
-                # Update metadata in Firestore if text upload was successful
-                if text_upload_result.get("success", False):
-                    # Add Firestore metadata
-                    metadata_update = {}
+                upload_results["metadata"] = metadata_result
 
-                    # Text file functionality has been removed
-                    metadata_update["text_size"] = 0
-                    metadata_update["text_file_skipped"] = True
+            # Overall success if at least text was uploaded
+            upload_success = text_upload_result.get("success", False)
 
-                    # Add LLM path if it was uploaded successfully
-                    if llm_upload_result and llm_upload_result.get("success", False):
-                        metadata_update["llm_path"] = gcs_llm_path
-                        metadata_update["llm_size"] = llm_size
-                        metadata_update["local_llm_path"] = str(llm_path)  # Add local path for token counting
-                        logging.info(f"Adding local LLM path for token counting: {str(llm_path)}")
+            # Add upload stage to results
+            result["stages"]["upload"] = {
+                "success": upload_success,
+                "time_seconds": time.time() - upload_start,
+                "result": upload_results
+            }
 
-                    # Update Firestore
-                    metadata_result = self.gcp_storage.add_filing_metadata(
-                        metadata,
-                        **metadata_update
-                    )
+            if not upload_success:
+                result["warning"] = f"Upload failed: {text_upload_result.get('error', 'Unknown error')}"
+            elif llm_upload_result and not llm_upload_result.get("success", False):
+                result["warning"] = f"LLM upload failed: {llm_upload_result.get('error', 'Unknown error')}"
+                # Don't fail the entire process if upload fails
+        else:
+            logging.info("GCP upload skipped (not configured)")
 
-                    upload_results["metadata"] = metadata_result
+    def _upload_llm_sidecars(self, llm_path, gcs_llm_path, llm_upload_result, upload_results):
+        """
+        Upload the section index and the chunks of an uploaded LLM file next to it in GCS.
+
+        The index gives the byte ranges of the file's sections, so readers can
+        fetch one section with a range read (GCPStorage.read_llm_section); the
+        chunks (LLM_CHUNKING in config) let readers load only the chunks
+        covering the sections they need. Text blocks the file references in
+        the text block store (TEXT_BLOCK_STORE in config) are uploaded once
+        each under text_blocks/. The delta against the previous filing
+        (LLM_DELTA in config) goes next to the file as llm.delta.json.
+        """
+        from src2.formatter.section_index import section_index_path
+        from src2.formatter.llm_chunker import chunk_dir_path, load_chunk_manifest, CHUNK_MANIFEST_NAME
+        from src2.formatter.llm_delta import delta_path, load_llm_delta
+
+        if not llm_upload_result.get("success", False):
+            return
+
+        self._upload_text_blocks(llm_path, upload_results)
+
+        index_path = section_index_path(llm_path)
+        if os.path.exists(index_path):
+            gcs_index_path = section_index_path(gcs_llm_path)
+            index_upload_result = self.gcp_storage.upload_file(index_path, gcs_index_path, force=True)
+            upload_results["section_index_upload"] = index_upload_result
+            if index_upload_result.get("success", False):
+                llm_upload_result["section_index_path"] = gcs_index_path
+
+        manifest = load_chunk_manifest(llm_path)
+        if manifest is not None:
+            chunk_dir = chunk_dir_path(llm_path)
+            gcs_chunk_dir = chunk_dir_path(gcs_llm_path)
+            # The manifest goes last, so it never lists chunks not yet uploaded
+            names = [chunk["file"] for chunk in manifest["chunks"]]
+            chunks_upload_result = self.gcp_storage.upload_files(
+                [(os.path.join(chunk_dir, name), f"{gcs_chunk_dir}/{name}") for name in names],
+                force=True
+            )
+            if chunks_upload_result.get("success", False):
+                chunks_upload_result["manifest"] = self.gcp_storage.upload_file(
+                    os.path.join(chunk_dir, CHUNK_MANIFEST_NAME), f"{gcs_chunk_dir}/{CHUNK_MANIFEST_NAME}", force=True
+                )
+                if chunks_upload_result["manifest"].get("success", False):
+                    llm_upload_result["chunk_manifest_path"] = f"{gcs_chunk_dir}/{CHUNK_MANIFEST_NAME}"
+            upload_results["chunks_upload"] = chunks_upload_result
+
+        # A delta left by an earlier run of a different version of the file is not uploaded
+        local_delta_path = delta_path(llm_path)
+        if os.path.exists(local_delta_path) and load_llm_delta(local_delta_path)["target"]["size"] == os.path.getsize(llm_path):
+            gcs_delta_path = delta_path(gcs_llm_path)
+            delta_upload_result = self.gcp_storage.upload_file(local_delta_path, gcs_delta_path, force=True)
+            upload_results["delta_upload"] = delta_upload_result
+            if delta_upload_result.get("success", False):
+                llm_upload_result["delta_path"] = gcs_delta_path
+
+    def _upload_text_blocks(self, llm_path, upload_results):
+        """
+        Upload the stored text blocks an LLM file references that are not yet in GCS.
 
-                # Overall success if at least text was uploaded
-                upload_success = text_upload_result.get("success", False)
+        Blocks are content-addressed, so each is uploaded once for all filings.
+        """
+        import tempfile
+        from src2.formatter.text_block_store import TextBlockStore, referenced_keys, text_block_object_name
+
+        with open(llm_path, 'r', encoding='utf-8') as f:
+            keys = referenced_keys(f.read())
+        if not keys:
+            return
+
+        blocks = TextBlockStore().get_many(keys)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            uploads = []
+            for key, text in blocks.items():
+                block_path = os.path.join(temp_dir, f"{key}.txt")
+                with open(block_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                uploads.append((block_path, text_block_object_name(key)))
+            upload_results["text_blocks_upload"] = self.gcp_storage.upload_files(uploads)
+
+        if len(blocks) < len(keys):
+            logging.warning(f"{len(keys) - len(blocks)} text blocks referenced by {llm_path} are not in the text block store")
+
+    def _reformat_from_cache(self, plan, filing_info, result, start_time):
+        """
+        Rebuild only the LLM output of a filing from its cached parsed XBRL data.
 
-                # Add upload stage to results
-                result["stages"]["upload"] = {
-                    "success": upload_success,
-                    "time_seconds": time.time() - upload_start,
-                    "result": upload_results
-                }
+        Used by incremental runs when the source document is unchanged but the
+        formatter code (or the output file) changed, so the filing is neither
+        downloaded, rendered nor parsed again.
 
-                if not upload_success:
-                    result["warning"] = f"Upload failed: {text_upload_result.get('error', 'Unknown error')}"
-                elif llm_upload_result and not llm_upload_result.get("success", False):
-                    result["warning"] = f"LLM upload failed: {llm_upload_result.get('error', 'Unknown error')}"
-                    # Don't fail the entire process if upload fails
-            else:
-                logging.info("GCP upload skipped (not configured)")
+        Args:
+            plan: Incremental plan from FilingFingerprintStore.plan
+            filing_info: Filing information dictionary
+            result: Result dictionary to fill in
+            start_time: Processing start time
 
-            # Final result construction
-            result["success"] = "error" not in result
-            result["text_path"] = None  # No longer generating text.txt files
-            result["llm_path"] = str(llm_path) if llm_path and os.path.exists(llm_path) else None
-            result["total_time_seconds"] = time.time() - start_time
+        Returns:
+            Dictionary with processing results and file paths
+        """
+        ticker = filing_info.get("ticker")
+        filing_type = filing_info.get("filing_type", "10-K")
+        record = plan["record"]
+        llm_path = Path(record["llm_path"])
+        previous_hash = record.get("llm_sha256")
+
+        result["stages"]["download"] = {
+            "success": True,
+            "skipped": True,
+            "time_seconds": 0,
+            "result": dict(record.get("download", {}))
+        }
 
-            return result
+        logging.info(f"Incremental: reformatting {ticker} {filing_info.get('accession_number')} from cached parsed XBRL ({plan['reason']})")
 
+        llm_start = time.time()
+        try:
+            with span("parsed_cache"):
+                xbrl_data, metadata = self.fingerprint_store.load_parsed(ticker, filing_info["accession_number"])
+            llm_result = self._generate_llm_output(xbrl_data, metadata, llm_path)
         except Exception as e:
-            logging.error(f"Pipeline continuation error: {str(e)}")
-            result["error"] = str(e)
+            logging.error(f"Error generating LLM format: {str(e)}")
+            metadata = {}
+            llm_result = {
+                "success": False,
+                "error": str(e)
+            }
+
+        result["stages"]["llm_format"] = {
+            "success": llm_result.get("success", False),
+            "time_seconds": time.time() - llm_start,
+            "result": llm_result
+        }
+
+        if not llm_result.get("success", False):
+            result["error"] = f"LLM formatting failed: {llm_result.get('error', 'Unknown error')}"
             result["success"] = False
             result["total_time_seconds"] = time.time() - start_time
             return result
 
+        with span("fact_store"):
+            self._append_facts(ticker, filing_info, xbrl_data, metadata, llm_path)
+
+        # Replace the uploaded copy if the output actually changed, or if the
+        # last upload did not complete
+        try:
+            from src2.sec.fingerprint import hash_file
+            if hash_file(llm_path) != previous_hash or record.get("uploaded") is False:
+                filing_info["force_upload"] = True
+        except OSError:
+            pass
+
+        with span("upload"):
+            self._upload_outputs(result, llm_result, llm_path, ticker, filing_type, filing_info, metadata)
+        with span("record_build"):
+            self._record_build(result, ticker, filing_info, llm_path)
+
+        result["success"] = "error" not in result
+        result["text_path"] = None
+        result["llm_path"] = str(llm_path) if os.path.exists(llm_path) else None
+        result["total_time_seconds"] = time.time() - start_time
+        return result
+
     def process_filing(self, ticker=None, cik=None, filing_type="10-K",
                        filing_index=0, save_intermediate=False):
         """
@@ -1069,6 +1489,16 @@ class SECFilingPipeline:
         Returns:
             Dictionary with processing results and file paths
         """
+        return self._profiled(
+            {"ticker": ticker or cik, "filing_type": filing_type},
+            lambda: self._process_filing(ticker, cik, filing_type, filing_index, save_intermediate)
+        )
+
+    def _process_filing(self, ticker=None, cik=None, filing_type="10-K",
+                        filing_index=0, save_intermediate=False):
+        """
+        Process a filing through the complete pipeline (see process_filing).
+        """
         start_time = time.time()
         result = {
             "ticker": ticker,
@@ -1083,12 +1513,13 @@ class SECFilingPipeline:
             logging.info(f"Stage 1: Downloading {filing_type} for {ticker or cik}")
 
             download_start = time.time()
-            filings = self.downloader.get_company_filings(
-                ticker=ticker,
-                cik=cik,
-                filing_type=filing_type,
-                count=filing_index+1
-            )
+            with span("filing_lookup"):
+                filings = self.downloader.get_company_filings(
+                    ticker=ticker,
+                    cik=cik,
+                    filing_type=filing_type,
+                    count=filing_index+1
+                )
 
             if not filings or len(filings) <= filing_index:
                 error_msg = f"No {filing_type} filings found for {ticker or cik}"
@@ -1099,8 +1530,15 @@ class SECFilingPipeline:
             # Get the target filing
             filing_info = filings[filing_index]
 
+            # Incremental runs go through the fingerprinted path
+            if self.incremental:
+                filing_info.setdefault("ticker", ticker)
+                filing_info.setdefault("filing_type", filing_type)
+                return self.process_filing_with_info(filing_info, save_intermediate)
+
             # Download the filing
-            download_result = self.downloader.download_filing(filing_info)
+            with span("download"):
+                download_result = self.downloader.download_filing(filing_info)
 
             # Add download stage to results
             result["stages"]["download"] = {
@@ -1134,11 +1572,13 @@ class SECFilingPipeline:
 
             try:
                 # Render to HTML
-                rendered_file = self.renderer.render_ixbrl(
-                    document_path,
-                    output_format="html",
-                    output_file=rendered_path
-                )
+                with span("render", bytes_read=os.path.getsize(document_path)):
+                    rendered_file = self.renderer.render_ixbrl(
+                        document_path,
+                        output_format="html",
+                        output_file=rendered_path
+                    )
+                    count("bytes_written", os.path.getsize(rendered_file))
 
                 render_result = {
                     "rendered_file": str(rendered_file),
@@ -1287,10 +1727,12 @@ class SECFilingPipeline:
             }
 
             # Extract content from filing
-            extract_result = self.extractor.process_filing(
-                rendered_path,
-                metadata=metadata
-            )
+            with span("extract", bytes_read=os.path.getsize(rendered_path)):
+                extract_result = self.extractor.process_filing(
+                    rendered_path,
+                    metadata=metadata
+                )
+                count("sections", len(extract_result.get("document_sections", {})))
 
             # Add extraction stage to results
             result["stages"]["extract"] = {
@@ -1302,7 +1744,8 @@ class SECFilingPipeline:
             # Save document sections to metadata for LLM formatter
             if 'document_sections' in extract_result:
                 metadata['html_content'] = {
-                    'document_sections': extract_result['document_sections']
+                    'document_sections': extract_result['document_sections'],
+                    'section_index': extract_result.get('section_index', [])
                 }
                 logging.info(f"Added {len(extract_result['document_sections'])} document sections to metadata for LLM formatter")
 
@@ -1465,10 +1908,18 @@ class SECFilingPipeline:
                             # Continue with basic XBRL data
 
                     # Generate LLM format
-                    llm_content = llm_formatter.generate_llm_format(xbrl_data, metadata)
+                    with span("llm_format", facts=len(xbrl_data["facts"])):
+                        llm_content = llm_formatter.generate_llm_format(xbrl_data, metadata)
 
                     # Save LLM format
-                    save_result = llm_formatter.save_llm_format(llm_content, metadata, str(llm_path))
+                    with span("save_llm_format"):
+                        save_result = llm_formatter.save_llm_format(llm_content, metadata, str(llm_path))
+                        count("bytes_written", save_result.get("size", 0))
+
+                    # Append the numeric facts to the fact store
+                    if save_result.get("success", False):
+                        with span("fact_store"):
+                            self._append_facts(ticker, filing_info, xbrl_data, dict(metadata, doc_path=doc_path), llm_path)
 
                     # Verify balance sheet integrity
                     if save_result.get("success", False):
@@ -1710,7 +2161,9 @@ class SECFilingPipeline:
                             logging.info(f"Force upload: LLM file exists but uploading again: {gcs_llm_path}")
                         else:
                             logging.info(f"Uploading LLM file to GCS: {gcs_llm_path}")
-                        llm_upload_result = self.gcp_storage.upload_file(str(llm_path), gcs_llm_path)
+                        # Existence was checked above, so skip the second check in upload_file
+                        llm_upload_result = self.gcp_storage.upload_file(str(llm_path), gcs_llm_path, force=True)
+                        self._upload_llm_sidecars(llm_path, gcs_llm_path, llm_upload_result, upload_results)
 
                     # Add LLM upload result
                     upload_results["llm_upload"] = llm_upload_result
@@ -1728,6 +2181,12 @@ class SECFilingPipeline:
                     if llm_upload_result and llm_upload_result.get("success", False):
                         metadata_update["llm_path"] = gcs_llm_path
                         metadata_update["llm_size"] = llm_size
+                        if llm_upload_result.get("section_index_path"):
+                            metadata_update["section_index_path"] = llm_upload_result["section_index_path"]
+                        if llm_upload_result.get("chunk_manifest_path"):
+                            metadata_update["chunk_manifest_path"] = llm_upload_result["chunk_manifest_path"]
+                        if llm_upload_result.get("delta_path"):
+                            metadata_update["delta_path"] = llm_upload_result["delta_path"]
                         metadata_update["local_llm_path"] = str(llm_path)  # Add local path for token counting
                         logging.info(f"Adding local LLM path for token counting: {str(llm_path)}")
 
@@ -1933,6 +2392,8 @@ def main():
     parser.add_argument("--save-intermediate", action="store_true", help="Save intermediate files")
     parser.add_argument("--gcp-bucket", help="GCS bucket name for upload")
     parser.add_argument("--gcp-project", help="GCP project ID for upload")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only rerun stages whose input or code fingerprints changed")
 
     args = parser.parse_args()
 
@@ -1941,7 +2402,8 @@ def main():
         contact_email=args.email,
         output_dir=args.output or "./sec_processed",
         gcp_bucket=args.gcp_bucket,
-        gcp_project=args.gcp_project
+        gcp_project=args.gcp_project,
+        incremental=args.incremental
     )
 
     # Helper function to notify about validation failures
@@ -11,14 +11,31 @@ import sys
 import logging
 import subprocess
 import tempfile
-import time
 import shutil
+import hashlib
+import uuid
 from pathlib import Path
 
+from src2.config import RENDER_CACHE
+
 # Constants
 ARELLE_DOWNLOAD_URL = "https://github.com/Arelle/Arelle/releases/latest/download/arelle-win-x64.zip"
 ARELLE_SCRIPT_URL = "https://raw.githubusercontent.com/Arelle/Arelle/master/scripts/runArelleCmdLine.py"
 
+# Output extension and Arelle plugins used for each output format
+OUTPUT_EXTENSIONS = {
+    "html": ".html",
+    "xml": ".xml",
+    "json": ".json"
+}
+OUTPUT_PLUGINS = {
+    "html": ["transforms/SEC"],  # SEC transformation rules
+    "json": ["xbrlJson"]
+}
+
+# Bump when the Arelle command line changes in a way that alters output
+RENDER_CACHE_VERSION = "1"
+
 class ArelleRenderer:
     """
     SEC iXBRL document renderer using Arelle.
@@ -28,7 +45,9 @@ class ArelleRenderer:
     """
     
     def __init__(self, arelle_path=None, temp_dir=None, 
-                 install_if_missing=True, validate_install=True):
+                 install_if_missing=True, validate_install=True,
+                 cache_dir=None, use_cache=None,
+                 cache_max_entries=None, cache_max_bytes=None):
         """
         Initialize the Arelle-based renderer.
         
@@ -37,6 +56,11 @@ class ArelleRenderer:
             temp_dir: Directory for temporary files
             install_if_missing: Whether to install Arelle if not found
             validate_install: Whether to validate Arelle installation
+            cache_dir: Directory for the content-addressed render cache
+                (kept outside temp_dir so cleanup() does not discard it)
+            use_cache: Whether to reuse cached renders (defaults to RENDER_CACHE config)
+            cache_max_entries: Maximum number of cached renders
+            cache_max_bytes: Maximum total size of cached renders in bytes
         """
         # Set up paths
         self.arelle_path = arelle_path
@@ -49,6 +73,18 @@ class ArelleRenderer:
             self.temp_dir = Path(tempfile.gettempdir()) / "ixbrl_renderer"
             os.makedirs(self.temp_dir, exist_ok=True)
         
+        # Set up render cache
+        self.use_cache = RENDER_CACHE.get("enabled", True) if use_cache is None else use_cache
+        self.cache_max_entries = cache_max_entries or RENDER_CACHE.get("max_entries", 500)
+        self.cache_max_bytes = cache_max_bytes or RENDER_CACHE.get("max_bytes", 5 * 1024 ** 3)
+        cache_dir = cache_dir or RENDER_CACHE.get("cache_dir")
+        if cache_dir:
+            self.cache_dir = Path(cache_dir)
+        else:
+            self.cache_dir = Path(tempfile.gettempdir()) / "ixbrl_render_cache"
+        if self.use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        
         # Validate or find Arelle installation
         if not self.arelle_path:
             self.arelle_path = self._find_arelle()
@@ -231,10 +267,128 @@ class ArelleRenderer:
             logging.error(f"Arelle validation failed: {str(e)}")
             return False
     
+    def get_cache_key(self, input_file, output_format="html"):
+        """
+        Compute the render cache key for an input document.
+        
+        The key covers the document content, output format and Arelle plugin set,
+        so any change to one of them produces a new cache entry.
+        
+        Args:
+            input_file: Path to iXBRL file
+            output_format: Output format (html, xhtml, xml, json)
+            
+        Returns:
+            Hex digest identifying the rendered output
+        """
+        hasher = hashlib.sha256()
+        with open(input_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        
+        plugins = ",".join(sorted(OUTPUT_PLUGINS.get(output_format, [])))
+        hasher.update(f"|format={output_format}|plugins={plugins}|v={RENDER_CACHE_VERSION}".encode("utf-8"))
+        return hasher.hexdigest()
+    
+    def _cache_path(self, cache_key, output_format):
+        """Get the cache file path for a cache key."""
+        ext = OUTPUT_EXTENSIONS.get(output_format, ".xhtml")
+        return self.cache_dir / f"{cache_key}{ext}"
+    
+    def _get_cached_render(self, cache_key, output_format):
+        """
+        Look up a cached render.
+        
+        Returns:
+            Path to the cached file or None if not cached
+        """
+        cache_path = self._cache_path(cache_key, output_format)
+        if not cache_path.exists():
+            return None
+        
+        try:
+            # Touch the entry so eviction treats it as recently used
+            os.utime(cache_path, None)
+        except OSError:
+            pass
+        return cache_path
+    
+    def _store_cached_render(self, cache_key, output_format, rendered_file):
+        """
+        Copy a rendered file into the cache and enforce the cache bounds.
+        
+        The copy goes to a unique temporary name first and is then renamed into
+        place, so concurrent workers never observe a partially written entry.
+        """
+        cache_path = self._cache_path(cache_key, output_format)
+        tmp_path = self.cache_dir / f".{cache_key}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            shutil.copyfile(rendered_file, tmp_path)
+            os.replace(tmp_path, cache_path)
+            logging.info(f"Stored render in cache: {cache_path}")
+        except Exception as e:
+            logging.warning(f"Could not store render in cache: {str(e)}")
+            if tmp_path.exists():
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        
+        self._evict_cache()
+    
+    def _evict_cache(self):
+        """
+        Evict least recently used cache entries until the cache is within its
+        entry count and size limits.
+        """
+        try:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logging.warning(f"Could not scan render cache: {str(e)}")
+            return
+        
+        # Oldest first
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        
+        while entries and (len(entries) > self.cache_max_entries or total_bytes > self.cache_max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total_bytes -= size
+                logging.info(f"Evicted render cache entry: {path}")
+            except FileNotFoundError:
+                # Another worker evicted it first
+                total_bytes -= size
+            except OSError as e:
+                logging.warning(f"Could not evict render cache entry {path}: {str(e)}")
+    
+    def clear_cache(self):
+        """
+        Remove all entries from the render cache.
+        """
+        try:
+            if os.path.exists(self.cache_dir):
+                shutil.rmtree(self.cache_dir)
+                logging.info(f"Removed render cache: {self.cache_dir}")
+        except Exception as e:
+            logging.error(f"Error clearing render cache: {str(e)}")
+    
     def render_ixbrl(self, input_file, output_format="html", output_file=None):
         """
         Render an iXBRL file using Arelle.
         
+        Renders are cached by input content, output format and plugin set, so
+        re-rendering an unchanged document copies the cached output instead of
+        running Arelle again.
+        
         Args:
             input_file: Path to iXBRL file
             output_format: Output format (html, xhtml, xml, json)
@@ -243,29 +397,45 @@ class ArelleRenderer:
         Returns:
             Path to rendered output file
         """
-        if not self.arelle_path:
-            raise ValueError("Arelle not found or not properly installed")
-        
         if not os.path.exists(input_file):
             raise ValueError(f"Input file not found: {input_file}")
         
+        cache_key = None
+        if self.use_cache:
+            try:
+                cache_key = self.get_cache_key(input_file, output_format)
+            except Exception as e:
+                logging.warning(f"Could not compute render cache key: {str(e)}")
+        
         # Set default output file if not provided
         if not output_file:
-            if output_format == "html":
-                ext = ".html"
-            elif output_format == "xml":
-                ext = ".xml"
-            elif output_format == "json":
-                ext = ".json"
-            else:
-                ext = ".xhtml"
+            ext = OUTPUT_EXTENSIONS.get(output_format, ".xhtml")
             
-            # Create temp file
-            output_file = self.temp_dir / f"rendered_{int(time.time())}{ext}"
+            # Name by content so identical inputs map to the same file and
+            # concurrent workers never collide on a timestamp
+            name = cache_key[:16] if cache_key else uuid.uuid4().hex
+            output_file = self.temp_dir / f"rendered_{name}{ext}"
         
         # Ensure output directory exists
         os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
         
+        # Serve from cache if possible (does not require Arelle)
+        if cache_key:
+            cached_file = self._get_cached_render(cache_key, output_format)
+            if cached_file:
+                try:
+                    if os.path.abspath(cached_file) != os.path.abspath(output_file):
+                        tmp_output = f"{output_file}.{uuid.uuid4().hex}.tmp"
+                        shutil.copyfile(cached_file, tmp_output)
+                        os.replace(tmp_output, output_file)
+                    logging.info(f"Using cached render for {input_file}: {cached_file}")
+                    return output_file
+                except Exception as e:
+                    logging.warning(f"Could not use cached render, rendering again: {str(e)}")
+        
+        if not self.arelle_path:
+            raise ValueError("Arelle not found or not properly installed")
+        
         # Determine how to run Arelle
         if self.arelle_path == "module":
             # Run as Python module
@@ -277,33 +447,23 @@ class ArelleRenderer:
             # Executable
             cmd_base = [self.arelle_path]
         
+        # Arelle writes to a unique temporary file which is renamed into place,
+        # so concurrent renders of the same output never see partial files
+        # (the original extension is kept in case Arelle infers the format from it)
+        output_name = Path(output_file).name
+        render_target = str(Path(output_file).with_name(f".{uuid.uuid4().hex}_{output_name}"))
+        
         # Build command based on output format
-        if output_format == "html":
-            # HTML output (most common format for human-readable rendering)
-            cmd = cmd_base + [
-                "--file", input_file,
-                "--plugins", "transforms/SEC",  # SEC transformation rules
-                "--save-instance", output_file
-            ]
-        elif output_format == "xml":
-            # XML output (XBRL format)
-            cmd = cmd_base + [
-                "--file", input_file,
-                "--save-instance", output_file
-            ]
-        elif output_format == "json":
+        cmd = cmd_base + ["--file", str(input_file)]
+        plugins = OUTPUT_PLUGINS.get(output_format)
+        if plugins:
+            cmd += ["--plugins", "|".join(plugins)]
+        if output_format == "json":
             # JSON output
-            cmd = cmd_base + [
-                "--file", input_file,
-                "--plugins", "xbrlJson",
-                "--save-json", output_file
-            ]
+            cmd += ["--save-json", render_target]
         else:
-            # Default to XHTML
-            cmd = cmd_base + [
-                "--file", input_file,
-                "--save-instance", output_file
-            ]
+            # HTML, XML (XBRL format) and XHTML output
+            cmd += ["--save-instance", render_target]
         
         # Run Arelle
         logging.info(f"Rendering iXBRL file: {input_file}")
@@ -324,17 +484,28 @@ class ArelleRenderer:
                 raise Exception(f"Arelle rendering failed: {result.stderr}")
             
             # Check if output file was created
-            if not os.path.exists(output_file):
+            if not os.path.exists(render_target):
                 logging.error(f"Output file not created: {output_file}")
                 logging.error(f"Arelle output: {result.stdout}")
                 raise Exception(f"Output file not created: {output_file}")
             
+            os.replace(render_target, output_file)
             logging.info(f"Successfully rendered iXBRL to: {output_file}")
+            
+            if cache_key:
+                self._store_cached_render(cache_key, output_format, output_file)
+            
             return output_file
             
         except Exception as e:
             logging.error(f"Error rendering iXBRL file: {str(e)}")
             raise Exception(f"Error rendering iXBRL file: {str(e)}")
+        finally:
+            if os.path.exists(render_target):
+                try:
+                    os.remove(render_target)
+                except OSError:
+                    pass
 
     def extract_text(self, ixbrl_file, output_file=None):
         """
@@ -418,11 +589,17 @@ if __name__ == "__main__":
     parser.add_argument("--format", choices=["html", "xml", "json", "text"], default="html",
                       help="Output format (default: html)")
     parser.add_argument("--arelle-path", help="Path to Arelle executable or script")
+    parser.add_argument("--cache-dir", help="Directory for the render cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the render cache")
     
     args = parser.parse_args()
     
     # Create renderer
-    renderer = ArelleRenderer(arelle_path=args.arelle_path)
+    renderer = ArelleRenderer(
+        arelle_path=args.arelle_path,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache
+    )
     
     # Render file
     if args.format == "text":
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+SEC Filing Section Segmenter
+
+Finds the Item sections of 10-K and 10-Q filings in one pass over the
+document's flattened text. Part, Item and Signatures headings are matched by
+a single compiled pattern, table of contents entries are told apart from the
+headings in the body, and the result is a list of section spans (character
+offsets into the flattened text) that the extractor, the text extractor, the
+LLM formatter and the Firestore metadata all share instead of each searching
+the HTML again.
+"""
+
+import re
+import logging
+import dataclasses
+
+from bs4 import BeautifulSoup, NavigableString, CData, Tag
+from lxml import etree
+
+# Section IDs by item number (10-K) and by part and item number (10-Q), in
+# document order. The LLM formatter takes its narrative section order from
+# this table, so IDs changed here change the section names of the LLM files.
+FORM_10K_SECTIONS = {
+    "1": "ITEM_1_BUSINESS",
+    "1A": "ITEM_1A_RISK_FACTORS",
+    "1B": "ITEM_1B_UNRESOLVED_STAFF_COMMENTS",
+    "1C": "ITEM_1C_CYBERSECURITY",
+    "2": "ITEM_2_PROPERTIES",
+    "3": "ITEM_3_LEGAL_PROCEEDINGS",
+    "4": "ITEM_4_MINE_SAFETY_DISCLOSURES",
+    "5": "ITEM_5_MARKET",
+    "6": "ITEM_6_SELECTED_FINANCIAL_DATA",
+    "7": "ITEM_7_MD_AND_A",
+    "7A": "ITEM_7A_MARKET_RISK",
+    "8": "ITEM_8_FINANCIAL_STATEMENTS",
+    "9": "ITEM_9_DISAGREEMENTS",
+    "9A": "ITEM_9A_CONTROLS",
+    "9B": "ITEM_9B_OTHER_INFORMATION",
+    "9C": "ITEM_9C_FOREIGN_JURISDICTIONS",
+    "10": "ITEM_10_DIRECTORS",
+    "11": "ITEM_11_EXECUTIVE_COMPENSATION",
+    "12": "ITEM_12_SECURITY_OWNERSHIP",
+    "13": "ITEM_13_RELATIONSHIPS",
+    "14": "ITEM_14_ACCOUNTANT_FEES",
+    "15": "ITEM_15_EXHIBITS",
+    "16": "ITEM_16_SUMMARY"
+}
+
+FORM_10Q_SECTIONS = {
+    "I": {
+        "1": "ITEM_1_FINANCIAL_STATEMENTS",
+        "2": "ITEM_2_MD_AND_A",
+        "3": "ITEM_3_MARKET_RISK",
+        "4": "ITEM_4_CONTROLS"
+    },
+    "II": {
+        "1": "ITEM_1_LEGAL_PROCEEDINGS",
+        "1A": "ITEM_1A_RISK_FACTORS_Q",
+        "2": "ITEM_2_UNREGISTERED_SALES",
+        "3": "ITEM_3_DEFAULTS",
+        "4": "ITEM_4_MINE_SAFETY_Q",
+        "5": "ITEM_5_OTHER_INFORMATION_Q",
+        "6": "ITEM_6_EXHIBITS_Q"
+    }
+}
+
+# Headings are at most this many characters long; longer lines starting with
+# "Item N" are cross-references in running text
+MAX_HEADING_LENGTH = 200
+
+# A run of at least TOC_MIN_ENTRIES headings, each within TOC_MAX_GAP
+# characters of the next, is a table of contents if its items appear again
+# later in the document
+TOC_MAX_GAP = 500
+TOC_MIN_ENTRIES = 5
+
+# Elements that start a new line in the flattened text
+BLOCK_TAGS = frozenset([
+    "address", "article", "blockquote", "br", "center", "dd", "div", "dl", "dt",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "ol", "p", "pre", "section",
+    "table", "tbody", "td", "th", "thead", "tfoot", "title", "tr", "ul"
+])
+
+# Elements whose text is not part of the document (ix:header holds the hidden
+# inline XBRL contexts and units)
+SKIPPED_TAGS = frozenset(["script", "style", "head", "ix:header"])
+
+# BeautifulSoup reduces strings made only of these characters to a single
+# space or newline; the lxml flattening does the same so both give equal text
+ASCII_SPACES = " \n\t\x0c\r"
+
+# Characters searched for "FORM 10-K" / "FORM 10-Q" (inline XBRL headers come first)
+COVER_PAGE_LENGTH = 100000
+
+_SPACE = r"[ \t\xa0]"
+
+# One pattern for every heading kind, anchored at line starts
+HEADING_PATTERN = re.compile(
+    rf"^{_SPACE}*(?:"
+    rf"(?P<part>PART{_SPACE}+(?P<part_num>IV|III|II|I)\b)"
+    rf"|(?P<item>ITEM{_SPACE}*(?P<item_num>\d{{1,2}}[A-C]?)\b)"
+    rf"|(?P<signatures>SIGNATURES?{_SPACE}*$)"
+    rf"){_SPACE}*[.:\-–—]?{_SPACE}*(?P<rest>[^\n]*)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+_FILING_TYPE_PATTERN = re.compile(r"FORM\s+10-?(K|Q)\b", re.IGNORECASE)
+
+
+@dataclasses.dataclass
+class SectionSpan:
+    """A section of a filing as character offsets into the flattened text."""
+    section_id: str
+    item: str
+    part: str
+    heading: str
+    start: int  # Start of the heading
+    body_start: int  # Start of the section text after the heading line
+    end: int  # Start of the next section (or end of text)
+
+    def to_dict(self):
+        """Convert to a dictionary (for JSON and Firestore metadata)."""
+        return dataclasses.asdict(self)
+
+
+def normalize_filing_type(filing_type):
+    """
+    Map filing type variants to the form the segmenter knows.
+
+    Args:
+        filing_type: Filing type such as "10-K", "10-K/A" or "10-Q"
+
+    Returns:
+        "10-K", "10-Q" or None for other filing types
+    """
+    if not filing_type:
+        return None
+    filing_type = filing_type.upper()
+    if filing_type.startswith("10-K"):
+        return "10-K"
+    if filing_type.startswith("10-Q"):
+        return "10-Q"
+    return None
+
+
+def detect_filing_type(text):
+    """
+    Detect whether a flattened filing is a 10-K or a 10-Q from its cover page.
+
+    Args:
+        text: Flattened filing text
+
+    Returns:
+        "10-K", "10-Q" or None
+    """
+    match = _FILING_TYPE_PATTERN.search(text[:COVER_PAGE_LENGTH])
+    if match:
+        return f"10-{match.group(1).upper()}"
+    return None
+
+
+def flatten_html(html_content):
+    """
+    Flatten an HTML document (or parsed BeautifulSoup content) into text with
+    one line per block element, so headings start at line starts while inline
+    elements stay on their line.
+
+    Args:
+        html_content: HTML string, BeautifulSoup object or Tag
+
+    Returns:
+        Flattened text
+    """
+    if isinstance(html_content, (str, bytes)):
+        root = BeautifulSoup(html_content, 'html.parser')
+    else:
+        root = html_content
+
+    parts = []
+    # Iterative walk; unclosed tags can nest deeper than the recursion limit
+    stack = [(iter(root.children), False)]
+    while stack:
+        children, is_block = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if is_block:
+                parts.append("\n")
+            continue
+        if isinstance(child, Tag):
+            if child.name in SKIPPED_TAGS:
+                continue
+            block = child.name in BLOCK_TAGS
+            if block:
+                parts.append("\n")
+            stack.append((iter(child.children), block))
+        elif type(child) is NavigableString or type(child) is CData:
+            parts.append(child.replace("\n", " "))
+
+    return "".join(parts)
+
+
+def _element_string(value):
+    """Text node of an lxml tree as it appears in the flattened text."""
+    if not value.strip(ASCII_SPACES):
+        return " "
+    return value.replace("\n", " ")
+
+
+def flatten_element(root):
+    """
+    Flatten an lxml element the way flatten_html flattens BeautifulSoup content.
+
+    Args:
+        root: lxml element (its own tail is not included)
+
+    Returns:
+        Flattened text
+    """
+    parts = []
+    if root.text:
+        parts.append(_element_string(root.text))
+
+    # Iterative walk, as in flatten_html
+    stack = [(root, iter(root), False)]
+    while stack:
+        element, children, is_block = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if is_block:
+                parts.append("\n")
+            if stack and element.tail:
+                parts.append(_element_string(element.tail))
+            continue
+        tag = child.tag
+        # Comments and processing instructions only contribute their tail
+        if not isinstance(tag, str) or tag in SKIPPED_TAGS:
+            if child.tail:
+                parts.append(_element_string(child.tail))
+            continue
+        block = tag in BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        if child.text:
+            parts.append(_element_string(child.text))
+        stack.append((child, iter(child), block))
+
+    return "".join(parts)
+
+
+def _heading_text(text, match):
+    """Heading text of a match, taking the title from the next line if the line only holds the number."""
+    label = match.group(0).strip()
+    if match.group("rest").strip():
+        return " ".join(label.split())
+
+    # "Item 1." and "Business" are often in separate cells or spans
+    position = match.end()
+    while position < len(text):
+        line_end = text.find("\n", position + 1)
+        if line_end == -1:
+            line_end = len(text)
+        line = text[position:line_end].strip()
+        if line:
+            if len(line) <= MAX_HEADING_LENGTH and not HEADING_PATTERN.match(line):
+                label = f"{label} {line}"
+            break
+        position = line_end
+    return " ".join(label.split())
+
+
+def _find_headings(text):
+    """All Part, Item and Signatures heading candidates in document order."""
+    headings = []
+    for match in HEADING_PATTERN.finditer(text):
+        if len(match.group(0).strip()) > MAX_HEADING_LENGTH:
+            continue
+        if match.group("part"):
+            kind, number = "part", match.group("part_num").upper()
+        elif match.group("item"):
+            kind, number = "item", match.group("item_num").upper()
+        else:
+            kind, number = "signatures", ""
+        headings.append({
+            "kind": kind,
+            "number": number,
+            "start": match.start() + len(match.group(0)) - len(match.group(0).lstrip()),
+            "line_end": match.end(),
+            "match": match,
+            "toc": False
+        })
+    return headings
+
+
+def _item_order(number):
+    """Sort key of an item number such as "9A"."""
+    digits = number.rstrip("ABC")
+    return int(digits) * 10 + (ord(number[-1]) - ord("A") + 1 if number[-1].isalpha() else 0)
+
+
+def _assign_sections(headings, filing_type):
+    """Set the part and section ID of each item heading."""
+    part = None
+    explicit_part = False
+    previous_order = None
+    for heading in headings:
+        if heading["kind"] == "part":
+            part = heading["number"]
+            explicit_part = True
+            previous_order = None
+            continue
+        if heading["kind"] != "item":
+            continue
+
+        order = _item_order(heading["number"])
+        if filing_type == "10-Q":
+            # Without Part headings, a lower item number starts the other part
+            if not explicit_part and previous_order is not None and order < previous_order:
+                part = "II" if part != "II" else "I"
+            explicit_part = False
+            heading["part"] = part or "I"
+            heading["section_id"] = FORM_10Q_SECTIONS.get(heading["part"], {}).get(heading["number"])
+        else:
+            heading["part"] = part
+            heading["section_id"] = FORM_10K_SECTIONS.get(heading["number"])
+        previous_order = order
+
+
+def _mark_table_of_contents(headings):
+    """Flag runs of closely spaced headings whose items appear again later as TOC entries."""
+    runs = []
+    run = []
+    run_ids = set()
+    for heading in headings:
+        section_id = heading.get("section_id")
+        if run and heading["start"] - run[-1]["start"] > TOC_MAX_GAP:
+            runs.append(run)
+            run, run_ids = [], set()
+        elif section_id and section_id in run_ids:
+            # A table of contents lists each item once, so a repeated item
+            # starts the body (together with the Part heading just before it)
+            carried = []
+            while run and run[-1]["kind"] == "part":
+                carried.insert(0, run.pop())
+            runs.append(run)
+            run, run_ids = carried, set()
+        run.append(heading)
+        if section_id:
+            run_ids.add(section_id)
+    if run:
+        runs.append(run)
+
+    for run in runs:
+        items = [heading for heading in run if heading.get("section_id")]
+        if len(items) < TOC_MIN_ENTRIES:
+            continue
+        run_end = run[-1]["start"]
+        later_ids = {
+            heading.get("section_id") for heading in headings
+            if heading["start"] > run_end and heading.get("section_id")
+        }
+        repeated = sum(1 for heading in items if heading["section_id"] in later_ids)
+        if repeated * 2 >= len(items):
+            for heading in run:
+                heading["toc"] = True
+
+
+def segment_text(text, filing_type=None):
+    """
+    Split flattened filing text into Item sections.
+
+    Args:
+        text: Flattened filing text (see flatten_html)
+        filing_type: "10-K" or "10-Q" (detected from the cover page if not given)
+
+    Returns:
+        List of SectionSpan in document order (empty for other filing types)
+    """
+    filing_type = normalize_filing_type(filing_type) or detect_filing_type(text)
+    if filing_type not in ("10-K", "10-Q"):
+        return []
+
+    headings = _find_headings(text)
+    _assign_sections(headings, filing_type)
+    _mark_table_of_contents(headings)
+
+    # Section boundaries: the first body heading of each item, plus Part and
+    # Signatures headings that end the previous item
+    boundaries = []
+    seen = set()
+    for heading in headings:
+        if heading["toc"]:
+            continue
+        if heading["kind"] == "item":
+            section_id = heading.get("section_id")
+            if not section_id or section_id in seen:
+                continue
+            seen.add(section_id)
+        boundaries.append(heading)
+
+    spans = []
+    for index, heading in enumerate(boundaries):
+        if heading["kind"] != "item":
+            continue
+        end = boundaries[index + 1]["start"] if index + 1 < len(boundaries) else len(text)
+        spans.append(SectionSpan(
+            section_id=heading["section_id"],
+            item=heading["number"],
+            part=heading.get("part") or "",
+            heading=_heading_text(text, heading["match"]),
+            start=heading["start"],
+            body_start=min(heading["line_end"], end),
+            end=end
+        ))
+
+    logging.debug(f"Segmented {filing_type} text of {len(text):,} chars into {len(spans)} sections")
+    return spans
+
+
+def segment_html(html_content, filing_type=None):
+    """
+    Flatten an HTML filing and split it into Item sections.
+
+    Args:
+        html_content: HTML string, BeautifulSoup object or Tag, or lxml element
+        filing_type: "10-K" or "10-Q" (detected if not given)
+
+    Returns:
+        Tuple of (flattened text, list of SectionSpan)
+    """
+    if isinstance(html_content, etree._Element):
+        text = flatten_element(html_content)
+    else:
+        text = flatten_html(html_content)
+    return text, segment_text(text, filing_type)
+
+
+def section_text(text, span):
+    """
+    Text of a section body with blank lines and surrounding whitespace removed.
+
+    Args:
+        text: Flattened filing text the span refers to
+        span: SectionSpan
+
+    Returns:
+        Section text with one line per block
+    """
+    lines = (line.strip() for line in text[span.body_start:span.end].splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def spans_to_document_sections(text, spans):
+    """
+    Build the document_sections dictionary used by the LLM formatter.
+
+    Args:
+        text: Flattened filing text the spans refer to
+        spans: List of SectionSpan
+
+    Returns:
+        Dict of section ID to {"heading", "text", "start", "end"}
+    """
+    document_sections = {}
+    for span in spans:
+        body = section_text(text, span)
+        if body:
+            document_sections[span.section_id] = {
+                "heading": span.heading,
+                "text": body,
+                "start": span.start,
+                "end": span.end
+            }
+    return document_sections
+
+
+def section_index(spans):
+    """
+    Compact description of the sections, for filing metadata.
+
+    Args:
+        spans: List of SectionSpan
+
+    Returns:
+        List of {"id", "heading", "start", "end"} dictionaries
+    """
+    return [
+        {"id": span.section_id, "heading": span.heading, "start": span.start, "end": span.end}
+        for span in spans
+    ]
@@ -3,6 +3,8 @@ Storage Package
 
 This package provides storage functionality:
 - GCPStorage: Upload files to Google Cloud Storage
+- FirestoreBatchWriter: Buffered, batched Firestore document writes
 """
 
-from .gcp_storage import GCPStorage, create_gcp_storage
\ No newline at end of file
+from .gcp_storage import GCPStorage, create_gcp_storage
+from .firestore_batch import FirestoreBatchWriter
@@ -0,0 +1,698 @@
+"""
+Fact Store Module
+
+Store of the numeric facts of every processed filing (FACT_STORE in config),
+so a concept can be read as a series over periods and filings without
+opening LLM files. Each fact is one row of a SQLite table:
+
+    ticker | prefix | concept | period_start | period_end | dimensions | value | unit | accession | filing_date
+
+- concept is the local name (Revenues), prefix its namespace prefix (us-gaap)
+- period_start is NULL for instant facts
+- dimensions is the canonical JSON of the context's explicit members, ""
+  for facts without dimensions, and NULL when the source did not record them
+  (facts backfilled from filings whose context definitions were not kept)
+- value is the number as reported (scale applied, negative for a sign="-"
+  attribute or parentheses)
+
+A covering index on (ticker, concept, period_end, ...) answers a series
+query from the index alone; all rows of a company live together in it, like
+a partition per ticker. Appending a filing replaces its rows, so reprocessing
+is idempotent.
+
+The pipeline appends each filing after its LLM file is saved.
+backfill_from_outputs fills the store from filings processed before: the
+facts saved next to each download (_xbrl_extracted_data.json with context
+definitions, else _xbrl_raw.json with the contexts of the downloaded
+document or, without it, the periods of the saved LLM file). Facts saved
+before the extractor kept the inline XBRL sign read as positive, so they are
+extracted again from the downloaded document, and filings without one are
+skipped.
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from src2.config import FACT_STORE, PROCESSED_DATA_DIR
+from src2.xbrl.calculation_validator import parse_fact_value
+from src2.xbrl.xbrl_cache import CACHE_FILENAME, load_cached_facts, save_cached_facts
+from src2.xbrl.xbrl_facts_extractor import extract_facts_from_html
+
+# Seconds to wait for another writer to release the store lock
+BUSY_TIMEOUT = 30.0
+
+# Saved LLM file names: ticker, filing type, fiscal year and period
+LLM_FILE_NAME_PATTERN = re.compile(r'^([A-Z0-9.]+)_(.+?)_(\d{4})(?:_(Q[1-4]|FY))?_llm\.txt$')
+
+# Fact blocks of the individual facts section
+FACT_BLOCK_PATTERN = re.compile(r'^@CONCEPT: .*?(?=\n\n|\Z)', re.MULTILINE | re.DOTALL)
+
+# Periods written in context IDs (..._D20230101-20231231, ..._I20231231,
+# C_0000789019_20230101_20231231)
+DURATION_REF_PATTERN = re.compile(r'(?:_D|_\d{10}_)(\d{8})[-_](\d{8})$')
+INSTANT_REF_PATTERN = re.compile(r'(?:_I|_\d{10}_)(\d{8})$')
+
+# Context definitions of an inline XBRL document (any namespace prefix)
+CONTEXT_PATTERN = re.compile(r'<(?:[\w-]+:)?context\b[^>]*?\bid="([^"]+)"[^>]*>(.*?)</(?:[\w-]+:)?context>', re.DOTALL)
+INSTANT_PATTERN = re.compile(r'<(?:[\w-]+:)?instant>\s*([^<\s]+)\s*<')
+START_DATE_PATTERN = re.compile(r'<(?:[\w-]+:)?startDate>\s*([^<\s]+)\s*<')
+END_DATE_PATTERN = re.compile(r'<(?:[\w-]+:)?endDate>\s*([^<\s]+)\s*<')
+MEMBER_PATTERN = re.compile(
+    r'<(?:[\w-]+:)?(?:explicit|typed)Member\b[^>]*?\bdimension="([^"]+)"[^>]*>(.*?)</(?:[\w-]+:)?(?:explicit|typed)Member>',
+    re.DOTALL
+)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Facts written per executemany batch
+INSERT_BATCH = 5000
+
+
+def _iso_date(digits):
+    """YYYY-MM-DD from YYYYMMDD."""
+    return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
+
+
+def canonical_dimensions(dimensions):
+    """
+    Stored form of a context's dimensions
+
+    Args:
+        dimensions: Dict of dimension (axis) to member, or None if unknown
+
+    Returns:
+        Sorted JSON of the members, "" for no dimensions, or None if unknown
+    """
+    if dimensions is None:
+        return None
+    if not dimensions:
+        return ""
+    return json.dumps({str(axis): str(member) for axis, member in dimensions.items()},
+                      sort_keys=True, separators=(",", ":"))
+
+
+def period_from_context_ref(context_ref):
+    """
+    Period written in a context ID, for contexts without a definition
+
+    Args:
+        context_ref: Context ID
+
+    Returns:
+        Period dictionary (instant, or startDate and endDate), or None
+    """
+    match = DURATION_REF_PATTERN.search(context_ref or "")
+    if match:
+        return {"startDate": _iso_date(match.group(1)), "endDate": _iso_date(match.group(2))}
+    match = INSTANT_REF_PATTERN.search(context_ref or "")
+    if match:
+        return {"instant": _iso_date(match.group(1))}
+    return None
+
+
+def document_contexts(html_content):
+    """
+    Context definitions of an inline XBRL document
+
+    Dimension and member names are written without their namespace prefix,
+    as in the contexts of the LLM formatter.
+
+    Args:
+        html_content: Content of the inline XBRL document
+
+    Returns:
+        Dict of context ID to context dictionary (period, dimensions)
+    """
+    contexts = {}
+    for context_id, body in CONTEXT_PATTERN.findall(html_content):
+        instant = INSTANT_PATTERN.search(body)
+        start_date = START_DATE_PATTERN.search(body)
+        end_date = END_DATE_PATTERN.search(body)
+        if start_date and end_date:
+            period = {"startDate": start_date.group(1), "endDate": end_date.group(1)}
+        elif instant:
+            period = {"instant": instant.group(1)}
+        else:
+            continue
+        dimensions = {
+            dimension.split(":")[-1]: TAG_PATTERN.sub("", member).strip().split(":")[-1]
+            for dimension, member in MEMBER_PATTERN.findall(body)
+        }
+        contexts[context_id] = {"id": context_id, "period": period, "dimensions": dimensions}
+    return contexts
+
+
+def llm_file_contexts(content):
+    """
+    Periods of the contexts used by the facts of a saved LLM file
+
+    The LLM file does not keep the dimensions of its contexts, so they are
+    returned as unknown.
+
+    Args:
+        content: Content of the LLM file (full or compact profile)
+
+    Returns:
+        Dict of context ID to context dictionary (period, dimensions None)
+    """
+    contexts = {}
+    for match in FACT_BLOCK_PATTERN.finditer(content):
+        fields = {}
+        for line in match.group(0).split("\n"):
+            tag, separator, value = line.partition(": ")
+            if separator:
+                fields.setdefault(tag, value.strip())
+
+        context_ref = fields.get("@CONTEXT_REF", "").split("|")[0].strip()
+        if not context_ref or context_ref in contexts:
+            continue
+        if fields.get("@START_DATE") and fields.get("@END_DATE"):
+            period = {"startDate": fields["@START_DATE"], "endDate": fields["@END_DATE"]}
+        elif fields.get("@DATE"):
+            period = {"instant": fields["@DATE"]}
+        else:
+            continue
+        contexts[context_ref] = {"id": context_ref, "period": period, "dimensions": None}
+
+    if not contexts:
+        from src2.formatter.fact_table import read_fact_table
+        table = read_fact_table(content)
+        for context_id, context_ref in (table or {}).get("contexts", {}).items():
+            start, separator, end = table["contexts_period"].get(context_id, "").partition(" to ")
+            if separator:
+                period = {"startDate": start, "endDate": end}
+            elif start:
+                period = {"instant": start}
+            else:
+                continue
+            contexts[context_ref] = {"id": context_ref, "period": period, "dimensions": None}
+    return contexts
+
+
+def numeric_fact_rows(facts, contexts):
+    """
+    Store rows of the numeric facts of a filing
+
+    A fact is numeric when it has a unit and its value parses as a number.
+    Contexts missing from the definitions take the period written in their
+    ID, with unknown dimensions; facts of contexts without a period are left out.
+
+    Args:
+        facts: Fact dictionaries as extracted from the inline XBRL document
+            (name or concept, contextRef or context_ref, unitRef or unit_ref,
+            value, format, scale, sign, decimals)
+        contexts: Dict of context ID to context dictionary with a period
+            (instant, or startDate and endDate) and the dimensions, as
+            "dimensions" (None if unknown) or as an entity segment
+
+    Returns:
+        List of row dictionaries (prefix, concept, period_start, period_end,
+        dimensions, value, unit, context)
+    """
+    rows = []
+    resolved = {}
+    for fact in facts:
+        unit = fact.get("unitRef") or fact.get("unit_ref")
+        context_ref = fact.get("contextRef") or fact.get("context_ref")
+        name = fact.get("name") or fact.get("concept")
+        if not unit or not context_ref or not name:
+            continue
+
+        if context_ref not in resolved:
+            context = contexts.get(context_ref)
+            period = context.get("period") if context else None
+            if period:
+                if "dimensions" in context:
+                    dimensions = context["dimensions"]
+                else:
+                    dimensions = (context.get("entity") or {}).get("segment") or {}
+            else:
+                period = period_from_context_ref(context_ref)
+                dimensions = None
+            if period and period.get("startDate") and period.get("endDate"):
+                resolved[context_ref] = (period["startDate"], period["endDate"], canonical_dimensions(dimensions))
+            elif period and period.get("instant"):
+                resolved[context_ref] = (None, period["instant"], canonical_dimensions(dimensions))
+            else:
+                resolved[context_ref] = None
+        if resolved[context_ref] is None:
+            continue
+
+        # Displayed negatives: "(1,234)"
+        text = str(fact.get("value", "")).strip()
+        negative = text.startswith("(") and text.endswith(")")
+        parsed = parse_fact_value({
+            "value": text[1:-1] if negative else text,
+            "format": fact.get("format"),
+            "scale": fact.get("scale"),
+            "sign": fact.get("sign"),
+            "decimals": fact.get("decimals")
+        })
+        if parsed is None:
+            continue
+        value = -parsed[0] if negative else parsed[0]
+
+        prefix, _, concept = name.rpartition(":")
+        period_start, period_end, dimensions = resolved[context_ref]
+        rows.append({
+            "prefix": prefix,
+            "concept": concept,
+            "period_start": period_start,
+            "period_end": period_end,
+            "dimensions": dimensions,
+            "value": value,
+            "unit": unit,
+            "context": context_ref
+        })
+    return rows
+
+
+class FactStore:
+    """
+    SQLite store of the numeric facts of processed filings, with one row per
+    fact and a covering index for concept x period series.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Open (and create if needed) a fact store.
+
+        Args:
+            db_path: Path to the SQLite database file (default:
+                FACT_STORE["store_path"], or facts.sqlite under the processed
+                data directory)
+        """
+        db_path = db_path or FACT_STORE.get("store_path") or os.path.join(PROCESSED_DATA_DIR, "facts.sqlite")
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS filings ("
+            "accession TEXT PRIMARY KEY, ticker TEXT NOT NULL, filing_type TEXT, fiscal_year TEXT, "
+            "fiscal_period TEXT, filing_date TEXT, source TEXT, facts INTEGER NOT NULL, added_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS facts ("
+            "ticker TEXT NOT NULL, prefix TEXT NOT NULL, concept TEXT NOT NULL, period_start TEXT, "
+            "period_end TEXT NOT NULL, dimensions TEXT, value REAL NOT NULL, unit TEXT NOT NULL, "
+            "accession TEXT NOT NULL, context TEXT NOT NULL, filing_date TEXT)"
+        )
+        # One row per fact of a filing (repeats of a fact in the document are dropped)
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS facts_by_filing ON facts (accession, prefix, concept, context, unit)"
+        )
+        # Covering index of series queries
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS facts_series ON facts ("
+            "ticker, concept, period_end, period_start, dimensions, unit, prefix, value, filing_date, accession)"
+        )
+
+    def _connection(self):
+        """Get this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def has_filing(self, accession):
+        """
+        Whether the facts of a filing are stored
+
+        Args:
+            accession: Accession number of the filing
+
+        Returns:
+            True if the filing was appended
+        """
+        row = self._connection().execute("SELECT 1 FROM filings WHERE accession = ?", (accession,)).fetchone()
+        return row is not None
+
+    def append_filing(self, filing, rows):
+        """
+        Store the numeric facts of a filing, replacing any stored before.
+
+        Args:
+            filing: Filing dictionary (ticker, accession_number, filing_type,
+                fiscal_year, fiscal_period, filing_date, source)
+            rows: Fact rows, see numeric_fact_rows
+
+        Returns:
+            Number of facts stored
+        """
+        accession = filing["accession_number"]
+        ticker = filing["ticker"]
+        filing_date = filing.get("filing_date")
+        values = [
+            (ticker, row["prefix"], row["concept"], row["period_start"], row["period_end"], row["dimensions"],
+             row["value"], row["unit"], accession, row["context"], filing_date)
+            for row in rows
+        ]
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM facts WHERE accession = ?", (accession,))
+            for start in range(0, len(values), INSERT_BATCH):
+                conn.executemany(
+                    "INSERT OR IGNORE INTO facts (ticker, prefix, concept, period_start, period_end, dimensions, "
+                    "value, unit, accession, context, filing_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values[start:start + INSERT_BATCH]
+                )
+            stored = conn.execute("SELECT COUNT(*) FROM facts WHERE accession = ?", (accession,)).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO filings (accession, ticker, filing_type, fiscal_year, fiscal_period, "
+                "filing_date, source, facts, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (accession, ticker, filing.get("filing_type"), filing.get("fiscal_year"),
+                 filing.get("fiscal_period"), filing_date, filing.get("source"), stored, time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def query_series(self, ticker, concept, dimensions=None, unit=None, months=None, instant=None,
+                     start=None, end=None, latest=True):
+        """
+        Values of a concept over periods
+
+        Args:
+            ticker: Company ticker
+            concept: Concept name, with or without prefix (us-gaap:Revenues or Revenues)
+            dimensions: Dict of axis to member for a dimensional series; by
+                default facts without dimensions (or with dimensions unknown)
+            unit: Unit ID (optional)
+            months: Only durations of this many months, e.g. 3 for quarters (optional)
+            instant: True for instant facts only, False for durations only (optional)
+            start: Earliest period end, YYYY-MM-DD (optional)
+            end: Latest period end, YYYY-MM-DD (optional)
+            latest: One value per period, from the most recent filing
+                reporting it (else every filing's value)
+
+        Returns:
+            List of dictionaries (period_start, period_end, value, unit,
+            dimensions, accession, filing_date) ordered by period
+        """
+        prefix, _, concept = concept.rpartition(":")
+        sql = ["SELECT period_start, period_end, value, unit, dimensions, accession, filing_date "
+               "FROM facts WHERE ticker = ? AND concept = ?"]
+        params = [ticker, concept]
+        if dimensions:
+            sql.append("AND dimensions = ?")
+            params.append(canonical_dimensions(dimensions))
+        else:
+            sql.append("AND (dimensions = '' OR dimensions IS NULL)")
+        if prefix:
+            sql.append("AND prefix = ?")
+            params.append(prefix)
+        if unit:
+            sql.append("AND unit = ?")
+            params.append(unit)
+        if start:
+            sql.append("AND period_end >= ?")
+            params.append(start)
+        if end:
+            sql.append("AND period_end <= ?")
+            params.append(end)
+        if instant is True:
+            sql.append("AND period_start IS NULL")
+        elif instant is False or months:
+            sql.append("AND period_start IS NOT NULL")
+        if months:
+            sql.append("AND CAST(round((julianday(period_end) - julianday(period_start) + 1) / 30.4375) AS INTEGER) = ?")
+            params.append(int(months))
+        # Latest filing first, then document order within a filing
+        sql.append("ORDER BY period_end, period_start, filing_date DESC, rowid")
+
+        series = []
+        seen = set()
+        for period_start, period_end, value, unit_ref, dims, accession, filing_date in self._connection().execute(" ".join(sql), params):
+            if latest:
+                key = (period_start, period_end, unit_ref, dims)
+                if key in seen:
+                    continue
+                seen.add(key)
+            series.append({
+                "period_start": period_start,
+                "period_end": period_end,
+                "value": value,
+                "unit": unit_ref,
+                "dimensions": json.loads(dims) if dims else ({} if dims == "" else None),
+                "accession": accession,
+                "filing_date": filing_date
+            })
+        return series
+
+    def concepts(self, ticker):
+        """
+        Concepts with stored facts for a company
+
+        Args:
+            ticker: Company ticker
+
+        Returns:
+            Sorted list of concept names (without prefix)
+        """
+        rows = self._connection().execute("SELECT DISTINCT concept FROM facts WHERE ticker = ? ORDER BY concept", (ticker,))
+        return [concept for (concept,) in rows]
+
+    def filings(self, ticker=None):
+        """
+        Filings whose facts are stored
+
+        Args:
+            ticker: Only this company's filings (optional)
+
+        Returns:
+            List of filing dictionaries ordered by ticker and filing date
+        """
+        sql = ("SELECT accession, ticker, filing_type, fiscal_year, fiscal_period, filing_date, source, facts "
+               "FROM filings")
+        params = []
+        if ticker:
+            sql += " WHERE ticker = ?"
+            params.append(ticker)
+        columns = ("accession_number", "ticker", "filing_type", "fiscal_year", "fiscal_period", "filing_date", "source", "facts")
+        return [dict(zip(columns, row)) for row in self._connection().execute(sql + " ORDER BY ticker, filing_date", params)]
+
+    def stats(self):
+        """
+        Size of the store
+
+        Returns:
+            Dictionary with the number of filings, facts and companies
+        """
+        conn = self._connection()
+        filings, companies = conn.execute("SELECT COUNT(*), COUNT(DISTINCT ticker) FROM filings").fetchone()
+        facts = conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+        return {"filings": filings, "facts": facts, "companies": companies}
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def has_signs(facts):
+    """
+    Whether facts were extracted with their inline XBRL sign
+
+    Negative values shown without parentheses are marked only by sign="-",
+    which facts extracted before the sign was kept do not have; none of the
+    facts of such a filing has a sign key.
+
+    Args:
+        facts: Fact dictionaries of a filing
+
+    Returns:
+        True if any fact has a sign key
+    """
+    return any("sign" in fact for fact in facts)
+
+
+def extract_signed_facts(doc_path):
+    """
+    Facts of an inline XBRL document, with their sign
+
+    Uses the facts cache next to the document, like the pipeline's extractor.
+
+    Args:
+        doc_path: Path to the inline XBRL document
+
+    Returns:
+        List of fact dictionaries
+    """
+    cache_path = os.path.join(os.path.dirname(doc_path), CACHE_FILENAME)
+    facts = load_cached_facts(cache_path, doc_path)
+    if facts is None:
+        facts = extract_facts_from_html(doc_path)
+        save_cached_facts(cache_path, doc_path, facts)
+    return facts
+
+
+def filing_contexts(contexts=None, doc_path=None, llm_path=None):
+    """
+    Context definitions of a filing, from the best source available
+
+    Contexts defined in the parsed XBRL data or the inline XBRL document
+    (with dimensions) take precedence over the periods of the saved LLM file
+    (without dimensions).
+
+    Args:
+        contexts: Contexts of the parsed XBRL data (optional)
+        doc_path: Path to the inline XBRL document (optional)
+        llm_path: Path to the saved LLM file (optional)
+
+    Returns:
+        Dict of context ID to context dictionary
+    """
+    merged = {}
+    if llm_path and os.path.exists(llm_path):
+        with open(llm_path, 'r', encoding='utf-8') as f:
+            merged.update(llm_file_contexts(f.read()))
+
+    defined = {context_id: context for context_id, context in (contexts or {}).items() if context.get("period")}
+    if not defined and doc_path and os.path.exists(doc_path):
+        with open(doc_path, 'r', encoding='utf-8', errors='ignore') as f:
+            defined = document_contexts(f.read())
+    merged.update(defined)
+    return merged
+
+
+def filing_from_llm_file(llm_path, downloads_dir=None):
+    """
+    Filing of a saved LLM file, with its download directory
+
+    The filing is found among the downloads of the company by filing type
+    and filing date (the @FILING_DATE of the LLM file).
+
+    Args:
+        llm_path: Path to the saved LLM file
+        downloads_dir: Downloads directory (default: FACT_STORE["downloads_dir"])
+
+    Returns:
+        Filing dictionary (ticker, accession_number, filing_type, fiscal_year,
+        fiscal_period, filing_date, source, download_dir, primary_doc_name),
+        or None if the
+        name does not follow the pipeline's naming or no download matches
+    """
+    match = LLM_FILE_NAME_PATTERN.match(os.path.basename(str(llm_path)))
+    if not match:
+        return None
+    ticker, filing_type, fiscal_year, fiscal_period = match.groups()
+
+    with open(llm_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    date_match = re.search(r'^@FILING_DATE: (\S+)', content, re.MULTILINE)
+    filing_date = date_match.group(1) if date_match else None
+
+    downloads_dir = downloads_dir or FACT_STORE.get("downloads_dir") or os.path.join(PROCESSED_DATA_DIR, "tmp", "sec_downloads")
+    for info_path in sorted(glob.glob(os.path.join(downloads_dir, ticker, filing_type, "*", "filing_info.json"))):
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if info.get("filing_date") == filing_date and info.get("accession_number"):
+            return {
+                "ticker": ticker,
+                "accession_number": info["accession_number"],
+                "filing_type": filing_type,
+                "fiscal_year": fiscal_year,
+                "fiscal_period": fiscal_period or "annual",
+                "filing_date": filing_date,
+                "source": os.path.basename(str(llm_path)),
+                "download_dir": os.path.dirname(info_path),
+                "primary_doc_name": info.get("primary_doc_name")
+            }
+    return None
+
+
+def backfill_from_outputs(store=None, llm_paths=None, downloads_dir=None, skip_existing=True):
+    """
+    Fill the store from filings processed before.
+
+    The facts of each saved LLM file are read from its download directory:
+    _xbrl_extracted_data.json (facts and context definitions), or
+    _xbrl_raw.json with the contexts defined in the downloaded document,
+    if kept, else the periods of the LLM file's contexts. Facts saved without
+    their sign are extracted again from the downloaded document; filings
+    whose document was not kept are skipped rather than stored with
+    negative values as positive.
+
+    Args:
+        store: FactStore (default: a store at the configured path)
+        llm_paths: Saved LLM files (default: every *_llm.txt under the
+            processed data directory)
+        downloads_dir: Downloads directory (default: FACT_STORE["downloads_dir"])
+        skip_existing: Leave filings already stored as they are
+
+    Returns:
+        Dictionary with the numbers of filings and facts stored, the filings
+        skipped (path and reason) and the time taken
+    """
+    store = store or FactStore()
+    if llm_paths is None:
+        llm_paths = sorted(glob.glob(os.path.join(PROCESSED_DATA_DIR, "*", "*_llm.txt")))
+
+    start = time.perf_counter()
+    result = {"filings": 0, "facts": 0, "skipped": []}
+    for llm_path in llm_paths:
+        filing = filing_from_llm_file(llm_path, downloads_dir)
+        if filing is None:
+            result["skipped"].append({"path": str(llm_path), "reason": "no matching download"})
+            continue
+        if skip_existing and store.has_filing(filing["accession_number"]):
+            result["skipped"].append({"path": str(llm_path), "reason": "already stored"})
+            continue
+
+        extracted_path = os.path.join(filing["download_dir"], "_xbrl_extracted_data.json")
+        raw_path = os.path.join(filing["download_dir"], "_xbrl_raw.json")
+        doc_path = os.path.join(filing["download_dir"], filing["primary_doc_name"] or "")
+        doc_path = doc_path if os.path.isfile(doc_path) else None
+        try:
+            if os.path.exists(extracted_path):
+                with open(extracted_path, 'r', encoding='utf-8') as f:
+                    extracted = json.load(f)
+                facts = extracted.get("facts", [])
+                contexts = filing_contexts(extracted.get("contexts"), llm_path=llm_path)
+            elif os.path.exists(raw_path):
+                with open(raw_path, 'r', encoding='utf-8') as f:
+                    facts = json.load(f)
+                contexts = filing_contexts(doc_path=doc_path, llm_path=llm_path)
+            else:
+                result["skipped"].append({"path": str(llm_path), "reason": "no extracted facts"})
+                continue
+
+            if not has_signs(facts):
+                if doc_path is None:
+                    result["skipped"].append({"path": str(llm_path),
+                                              "reason": "facts saved without signs and no document to extract them from"})
+                    continue
+                logging.info(f"Facts of {llm_path} were saved without signs, extracting them from {doc_path}")
+                facts = extract_signed_facts(doc_path)
+        except (OSError, ValueError) as e:
+            result["skipped"].append({"path": str(llm_path), "reason": str(e)})
+            continue
+
+        rows = numeric_fact_rows(facts, contexts)
+        result["facts"] += store.append_filing(filing, rows)
+        result["filings"] += 1
+        logging.info(f"Backfilled {len(rows)} numeric facts of {filing['ticker']} {filing['accession_number']} from {llm_path}")
+
+    result["time_seconds"] = time.perf_counter() - start
+    return result
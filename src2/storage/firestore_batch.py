@@ -0,0 +1,282 @@
+"""
+Batched Firestore Writes
+
+Buffers Firestore document writes and commits them with batched writes, so
+metadata updates do not add a network round trip to every processed filing.
+
+Works with the google-cloud-firestore client (including the Firestore
+emulator via FIRESTORE_EMULATOR_HOST) and with InMemoryFirestoreClient from
+src2.storage.local_backends.
+"""
+
+import time
+import logging
+import datetime
+import threading
+
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+# Default flush thresholds
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds a document may wait in the buffer
+DEFAULT_MAX_BUFFER_BYTES = 8 * 1024 * 1024  # well below the 10 MB request limit
+
+# Commits of a document before it is given up on; documents of a failed batch
+# go back to the buffer until then
+MAX_COMMIT_ATTEMPTS = 3
+
+# Seconds waited before retrying failed documents, growing with each retry
+RETRY_DELAY = 1.0
+
+
+def prepare_document(doc_data):
+    """
+    Replace datetime values with Firestore server timestamps.
+
+    Args:
+        doc_data: Document data dictionary
+
+    Returns:
+        New dictionary ready to be written
+    """
+    try:
+        from google.cloud.firestore import SERVER_TIMESTAMP
+    except ImportError:
+        SERVER_TIMESTAMP = None
+
+    processed_data = {}
+    for key, value in doc_data.items():
+        if isinstance(value, datetime.datetime) and SERVER_TIMESTAMP is not None:
+            processed_data[key] = SERVER_TIMESTAMP
+        else:
+            processed_data[key] = value
+    return processed_data
+
+
+def _estimate_size(document_id, data):
+    """Rough serialized size of a document, for the buffer byte threshold."""
+    return len(document_id) + sum(len(str(key)) + len(str(value)) for key, value in data.items())
+
+
+class FirestoreBatchWriter:
+    """
+    Buffer document writes and commit them in batches.
+
+    Documents are flushed when the buffer reaches max_batch_size documents or
+    max_buffer_bytes, when the oldest buffered document is older than
+    flush_interval seconds, and on flush()/close(). A later write to the same
+    document replaces the buffered one. Commits run outside the buffer lock,
+    so set() does not wait for a commit in progress.
+
+    Documents of a batch that fails to commit go back to the buffer and are
+    retried with the next flush, up to max_attempts commits; stats counts the
+    documents given up on across all flushes, whichever triggered them.
+    """
+
+    def __init__(self, firestore_client, collection="filings", max_batch_size=MAX_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_buffer_bytes=DEFAULT_MAX_BUFFER_BYTES,
+                 max_attempts=MAX_COMMIT_ATTEMPTS):
+        """
+        Initialize the batch writer.
+
+        Args:
+            firestore_client: Firestore client (or compatible stand-in)
+            collection: Collection the documents are written to
+            max_batch_size: Documents per commit (capped at the Firestore limit of 500)
+            flush_interval: Maximum seconds a document waits before being flushed
+                (None or 0 disables the time threshold)
+            max_buffer_bytes: Approximate buffered bytes that trigger a flush
+            max_attempts: Commits of a document before it is given up on
+        """
+        self.firestore_client = firestore_client
+        self.collection = collection
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_attempts = max(1, max_attempts)
+
+        self._buffer = {}
+        self._attempts = {}
+        self._buffer_bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._closed = False
+
+        self.stats = {
+            "documents_written": 0,
+            "batches_committed": 0,
+            "retried_documents": 0,
+            "failed_documents": 0
+        }
+
+        # Background thread for the time threshold
+        self._wakeup = threading.Event()
+        self._timer = None
+        if self.flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, name="firestore-batch-writer", daemon=True)
+            self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def set(self, document_id, doc_data):
+        """
+        Queue a document write (overwriting the document, like DocumentReference.set).
+
+        Args:
+            document_id: Document ID within the collection
+            doc_data: Document data
+
+        Returns:
+            Number of documents currently buffered
+        """
+        if self._closed:
+            raise RuntimeError("FirestoreBatchWriter is closed")
+
+        data = prepare_document(doc_data)
+        with self._lock:
+            previous = self._buffer.pop(document_id, None)
+            if previous is not None:
+                self._buffer_bytes -= _estimate_size(document_id, previous)
+            self._attempts.pop(document_id, None)
+
+            self._buffer[document_id] = data
+            self._buffer_bytes += _estimate_size(document_id, data)
+            if self._oldest is None:
+                self._oldest = time.time()
+
+            buffered = len(self._buffer)
+            full = buffered >= self.max_batch_size or self._buffer_bytes >= self.max_buffer_bytes
+
+        if full:
+            self.flush()
+        return buffered
+
+    def flush(self, retry=False):
+        """
+        Commit all buffered documents.
+
+        Documents of a batch that fails to commit are put back in the buffer,
+        unless they have been tried max_attempts times.
+
+        Args:
+            retry: Keep flushing (waiting RETRY_DELAY longer each time) until
+                no failed documents are left to retry
+
+        Returns:
+            Dict with success flag and number of documents written, put back in
+            the buffer and given up on
+        """
+        result = self._flush_once()
+        retries = 0
+        while retry and result["requeued_documents"]:
+            retries += 1
+            time.sleep(RETRY_DELAY * retries)
+            again = self._flush_once()
+            again["documents_written"] += result["documents_written"]
+            again["failed_documents"] += result["failed_documents"]
+            result = again
+
+        result["success"] = result["failed_documents"] == 0 and result["requeued_documents"] == 0
+        return result
+
+    def _flush_once(self):
+        # Take the buffered documents, then commit without holding the buffer
+        # lock so set() never waits for a commit. Commits are serialized, so an
+        # older version of a document cannot be committed after a newer one.
+        with self._commit_lock:
+            with self._lock:
+                pending = list(self._buffer.items())
+                self._buffer = {}
+                self._buffer_bytes = 0
+                self._oldest = None
+
+            written = 0
+            failed = 0
+            requeued = 0
+            collection_ref = self.firestore_client.collection(self.collection)
+
+            for start in range(0, len(pending), self.max_batch_size):
+                chunk = pending[start:start + self.max_batch_size]
+                try:
+                    batch = self.firestore_client.batch()
+                    for document_id, data in chunk:
+                        batch.set(collection_ref.document(document_id), data)
+                    batch.commit()
+                    written += len(chunk)
+                    with self._lock:
+                        self.stats["batches_committed"] += 1
+                        for document_id, _ in chunk:
+                            if document_id not in self._buffer:
+                                self._attempts.pop(document_id, None)
+                except Exception as e:
+                    logging.error(f"❌ Failed to commit batch of {len(chunk)} Firestore documents: {str(e)}")
+                    if "FAILED_PRECONDITION" in str(e):
+                        logging.error("This error often means the Firestore database doesn't exist")
+
+                    with self._lock:
+                        for document_id, data in chunk:
+                            # A newer write of the document was queued meanwhile and replaces this one
+                            if document_id in self._buffer:
+                                continue
+                            attempts = self._attempts.get(document_id, 0) + 1
+                            if attempts < self.max_attempts:
+                                self._attempts[document_id] = attempts
+                                self._buffer[document_id] = data
+                                self._buffer_bytes += _estimate_size(document_id, data)
+                                requeued += 1
+                            else:
+                                self._attempts.pop(document_id, None)
+                                failed += 1
+
+            with self._lock:
+                if requeued and self._oldest is None:
+                    self._oldest = time.time()
+                self.stats["documents_written"] += written
+                self.stats["retried_documents"] += requeued
+                self.stats["failed_documents"] += failed
+
+        if requeued:
+            logging.warning(f"Put {requeued} Firestore documents back in the buffer to retry")
+        if written:
+            logging.info(f"✅ Committed {written} Firestore documents to '{self.collection}' in batched writes")
+        if failed:
+            logging.error(f"❌ Gave up on {failed} Firestore documents after {self.max_attempts} attempts")
+
+        return {
+            "documents_written": written,
+            "requeued_documents": requeued,
+            "failed_documents": failed
+        }
+
+    def _flush_periodically(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval / 2)
+            if self._closed:
+                break
+            with self._lock:
+                due = self._oldest is not None and time.time() - self._oldest >= self.flush_interval
+            if due:
+                self.flush()
+
+    def close(self):
+        """
+        Flush remaining documents (retrying failed ones) and stop the
+        background flush thread.
+
+        Returns:
+            Result of the final flush
+        """
+        self._closed = True
+        self._wakeup.set()
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+        return self.flush(retry=True)
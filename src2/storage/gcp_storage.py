@@ -5,67 +5,65 @@ Responsible for uploading files to Google Cloud Storage.
 """
 
 import os
+import io
+import atexit
+import gzip
+import json
+import time
 import logging
 import datetime
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def estimate_tokens(text_content):
-    """
-    Estimate the number of tokens in text content.
-    Uses a more nuanced approach to token estimation:
-    - For English text dominated by alphanumeric characters: ~4.0 chars per token
-    - For JSON/structured data with many special chars: ~2.5 chars per token
-    - For numeric heavy financial tables: ~3.0 chars per token
-
-    Args:
-        text_content: The text content to estimate
-
-    Returns:
-        Estimated token count with improved accuracy
-    """
-    if not text_content:
-        return 0
-
-    # Check if this is likely a structured file with special characters
-    special_chars_ratio = sum(1 for c in text_content if not c.isalnum() and not c.isspace()) / max(1, len(text_content))
-
-    # Default ratio for normal text
-    chars_per_token = 4.0
+from src2.sec.instrumentation import span
+from src2.storage.token_estimator import count_tokens
 
-    # Adjust based on content characteristics
-    if '@' in text_content and '|' in text_content and special_chars_ratio > 0.1:
-        # This is likely our LLM format with many special characters
-        chars_per_token = 3.0
-    elif special_chars_ratio > 0.15:
-        # Very high special character ratio (like JSON)
-        chars_per_token = 2.5
-    elif len([c for c in text_content[:1000] if c.isdigit()]) > 300:
-        # Numeric-heavy content like financial tables
-        chars_per_token = 3.0
+# Files at least this large are uploaded with resumable, chunked uploads
+RESUMABLE_UPLOAD_THRESHOLD = 1024 * 1024  # 1 MB
 
-    # Apply the estimate
-    estimated_tokens = int(len(text_content) / chars_per_token)
+# Chunk size for resumable uploads (must be a multiple of 256 KB)
+UPLOAD_CHUNK_SIZE = 4 * 256 * 1024  # 1 MB
 
-    # Add a small buffer for safety (Claude, OpenAI and other tokenizers vary slightly)
-    return int(estimated_tokens * 1.05)
+# Default number of parallel uploads in upload_files
+DEFAULT_UPLOAD_WORKERS = 8
 
 class GCPStorage:
     """
     Upload files to Google Cloud Storage
     """
 
-    def __init__(self, bucket_name, project_id=None):
+    def __init__(self, bucket_name, project_id=None, storage_client=None, firestore_client=None):
         """
         Initialize GCP storage
 
         Args:
             bucket_name: GCS bucket name
             project_id: GCP project ID (optional)
+            storage_client: Storage client to use instead of creating one, e.g. a
+                LocalStorageClient from src2.storage.local_backends (optional)
+            firestore_client: Firestore client to use with an injected storage client (optional)
         """
         self.bucket_name = bucket_name
         self.project_id = project_id
         self.storage_client = None
         self.firestore_client = None
 
+        # Object names known to exist, per listed prefix (see prefetch_existing)
+        self._existing_by_prefix = {}
+        self._existing_lock = threading.Lock()
+
+        # Buffered Firestore writer (see enable_metadata_batching)
+        self.metadata_writer = None
+
+        # Use injected clients (local backends, emulators) if provided
+        if storage_client is not None:
+            self.storage_client = storage_client
+            self.bucket = storage_client.bucket(bucket_name)
+            self.firestore_client = firestore_client
+            logging.info(f"Initialized GCP storage with bucket {bucket_name} using injected clients")
+            return
+
         # Load GCP libraries
         try:
             from google.cloud import storage, firestore
@@ -137,14 +135,147 @@ class GCPStorage:
         try:
             result = {}
             for path in paths:
+                # Answer from a prefetched listing when possible (no round trip)
+                known = self._lookup_existing(path)
+                if known is not None:
+                    result[path] = known
+                    continue
+
                 blob = self.bucket.blob(path)
-                result[path] = blob.exists()
+                with span("gcs_exists"):
+                    result[path] = blob.exists()
             return result
         except Exception as e:
             logging.error(f"Error checking file existence: {str(e)}")
             return {path: False for path in paths}
 
-    def upload_file(self, local_file_path, gcs_path, force=False):
+    def _lookup_existing(self, path):
+        """
+        Look up a path in the prefetched listings.
+
+        Returns:
+            True/False if the path is covered by a listed prefix, otherwise None
+        """
+        with self._existing_lock:
+            for prefix, names in self._existing_by_prefix.items():
+                if path.startswith(prefix):
+                    return path in names
+        return None
+
+    def _record_existing(self, path, exists=True):
+        """Keep prefetched listings in sync after an upload or delete."""
+        with self._existing_lock:
+            for prefix, names in self._existing_by_prefix.items():
+                if path.startswith(prefix):
+                    if exists:
+                        names.add(path)
+                    else:
+                        names.discard(path)
+
+    def prefetch_existing(self, prefix):
+        """
+        List all objects under a prefix once, so later existence checks for
+        paths under that prefix are answered without a GCS round trip.
+
+        Args:
+            prefix: GCS path prefix (e.g. "companies/AAPL/")
+
+        Returns:
+            Number of objects found under the prefix
+        """
+        if not self.is_enabled():
+            logging.warning("GCP storage is not enabled")
+            return 0
+
+        try:
+            names = {blob.name for blob in self.bucket.list_blobs(prefix=prefix)}
+        except Exception as e:
+            logging.error(f"Error listing GCS prefix {prefix}: {str(e)}")
+            return 0
+
+        with self._existing_lock:
+            self._existing_by_prefix[prefix] = names
+
+        logging.info(f"Prefetched {len(names)} existing objects under gs://{self.bucket_name}/{prefix}")
+        return len(names)
+
+    def list_existing(self, paths, prefix_depth=2):
+        """
+        Check existence of many paths with one listing per path prefix instead
+        of one request per path.
+
+        Args:
+            paths: List of GCS paths to check
+            prefix_depth: Number of leading path segments used to group paths
+                into listings (2 groups "companies/TICKER/")
+
+        Returns:
+            Dict mapping paths to existence status (True/False)
+        """
+        if not self.is_enabled():
+            logging.warning("GCP storage is not enabled")
+            return {path: False for path in paths}
+
+        for path in paths:
+            if self._lookup_existing(path) is None:
+                segments = path.split("/")
+                prefix = "/".join(segments[:prefix_depth]) + "/" if len(segments) > prefix_depth else path
+                self.prefetch_existing(prefix)
+
+        return self.check_files_exist(paths)
+
+    def _upload_blob(self, local_file_path, gcs_path, gzip_encoding=False):
+        """
+        Upload one file to a blob.
+
+        Large payloads use resumable, chunked uploads. With gzip_encoding the
+        payload is compressed and stored with Content-Encoding: gzip, which GCS
+        transparently decompresses for clients that do not accept gzip.
+
+        LLM files with a section index are never gzip-encoded: range reads
+        (read_llm_section) use offsets into the uncompressed file, which do not
+        apply to an object stored compressed.
+
+        Returns:
+            Number of bytes transferred
+
+        Raises:
+            ValueError: If gzip_encoding is requested for an LLM file with a section index
+        """
+        if gzip_encoding:
+            from src2.formatter.section_index import section_index_path
+
+            if os.path.exists(section_index_path(local_file_path)):
+                raise ValueError(f"{local_file_path} has a section index for range reads "
+                                 f"and cannot be stored gzip-encoded")
+
+        content_type = mimetypes.guess_type(gcs_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+
+        if gzip_encoding:
+            with open(local_file_path, 'rb') as f:
+                payload = gzip.compress(f.read())
+            size = len(payload)
+        else:
+            payload = None
+            size = os.path.getsize(local_file_path)
+
+        chunk_size = UPLOAD_CHUNK_SIZE if size >= RESUMABLE_UPLOAD_THRESHOLD else None
+        blob = self.bucket.blob(gcs_path, chunk_size=chunk_size)
+
+        with span("gcs_upload", bytes_written=size):
+            if payload is not None:
+                blob.content_encoding = "gzip"
+                blob.upload_from_file(io.BytesIO(payload), content_type=content_type)
+            else:
+                with open(local_file_path, 'rb') as f:
+                    blob.upload_from_file(f, content_type=content_type)
+
+        self._record_existing(gcs_path)
+        return size
+
+    def upload_file(self, local_file_path, gcs_path, force=False, gzip_encoding=False):
         """
         Upload a file to GCS
 
@@ -152,6 +283,8 @@ class GCPStorage:
             local_file_path: Path to local file
             gcs_path: Path in GCS bucket
             force: Whether to upload even if the file already exists in GCS
+            gzip_encoding: Whether to store the file gzip-compressed (Content-Encoding: gzip)
+                (not allowed for LLM files with a section index)
 
         Returns:
             Dict with upload result
@@ -178,12 +311,8 @@ class GCPStorage:
                         "size": os.path.getsize(local_file_path)
                     }
 
-            # Create blob
-            blob = self.bucket.blob(gcs_path)
-
             # Upload file
-            with open(local_file_path, 'rb') as f:
-                blob.upload_from_file(f)
+            self._upload_blob(local_file_path, gcs_path, gzip_encoding=gzip_encoding)
 
             if force:
                 logging.info(f"Force uploaded {local_file_path} to gs://{self.bucket_name}/{gcs_path}")
@@ -205,6 +334,97 @@ class GCPStorage:
                 "local_path": local_file_path
             }
 
+    def upload_files(self, uploads, force=False, max_workers=DEFAULT_UPLOAD_WORKERS, gzip_encoding=False):
+        """
+        Upload many files to GCS in parallel.
+
+        Existence is checked with one listing per path prefix rather than one
+        request per file, and uploads run on a bounded thread pool.
+
+        Args:
+            uploads: List of (local_file_path, gcs_path) tuples
+            force: Whether to upload even if files already exist in GCS
+            max_workers: Maximum number of concurrent uploads
+            gzip_encoding: Whether to store files gzip-compressed (Content-Encoding: gzip)
+                (not allowed for LLM files with a section index)
+
+        Returns:
+            Dict with overall result and per-file results (in input order)
+        """
+        start_time = time.time()
+        uploads = list(uploads)
+
+        if not self.is_enabled():
+            logging.warning("GCP storage is not enabled")
+            return {
+                "success": False,
+                "error": "GCP storage not enabled",
+                "results": []
+            }
+
+        results = [None] * len(uploads)
+        pending = []
+
+        # Skip files that already exist (one listing per prefix)
+        existing = {} if force else self.list_existing([gcs_path for _, gcs_path in uploads])
+        for index, (local_file_path, gcs_path) in enumerate(uploads):
+            if existing.get(gcs_path, False):
+                results[index] = {
+                    "success": True,
+                    "local_path": local_file_path,
+                    "gcs_path": gcs_path,
+                    "already_exists": True,
+                    "size": os.path.getsize(local_file_path)
+                }
+            else:
+                pending.append(index)
+
+        def upload_one(index):
+            local_file_path, gcs_path = uploads[index]
+            try:
+                transferred = self._upload_blob(local_file_path, gcs_path, gzip_encoding=gzip_encoding)
+                return {
+                    "success": True,
+                    "local_path": local_file_path,
+                    "gcs_path": gcs_path,
+                    "force_upload": force,
+                    "size": os.path.getsize(local_file_path),
+                    "bytes_transferred": transferred
+                }
+            except Exception as e:
+                logging.error(f"Error uploading {local_file_path} to GCS: {str(e)}")
+                return {
+                    "success": False,
+                    "error": str(e),
+                    "local_path": local_file_path,
+                    "gcs_path": gcs_path
+                }
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+                futures = {executor.submit(upload_one, index): index for index in pending}
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+
+        uploaded = sum(1 for r in results if r["success"] and not r.get("already_exists"))
+        skipped = sum(1 for r in results if r.get("already_exists"))
+        failed = sum(1 for r in results if not r["success"])
+        bytes_transferred = sum(r.get("bytes_transferred", 0) for r in results)
+        elapsed = time.time() - start_time
+
+        logging.info(f"Batch upload to gs://{self.bucket_name}: {uploaded} uploaded, {skipped} already existed, "
+                     f"{failed} failed ({bytes_transferred / (1024 * 1024):.2f} MB in {elapsed:.2f}s)")
+
+        return {
+            "success": failed == 0,
+            "uploaded": uploaded,
+            "skipped": skipped,
+            "failed": failed,
+            "bytes_transferred": bytes_transferred,
+            "time_seconds": elapsed,
+            "results": results
+        }
+
     def add_filing_metadata(self, filing_metadata, **kwargs):
         """
         Add filing metadata to Firestore
@@ -446,15 +666,17 @@ class GCPStorage:
                     document_id = f"{ticker}_{filing_type}_{year}"
                     logging.info(f"Using fallback year {year} for document ID: {document_id}")
 
-            # Check if document already exists
+            # Check if document already exists (skipped when writes are batched,
+            # since the write overwrites the document either way)
             filing_ref = self.firestore_client.collection("filings").document(document_id)
-            existing_doc = filing_ref.get()
+            if self.metadata_writer is None:
+                existing_doc = filing_ref.get()
 
-            # Log whether the document already exists
-            if existing_doc.exists:
-                logging.info(f"Document already exists in Firestore with ID: {document_id}")
-            else:
-                logging.info(f"Creating new document in Firestore with ID: {document_id}")
+                # Log whether the document already exists
+                if existing_doc.exists:
+                    logging.info(f"Document already exists in Firestore with ID: {document_id}")
+                else:
+                    logging.info(f"Creating new document in Firestore with ID: {document_id}")
 
             # Create document data
             doc_data = {
@@ -479,6 +701,12 @@ class GCPStorage:
                 'fiscal_integrity_verified': True
             }
 
+            # Add the section spans found by the section segmenter (IDs, headings and offsets, no text)
+            html_content = filing_metadata.get('html_content')
+            if isinstance(html_content, dict) and html_content.get('section_index'):
+                doc_data['sections'] = html_content['section_index']
+                doc_data['section_count'] = len(html_content['section_index'])
+
             # Add LLM file metadata if provided
             if 'llm_path' in kwargs:
                 llm_path = kwargs.get('llm_path')
@@ -534,7 +762,7 @@ class GCPStorage:
 
                     # Process the content if we found it
                     if llm_content:
-                        llm_token_count = estimate_tokens(llm_content)
+                        llm_token_count = count_tokens(llm_content)
                         doc_data['llm_token_count'] = llm_token_count
                         doc_data['llm_token_count_source'] = found_path
                         doc_data['llm_char_count'] = len(llm_content)
@@ -609,7 +837,7 @@ class GCPStorage:
 
                     # Process the content if we found it
                     if text_content:
-                        text_token_count = estimate_tokens(text_content)
+                        text_token_count = count_tokens(text_content)
                         doc_data['text_token_count'] = text_token_count
                         doc_data['text_token_count_source'] = found_path
                         doc_data['text_char_count'] = len(text_content)
@@ -636,6 +864,17 @@ class GCPStorage:
             has_token_counts = 'llm_token_count' in doc_data or 'text_token_count' in doc_data
             token_count_source = doc_data.get('llm_token_count_source', 'none')
 
+            # Queue the document for a batched write if batching is enabled
+            if self.metadata_writer is not None:
+                self.metadata_writer.set(document_id, doc_data)
+                logging.info(f"Queued document for batched Firestore write with ID: {document_id}")
+                return {
+                    "success": True,
+                    "document_id": document_id,
+                    "has_token_counts": has_token_counts,
+                    "queued": True
+                }
+
             # Add document to Firestore (overwrite if exists)
             try:
                 # Log the document data for debugging
@@ -667,7 +906,8 @@ class GCPStorage:
                             processed_data[key] = value
 
                     # Set the document
-                    filing_ref.set(processed_data)
+                    with span("firestore_write"):
+                        filing_ref.set(processed_data)
                     logging.info(f"✅ Successfully saved document to Firestore with ID: {document_id}")
                 except Exception as set_error:
                     logging.error(f"❌ Failed to set document in Firestore: {str(set_error)}")
@@ -748,6 +988,145 @@ class GCPStorage:
                 "error": str(e)
             }
 
+    def enable_metadata_batching(self, max_batch_size=None, flush_interval=None):
+        """
+        Buffer filing metadata writes and commit them in batches.
+
+        After this, add_filing_metadata queues documents instead of writing and
+        re-reading each one. Call flush_metadata() (or close_metadata_writer())
+        at the end of a run; queued documents are also committed at interpreter
+        exit, so a run that stops early does not lose them.
+
+        Args:
+            max_batch_size: Documents per batched commit (at most 500)
+            flush_interval: Maximum seconds a document waits before being committed
+
+        Returns:
+            True if batching is enabled, False if Firestore is not available
+        """
+        if not self.is_firestore_enabled():
+            logging.warning("Firestore is not enabled, metadata batching not available")
+            return False
+
+        if self.metadata_writer is None:
+            from .firestore_batch import FirestoreBatchWriter, MAX_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+            self.metadata_writer = FirestoreBatchWriter(
+                self.firestore_client,
+                collection="filings",
+                max_batch_size=max_batch_size or MAX_BATCH_SIZE,
+                flush_interval=DEFAULT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+            )
+            atexit.register(self.close_metadata_writer)
+            logging.info("Enabled batched Firestore metadata writes")
+        return True
+
+    def flush_metadata(self):
+        """
+        Commit any queued filing metadata documents, retrying failed ones.
+
+        Returns:
+            Dict with result of the flush, and the writer's cumulative "stats"
+            (including documents given up on by earlier flushes)
+        """
+        if self.metadata_writer is None:
+            return {"success": True, "documents_written": 0, "failed_documents": 0}
+        result = self.metadata_writer.flush(retry=True)
+        result["stats"] = dict(self.metadata_writer.stats)
+        return result
+
+    def close_metadata_writer(self):
+        """
+        Commit queued filing metadata and go back to unbatched writes.
+
+        Returns:
+            Dict with result of the final flush
+        """
+        if self.metadata_writer is None:
+            return {"success": True, "documents_written": 0, "failed_documents": 0}
+        writer, self.metadata_writer = self.metadata_writer, None
+        return writer.close()
+
+    def read_llm_section(self, gcs_llm_path, name, tag=None):
+        """
+        Read one section of an uploaded LLM file with a range read
+
+        Uses the section index uploaded next to the file (see
+        src2.formatter.section_index), so only the index and the section's
+        bytes are transferred. Text blocks the section references are read
+        from text_blocks/, as in read_llm_file.
+
+        Args:
+            gcs_llm_path: Path of the LLM file in GCS bucket
+            name: Section name (e.g. "BALANCE_SHEET", "ITEM_7_MD_AND_A")
+            tag: Section tag, e.g. "SEC" or "STATEMENT" (optional)
+
+        Returns:
+            Content of the first section with the name (with stored text
+            blocks put back), or None if the file has no index or no such section
+        """
+        if not self.is_enabled():
+            logging.warning("GCP storage is not enabled")
+            return None
+
+        from src2.formatter.section_index import section_index_path, find_sections
+
+        try:
+            index_blob = self.bucket.blob(section_index_path(gcs_llm_path))
+            if not index_blob.exists():
+                logging.info(f"No section index for {gcs_llm_path}")
+                return None
+            index = json.loads(index_blob.download_as_bytes())
+
+            entries = find_sections(index, name, tag)
+            if not entries:
+                return None
+            offset, length = entries[0]["offset"], entries[0]["length"]
+            if length == 0:
+                return ""
+
+            # The end of a range read is inclusive
+            with span("gcs_range_read", bytes_read=length):
+                data = self.bucket.blob(gcs_llm_path).download_as_bytes(start=offset, end=offset + length - 1)
+            return self._rehydrate_text_blocks(data.decode('utf-8'))
+        except Exception as e:
+            logging.error(f"Error reading section {name} of {gcs_llm_path}: {str(e)}")
+            return None
+
+    def read_llm_file(self, gcs_llm_path):
+        """
+        Read an uploaded LLM file with its stored text blocks put back
+
+        Text the file references in the text block store (see
+        src2.formatter.text_block_store) is read from the blocks uploaded
+        under text_blocks/.
+
+        Args:
+            gcs_llm_path: Path of the LLM file in GCS bucket
+
+        Returns:
+            Full content of the file, or None if it could not be read
+        """
+        if not self.is_enabled():
+            logging.warning("GCP storage is not enabled")
+            return None
+
+        try:
+            content = self.bucket.blob(gcs_llm_path).download_as_bytes().decode('utf-8')
+            return self._rehydrate_text_blocks(content)
+        except Exception as e:
+            logging.error(f"Error reading {gcs_llm_path}: {str(e)}")
+            return None
+
+    def _rehydrate_text_blocks(self, content):
+        """Put back the text blocks that LLM content references, read from text_blocks/ in the bucket."""
+        from src2.formatter.text_block_store import referenced_keys, rehydrate_text_blocks, text_block_object_name
+
+        blocks = {
+            key: self.bucket.blob(text_block_object_name(key)).download_as_bytes().decode('utf-8')
+            for key in referenced_keys(content)
+        }
+        return rehydrate_text_blocks(content, blocks)
+
     def delete_file(self, gcs_path):
         """
         Delete a file from GCS
@@ -781,6 +1160,7 @@ class GCPStorage:
 
             # Delete the blob
             blob.delete()
+            self._record_existing(gcs_path, exists=False)
 
             logging.info(f"Deleted file from GCS: {gcs_path}")
 
@@ -797,18 +1177,26 @@ class GCPStorage:
             }
 
 # Factory function to create GCP storage
-def create_gcp_storage(bucket_name, project_id=None):
+def create_gcp_storage(bucket_name, project_id=None, local_root=None):
     """
     Create a GCP storage instance
 
     Args:
         bucket_name: GCS bucket name
         project_id: GCP project ID (optional)
+        local_root: Directory for a filesystem-backed bucket and in-memory
+            Firestore instead of GCP (optional)
 
     Returns:
         GCPStorage instance
     """
-    storage = GCPStorage(bucket_name, project_id)
+    if local_root:
+        from .local_backends import LocalStorageClient, InMemoryFirestoreClient
+        storage = GCPStorage(bucket_name, project_id,
+                             storage_client=LocalStorageClient(local_root),
+                             firestore_client=InMemoryFirestoreClient())
+    else:
+        storage = GCPStorage(bucket_name, project_id)
     if storage.is_enabled():
         return storage
     else:
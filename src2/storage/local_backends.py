@@ -0,0 +1,259 @@
+"""
+Local Storage Backends
+
+Stand-ins for the subset of the Google Cloud Storage and Firestore client
+APIs used by GCPStorage, so uploads and metadata writes can be exercised
+without GCP credentials: a filesystem-backed storage client and an in-memory
+Firestore client.
+
+To test against the official emulators instead, set STORAGE_EMULATOR_HOST or
+FIRESTORE_EMULATOR_HOST; the google-cloud clients pick them up automatically.
+"""
+
+import os
+import copy
+import json
+import shutil
+import logging
+import threading
+from pathlib import Path
+
+
+class LocalBlob:
+    """
+    A blob stored as a file under the bucket directory.
+    """
+
+    def __init__(self, bucket, name, chunk_size=None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self.content_type = None
+        self.content_encoding = None
+        self.metadata = None
+
+    @property
+    def path(self):
+        return self.bucket.root / self.name
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.path.exists() else None
+
+    def exists(self, client=None):
+        return self.path.is_file()
+
+    def upload_from_file(self, file_obj, content_type=None, **kwargs):
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(file_obj, f)
+        os.replace(tmp_path, self.path)
+
+        # Keep object attributes next to the data, as GCS does
+        attributes = {
+            "content_type": content_type or self.content_type,
+            "content_encoding": self.content_encoding,
+            "metadata": self.metadata
+        }
+        with open(self.bucket.attributes_path(self.name), 'w', encoding='utf-8') as f:
+            json.dump(attributes, f)
+
+    def upload_from_filename(self, filename, content_type=None, **kwargs):
+        with open(filename, 'rb') as f:
+            self.upload_from_file(f, content_type=content_type, **kwargs)
+
+    def download_as_bytes(self, start=None, end=None, **kwargs):
+        # Range reads include the end byte, as in GCS
+        with open(self.path, 'rb') as f:
+            if start is None and end is None:
+                return f.read()
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end - (start or 0) + 1)
+
+    def delete(self, client=None):
+        os.remove(self.path)
+        attributes_path = self.bucket.attributes_path(self.name)
+        if attributes_path.exists():
+            os.remove(attributes_path)
+
+    def reload(self, client=None):
+        attributes_path = self.bucket.attributes_path(self.name)
+        if attributes_path.exists():
+            with open(attributes_path, 'r', encoding='utf-8') as f:
+                attributes = json.load(f)
+            self.content_type = attributes.get("content_type")
+            self.content_encoding = attributes.get("content_encoding")
+            self.metadata = attributes.get("metadata")
+
+
+class LocalBucket:
+    """
+    A bucket backed by a local directory.
+    """
+
+    ATTRIBUTES_DIR = ".attributes"
+
+    def __init__(self, root, name):
+        self.name = name
+        self.root = Path(root) / name
+        os.makedirs(self.root, exist_ok=True)
+
+    def attributes_path(self, blob_name):
+        path = self.root / self.ATTRIBUTES_DIR / f"{blob_name}.json"
+        os.makedirs(path.parent, exist_ok=True)
+        return path
+
+    def blob(self, blob_name, chunk_size=None):
+        return LocalBlob(self, blob_name, chunk_size=chunk_size)
+
+    def get_blob(self, blob_name):
+        blob = self.blob(blob_name)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix=None, **kwargs):
+        prefix = prefix or ""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Skip object attributes and in-flight uploads
+            dirnames[:] = [d for d in dirnames if d != self.ATTRIBUTES_DIR]
+            for filename in filenames:
+                if filename.startswith(".") and filename.endswith(".tmp"):
+                    continue
+                name = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    yield self.blob(name)
+
+
+class LocalStorageClient:
+    """
+    Storage client whose buckets are directories under a root directory.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        os.makedirs(self.root_dir, exist_ok=True)
+        logging.info(f"Using local storage backend at {self.root_dir}")
+
+    def bucket(self, bucket_name):
+        return LocalBucket(self.root_dir, bucket_name)
+
+    def list_blobs(self, bucket_or_name, prefix=None, **kwargs):
+        bucket = bucket_or_name if isinstance(bucket_or_name, LocalBucket) else self.bucket(bucket_or_name)
+        return bucket.list_blobs(prefix=prefix, **kwargs)
+
+
+class InMemoryDocumentSnapshot:
+    """
+    Snapshot of an in-memory document.
+    """
+
+    def __init__(self, document_id, data):
+        self.id = document_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class InMemoryDocumentReference:
+    """
+    Reference to a document in an in-memory collection.
+    """
+
+    def __init__(self, client, collection_name, document_id):
+        self._client = client
+        self.collection_name = collection_name
+        self.id = document_id
+
+    def get(self, **kwargs):
+        with self._client.lock:
+            data = self._client.documents.get(self.collection_name, {}).get(self.id)
+            return InMemoryDocumentSnapshot(self.id, copy.deepcopy(data))
+
+    def set(self, document_data, merge=False, **kwargs):
+        self._client.commit_writes([(self, document_data, merge)])
+
+    def delete(self, **kwargs):
+        with self._client.lock:
+            self._client.documents.get(self.collection_name, {}).pop(self.id, None)
+
+
+class InMemoryCollectionReference:
+    """
+    Reference to an in-memory collection.
+    """
+
+    def __init__(self, client, name):
+        self._client = client
+        self.id = name
+
+    def document(self, document_id):
+        return InMemoryDocumentReference(self._client, self.id, document_id)
+
+    def stream(self, **kwargs):
+        with self._client.lock:
+            items = list(self._client.documents.get(self.id, {}).items())
+        for document_id, data in items:
+            yield InMemoryDocumentSnapshot(document_id, copy.deepcopy(data))
+
+
+class InMemoryWriteBatch:
+    """
+    Write batch applied atomically on commit.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append((reference, document_data, merge))
+
+    def commit(self, **kwargs):
+        if len(self._writes) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        self._client.commit_writes(self._writes)
+        self._writes = []
+
+
+class InMemoryFirestoreClient:
+    """
+    Firestore client that keeps documents in memory.
+
+    Collections, document references, get/set and batched writes behave like
+    the google-cloud-firestore client for the operations GCPStorage uses.
+    Server timestamp sentinels are stored as the commit time.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.commit_count = 0
+
+    def collection(self, name):
+        return InMemoryCollectionReference(self, name)
+
+    def batch(self):
+        return InMemoryWriteBatch(self)
+
+    def commit_writes(self, writes):
+        """Apply a list of (reference, data, merge) writes as one commit."""
+        import datetime
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        with self.lock:
+            for reference, document_data, merge in writes:
+                data = {
+                    key: now if type(value).__name__ == "Sentinel" else copy.deepcopy(value)
+                    for key, value in document_data.items()
+                }
+                collection = self.documents.setdefault(reference.collection_name, {})
+                if merge and reference.id in collection:
+                    collection[reference.id].update(data)
+                else:
+                    collection[reference.id] = data
+            self.commit_count += 1
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Calculation Linkbase Validation
+
+Checks the summation relationships of a filing's calculation linkbase
+(parent = sum of weight x child) against the reported facts, for every role,
+context and unit of the filing at once.
+
+The arcs are loaded into arrays with one row per (role, parent) relationship
+and one entry per arc, and the fact values into a concept x (context, unit)
+matrix, so all relationships are evaluated with a few NumPy gathers and
+segment sums instead of a Python loop per relationship and context.
+
+A relationship is checked in a context and unit when the parent is reported
+and at least one child is. It is inconsistent when the reported and computed
+totals differ by more than the rounding of the facts involved (half a unit of
+each fact's decimals, weighted), as in the round-to-nearest rule of XBRL
+Calculations 1.1. Duplicate facts keep the most precise value; duplicates
+that disagree are reported and not used.
+
+Settings come from CALCULATION_VALIDATION in config.
+"""
+
+import os
+import sys
+import math
+import logging
+from pathlib import Path
+
+import numpy as np
+from lxml import etree
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src2.config import CALCULATION_VALIDATION
+
+LINK_NS = "http://www.xbrl.org/2003/linkbase"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+
+# Inline XBRL formats whose displayed value is zero
+ZERO_FORMATS = {"fixed-zero", "fixedzero", "zerodash"}
+
+# Inline XBRL formats with a comma as the decimal separator
+COMMA_DECIMAL_FORMATS = {"num-comma-decimal", "numcommadecimal", "numdotcomma"}
+
+# Number words of the SEC numwordsen format
+NUMBER_WORDS = {
+    "no": 0, "none": 0, "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12
+}
+
+
+def concept_from_href(href):
+    """
+    Concept name of a locator href (schema#us-gaap_Assets -> us-gaap:Assets)
+
+    Args:
+        href: Locator href or element id
+
+    Returns:
+        Concept name in prefix:LocalName form
+    """
+    fragment = href.split('#')[-1]
+    return fragment if ':' in fragment else fragment.replace('_', ':', 1)
+
+
+def load_calculation_arcs(path):
+    """
+    Load the calculation arcs of a linkbase (or a schema with embedded linkbases)
+
+    Prohibited arcs remove the arcs they override; repeated arcs are kept once.
+
+    Args:
+        path: Path to a calculation linkbase (*_cal.xml) or schema (*.xsd)
+
+    Returns:
+        List of arc dictionaries (role, parent, child, weight) in document order
+    """
+    tree = etree.parse(str(path))
+    arcs = {}
+    for link in tree.iter(f"{{{LINK_NS}}}calculationLink"):
+        role = link.get(f"{{{XLINK_NS}}}role", "")
+
+        # Locator labels are local to their extended link
+        locators = {}
+        for loc in link.iter(f"{{{LINK_NS}}}loc"):
+            label = loc.get(f"{{{XLINK_NS}}}label")
+            href = loc.get(f"{{{XLINK_NS}}}href")
+            if label and href:
+                locators.setdefault(label, []).append(concept_from_href(href))
+
+        for arc in link.iter(f"{{{LINK_NS}}}calculationArc"):
+            parents = locators.get(arc.get(f"{{{XLINK_NS}}}from"), [])
+            children = locators.get(arc.get(f"{{{XLINK_NS}}}to"), [])
+            try:
+                weight = float(arc.get("weight", "1"))
+            except ValueError:
+                logging.warning(f"Ignoring calculation arc with weight {arc.get('weight')!r} in {path}")
+                continue
+            for parent in parents:
+                for child in children:
+                    key = (role, parent, child)
+                    if arc.get("use") == "prohibited":
+                        arcs.pop(key, None)
+                    elif key not in arcs:
+                        arcs[key] = weight
+
+    return [
+        {"role": role, "parent": parent, "child": child, "weight": weight}
+        for (role, parent, child), weight in arcs.items()
+    ]
+
+
+def find_calculation_linkbase(filing_dir):
+    """
+    Find the calculation linkbase of a filing directory
+
+    Args:
+        filing_dir: Directory with the downloaded filing
+
+    Returns:
+        Path to a *_cal.xml linkbase, or to a schema with an embedded
+        calculation linkbase, or None
+    """
+    filing_dir = Path(filing_dir)
+    linkbases = sorted(filing_dir.glob("*_cal.xml"))
+    if linkbases:
+        return linkbases[0]
+
+    for schema in sorted(filing_dir.glob("*.xsd")):
+        try:
+            with open(schema, 'rb') as f:
+                if b"calculationLink" in f.read():
+                    return schema
+        except OSError:
+            continue
+    return None
+
+
+def parse_fact_value(fact):
+    """
+    Numeric value and precision of an inline XBRL fact
+
+    Args:
+        fact: Fact dictionary (value, format, scale, sign, decimals)
+
+    Returns:
+        Tuple of (value, decimals), decimals being math.inf for exact values,
+        or None if the fact is not numeric
+    """
+    text = str(fact.get("value", "")).strip()
+    fact_format = (fact.get("format") or "").split(":")[-1].lower()
+
+    try:
+        scale = int(fact.get("scale") or 0)
+    except ValueError:
+        return None
+
+    if fact_format in ZERO_FORMATS:
+        value = 0.0
+        shown_decimals = 0
+    elif fact_format == "numwordsen":
+        if text.lower() not in NUMBER_WORDS:
+            return None
+        value = float(NUMBER_WORDS[text.lower()])
+        shown_decimals = 0
+    else:
+        if fact_format in COMMA_DECIMAL_FORMATS:
+            text = text.replace('.', '').replace(' ', '').replace('\xa0', '').replace(',', '.')
+        else:
+            text = text.replace(',', '').replace(' ', '').replace('\xa0', '')
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        if not math.isfinite(value):
+            return None
+        shown_decimals = len(text.split('.')[1]) if '.' in text else 0
+
+    value *= 10.0 ** scale
+    if fact.get("sign") == "-":
+        value = -value
+
+    # Without a decimals attribute, the value is as precise as it is shown
+    decimals = fact.get("decimals")
+    if decimals is None or decimals == "":
+        return value, shown_decimals - scale
+    if str(decimals).upper() == "INF":
+        return value, math.inf
+    try:
+        return value, int(decimals)
+    except ValueError:
+        return value, shown_decimals - scale
+
+
+def _half_unit(decimals):
+    """Half a unit of the last reported digit (0 for exact values)."""
+    return 0.0 if decimals == math.inf else 0.5 * 10.0 ** (-decimals)
+
+
+def validate_calculations(facts, arcs, max_reported=None):
+    """
+    Check all summation relationships of a calculation linkbase
+
+    Args:
+        facts: Fact dictionaries (name, contextRef, unitRef, value, format,
+            scale, sign, decimals) as extracted from the inline XBRL document
+        arcs: Arc dictionaries (role, parent, child, weight), e.g. from
+            load_calculation_arcs
+        max_reported: Maximum number of inconsistencies listed (defaults to config)
+
+    Returns:
+        Dictionary with counts per role and the inconsistencies (role,
+        concept, context, unit, reported and computed totals, difference,
+        tolerance, number of reported children)
+    """
+    if max_reported is None:
+        max_reported = CALCULATION_VALIDATION.get("max_reported", 100)
+
+    # Relationships: one row per (role, parent), arcs grouped by row
+    rows = {}
+    arc_children = []
+    for arc in arcs:
+        parent = concept_from_href(arc["parent"])
+        child = concept_from_href(arc["child"])
+        row = rows.setdefault((arc.get("role") or "", parent), len(rows))
+        arc_children.append((row, child, float(arc.get("weight", 1.0))))
+
+    concepts = {}
+    for (role, parent) in rows:
+        concepts.setdefault(parent, len(concepts))
+    for _, child, _ in arc_children:
+        concepts.setdefault(child, len(concepts))
+
+    # Fact values: concept x (context, unit); duplicates keep the most precise value
+    columns = {}
+    cells = {}
+    conflicts = set()
+    for fact in facts:
+        concept = fact.get("name")
+        if concept not in concepts or not fact.get("unitRef") or not fact.get("contextRef"):
+            continue
+        parsed = parse_fact_value(fact)
+        if parsed is None:
+            continue
+        column = columns.setdefault((fact["contextRef"], fact["unitRef"]), len(columns))
+        cell = (concepts[concept], column)
+        previous = cells.get(cell)
+        if previous is None:
+            cells[cell] = parsed
+            continue
+        if abs(previous[0] - parsed[0]) > _half_unit(previous[1]) + _half_unit(parsed[1]):
+            conflicts.add(cell)
+        if parsed[1] > previous[1]:
+            cells[cell] = parsed
+
+    result = {
+        "success": True,
+        "arcs": len(arc_children),
+        "relationships": len(rows),
+        "columns": len(columns),
+        "checked": 0,
+        "inconsistent": 0,
+        "duplicate_conflicts": len(conflicts),
+        "roles": {},
+        "inconsistencies": []
+    }
+    for role, _ in rows:
+        result["roles"].setdefault(role, {"relationships": 0, "checked": 0, "inconsistent": 0})
+        result["roles"][role]["relationships"] += 1
+    if not rows or not columns:
+        return result
+
+    values = np.zeros((len(concepts), len(columns)))
+    present = np.zeros((len(concepts), len(columns)), dtype=bool)
+    half_units = np.zeros((len(concepts), len(columns)))
+    if cells:
+        index = np.array(list(cells.keys()), dtype=np.int64)
+        parsed = list(cells.values())
+        values[index[:, 0], index[:, 1]] = [value for value, _ in parsed]
+        half_units[index[:, 0], index[:, 1]] = [_half_unit(decimals) for _, decimals in parsed]
+        present[index[:, 0], index[:, 1]] = True
+    if conflicts:
+        # Disagreeing duplicates make the fact unusable
+        index = np.array(list(conflicts), dtype=np.int64)
+        present[index[:, 0], index[:, 1]] = False
+
+    # Arcs sorted by row, so every row is one contiguous segment
+    arc_rows = np.array([row for row, _, _ in arc_children], dtype=np.int64)
+    order = np.argsort(arc_rows, kind='stable')
+    arc_rows = arc_rows[order]
+    child_index = np.array([concepts[child] for _, child, _ in arc_children], dtype=np.int64)[order]
+    weights = np.array([weight for _, _, weight in arc_children])[order]
+    starts = np.flatnonzero(np.r_[True, arc_rows[1:] != arc_rows[:-1]])
+
+    child_present = present[child_index]
+    computed = np.add.reduceat(np.where(child_present, values[child_index] * weights[:, None], 0.0), starts)
+    children_reported = np.add.reduceat(child_present.astype(np.int64), starts)
+    tolerance = np.add.reduceat(np.where(child_present, half_units[child_index] * np.abs(weights)[:, None], 0.0), starts)
+
+    parent_index = np.array([concepts[parent] for (_, parent) in rows], dtype=np.int64)
+    reported = values[parent_index]
+    tolerance += np.where(present[parent_index], half_units[parent_index], 0.0)
+    # Allow for floating point error in the sums
+    tolerance += 1e-9 * np.maximum(np.abs(reported), np.abs(computed))
+
+    checked = present[parent_index] & (children_reported > 0)
+    inconsistent = checked & (np.abs(reported - computed) > tolerance)
+
+    role_names = [role for role, _ in rows]
+    checked_rows = checked.sum(axis=1)
+    inconsistent_rows = inconsistent.sum(axis=1)
+    for row, role in enumerate(role_names):
+        result["roles"][role]["checked"] += int(checked_rows[row])
+        result["roles"][role]["inconsistent"] += int(inconsistent_rows[row])
+    result["checked"] = int(checked_rows.sum())
+    result["inconsistent"] = int(inconsistent_rows.sum())
+
+    column_keys = list(columns)
+    row_keys = list(rows)
+    for row, column in zip(*np.nonzero(inconsistent)):
+        if len(result["inconsistencies"]) >= max_reported:
+            break
+        role, parent = row_keys[row]
+        context, unit = column_keys[column]
+        result["inconsistencies"].append({
+            "role": role,
+            "concept": parent,
+            "context": context,
+            "unit": unit,
+            "reported": float(reported[row, column]),
+            "computed": float(computed[row, column]),
+            "difference": float(reported[row, column] - computed[row, column]),
+            "tolerance": float(tolerance[row, column]),
+            "children": int(children_reported[row, column])
+        })
+
+    return result
+
+
+def validate_filing_calculations(filing_dir, facts, max_reported=None):
+    """
+    Check the facts of a filing against the calculation linkbase next to it
+
+    Args:
+        filing_dir: Directory with the downloaded filing
+        facts: Fact dictionaries extracted from the inline XBRL document
+        max_reported: Maximum number of inconsistencies listed (defaults to config)
+
+    Returns:
+        Validation result (see validate_calculations), or a dictionary with
+        success False and an error if there is no usable linkbase
+    """
+    linkbase = find_calculation_linkbase(filing_dir)
+    if linkbase is None:
+        return {"success": False, "error": f"No calculation linkbase found in {filing_dir}"}
+
+    try:
+        arcs = load_calculation_arcs(linkbase)
+    except (OSError, etree.XMLSyntaxError) as e:
+        logging.warning(f"Could not load calculation linkbase {linkbase}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+    result = validate_calculations(facts, arcs, max_reported)
+    result["linkbase"] = str(linkbase)
+    logging.info(f"Calculation check of {linkbase}: {result['checked']} relationships checked, "
+                 f"{result['inconsistent']} inconsistent, {result['duplicate_conflicts']} conflicting duplicates")
+    return result
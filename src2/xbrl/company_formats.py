@@ -7,9 +7,21 @@ provides mechanisms to dynamically adapt to different filing formats.
 
 import os
 import sys
+import copy
 import json
+import time
+import atexit
 import logging
+import tempfile
+import threading
 from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (e.g. Windows); writes are still atomic
+    fcntl = None
 
 # Use a path relative to this file for the registry
 FORMATS_REGISTRY_PATH = os.path.join(
@@ -17,6 +29,12 @@ FORMATS_REGISTRY_PATH = os.path.join(
     "company_formats_registry.json"
 )
 
+# Seconds to wait before writing learned formats, so several updates share one write
+DEFAULT_SAVE_DELAY = 2.0
+
+# Minimum seconds between checks of the registry file's modification time
+DEFAULT_RELOAD_CHECK_INTERVAL = 1.0
+
 # Default format handlers for common cases
 FORMAT_HANDLERS = {
     "standard": {
@@ -71,30 +89,256 @@ COMPANY_FORMATS = {
     }
 }
 
-def load_company_formats():
-    """Load company formats from the registry file, or create if not exists"""
-    try:
-        if os.path.exists(FORMATS_REGISTRY_PATH):
-            with open(FORMATS_REGISTRY_PATH, 'r') as f:
-                return json.load(f)
-        else:
+class CompanyFormatRegistry:
+    """
+    In-process registry of company-specific XBRL formats.
+
+    The registry file is read once and kept in memory, so format detection is
+    a dictionary lookup. The file's modification time is checked at most every
+    reload_check_interval seconds and the registry is reloaded when another
+    process has changed it. Changes are written after save_delay seconds, so a
+    run that learns formats for many filings writes the file once instead of
+    after every parse. Writes hold an exclusive lock on a sidecar lock file and
+    merge this process's changed companies into the current file contents, so
+    concurrent processes do not lose each other's updates.
+    """
+
+    def __init__(self, registry_path=FORMATS_REGISTRY_PATH, save_delay=DEFAULT_SAVE_DELAY,
+                 reload_check_interval=DEFAULT_RELOAD_CHECK_INTERVAL):
+        """
+        Initialize the registry (the file is loaded on first use).
+
+        Args:
+            registry_path: Path to the registry JSON file
+            save_delay: Seconds to wait before writing changes (0 writes immediately)
+            reload_check_interval: Minimum seconds between modification time checks
+        """
+        self.registry_path = registry_path
+        self.lock_path = f"{registry_path}.lock"
+        self.save_delay = save_delay
+        self.reload_check_interval = reload_check_interval
+
+        self._formats = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._timer = None
+
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the registry's lock file (no-op without fcntl)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.registry_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_file(self):
+        """Read the registry file, returning (formats, mtime)."""
+        mtime = self._file_mtime()
+        if mtime is None:
+            return copy.deepcopy(COMPANY_FORMATS), None
+        try:
+            with open(self.registry_path, 'r') as f:
+                return json.load(f), mtime
+        except Exception as e:
+            logging.warning(f"Error loading company formats registry: {str(e)}")
+            return copy.deepcopy(COMPANY_FORMATS), mtime
+
+    def _ensure_loaded(self):
+        """Load the registry, or reload it if the file changed on disk."""
+        now = time.monotonic()
+        if self._formats is not None and now - self._last_check < self.reload_check_interval:
+            return
+        self._last_check = now
+
+        mtime = self._file_mtime()
+        if self._formats is not None and mtime == self._mtime:
+            return
+
+        formats, mtime = self._read_file()
+        if self._formats is not None:
+            # Keep this process's unsaved changes on top of the reloaded file
+            for ticker in self._dirty:
+                if ticker in self._formats:
+                    formats[ticker] = self._formats[ticker]
+            logging.debug(f"Reloaded company formats registry from {self.registry_path}")
+        self._formats = formats
+        self._mtime = mtime
+
+        if mtime is None:
             # Create initial registry with default values
-            with open(FORMATS_REGISTRY_PATH, 'w') as f:
-                json.dump(COMPANY_FORMATS, f, indent=2)
-            return COMPANY_FORMATS
-    except Exception as e:
-        logging.warning(f"Error loading company formats registry: {str(e)}")
-        return COMPANY_FORMATS
+            self._dirty.update(formats)
+            self._schedule_save()
+
+    def get(self, ticker):
+        """
+        Get the format information of a company.
+
+        Args:
+            ticker: Company ticker symbol
+
+        Returns:
+            Format information dictionary, or None if not registered
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._formats.get(ticker)
+
+    def all(self):
+        """
+        Get a copy of all registered company formats.
+
+        Returns:
+            Dictionary with company ticker as key and format info as value
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._formats)
+
+    def set(self, ticker, format_info):
+        """
+        Register or replace the format information of a company.
+
+        Args:
+            ticker: Company ticker symbol
+            format_info: Dictionary with format information
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self._formats[ticker] = copy.deepcopy(format_info)
+            self._dirty.add(ticker)
+            self._schedule_save()
+
+    def update(self, ticker, update):
+        """
+        Modify the format information of a company in place.
+
+        Args:
+            ticker: Company ticker symbol
+            update: Function taking the company's format info (None if not
+                registered) and returning the new format info, or None to
+                leave the registry unchanged
+
+        Returns:
+            True if the registry was changed
+        """
+        with self._lock:
+            self._ensure_loaded()
+            current = copy.deepcopy(self._formats.get(ticker))
+            new_info = update(current)
+            if new_info is None or new_info == self._formats.get(ticker):
+                return False
+            self._formats[ticker] = new_info
+            self._dirty.add(ticker)
+            self._schedule_save()
+            return True
+
+    def replace_all(self, formats_dict):
+        """
+        Replace the whole registry and write it immediately.
+
+        Args:
+            formats_dict: Dictionary with company ticker as key and format info as value
+
+        Returns:
+            True if the registry file was written
+        """
+        with self._lock:
+            self._formats = copy.deepcopy(formats_dict)
+            self._last_check = time.monotonic()
+            self._cancel_timer()
+            try:
+                with self._file_lock():
+                    self._write_file(self._formats)
+                self._dirty.clear()
+                return True
+            except Exception as e:
+                logging.warning(f"Error saving company formats registry: {str(e)}")
+                return False
+
+    def _schedule_save(self):
+        if not self.save_delay:
+            self.flush()
+            return
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _write_file(self, formats):
+        """Write the registry atomically and remember the new modification time."""
+        directory = os.path.dirname(self.registry_path) or "."
+        fd, temp_path = tempfile.mkstemp(prefix=".company_formats_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(formats, f, indent=2)
+            os.replace(temp_path, self.registry_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._mtime = self._file_mtime()
+
+    def flush(self):
+        """
+        Write pending changes to the registry file.
+
+        The file is re-read under the file lock and only the companies changed
+        in this process are written over it.
+
+        Returns:
+            True if there was nothing to write or the write succeeded
+        """
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty:
+                return True
+
+            try:
+                with self._file_lock():
+                    on_disk, _ = self._read_file()
+                    for ticker in self._dirty:
+                        on_disk[ticker] = self._formats[ticker]
+                    self._write_file(on_disk)
+                    saved = len(self._dirty)
+                    self._formats = on_disk
+                    self._dirty.clear()
+                logging.debug(f"Saved {saved} company format updates to {self.registry_path}")
+                return True
+            except Exception as e:
+                logging.warning(f"Error saving company formats registry: {str(e)}")
+                return False
+
+
+# Shared registry instance
+format_registry = CompanyFormatRegistry()
+
+def load_company_formats():
+    """Load company formats from the in-memory registry"""
+    return format_registry.all()
 
 def save_company_formats(formats_dict):
     """Save company formats to the registry file"""
-    try:
-        with open(FORMATS_REGISTRY_PATH, 'w') as f:
-            json.dump(formats_dict, f, indent=2)
-        return True
-    except Exception as e:
-        logging.warning(f"Error saving company formats registry: {str(e)}")
-        return False
+    return format_registry.replace_all(formats_dict)
 
 def detect_xbrl_format(file_path, ticker=None):
     """
@@ -120,18 +364,18 @@ def detect_xbrl_format(file_path, ticker=None):
     
     # If ticker is provided, check company-specific overrides
     if ticker:
-        company_formats = load_company_formats()
+        company_format = format_registry.get(ticker)
         
-        if ticker in company_formats:
+        if company_format:
             # Check if any patterns match
-            for pattern, pattern_format in company_formats[ticker].get("format_patterns", {}).items():
+            for pattern, pattern_format in company_format.get("format_patterns", {}).items():
                 if pattern in file_path:
                     format_type = pattern_format
                     break
             
             # If no pattern matched, use company default if available
-            if format_type == "standard" and "default_format" in company_formats[ticker]:
-                format_type = company_formats[ticker]["default_format"]
+            if format_type == "standard" and "default_format" in company_format:
+                format_type = company_format["default_format"]
     
     return format_type
 
@@ -158,13 +402,9 @@ def register_company_format(ticker, format_info):
     Returns:
         True if registration succeeded
     """
-    company_formats = load_company_formats()
-    
-    # Update existing entry or add new one
-    company_formats[ticker] = format_info
-    
-    # Save updated registry
-    return save_company_formats(company_formats)
+    # Update existing entry or add new one (written by the registry shortly after)
+    format_registry.set(ticker, format_info)
+    return True
 
 def learn_from_successful_parse(ticker, file_path, format_used):
     """
@@ -182,15 +422,6 @@ def learn_from_successful_parse(ticker, file_path, format_used):
         return False
     
     try:
-        company_formats = load_company_formats()
-        
-        # Create entry if it doesn't exist
-        if ticker not in company_formats:
-            company_formats[ticker] = {
-                "default_format": "standard",
-                "format_patterns": {}
-            }
-        
         # Identify a pattern from the file path
         path = Path(file_path)
         filename = path.name
@@ -206,22 +437,34 @@ def learn_from_successful_parse(ticker, file_path, format_used):
         elif 'FilingSummary.xml' in filename:
             pattern_candidates.append('FilingSummary.xml')
         
+        if not pattern_candidates:
+            return False
+        
         # Use the best pattern we found
-        if pattern_candidates:
-            pattern = pattern_candidates[0]
-            company_formats[ticker]["format_patterns"][pattern] = format_used
+        pattern = pattern_candidates[0]
+        
+        def apply(company_format):
+            # Create entry if it doesn't exist
+            if company_format is None:
+                company_format = {
+                    "default_format": "standard",
+                    "format_patterns": {}
+                }
+            company_format.setdefault("format_patterns", {})[pattern] = format_used
             
             # Count how many formats we have for this company
             format_counts = {}
-            for _, fmt in company_formats[ticker]["format_patterns"].items():
+            for _, fmt in company_format["format_patterns"].items():
                 format_counts[fmt] = format_counts.get(fmt, 0) + 1
             
             # Update default format to the most common one
             most_common_format = max(format_counts.items(), key=lambda x: x[1])[0]
-            company_formats[ticker]["default_format"] = most_common_format
-            
-            # Save updated registry
-            return save_company_formats(company_formats)
+            company_format["default_format"] = most_common_format
+            return company_format
+        
+        # Unchanged formats are not written; changes are saved by the registry shortly after
+        format_registry.update(ticker, apply)
+        return True
     
     except Exception as e:
         logging.warning(f"Error learning company format: {str(e)}")
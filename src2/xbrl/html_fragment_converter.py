@@ -0,0 +1,678 @@
+#!/usr/bin/env python3
+"""
+HTML Fragment Conversion Engine
+
+Converts the HTML fragments found in XBRL fact values (text blocks, tables
+and numbers wrapped in markup) exactly as xbrl_parser.extract_text_only_from_html
+does, without building BeautifulSoup trees. A 10-K has hundreds of TextBlock
+facts, many of them repeated across contexts, and the BeautifulSoup path
+parses every table twice.
+
+- Fragments are read with a single regular expression tokenizer into a small
+  tree that follows the BeautifulSoup 'html.parser' tree building rules, so
+  the text and the serialized markup are the same. Attribute cleanup happens
+  while serializing, and the text of the cleaned table is the text of the
+  original (only attributes change), so each fragment is parsed once.
+  Markup outside the subset the tokenizer accepts (scripts, comments,
+  declarations, unquoted attributes, stray "<" or "&") is handed to the
+  BeautifulSoup implementation.
+- Results are memoized by content hash, in memory for the process and in a
+  SQLite store shared across filings.
+- convert_many converts each distinct fragment of a batch once, optionally
+  in a process pool.
+
+Settings come from XBRL_FRAGMENT_CONVERSION in config.
+"""
+
+import os
+import re
+import sys
+import html
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4.dammit import EntitySubstitution
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src2.config import XBRL_FRAGMENT_CONVERSION
+from src2.xbrl.xbrl_parser import extract_text_only_from_html
+
+# Bump when the conversion output changes, so stored results are not reused
+FRAGMENT_CONVERSION_VERSION = "1"
+
+# Seconds to wait for another writer to release the store lock
+BUSY_TIMEOUT = 30.0
+
+# Verification patterns of extract_text_only_from_html
+NUMBER_PATTERN = re.compile(r'\$?[\d,]+\.?\d*%?|\(\$?[\d,]+\.?\d*\)')
+TOKEN_PATTERN = re.compile(r'\b[\w\d.,$%()-]+\b')
+
+# Attribute cleanup of process_table_safely and extract_text_only_from_html
+ESSENTIAL_STYLES = ('align', 'padding', 'margin', 'width', 'height', 'border')
+TABLE_REMOVABLE_ATTRIBUTES = ('bgcolor', 'color', 'font', 'face', 'class')
+TEXT_REMOVABLE_ATTRIBUTES = ('bgcolor', 'color', 'font', 'face', 'class', 'font-family')
+
+# One token of the accepted markup subset: a start tag with quoted (or no)
+# attribute values, an end tag, a character or entity reference, or text
+FRAGMENT_TOKEN = re.compile(r"""
+    <(?P<start>[a-zA-Z][-.:a-zA-Z0-9_]*)
+     (?P<attrs>(?:\s+[^\s"'<>/=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'))?)*)
+     \s*(?P<close>/?)>
+  | </(?P<end>[a-zA-Z][-.:a-zA-Z0-9_]*)\s*>
+  | &(?:\#(?P<dec>[0-9]{1,7})|\#[xX](?P<hex>[0-9a-fA-F]{1,6})|(?P<entity>[a-zA-Z][a-zA-Z0-9]*));
+  | (?P<text>[^<&]+)
+""", re.VERBOSE)
+ATTRIBUTE = re.compile(r"""([^\s"'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'))?""")
+NON_WHITESPACE = re.compile(r'\S+')
+
+# Tags whose content html.parser or BeautifulSoup treat specially (raw text,
+# preserved whitespace, non-text strings, charset substitution)
+FALLBACK_TAGS = frozenset([
+    'script', 'style', 'textarea', 'title', 'xmp', 'iframe', 'noembed', 'noframes',
+    'noscript', 'plaintext', 'pre', 'template', 'rt', 'rp', 'meta'
+])
+
+# Tags BeautifulSoup closes immediately and writes as <tag/>
+VOID_TAGS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame',
+    'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta',
+    'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+])
+
+# Attributes BeautifulSoup splits into whitespace separated lists
+MULTI_VALUED_ATTRIBUTES = {
+    '*': frozenset(['class', 'accesskey', 'dropzone']),
+    'a': frozenset(['rel', 'rev']),
+    'link': frozenset(['rel', 'rev']),
+    'td': frozenset(['headers']),
+    'th': frozenset(['headers']),
+    'form': frozenset(['accept-charset']),
+    'object': frozenset(['archive']),
+    'area': frozenset(['rel']),
+    'icon': frozenset(['sizes']),
+    'iframe': frozenset(['sandbox']),
+    'output': frozenset(['for'])
+}
+
+ASCII_SPACES = " \n\t\x0c\r"
+
+
+class _Element:
+    """An element of a parsed fragment (attributes are kept as markup until serialized)."""
+
+    __slots__ = ('name', 'attrs_markup', 'children')
+
+    def __init__(self, name, attrs_markup):
+        self.name = name
+        self.attrs_markup = attrs_markup
+        self.children = []
+
+
+def _reference_character(code):
+    """The character of a numeric reference, or None where BeautifulSoup substitutes another."""
+    # 0x80-0x9F are read as windows-1252, and invalid code points are replaced
+    if code == 0 or 0x80 <= code <= 0x9F or 0xD800 <= code <= 0xDFFF or code > 0x10FFFF:
+        return None
+    return chr(code)
+
+
+def _parse_attributes(name, markup):
+    """Attribute dictionary of a start tag, as BeautifulSoup stores it."""
+    attrs = {}
+    multi_valued = MULTI_VALUED_ATTRIBUTES['*'] | MULTI_VALUED_ATTRIBUTES.get(name, frozenset())
+    for match in ATTRIBUTE.finditer(markup):
+        key = match.group(1).lower()
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        if value:
+            value = html.unescape(value)
+        elif value is None:
+            value = ""
+        if key in multi_valued:
+            value = " ".join(NON_WHITESPACE.findall(value))
+        # Later duplicates replace earlier ones
+        attrs[key] = value
+    return attrs
+
+
+def parse_fragment(html_value):
+    """
+    Parse an HTML fragment into a tree built like a BeautifulSoup 'html.parser' tree
+
+    Args:
+        html_value: HTML fragment
+
+    Returns:
+        Tuple of (root element, list of the text strings in document order), or
+        None if the fragment uses markup outside the accepted subset
+    """
+    root = _Element(None, "")
+    stack = [root]
+    open_counts = {}
+    already_closed = []
+    strings = []
+    data = []
+
+    def end_data():
+        if data:
+            string = "".join(data)
+            data.clear()
+            # Whitespace-only strings are reduced to one character
+            if not string.strip(ASCII_SPACES):
+                string = "\n" if "\n" in string else " "
+            stack[-1].children.append(string)
+            strings.append(string)
+
+    def pop_to(name):
+        if not open_counts.get(name):
+            return
+        while len(stack) > 1:
+            element = stack.pop()
+            open_counts[element.name] -= 1
+            if element.name == name:
+                return
+
+    position = 0
+    for match in FRAGMENT_TOKEN.finditer(html_value):
+        if match.start() != position:
+            return None
+        position = match.end()
+        kind = match.lastgroup
+
+        if kind == 'text':
+            data.append(match.group('text'))
+        elif kind == 'close':
+            # A start tag (its last group always takes part in the match)
+            name = match.group('start').lower()
+            if name in FALLBACK_TAGS:
+                return None
+            end_data()
+            element = _Element(name, match.group('attrs'))
+            stack[-1].children.append(element)
+            stack.append(element)
+            open_counts[name] = open_counts.get(name, 0) + 1
+            if match.group('close'):
+                pop_to(name)
+            elif name in VOID_TAGS:
+                pop_to(name)
+                already_closed.append(name)
+        elif kind == 'end':
+            name = match.group('end').lower()
+            if name in already_closed:
+                already_closed.remove(name)
+            else:
+                end_data()
+                pop_to(name)
+        elif kind == 'entity':
+            character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(match.group('entity'))
+            if character is None:
+                return None
+            data.append(character)
+        else:
+            code = int(match.group('dec'), 10) if kind == 'dec' else int(match.group('hex'), 16)
+            character = _reference_character(code)
+            if character is None:
+                return None
+            data.append(character)
+
+    if position != len(html_value):
+        return None
+    end_data()
+    return root, strings
+
+
+def _escape(value):
+    """Escape text as BeautifulSoup's minimal formatter does."""
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    return value
+
+
+def _quote_attribute(value):
+    """Quote an escaped attribute value as BeautifulSoup does."""
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _clean_attributes(attrs, removable):
+    """Remove cosmetic styles and attributes, as the BeautifulSoup cleanup does."""
+    if 'style' in attrs:
+        style_parts = []
+        for part in attrs['style'].split(';'):
+            part = part.strip()
+            if part and any(essential in part.lower() for essential in ESSENTIAL_STYLES):
+                style_parts.append(part)
+        if style_parts:
+            attrs['style'] = ';'.join(style_parts)
+        else:
+            del attrs['style']
+    for attr in removable:
+        attrs.pop(attr, None)
+
+
+@lru_cache(maxsize=8192)
+def _opening_tag(name, attrs_markup, removable):
+    """
+    Serialized start tag (without the closing ">") of an element.
+
+    Table cells repeat the same few start tags thousands of times, so the
+    attributes are parsed, cleaned and formatted once per distinct tag.
+    """
+    if not attrs_markup:
+        return '<' + name
+    attrs = _parse_attributes(name, attrs_markup)
+    if removable:
+        _clean_attributes(attrs, removable)
+    if not attrs:
+        return '<' + name
+    return '<' + name + ' ' + ' '.join(
+        key + '=' + _quote_attribute(_escape(value)) for key, value in sorted(attrs.items())
+    )
+
+
+def serialize_fragment(root, removable=()):
+    """
+    Serialize a parsed fragment as str() of the BeautifulSoup tree would
+
+    Args:
+        root: Root element returned by parse_fragment
+        removable: Tuple of attributes to drop (styles are reduced to the
+            structural ones whenever removable is not empty)
+
+    Returns:
+        HTML string
+    """
+    pieces = []
+    # Iterative walk, so deeply nested fragments cannot hit the recursion limit
+    pending = list(reversed(root.children))
+    while pending:
+        node = pending.pop()
+        if isinstance(node, str):
+            pieces.append(_escape(node))
+            continue
+        if isinstance(node, tuple):
+            pieces.append(node[0])
+            continue
+
+        opening = _opening_tag(node.name, node.attrs_markup, removable)
+        if not node.children and node.name in VOID_TAGS:
+            pieces.append(opening + '/>')
+            continue
+        pieces.append(opening + '>')
+        pending.append(('</' + node.name + '>',))
+        pending.extend(reversed(node.children))
+    return ''.join(pieces)
+
+
+def _convert_table(table_html, root, strings):
+    """process_table_safely on a parsed fragment."""
+    original_text = ' '.join(strings)
+
+    # If no content, return original
+    if not TOKEN_PATTERN.search(original_text):
+        return table_html
+
+    # Removing attributes leaves the text unchanged, so every number and
+    # token of the original is still there
+    cleaned_html = serialize_fragment(root, TABLE_REMOVABLE_ATTRIBUTES)
+    if len(cleaned_html) < len(table_html):
+        logging.info(f"Table size: {len(table_html)} → {len(cleaned_html)} chars ({len(cleaned_html)/len(table_html):.1%})")
+        return cleaned_html
+    return table_html
+
+
+def _convert_text_block(html_value, root, strings):
+    """The general HTML branch of extract_text_only_from_html on a parsed fragment."""
+    original_numbers = NUMBER_PATTERN.findall(html_value)
+    original_number_set = set(original_numbers)
+    original_token_set = set(TOKEN_PATTERN.findall(html_value))
+
+    # Really simple HTML with just text content
+    if html_value.count("<") < 5 and not original_number_set:
+        text = " ".join(string.strip() for string in strings if string.strip())
+        if set(TOKEN_PATTERN.findall(text)) == original_token_set:
+            return text
+
+    extracted_text = ' '.join(strings)
+    simplified_html = serialize_fragment(root, TEXT_REMOVABLE_ATTRIBUTES)
+
+    # If any numeric value is missing, return original
+    extracted_numbers = NUMBER_PATTERN.findall(extracted_text)
+    if original_number_set != set(extracted_numbers) or len(original_numbers) != len(extracted_numbers):
+        return html_value
+
+    # Allow at most 0.5% token loss (for non-numeric tokens only)
+    missing_tokens = original_token_set - set(TOKEN_PATTERN.findall(extracted_text))
+    if len(missing_tokens) > 0.005 * len(original_token_set):
+        return html_value
+
+    if len(extracted_text) < len(simplified_html) and len(extracted_text) < len(html_value):
+        return extracted_text
+    elif len(simplified_html) < len(html_value):
+        return simplified_html
+    return html_value
+
+
+def convert_fragment(html_value):
+    """
+    Convert an XBRL fact value, with the same result as extract_text_only_from_html
+
+    Args:
+        html_value: Value that might contain HTML formatting
+
+    Returns:
+        Text-only value with HTML/CSS removed but all data perfectly preserved
+    """
+    if not html_value or not isinstance(html_value, str):
+        return html_value
+    if '<' not in html_value or '>' not in html_value:
+        return html_value
+
+    parsed = parse_fragment(html_value)
+    if parsed is None:
+        return extract_text_only_from_html(html_value)
+    root, strings = parsed
+
+    # Numeric values wrapped in simple HTML
+    stripped = html_value.strip().replace('-', '').replace('.', '').replace(',', '').replace('$', '').replace('%', '')
+    if stripped.isdigit() or (stripped.startswith('(') and stripped.endswith(')') and stripped[1:-1].isdigit()):
+        text = ''.join(strings)
+        original_numbers = NUMBER_PATTERN.findall(html_value)
+        extracted_numbers = NUMBER_PATTERN.findall(text)
+        if set(original_numbers) == set(extracted_numbers) and len(original_numbers) == len(extracted_numbers):
+            return text
+        return html_value
+
+    if '<table' in html_value:
+        return _convert_table(html_value, root, strings)
+    return _convert_text_block(html_value, root, strings)
+
+
+def fragment_key(html_value):
+    """
+    Content hash of a fragment, covering the conversion version
+
+    Args:
+        html_value: HTML fragment
+
+    Returns:
+        Hex digest identifying the converted output
+    """
+    hasher = hashlib.sha256(html_value.encode('utf-8', 'surrogatepass'))
+    hasher.update(f"|v={FRAGMENT_CONVERSION_VERSION}".encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _needs_conversion(value):
+    """Whether a fact value can contain markup (other values come back unchanged)."""
+    return isinstance(value, str) and '<' in value and '>' in value
+
+
+class FragmentStore:
+    """
+    SQLite store of converted fragments, shared by filings and processes.
+
+    Entries are keyed by fragment_key; the least recently used ones are
+    evicted once the store holds more than max_entries.
+    """
+
+    def __init__(self, db_path, max_entries=50000):
+        """
+        Open (and create if needed) a fragment store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_entries: Maximum number of stored fragments
+        """
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS fragments ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, used_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """Get this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, keys):
+        """
+        Look up converted fragments.
+
+        Args:
+            keys: Fragment keys
+
+        Returns:
+            Dict of key to converted value for the keys that are stored
+        """
+        found = {}
+        keys = list(keys)
+        conn = self._connection()
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(
+                f"SELECT key, value FROM fragments WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def put_many(self, items, touched=()):
+        """
+        Store converted fragments and mark reused ones as recently used.
+
+        Args:
+            items: Dict of key to converted value
+            touched: Keys of stored fragments that were reused
+        """
+        if not items and not touched:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fragments (key, value, used_at) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()]
+            )
+            conn.executemany("UPDATE fragments SET used_at = ? WHERE key = ?", [(now, key) for key in touched])
+            if items:
+                # Evict the least recently used entries beyond the bound
+                conn.execute(
+                    "DELETE FROM fragments WHERE key IN (SELECT key FROM fragments "
+                    "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        """Remove all stored fragments."""
+        self._connection().execute("DELETE FROM fragments")
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class FragmentConverter:
+    """
+    Converts fact values with per-fragment memoization and optional parallelism.
+
+    Converted fragments are kept in an in-memory LRU map keyed by content hash,
+    backed by a FragmentStore for fragments large enough to be worth storing,
+    so repeated text blocks are converted once per run and once across runs.
+    """
+
+    def __init__(self, use_store=None, store_path=None, workers=None,
+                 memo_entries=None, min_stored_chars=None):
+        """
+        Initialize the converter.
+
+        Args:
+            use_store: Whether to use the persistent store (defaults to config)
+            store_path: Path to the store database (defaults to config, or a
+                file under the system temp directory)
+            workers: Default number of conversion processes for convert_many
+            memo_entries: Maximum number of fragments kept in memory
+            min_stored_chars: Smallest fragment (in characters) worth storing
+        """
+        config = XBRL_FRAGMENT_CONVERSION
+        self.workers = workers or config.get("workers", 1)
+        self.memo_entries = memo_entries or config.get("memo_entries", 4096)
+        self.min_stored_chars = min_stored_chars if min_stored_chars is not None else config.get("min_stored_chars", 512)
+        self.min_parallel_chars = config.get("min_parallel_chars", 2 * 1024 * 1024)
+        self.stats = {"converted": 0, "memo_hits": 0, "store_hits": 0}
+        self._memo = OrderedDict()
+
+        self.store = None
+        use_store = config.get("store_enabled", True) if use_store is None else use_store
+        if use_store:
+            store_path = store_path or config.get("store_path")
+            if not store_path:
+                store_path = Path(tempfile.gettempdir()) / "xbrl_fragment_cache" / "fragments.sqlite"
+            try:
+                self.store = FragmentStore(store_path, config.get("store_max_entries", 50000))
+            except Exception as e:
+                logging.warning(f"Could not open fragment store {store_path}: {str(e)}")
+
+    def _remember(self, key, value):
+        """Add a converted fragment to the in-memory LRU map."""
+        self._memo[key] = value
+        self._memo.move_to_end(key)
+        if len(self._memo) > self.memo_entries:
+            self._memo.popitem(last=False)
+
+    def convert(self, html_value):
+        """
+        Convert one fact value
+
+        Args:
+            html_value: Value that might contain HTML formatting
+
+        Returns:
+            Converted value (see convert_fragment)
+        """
+        return self.convert_many([html_value], workers=1)[0]
+
+    def convert_many(self, values, workers=None):
+        """
+        Convert a batch of fact values, each distinct fragment once
+
+        Args:
+            values: List of fact values
+            workers: Number of conversion processes (defaults to the converter
+                setting); small batches are always converted in process
+
+        Returns:
+            List of converted values, in the order of values
+        """
+        workers = workers or self.workers
+        results = list(values)
+
+        # Group the values that need conversion by content hash
+        positions = {}
+        fragments = {}
+        for index, value in enumerate(results):
+            if not _needs_conversion(value):
+                continue
+            key = fragment_key(value)
+            if key not in positions:
+                positions[key] = []
+                fragments[key] = value
+            positions[key].append(index)
+
+        converted = {}
+        for key in positions:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                converted[key] = self._memo[key]
+        self.stats["memo_hits"] += len(converted)
+
+        stored_keys = [key for key in positions if key not in converted and len(fragments[key]) >= self.min_stored_chars]
+        store_hits = {}
+        if self.store is not None and stored_keys:
+            try:
+                store_hits = self.store.get_many(stored_keys)
+            except Exception as e:
+                logging.warning(f"Could not read fragment store: {str(e)}")
+        converted.update(store_hits)
+        self.stats["store_hits"] += len(store_hits)
+
+        missing = [key for key in positions if key not in converted]
+        missing_chars = sum(len(fragments[key]) for key in missing)
+        if workers > 1 and len(missing) > 1 and missing_chars >= self.min_parallel_chars:
+            logging.info(f"Converting {len(missing)} fragments ({missing_chars // 1024} KB) with {workers} processes")
+            # Largest first, so one big table does not finish last
+            missing.sort(key=lambda key: len(fragments[key]), reverse=True)
+            with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+                outputs = executor.map(convert_fragment, [fragments[key] for key in missing], chunksize=4)
+                converted.update(zip(missing, outputs))
+        else:
+            for key in missing:
+                converted[key] = convert_fragment(fragments[key])
+        self.stats["converted"] += len(missing)
+
+        if self.store is not None:
+            new_items = {key: converted[key] for key in missing if len(fragments[key]) >= self.min_stored_chars}
+            try:
+                self.store.put_many(new_items, touched=store_hits.keys())
+            except Exception as e:
+                logging.warning(f"Could not write fragment store: {str(e)}")
+
+        for key, indexes in positions.items():
+            self._remember(key, converted[key])
+            for index in indexes:
+                results[index] = converted[key]
+        return results
+
+    def clear(self):
+        """Forget all memoized and stored fragments."""
+        self._memo.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+_default_converter = None
+
+
+def get_fragment_converter():
+    """
+    Get the process-wide converter, so the memo spans every filing of a run
+
+    Returns:
+        FragmentConverter configured from XBRL_FRAGMENT_CONVERSION
+    """
+    global _default_converter
+    if _default_converter is None:
+        _default_converter = FragmentConverter()
+    return _default_converter
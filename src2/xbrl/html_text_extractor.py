@@ -9,8 +9,36 @@ import requests
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from src.config import SEC_BASE_URL, USER_AGENT, PROCESSED_DATA_DIR
-from src.edgar.edgar_utils import sec_request
+from src2.config import SEC_BASE_URL, USER_AGENT, PROCESSED_DATA_DIR, HTML_TEXT_EXTRACTION
+from src2.edgar.edgar_utils import sec_request
+from src2.sec.section_segmenter import normalize_filing_type, segment_html
+from src2.xbrl.text_normalizer import normalize_text
+
+# Section headings searched for in filings other than 10-K and 10-Q
+GENERIC_SECTION_PATTERNS = [
+    (r'Financial\s+Statements', 'FINANCIAL_STATEMENTS'),
+    (r'Notes\s+to.*Financial\s+Statements', 'NOTES_TO_FINANCIAL_STATEMENTS'),
+    (r'Management.*Discussion.*Analysis', 'MANAGEMENT_DISCUSSION'),
+    (r'Risk\s+Factors', 'RISK_FACTORS'),
+    
+    # Common to all reports
+    (r'Consolidated Balance Sheets?', 'CONSOLIDATED_BALANCE_SHEET'),
+    (r'Consolidated Statements? of Operations', 'CONSOLIDATED_INCOME_STATEMENT'),
+    (r'Consolidated Statements? of Cash Flows?', 'CONSOLIDATED_CASH_FLOW'),
+    (r'Consolidated Statements? of Stockholders[\'\"]? Equity', 'CONSOLIDATED_EQUITY'),
+    (r'Consolidated Statements? of Comprehensive Income', 'CONSOLIDATED_COMPREHENSIVE_INCOME'),
+    
+    # Important subsections 
+    (r'Controls and Procedures', 'CONTROLS_AND_PROCEDURES'),
+    (r'Critical Accounting (Policies|Estimates)', 'CRITICAL_ACCOUNTING'),
+    (r'Forward[-\s]Looking Statements?', 'FORWARD_LOOKING'),
+    (r'Liquidity and Capital Resources', 'LIQUIDITY_AND_CAPITAL'),
+    (r'Results? of Operations', 'RESULTS_OF_OPERATIONS'),
+    (r'Significant Accounting Policies', 'SIGNIFICANT_ACCOUNTING_POLICIES')
+]
+
+# Elements that can hold those headings
+GENERIC_HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'strong', 'b', 'p', 'div']
 
 def get_html_filing_url(accession_number, cik):
     """
@@ -449,10 +477,33 @@ def fetch_filing_html(filing_metadata):
     return {"error": f"Failed to download HTML filing: {last_error} for all URLs"}
 
 
+def new_text_sections(source_url=None):
+    """
+    Create the dictionary that extracted text sections are stored in
+    
+    Args:
+        source_url: The URL or file path where the content was obtained
+        
+    Returns:
+        Dictionary with empty metadata, text and sections
+    """
+    return {
+        "metadata": {
+            "source_url": source_url,
+            "extraction_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "full_text": "",
+        "toc": "",
+        "document_sections": {}  # Initialize this to avoid KeyError
+    }
+
 def extract_clean_text(html_content, filing_type, source_url=None):
     """
     Extract clean text from HTML SEC filing with section markers
     
+    The parser is chosen by HTML_TEXT_EXTRACTION["engine"] in config: "lxml"
+    (see lxml_text_extractor) or "html.parser" (BeautifulSoup).
+    
     Args:
         html_content: HTML content of the filing
         filing_type: Type of filing (10-K, 10-Q)
@@ -461,6 +512,14 @@ def extract_clean_text(html_content, filing_type, source_url=None):
     Returns:
         Dictionary containing extracted text sections
     """
+    # The lxml engine gives the same sections with a much faster parser
+    if HTML_TEXT_EXTRACTION.get("engine") == "lxml":
+        from src2.xbrl import lxml_text_extractor
+        sections = lxml_text_extractor.extract_clean_text(html_content, filing_type, source_url)
+        if sections is not None:
+            return sections
+        logging.warning("lxml could not parse the HTML content, falling back to BeautifulSoup")
+    
     # Parse HTML content
     try:
         soup = BeautifulSoup(html_content, 'html.parser')
@@ -473,15 +532,8 @@ def extract_clean_text(html_content, filing_type, source_url=None):
         }
     
     # Create a dictionary to store extracted sections
-    sections = {
-        "metadata": {
-            "source_url": source_url,
-            "extraction_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        },
-        "full_text": "",
-        "toc": "",
-        "document_sections": {}  # Initialize this to avoid KeyError
-    }
+    sections = new_text_sections(source_url)
+    sections["metadata"]["parser_engine"] = "html.parser"
     
     # Check if this is an iXBRL viewer page
     is_ixbrl_viewer = False
@@ -491,79 +543,8 @@ def extract_clean_text(html_content, filing_type, source_url=None):
         logging.info(f"Detected iXBRL viewer wrapper page - content requires SEC website rendering")
         
     if is_ixbrl_viewer:
-        # Try to extract document path from the file itself
-        sec_viewer_url = None
-        doc_match = re.search(r'doc=(\/Archives\/edgar\/data\/[^"&]+)', html_content)
-        if doc_match:
-            actual_doc_path = doc_match.group(1)
-            sec_viewer_url = f"https://www.sec.gov/ix?doc={actual_doc_path}"
-        
-        # Try to build the URL from local file path
-        if not sec_viewer_url and source_url:
-            # Check if we can extract accession number and CIK from the path
-            acc_match = re.search(r'edgar_([^_]+)_.*?/([^/]+)\.htm', source_url)
-            # Try the Edgar temp directory pattern as well
-            if not acc_match:
-                acc_match = re.search(r'/edgar_([^_]+)_[^/]+/([^/]+)\.htm', source_url)
-            if acc_match:
-                ticker = acc_match.group(1)
-                filename = acc_match.group(2)
-                
-                # Look for a reference to this ticker's CIK in the HTML
-                cik_match = re.search(r'CIK=(\d+)|/data/(\d+)/', html_content)
-                if cik_match:
-                    cik = cik_match.group(1) or cik_match.group(2)
-                    # Remove leading zeros
-                    cik_no_zeros = cik.lstrip('0')
-                    
-                    # Try to find accession number
-                    accn_match = re.search(r'AccessionNumber=([^&"\s]+)|/(\d{10,})/', html_content)
-                    if accn_match:
-                        accn = accn_match.group(1) or accn_match.group(2)
-                        # Build URL
-                        sec_viewer_url = f"https://www.sec.gov/ix?doc=/Archives/edgar/data/{cik_no_zeros}/{accn}/{filename}.htm"
-        
-        # Add a special case for Microsoft since we know the exact URL
-        if not sec_viewer_url and "MSFT" in source_url:
-            # This is the known URL for Microsoft 2024 10-K
-            sec_viewer_url = "https://www.sec.gov/ix?doc=/Archives/edgar/data/789019/000095017024087843/msft-20240630.htm"
-            
-        # Build a diagnostic message for iXBRL files
-        ixbrl_diagnostic = f"""
-========== SEC iXBRL VIEWER DOCUMENT DETECTED ==========
-This filing uses SEC's inline XBRL (iXBRL) format with a dynamic viewer.
-The HTML file is only a wrapper that loads the actual content via JavaScript.
-
-File: {source_url}
-Content type: iXBRL Viewer Loader
-Size: {len(html_content)} bytes
-Date: {time.strftime("%Y-%m-%d %H:%M:%S")}
-
-To view this document properly:
-1. Visit the SEC website directly with this URL
-   {sec_viewer_url if sec_viewer_url else "https://www.sec.gov/ix?doc=/Archives/edgar/data/CIK/ACCESSION/FILENAME.htm"}
-2. Use the SEC's iXBRL viewer interface
-3. Consider implementing a headless browser solution to render JavaScript
-
-The text extraction is limited without JavaScript rendering.
-==========================================================
-"""
-        # Save the SEC viewer URL to metadata
-        if sec_viewer_url:
-            sections["metadata"]["sec_viewer_url"] = sec_viewer_url
-        sections["full_text"] = ixbrl_diagnostic
-        
-        # Try to extract at least some information from the page
         title = soup.find('title')
-        if title:
-            sections["metadata"]["title"] = title.text.strip()
-           
-        # Add debugging summary
-        sections["metadata"]["extraction_method"] = "ixbrl_viewer_detected"
-        sections["metadata"]["extraction_success"] = False
-        sections["metadata"]["requires_sec_website"] = True
-        
-        return sections
+        return ixbrl_viewer_sections(sections, html_content, source_url, title.text if title else None)
     
     # Extract metadata from various sources
     extract_document_metadata(soup, sections)
@@ -593,7 +574,9 @@ The text extraction is limited without JavaScript rendering.
         # Get the full text with section markers - safely handle missing document_sections
         if sections.get("document_sections"):
             try:
-                full_text_with_markers = get_text_with_section_markers(main_content, sections["document_sections"])
+                full_text_with_markers = get_text_with_section_markers(
+                    main_content, sections["document_sections"], sections.get("section_text")
+                )
                 sections["full_text"] = full_text_with_markers
             except Exception as e:
                 logging.error(f"Error generating text with section markers: {str(e)}")
@@ -603,6 +586,9 @@ The text extraction is limited without JavaScript rendering.
             # No sections found, just get clean text
             logging.info("No document sections identified, using clean text extraction")
             sections["full_text"] = clean_text(main_content.get_text())
+        
+        # The flattened text was only needed to place the section markers
+        sections.pop("section_text", None)
     else:
         # Last resort - use entire HTML
         logging.info("No main content identified, using entire HTML")
@@ -615,6 +601,111 @@ The text extraction is limited without JavaScript rendering.
     if "main_document_url" in sections.get("metadata", {}):
         sections["metadata"]["is_index_page"] = True
     
+    finish_text_sections(sections, html_content, source_url)
+    
+    # Add HTML structure analysis
+    add_html_structure(sections, (tag.name for tag in soup.find_all(True)))
+    
+    return sections
+
+def ixbrl_viewer_sections(sections, html_content, source_url, title=None):
+    """
+    Fill in the extraction result for an iXBRL viewer wrapper page
+    
+    Args:
+        sections: Dictionary of extracted text sections to populate
+        html_content: HTML content of the wrapper page
+        source_url: The URL or file path where the content was obtained
+        title: Text of the page's title element, if any
+        
+    Returns:
+        The sections dictionary
+    """
+    # Try to extract document path from the file itself
+    sec_viewer_url = None
+    doc_match = re.search(r'doc=(\/Archives\/edgar\/data\/[^"&]+)', html_content)
+    if doc_match:
+        actual_doc_path = doc_match.group(1)
+        sec_viewer_url = f"https://www.sec.gov/ix?doc={actual_doc_path}"
+    
+    # Try to build the URL from local file path
+    if not sec_viewer_url and source_url:
+        # Check if we can extract accession number and CIK from the path
+        acc_match = re.search(r'edgar_([^_]+)_.*?/([^/]+)\.htm', source_url)
+        # Try the Edgar temp directory pattern as well
+        if not acc_match:
+            acc_match = re.search(r'/edgar_([^_]+)_[^/]+/([^/]+)\.htm', source_url)
+        if acc_match:
+            ticker = acc_match.group(1)
+            filename = acc_match.group(2)
+            
+            # Look for a reference to this ticker's CIK in the HTML
+            cik_match = re.search(r'CIK=(\d+)|/data/(\d+)/', html_content)
+            if cik_match:
+                cik = cik_match.group(1) or cik_match.group(2)
+                # Remove leading zeros
+                cik_no_zeros = cik.lstrip('0')
+                
+                # Try to find accession number
+                accn_match = re.search(r'AccessionNumber=([^&"\s]+)|/(\d{10,})/', html_content)
+                if accn_match:
+                    accn = accn_match.group(1) or accn_match.group(2)
+                    # Build URL
+                    sec_viewer_url = f"https://www.sec.gov/ix?doc=/Archives/edgar/data/{cik_no_zeros}/{accn}/{filename}.htm"
+    
+    # Add a special case for Microsoft since we know the exact URL
+    if not sec_viewer_url and "MSFT" in source_url:
+        # This is the known URL for Microsoft 2024 10-K
+        sec_viewer_url = "https://www.sec.gov/ix?doc=/Archives/edgar/data/789019/000095017024087843/msft-20240630.htm"
+        
+    # Build a diagnostic message for iXBRL files
+    ixbrl_diagnostic = f"""
+========== SEC iXBRL VIEWER DOCUMENT DETECTED ==========
+This filing uses SEC's inline XBRL (iXBRL) format with a dynamic viewer.
+The HTML file is only a wrapper that loads the actual content via JavaScript.
+
+File: {source_url}
+Content type: iXBRL Viewer Loader
+Size: {len(html_content)} bytes
+Date: {time.strftime("%Y-%m-%d %H:%M:%S")}
+
+To view this document properly:
+1. Visit the SEC website directly with this URL
+   {sec_viewer_url if sec_viewer_url else "https://www.sec.gov/ix?doc=/Archives/edgar/data/CIK/ACCESSION/FILENAME.htm"}
+2. Use the SEC's iXBRL viewer interface
+3. Consider implementing a headless browser solution to render JavaScript
+
+The text extraction is limited without JavaScript rendering.
+==========================================================
+"""
+    # Save the SEC viewer URL to metadata
+    if sec_viewer_url:
+        sections["metadata"]["sec_viewer_url"] = sec_viewer_url
+    sections["full_text"] = ixbrl_diagnostic
+    
+    # Try to extract at least some information from the page
+    if title:
+        sections["metadata"]["title"] = title.strip()
+       
+    # Add debugging summary
+    sections["metadata"]["extraction_method"] = "ixbrl_viewer_detected"
+    sections["metadata"]["extraction_success"] = False
+    sections["metadata"]["requires_sec_website"] = True
+    
+    return sections
+
+def finish_text_sections(sections, html_content, source_url):
+    """
+    Add the extraction summary to extracted text sections
+    
+    Filters XBRL context identifiers from the start of the text, records the
+    extraction size and method, and prepends the technical summary.
+    
+    Args:
+        sections: Dictionary of extracted text sections
+        html_content: HTML content of the filing
+        source_url: The URL or file path where the content was obtained
+    """
     # Filter out any XBRL context identifiers at the beginning of content
     if sections["full_text"]:
         sections["full_text"] = filter_xbrl_identifiers(sections["full_text"])
@@ -648,18 +739,23 @@ Date: {time.strftime("%Y-%m-%d %H:%M:%S")}
         sections["full_text"] = debug_summary + sections["full_text"]
     else:
         sections["full_text"] = debug_summary + "No content was extracted from this document."
+
+def add_html_structure(sections, tag_names):
+    """
+    Add HTML structure analysis (tag counts and iXBRL markers) to the metadata
     
-    # Add HTML structure analysis
+    Args:
+        sections: Dictionary of extracted text sections
+        tag_names: Names of all tags in the document
+    """
     try:
         # Count tags to analyze document structure
         tag_counts = {}
-        for tag in soup.find_all(True):
-            tag_name = tag.name
+        for tag_name in tag_names:
             tag_counts[tag_name] = tag_counts.get(tag_name, 0) + 1
         
         # Sort by most common tags
         top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        tag_analysis = "\n".join([f"{tag}: {count}" for tag, count in top_tags])
         
         # Add to metadata
         sections["metadata"]["html_structure"] = {
@@ -669,13 +765,11 @@ Date: {time.strftime("%Y-%m-%d %H:%M:%S")}
         }
         
         # Check for iXBRL markers
-        has_ixbrl = any(tag.name.startswith('ix:') for tag in soup.find_all())
+        has_ixbrl = any(tag_name.startswith('ix:') for tag_name in tag_counts)
         sections["metadata"]["has_ixbrl_tags"] = has_ixbrl
         
     except Exception as e:
         logging.error(f"Error analyzing HTML structure: {str(e)}")
-    
-    return sections
 
 def extract_document_metadata(soup, sections):
     """
@@ -685,12 +779,28 @@ def extract_document_metadata(soup, sections):
         soup: BeautifulSoup object of the full HTML
         sections: Dictionary to populate with metadata
     """
-    # Try SEC header first
     sec_header = soup.find('sec-header')
-    if sec_header:
-        # Add SEC header metadata
-        header_text = sec_header.get_text()
-        
+    title = soup.find('title')
+    h1 = soup.find('h1')
+    fill_document_metadata(
+        sections,
+        header_text=sec_header.get_text() if sec_header else None,
+        title_text=title.text if title else None,
+        h1_text=h1.get_text() if h1 else None
+    )
+
+def fill_document_metadata(sections, header_text=None, title_text=None, h1_text=None):
+    """
+    Fill in document metadata from the text of the SEC header, title and first heading
+    
+    Args:
+        sections: Dictionary to populate with metadata
+        header_text: Text of the sec-header element, if any
+        title_text: Text of the title element, if any
+        h1_text: Text of the first h1 element, if any
+    """
+    # Try SEC header first
+    if header_text is not None:
         # Extract document type
         doc_type_match = re.search(r'CONFORMED SUBMISSION TYPE:\s*(\S+)', header_text)
         if doc_type_match:
@@ -713,15 +823,14 @@ def extract_document_metadata(soup, sections):
     
     # Try to find metadata in the title if not found in SEC header
     if "document_type" not in sections["metadata"]:
-        title = soup.find('title')
-        if title and title.text:
-            sections["metadata"]["title"] = title.text.strip()
+        if title_text:
+            sections["metadata"]["title"] = title_text.strip()
             
             # Try to extract document type and company from title
-            title_text = title.text.lower()
-            if "10-k" in title_text or "10k" in title_text or "annual report" in title_text:
+            lower_title = title_text.lower()
+            if "10-k" in lower_title or "10k" in lower_title or "annual report" in lower_title:
                 sections["metadata"]["document_type"] = "10-K"
-            elif "10-q" in title_text or "10q" in title_text or "quarterly report" in title_text:
+            elif "10-q" in lower_title or "10q" in lower_title or "quarterly report" in lower_title:
                 sections["metadata"]["document_type"] = "10-Q"
             
             # Try to extract company name from title
@@ -731,16 +840,15 @@ def extract_document_metadata(soup, sections):
             ]
             
             for pattern in company_patterns:
-                company_match = re.search(pattern, title.text)
+                company_match = re.search(pattern, title_text)
                 if company_match:
                     sections["metadata"]["company_name"] = company_match.group(1).strip()
                     break
     
     # Look for company name in first heading if not yet found
     if "company_name" not in sections["metadata"]:
-        h1 = soup.find('h1')
-        if h1:
-            sections["metadata"]["company_name"] = h1.get_text().strip()
+        if h1_text is not None:
+            sections["metadata"]["company_name"] = h1_text.strip()
 
 def find_main_content(soup):
     """
@@ -834,94 +942,38 @@ def identify_and_mark_sections(content, sections, filing_type):
     """
     Identify standard SEC filing sections and mark them in the document
     
+    10-K and 10-Q Items are found by the section segmenter in one pass over the
+    flattened content; the flattened text is kept in sections["section_text"]
+    so the section markers can be placed at the span offsets.
+    
     Args:
         content: BeautifulSoup object of the main content
         sections: Dictionary to populate with section info
         filing_type: Type of filing (10-K, 10-Q)
     """
-    # Define standard SEC item sections based on filing type
-    section_patterns = []
-    
-    if filing_type == "10-K":
-        section_patterns = [
-            (r'Item\s+1\.?\s*Business', 'ITEM_1_BUSINESS'),
-            (r'Item\s+1A\.?\s*Risk\s+Factors', 'ITEM_1A_RISK_FACTORS'),
-            (r'Item\s+1B\.?\s*Unresolved\s+Staff\s+Comments', 'ITEM_1B_UNRESOLVED_STAFF_COMMENTS'),
-            (r'Item\s+2\.?\s*Properties', 'ITEM_2_PROPERTIES'),
-            (r'Item\s+3\.?\s*Legal\s+Proceedings', 'ITEM_3_LEGAL_PROCEEDINGS'),
-            (r'Item\s+4\.?\s*Mine\s+Safety\s+Disclosures', 'ITEM_4_MINE_SAFETY_DISCLOSURES'),
-            (r'Item\s+5\.?\s*Market\s+for\s+Registrant', 'ITEM_5_MARKET'),
-            (r'Item\s+6\.?\s*Selected\s+Financial\s+Data', 'ITEM_6_SELECTED_FINANCIAL_DATA'),
-            (r'Item\s+7\.?\s*Management.*Discussion', 'ITEM_7_MD_AND_A'),
-            (r'Item\s+7A\.?\s*Quantitative\s+and\s+Qualitative', 'ITEM_7A_MARKET_RISK'),
-            (r'Item\s+8\.?\s*Financial\s+Statements', 'ITEM_8_FINANCIAL_STATEMENTS'),
-            (r'Item\s+9\.?\s*Changes\s+in\s+and\s+Disagreements', 'ITEM_9_DISAGREEMENTS'),
-            (r'Item\s+9A\.?\s*Controls\s+and\s+Procedures', 'ITEM_9A_CONTROLS'),
-            (r'Item\s+9B\.?\s*Other\s+Information', 'ITEM_9B_OTHER_INFORMATION'),
-            (r'Item\s+10\.?\s*Directors', 'ITEM_10_DIRECTORS'),
-            (r'Item\s+11\.?\s*Executive\s+Compensation', 'ITEM_11_EXECUTIVE_COMPENSATION'),
-            (r'Item\s+12\.?\s*Security\s+Ownership', 'ITEM_12_SECURITY_OWNERSHIP'),
-            (r'Item\s+13\.?\s*Certain\s+Relationships', 'ITEM_13_RELATIONSHIPS'),
-            (r'Item\s+14\.?\s*Principal\s+Accountant\s+Fees', 'ITEM_14_ACCOUNTANT_FEES'),
-            (r'Item\s+15\.?\s*Exhibits', 'ITEM_15_EXHIBITS')
-        ]
-    elif filing_type == "10-Q":
-        section_patterns = [
-            (r'Item\s+1\.?\s*Financial\s+Statements', 'ITEM_1_FINANCIAL_STATEMENTS'),
-            (r'Item\s+2\.?\s*Management.*Discussion', 'ITEM_2_MD_AND_A'),
-            (r'Item\s+3\.?\s*Quantitative\s+and\s+Qualitative', 'ITEM_3_MARKET_RISK'),
-            (r'Item\s+4\.?\s*Controls\s+and\s+Procedures', 'ITEM_4_CONTROLS'),
-            (r'Item\s+1\.?\s*Legal\s+Proceedings', 'ITEM_1_LEGAL_PROCEEDINGS'),
-            (r'Item\s+1A\.?\s*Risk\s+Factors', 'ITEM_1A_RISK_FACTORS'),
-            (r'Item\s+2\.?\s*Unregistered\s+Sales', 'ITEM_2_UNREGISTERED_SALES'),
-            (r'Item\s+3\.?\s*Defaults', 'ITEM_3_DEFAULTS'),
-            (r'Item\s+4\.?\s*Mine\s+Safety\s+Disclosures', 'ITEM_4_MINE_SAFETY'),
-            (r'Item\s+5\.?\s*Other\s+Information', 'ITEM_5_OTHER_INFORMATION'),
-            (r'Item\s+6\.?\s*Exhibits', 'ITEM_6_EXHIBITS'),
-            (r'Notes\s+to.*(Financial\s+Statements|Condensed)', 'NOTES_TO_FINANCIAL_STATEMENTS'),
-            (r'Management.*Discussion.*Analysis', 'MANAGEMENT_DISCUSSION'),
-            (r'Part\s+I\.?\s*Financial\s+Information', 'PART_I_FINANCIAL_INFORMATION'),
-            (r'Part\s+II\.?\s*Other\s+Information', 'PART_II_OTHER_INFORMATION')
-        ]
-    else:
-        # Generic patterns for other filing types
-        section_patterns = [
-            (r'Financial\s+Statements', 'FINANCIAL_STATEMENTS'),
-            (r'Notes\s+to.*Financial\s+Statements', 'NOTES_TO_FINANCIAL_STATEMENTS'),
-            (r'Management.*Discussion.*Analysis', 'MANAGEMENT_DISCUSSION'),
-            (r'Risk\s+Factors', 'RISK_FACTORS')
-        ]
+    # Initialize document_sections if not present
+    if "document_sections" not in sections:
+        sections["document_sections"] = {}
     
-    # Add more specific sections for better granularity
-    additional_patterns = [
-        # Common to all reports
-        (r'Consolidated Balance Sheets?', 'CONSOLIDATED_BALANCE_SHEET'),
-        (r'Consolidated Statements? of Operations', 'CONSOLIDATED_INCOME_STATEMENT'),
-        (r'Consolidated Statements? of Cash Flows?', 'CONSOLIDATED_CASH_FLOW'),
-        (r'Consolidated Statements? of Stockholders[\'\"]? Equity', 'CONSOLIDATED_EQUITY'),
-        (r'Consolidated Statements? of Comprehensive Income', 'CONSOLIDATED_COMPREHENSIVE_INCOME'),
-        
-        # Important subsections 
-        (r'Controls and Procedures', 'CONTROLS_AND_PROCEDURES'),
-        (r'Critical Accounting (Policies|Estimates)', 'CRITICAL_ACCOUNTING'),
-        (r'Forward[-\s]Looking Statements?', 'FORWARD_LOOKING'),
-        (r'Liquidity and Capital Resources', 'LIQUIDITY_AND_CAPITAL'),
-        (r'Results? of Operations', 'RESULTS_OF_OPERATIONS'),
-        (r'Significant Accounting Policies', 'SIGNIFICANT_ACCOUNTING_POLICIES')
-    ]
+    if normalize_filing_type(filing_type):
+        text, spans = segment_html(content, filing_type)
+        sections["section_text"] = text
+        sections["section_spans"] = [span.to_dict() for span in spans]
+        for span in spans:
+            sections["document_sections"][span.section_id] = {
+                "heading": span.heading,
+                "start": span.start,
+                "end": span.end
+            }
+        return
     
-    # Combine all patterns
-    section_patterns.extend(additional_patterns)
+    section_patterns = GENERIC_SECTION_PATTERNS
     
     # Find all headings
-    headings = content.find_all(['h1', 'h2', 'h3', 'h4', 'strong', 'b', 'p', 'div'], 
+    headings = content.find_all(GENERIC_HEADING_TAGS, 
                                string=lambda text: text and any(re.search(pattern, text, re.IGNORECASE) 
                                                               for pattern, _ in section_patterns))
     
-    # Initialize document_sections if not present
-    if "document_sections" not in sections:
-        sections["document_sections"] = {}
-    
     # Process each heading to extract section info
     for heading in headings:
         heading_text = heading.get_text().strip()
@@ -936,24 +988,45 @@ def identify_and_mark_sections(content, sections, filing_type):
                 }
                 break
 
-def get_text_with_section_markers(content, document_sections=None):
+def get_text_with_section_markers(content, document_sections=None, section_text=None):
     """
     Generate text with section markers from the content
     
     Args:
-        content: BeautifulSoup object of the main content
+        content: BeautifulSoup object (or lxml element) of the main content
         document_sections: Dictionary containing section info
+        section_text: Flattened text the section offsets refer to (from
+            identify_and_mark_sections); markers are then placed at the offsets
+            instead of searching for each heading
         
     Returns:
         String with the full text and section markers
     """
     import copy
     
-    # Create a copy of the content to avoid modifying the original
-    content_copy = copy.deepcopy(content)
+    # Section spans from the segmenter: insert markers at the span offsets
+    if (section_text is not None and document_sections
+            and all("start" in info for info in document_sections.values())):
+        pieces = []
+        position = 0
+        for section_id, info in sorted(document_sections.items(), key=lambda item: item[1]["start"]):
+            pieces.append(clean_text(section_text[position:info["start"]]))
+            pieces.append(f"\n\n@SECTION_START: {section_id}\n")
+            pieces.append(clean_text(section_text[info["start"]:info["end"]]))
+            pieces.append(f"\n@SECTION_END: {section_id}\n\n")
+            position = info["end"]
+        pieces.append(clean_text(section_text[position:]))
+        return "".join(pieces).strip()
     
     # Get base text first (we'll add markers manually as strings)
-    base_text = clean_text(content_copy.get_text())
+    if hasattr(content, "get_text"):
+        # Create a copy of the content to avoid modifying the original
+        content_copy = copy.deepcopy(content)
+        base_text = clean_text(content_copy.get_text())
+    else:
+        # lxml element (lxml text extraction engine)
+        from src2.xbrl.lxml_text_extractor import element_text
+        base_text = clean_text(element_text(content))
     
     # If no sections identified, just return the cleaned text
     if not document_sections:
@@ -1227,7 +1300,8 @@ def filter_xbrl_identifiers(text):
         Filtered text without XBRL context identifiers at the beginning
     """
     # Regular expression to detect XBRL context identifiers
-    xbrl_pattern = r'^((?:[a-z0-9:\-]+\s*)+)(?=UNITED STATES|FORM|[A-Z]{3,})'
+    # (a single character class, so a long run of identifiers cannot backtrack exponentially)
+    xbrl_pattern = r'^([a-z0-9:\-][a-z0-9:\-\s]*)(?=UNITED STATES|FORM|[A-Z]{3,})'
     
     # Check if the text starts with XBRL identifiers
     match = re.search(xbrl_pattern, text, re.MULTILINE | re.DOTALL)
@@ -1241,6 +1315,9 @@ def filter_xbrl_identifiers(text):
 def clean_text(text):
     """
     Clean and normalize extracted text
+
+    Uses the fused normalizer, which gives the same output as the previous
+    multi-pass cleanup (text_normalizer.clean_text_multipass).
     
     Args:
         text: Raw text extracted from HTML
@@ -1248,34 +1325,7 @@ def clean_text(text):
     Returns:
         Cleaned text
     """
-    if not text:
-        return ""
-    
-    # Remove excessive whitespace (but preserve paragraph breaks)
-    text = re.sub(r'([^\n])\s+([^\n])', r'\1 \2', text)
-    
-    # Remove repeated newlines (more than 2)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # Remove non-breaking spaces and other common whitespace characters
-    text = text.replace('\xa0', ' ')
-    
-    # Remove page numbers and headers/footers (common in SEC filings)
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
-    text = re.sub(r'\n\s*Page\s+\d+\s+of\s+\d+\s*\n', '\n', text, flags=re.IGNORECASE)
-    
-    # Remove "Continued..." markers
-    text = re.sub(r'\(Continued.*?\)', '', text)
-    text = re.sub(r'\n\s*Continued.*?\n', '\n', text, flags=re.IGNORECASE)
-    
-    # Fix hyphenation artifacts (words broken across lines)
-    # Only fix hyphenation for clear word breaks, not compound words or legitimate hyphens
-    text = re.sub(r'([a-z])-\s+([a-z])', r'\1\2', text)
-    
-    # Remove any HTML tags that might have been missed
-    text = re.sub(r'<[^>]+>', '', text)
-    
-    return text.strip()
+    return normalize_text(text)
 
 def save_text_file(text_content, filing_metadata):
     """
@@ -0,0 +1,353 @@
+# src2/xbrl/lxml_text_extractor.py
+"""
+lxml HTML Text Extraction Engine
+
+Alternative engine for extract_clean_text that works on an lxml.html tree
+instead of a BeautifulSoup 'html.parser' tree. Parsing with libxml2 is
+several times faster on SEC-size documents, and the traversals (flattening,
+text collection) are iterative, so deeply nested or unclosed markup cannot
+hit the recursion limit.
+
+The extraction steps mirror html_text_extractor: metadata, main content,
+table of contents, sections (the section segmenter for 10-K and 10-Q, the
+generic heading search otherwise) and the full text with section markers.
+Text is collected with BeautifulSoup's whitespace handling, so both engines
+produce the same sections and text. Index pages are small, so they are handed
+to the BeautifulSoup index page handler.
+
+The engine is selected with HTML_TEXT_EXTRACTION["engine"] in config.
+"""
+
+import os
+import re
+import sys
+import logging
+
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src2.sec.section_segmenter import ASCII_SPACES, normalize_filing_type
+from src2.xbrl.html_text_extractor import (
+    GENERIC_SECTION_PATTERNS, GENERIC_HEADING_TAGS,
+    new_text_sections, ixbrl_viewer_sections, fill_document_metadata,
+    identify_and_mark_sections as identify_segmented_sections,
+    get_text_with_section_markers, handle_index_page, finish_text_sections,
+    add_html_structure, clean_text
+)
+
+TOC_PATTERN = re.compile(r'TABLE\s+OF\s+CONTENTS', re.IGNORECASE)
+TOC_SUMMARY_PATTERN = re.compile(r'Table\s+of\s+Contents', re.IGNORECASE)
+TOC_CLASS_PATTERN = re.compile(r'toc|index', re.IGNORECASE)
+VIEWER_PATTERN = re.compile(r'loadViewer\(.*ixviewer')
+BODY_TAG_PATTERN = re.compile(r'<body[\s>]', re.IGNORECASE)
+HEAD_TAG_PATTERN = re.compile(r'<head[\s>]', re.IGNORECASE)
+
+INDEX_TABLE_CLASSES = ('tableFile', 'tableFile2')
+INDEX_TABLE_SUMMARIES = ('Document Format Files', 'Data Files')
+
+
+def parse_html(html_content):
+    """
+    Parse an HTML document with lxml
+
+    Args:
+        html_content: HTML content (str or bytes)
+
+    Returns:
+        Root lxml element, or None if the document cannot be parsed
+    """
+    # lxml refuses str input with an XML encoding declaration, which inline
+    # XBRL documents start with, so parse the UTF-8 bytes
+    data = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+    parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, huge_tree=True)
+    try:
+        return lxml.html.document_fromstring(data, parser=parser)
+    except (etree.ParserError, ValueError) as e:
+        logging.warning(f"lxml could not parse HTML content: {str(e)}")
+        return None
+
+
+def _string(value):
+    """A text node as BeautifulSoup stores it (whitespace-only strings are reduced)."""
+    if not value.strip(ASCII_SPACES):
+        return "\n" if "\n" in value else " "
+    return value
+
+
+def element_text(element):
+    """
+    Text of an element, as BeautifulSoup's get_text() returns it
+
+    Args:
+        element: lxml element
+
+    Returns:
+        Concatenated text of the element and its descendants
+    """
+    return "".join(_string(value) for value in element.itertext())
+
+
+def element_string(element):
+    """
+    The single string of an element, as BeautifulSoup's .string returns it
+
+    Args:
+        element: lxml element
+
+    Returns:
+        The string if the element holds exactly one string (directly or through
+        a chain of single children), otherwise None
+    """
+    while True:
+        if len(element) == 0:
+            return _string(element.text) if element.text else None
+        if element.text or len(element) != 1 or element[0].tail:
+            return None
+        element = element[0]
+
+
+def find_main_content(root, has_body=True):
+    """
+    Find the main content of the document using multiple approaches
+
+    Args:
+        root: Root lxml element of the full HTML
+        has_body: Whether the source has a body tag (lxml always adds one)
+
+    Returns:
+        lxml element of the main content
+    """
+    # Approach 1: Look for the document content in a standard structure
+    document = root.find('.//document')
+    if document is not None:
+        html_doc = document.find('.//html')
+        if html_doc is not None:
+            body = html_doc.find('.//body')
+            if body is not None:
+                logging.info("Found content using approach 1: document > html > body")
+                return body
+
+    # Approach 2: Look for div with main content - often in SEC index pages
+    main_content = root.find('.//div[@id="main-content"]')
+    if main_content is not None:
+        logging.info("Found content using approach 2: div with id='main-content'")
+        return main_content
+
+    # Approach 3: Look for typical SEC content div
+    for div in root.iter('div'):
+        if 'formGrouping' in (div.get('class') or '').split():
+            logging.info("Found content using approach 3: div with class='formGrouping'")
+            return div
+
+    # Approach 4: Standard HTML body
+    body = root.find('body')
+    if has_body and body is not None:
+        logging.info("Found content using approach 4: body tag")
+        return body
+
+    # If all else fails, return the entire document
+    logging.info("No main content container found, using entire document")
+    return root
+
+
+def _first(elements):
+    """First element of an iterable, or None."""
+    return next(iter(elements), None)
+
+
+def extract_table_of_contents(content):
+    """
+    Extract table of contents if present
+
+    Args:
+        content: lxml element of the main content
+
+    Returns:
+        String containing the table of contents or empty string
+    """
+    # Look for typical TOC patterns, in the same order as the BeautifulSoup engine
+    toc_candidates = [
+        _first(el for el in content.iterdescendants(tag) if TOC_PATTERN.search(element_string(el) or ''))
+        for tag in ('div', 'h2', 'h3')
+    ]
+    toc_candidates.append(_first(
+        table for table in content.iterdescendants('table')
+        if TOC_SUMMARY_PATTERN.search(table.get('summary') or '')
+    ))
+
+    # Filter out None values
+    toc_candidates = [c for c in toc_candidates if c is not None]
+    if not toc_candidates:
+        return ""
+
+    toc_element = toc_candidates[0]
+    toc_table = None
+
+    # If the element itself is a table
+    if toc_element.tag == 'table':
+        toc_table = toc_element
+    else:
+        # Look for next table or div (descendants come before following elements)
+        next_table = _first(toc_element.xpath('(descendant::table | following::table)[1]'))
+        next_div = _first(
+            div for div in toc_element.xpath('descendant::div[@class] | following::div[@class]')
+            if TOC_CLASS_PATTERN.search(div.get('class'))
+        )
+
+        if next_table is not None and (next_div is None or next_table.sourceline < next_div.sourceline):
+            toc_table = next_table
+        elif next_div is not None:
+            toc_table = next_div
+
+    if toc_table is not None:
+        return "@TABLE_OF_CONTENTS\n" + clean_text(element_text(toc_table))
+    return ""
+
+
+def identify_and_mark_sections(content, sections, filing_type):
+    """
+    Identify standard SEC filing sections in lxml content
+
+    10-K and 10-Q Items come from the section segmenter, exactly as in the
+    BeautifulSoup engine; other filings use the generic heading search.
+
+    Args:
+        content: lxml element of the main content
+        sections: Dictionary to populate with section info
+        filing_type: Type of filing (10-K, 10-Q)
+    """
+    if normalize_filing_type(filing_type):
+        identify_segmented_sections(content, sections, filing_type)
+        return
+
+    if "document_sections" not in sections:
+        sections["document_sections"] = {}
+
+    for heading in content.iterdescendants(*GENERIC_HEADING_TAGS):
+        string = element_string(heading)
+        if not string or not any(re.search(pattern, string, re.IGNORECASE) for pattern, _ in GENERIC_SECTION_PATTERNS):
+            continue
+
+        heading_text = element_text(heading).strip()
+        for pattern, section_id in GENERIC_SECTION_PATTERNS:
+            if re.search(pattern, heading_text, re.IGNORECASE):
+                sections["document_sections"][section_id] = {
+                    "heading": heading_text,
+                    "element": heading
+                }
+                break
+
+
+def _looks_like_index_page(root, html_content, sections):
+    """The index page checks of handle_index_page, on the lxml tree."""
+    title = sections.get("metadata", {}).get("title", "").lower()
+    if "index" in title or "filing documents" in title:
+        return True
+    for table in root.iter('table'):
+        if set((table.get('class') or '').split()) & set(INDEX_TABLE_CLASSES):
+            return True
+        if table.get('summary') in INDEX_TABLE_SUMMARIES:
+            return True
+    return "EDGAR Filing Documents" in html_content
+
+
+def extract_clean_text(html_content, filing_type, source_url=None):
+    """
+    Extract clean text from HTML SEC filing with section markers using lxml
+
+    Args:
+        html_content: HTML content of the filing
+        filing_type: Type of filing (10-K, 10-Q)
+        source_url: The URL or file path where the content was obtained (for debugging)
+
+    Returns:
+        Dictionary containing extracted text sections, or None if lxml cannot
+        parse the content (the caller then falls back to BeautifulSoup)
+    """
+    root = parse_html(html_content)
+    if root is None:
+        return None
+
+    sections = new_text_sections(source_url)
+    sections["metadata"]["parser_engine"] = "lxml"
+
+    # Check if this is an iXBRL viewer page
+    if 'loadViewer' in html_content and any(
+            script.text and VIEWER_PATTERN.search(script.text) for script in root.iter('script')):
+        sections["metadata"]["document_type"] = "iXBRL Viewer"
+        logging.info("Detected iXBRL viewer wrapper page - content requires SEC website rendering")
+        title = root.find('.//title')
+        return ixbrl_viewer_sections(
+            sections, html_content, source_url, element_text(title) if title is not None else None
+        )
+
+    # Extract metadata from various sources
+    sec_header = root.find('.//sec-header')
+    title = root.find('.//title')
+    h1 = root.find('.//h1')
+    fill_document_metadata(
+        sections,
+        header_text=element_text(sec_header) if sec_header is not None else None,
+        title_text=element_text(title) if title is not None else None,
+        h1_text=element_text(h1) if h1 is not None else None
+    )
+
+    # Add debug info about the document content
+    has_body = bool(BODY_TAG_PATTERN.search(html_content))
+    sections["metadata"]["content_size_bytes"] = len(html_content)
+    sections["metadata"]["has_body"] = has_body
+    sections["metadata"]["has_tables"] = sum(1 for _ in root.iter('table'))
+
+    # Without a body the whole document is the content; libxml2 moves title and
+    # meta elements into a head the source did not have, so undo that
+    if not has_body and not HEAD_TAG_PATTERN.search(html_content):
+        head = root.find('head')
+        if head is not None:
+            head.drop_tag()
+
+    # Find the main document content
+    main_content = find_main_content(root, has_body)
+    sections["metadata"]["main_content_approach"] = "found"
+
+    # Clean up content - remove scripts, styles but keep structure
+    etree.strip_elements(main_content, 'script', 'style', with_tail=False)
+
+    # Extract the table of contents if present
+    toc = extract_table_of_contents(main_content)
+    if toc:
+        sections["toc"] = toc
+
+    # Identify and mark standard SEC document sections
+    identify_and_mark_sections(main_content, sections, filing_type)
+
+    # Get the full text with section markers
+    if sections.get("document_sections"):
+        try:
+            sections["full_text"] = get_text_with_section_markers(
+                main_content, sections["document_sections"], sections.get("section_text")
+            )
+        except Exception as e:
+            logging.error(f"Error generating text with section markers: {str(e)}")
+            sections["full_text"] = clean_text(element_text(main_content))
+    else:
+        logging.info("No document sections identified, using clean text extraction")
+        sections["full_text"] = clean_text(element_text(main_content))
+
+    # The flattened text was only needed to place the section markers
+    sections.pop("section_text", None)
+
+    # Index pages are small; let the BeautifulSoup handler find the main document link
+    if _looks_like_index_page(root, html_content, sections):
+        handle_index_page(BeautifulSoup(html_content, 'html.parser'), sections, filing_type)
+        if "main_document_url" in sections.get("metadata", {}):
+            sections["metadata"]["is_index_page"] = True
+
+    finish_text_sections(sections, html_content, source_url)
+
+    # Add HTML structure analysis
+    add_html_structure(sections, (element.tag for element in root.iter() if isinstance(element.tag, str)))
+
+    return sections
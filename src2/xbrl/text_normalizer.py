@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Fused Text Normalizer
+
+Single-pass replacement for the multi-pass clean_text normalization of text
+extracted from SEC filings. The multi-pass version (kept below as
+clean_text_multipass for golden-output comparisons) runs ten regular
+expression and replace passes over the whole document; the first one, which
+collapses whitespace, tries a match at every character and accounts for
+almost all of the time.
+
+normalize_text does the whitespace collapse with a small state machine over
+the whitespace runs. A single space comes out unchanged whatever the state,
+so only the other runs (found with two plain character scans) are visited;
+the state of each is recovered by walking back over the chain of one
+character tokens before it, which reproduces the non-overlapping match
+quirks of the regular expression exactly (a one character token can be
+consumed as the right-hand side of the previous match, which leaves the
+following run untouched). Collapsing repeated newlines and non-breaking
+spaces is folded into the same walk, as they can only occur in the runs
+that survive. The remaining page number, "Continued" marker, hyphenation and
+leftover tag passes are only run when the text contains the characters they
+need, and hyphenation uses a pattern anchored on the hyphen with a fallback
+to the original pattern for chained matches.
+The output is identical to clean_text_multipass.
+"""
+
+import re
+
+# Whitespace characters matched by \s other than the space, spelled out so
+# the scan for them can use a plain character set, and runs of spaces
+OTHER_WHITESPACE = re.compile('[\t\n\x0b\x0c\r\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]')
+SPACE_RUN = re.compile('  +')
+
+REPEATED_NEWLINES = re.compile(r'\n{3,}')
+PAGE_NUMBER_LINE = re.compile(r'\n\s*\d+\s*\n')
+PAGE_OF_LINE = re.compile(r'\n\s*Page\s+\d+\s+of\s+\d+\s*\n', re.IGNORECASE)
+CONTINUED_MARKER = re.compile(r'\(Continued.*?\)')
+CONTINUED_LINE = re.compile(r'\n\s*Continued.*?\n', re.IGNORECASE)
+HTML_TAG = re.compile(r'<[^>]+>')
+
+# Hyphenation: the original pattern consumes the letters on both sides of the
+# break, so a letter shared by two breaks ("a- b- c") only joins once
+HYPHENATION = re.compile(r'([a-z])-\s+([a-z])')
+HYPHEN_BREAK = re.compile(r'-(?<=[a-z]-)\s+(?=[a-z])')
+CHAINED_HYPHEN_BREAK = re.compile(r'-(?<=[a-z]-)\s+[a-z]-\s+[a-z]')
+
+
+def clean_text_multipass(text):
+    """
+    Multi-pass text normalization (reference implementation of normalize_text)
+
+    Args:
+        text: Raw text extracted from HTML
+
+    Returns:
+        Cleaned text
+    """
+    if not text:
+        return ""
+
+    # Remove excessive whitespace (but preserve paragraph breaks)
+    text = re.sub(r'([^\n])\s+([^\n])', r'\1 \2', text)
+
+    # Remove repeated newlines (more than 2)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    # Remove non-breaking spaces and other common whitespace characters
+    text = text.replace('\xa0', ' ')
+
+    # Remove page numbers and headers/footers (common in SEC filings)
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    text = re.sub(r'\n\s*Page\s+\d+\s+of\s+\d+\s*\n', '\n', text, flags=re.IGNORECASE)
+
+    # Remove "Continued..." markers
+    text = re.sub(r'\(Continued.*?\)', '', text)
+    text = re.sub(r'\n\s*Continued.*?\n', '\n', text, flags=re.IGNORECASE)
+
+    # Fix hyphenation artifacts (words broken across lines)
+    # Only fix hyphenation for clear word breaks, not compound words or legitimate hyphens
+    text = re.sub(r'([a-z])-\s+([a-z])', r'\1\2', text)
+
+    # Remove any HTML tags that might have been missed
+    text = re.sub(r'<[^>]+>', '', text)
+
+    return text.strip()
+
+
+def _collapse_run(run, anchored, trailing):
+    """
+    Collapse one whitespace run as the multi-pass whitespace substitution does.
+
+    Args:
+        run: The whitespace run
+        anchored: True if the character before the run can start a match (it
+            was not consumed by the previous match and is not the text start)
+        trailing: True if the run ends the text (nothing follows it)
+
+    Returns:
+        Tuple of (collapsed run, whether the character after the run was consumed)
+    """
+    # At the end of the text the right-hand side backtracks to the last
+    # character of the run that is not a newline
+    last = len(run.rstrip('\n')) - 1
+
+    if anchored:
+        if not trailing:
+            return ' ', True
+        if last >= 1:
+            return ' ' + run[last:], True
+        return run, False
+
+    # Otherwise the match has to start inside the run, at its first character
+    # that is not a newline and has more whitespace after it
+    for position in range(len(run) - 1):
+        if run[position] == '\n':
+            continue
+        if not trailing:
+            return run[:position + 1] + ' ', True
+        if last >= position + 2:
+            return run[:position + 1] + ' ' + run[last:], True
+        return run, False
+    return run, False
+
+
+def _run_is_anchored(text, start, known):
+    """
+    Whether the character before the whitespace run at start can start a match.
+
+    It cannot if it is a one character token consumed by the match over the
+    previous run, which depends on that run in turn, so walk back over the
+    chain of one character tokens and replay it forward.
+
+    Args:
+        text: The text being normalized
+        start: Start offset of the run
+        known: Dictionary of run start offset to anchored state, filled in as
+            runs are resolved so chains are only walked once
+
+    Returns:
+        True if the run is anchored
+    """
+    chain = []
+    position = start
+    anchored = False
+    while position > 0:
+        # Tokens longer than one character (or at the text start) are never consumed
+        if position == 1 or not text[position - 2].isspace():
+            anchored = True
+            break
+        run_end = position - 1
+        run_start = run_end - 1
+        while run_start > 0 and text[run_start - 1].isspace():
+            run_start -= 1
+        chain.append(text[run_start:run_end])
+        if run_start in known:
+            anchored = known[run_start]
+            break
+        position = run_start
+
+    for run in reversed(chain):
+        _, consumed = _collapse_run(run, anchored, False)
+        anchored = not consumed
+
+    known[start] = anchored
+    return anchored
+
+
+def _complex_runs(text):
+    """
+    Find the whitespace runs other than a single space.
+
+    Args:
+        text: The text being normalized
+
+    Returns:
+        Sorted list of (start, end) offsets of maximal whitespace runs
+    """
+    seeds = [match.start() for match in OTHER_WHITESPACE.finditer(text)]
+    seeds.extend(match.start() for match in SPACE_RUN.finditer(text))
+    seeds.sort()
+
+    runs = []
+    length = len(text)
+    end = -1
+    for seed in seeds:
+        if seed < end:
+            continue
+        start = seed
+        while start > 0 and text[start - 1].isspace():
+            start -= 1
+        end = seed + 1
+        while end < length and text[end].isspace():
+            end += 1
+        runs.append((start, end))
+    return runs
+
+
+def _collapse_whitespace(text):
+    """
+    Collapse whitespace runs exactly as re.sub(r'([^\\n])\\s+([^\\n])', r'\\1 \\2')
+    does, then collapse repeated newlines and replace non-breaking spaces.
+
+    Single space runs come out unchanged whatever the state, so only the other
+    runs are visited.
+    """
+    pieces = []
+    position = 0
+    known = {}
+    length = len(text)
+
+    for start, end in _complex_runs(text):
+        run, _ = _collapse_run(text[start:end], _run_is_anchored(text, start, known), end == length)
+        if run != ' ':
+            if '\n\n\n' in run:
+                run = REPEATED_NEWLINES.sub('\n\n', run)
+            run = run.replace('\xa0', ' ')
+        pieces.append(text[position:start])
+        pieces.append(run)
+        position = end
+
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+def normalize_text(text):
+    """
+    Clean and normalize extracted text in a single fused pass
+
+    Produces the same output as clean_text_multipass.
+
+    Args:
+        text: Raw text extracted from HTML
+
+    Returns:
+        Cleaned text
+    """
+    if not text:
+        return ""
+
+    text = _collapse_whitespace(text)
+
+    # Page numbers, headers/footers and "Continued" lines all start with a newline
+    if '\n' in text:
+        text = PAGE_NUMBER_LINE.sub('\n', text)
+        text = PAGE_OF_LINE.sub('\n', text)
+    if '(Continued' in text:
+        text = CONTINUED_MARKER.sub('', text)
+    if '\n' in text:
+        text = CONTINUED_LINE.sub('\n', text)
+
+    if '-' in text:
+        if CHAINED_HYPHEN_BREAK.search(text):
+            text = HYPHENATION.sub(r'\1\2', text)
+        else:
+            text = HYPHEN_BREAK.sub('', text)
+
+    if '<' in text:
+        text = HTML_TAG.sub('', text)
+
+    return text.strip()
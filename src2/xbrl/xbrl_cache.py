@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Compact Binary XBRL Cache
+
+This module stores parsed XBRL data (contexts, units and facts) in a compact
+binary format so filings can be reformatted without re-parsing the source HTML.
+
+File layout (all integers little-endian):
+- Header: magic, format version, string count, string blob size, fact count
+- String table: offsets into a UTF-8 blob; every string (concept names, context
+  and unit refs, values, dictionary keys) is stored once and referenced by id
+- Fact index: offset of each encoded fact, for random access
+- Data: the encoded non-fact data (contexts, units, metadata) followed by the facts
+
+Files are read through mmap and facts are decoded lazily, so loading a cache
+only touches the bytes that are actually used.
+"""
+
+import os
+import mmap
+import struct
+import logging
+import hashlib
+from pathlib import Path
+
+MAGIC = b"NXBC"
+FORMAT_VERSION = 1
+
+# Version of the extracted fact fields (2 added the inline XBRL sign);
+# cached facts of other versions are extracted again
+FACTS_VERSION = 2
+
+# File name used next to downloaded filings
+CACHE_FILENAME = "_xbrl_raw.nxbc"
+
+# Source of the fact extraction; cached facts record its hash, so a change to
+# the extractor code extracts them again without a FACTS_VERSION bump
+EXTRACTOR_SOURCE = Path(__file__).resolve().parent / "xbrl_facts_extractor.py"
+
+_HEADER = struct.Struct("<4sHHIII")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+_extractor_fingerprint = None
+
+# Value tags
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_LIST = 6
+_DICT = 7
+_BIGINT = 8
+
+
+class XBRLCacheError(Exception):
+    """Raised when a cache file is missing, corrupt or of an unknown version."""
+    pass
+
+
+class _Encoder:
+    """Encode JSON-like values with an interned string table."""
+
+    def __init__(self):
+        self.string_ids = {}
+        self.strings = []
+
+    def intern(self, text):
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.string_ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def encode(self, value, out):
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            if -(1 << 63) <= value < (1 << 63):
+                out.append(_INT)
+                out += _I64.pack(value)
+            else:
+                out.append(_BIGINT)
+                out += _U32.pack(self.intern(str(value)))
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, str):
+            out.append(_STR)
+            out += _U32.pack(self.intern(value))
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            out += _U32.pack(len(value))
+            for key, item in value.items():
+                out += _U32.pack(self.intern(str(key)))
+                self.encode(item, out)
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self.encode(item, out)
+        else:
+            # Dates, paths and other scalars are stored as their string form
+            out.append(_STR)
+            out += _U32.pack(self.intern(str(value)))
+
+
+def write_xbrl_cache(path, xbrl_data, metadata=None):
+    """
+    Write parsed XBRL data to a binary cache file.
+
+    Args:
+        path: Output file path
+        xbrl_data: Parsed XBRL data ("facts" list plus contexts, units, etc.)
+        metadata: Optional JSON-like metadata stored alongside the data
+
+    Returns:
+        Size of the written file in bytes
+    """
+    encoder = _Encoder()
+
+    # Everything except the facts goes into one leading record
+    rest = {
+        "xbrl": {key: value for key, value in xbrl_data.items() if key != "facts"},
+        "metadata": metadata
+    }
+    data = bytearray()
+    encoder.encode(rest, data)
+
+    # Facts are encoded one by one so they can be decoded individually
+    facts = xbrl_data.get("facts", [])
+    fact_offsets = []
+    for fact in facts:
+        fact_offsets.append(len(data))
+        encoder.encode(fact, data)
+    fact_offsets.append(len(data))
+
+    # Build the string table
+    string_offsets = bytearray()
+    blob = bytearray()
+    for text in encoder.strings:
+        string_offsets += _U32.pack(len(blob))
+        blob += text.encode("utf-8", "surrogatepass")
+    string_offsets += _U32.pack(len(blob))
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(encoder.strings), len(blob), len(facts))
+    fact_index = b"".join(_U32.pack(offset) for offset in fact_offsets)
+
+    # Write atomically so concurrent readers never map a partial file
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(string_offsets)
+        f.write(blob)
+        f.write(fact_index)
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    return os.path.getsize(path)
+
+
+class XBRLCacheReader:
+    """
+    Read a binary XBRL cache file.
+
+    Facts are decoded lazily on access; strings are decoded once and shared,
+    so repeated concept names and context refs are the same Python objects.
+    """
+
+    def __init__(self, path, use_mmap=True):
+        """
+        Open a cache file.
+
+        Args:
+            path: Path to the cache file
+            use_mmap: Map the file into memory instead of reading it
+        """
+        self.path = Path(path)
+        self._file = None
+        self._mmap = None
+
+        try:
+            if use_mmap:
+                self._file = open(self.path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._buf = self._mmap
+            else:
+                with open(self.path, 'rb') as f:
+                    self._buf = f.read()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise XBRLCacheError(f"Cannot open XBRL cache {self.path}: {str(e)}")
+
+        if len(self._buf) < _HEADER.size:
+            self.close()
+            raise XBRLCacheError(f"XBRL cache is truncated: {self.path}")
+
+        magic, version, _, n_strings, blob_size, n_facts = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise XBRLCacheError(f"Unsupported XBRL cache format in {self.path}")
+
+        self._n_strings = n_strings
+        self._n_facts = n_facts
+        self._string_offsets_pos = _HEADER.size
+        self._blob_pos = self._string_offsets_pos + (n_strings + 1) * _U32.size
+        self._fact_index_pos = self._blob_pos + blob_size
+        self._data_pos = self._fact_index_pos + (n_facts + 1) * _U32.size
+        self._strings = [None] * n_strings
+
+        if len(self._buf) < self._data_pos:
+            self.close()
+            raise XBRLCacheError(f"XBRL cache is truncated: {self.path}")
+
+        self._rest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the file mapping."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _string(self, string_id):
+        text = self._strings[string_id]
+        if text is None:
+            pos = self._string_offsets_pos + string_id * _U32.size
+            start = _U32.unpack_from(self._buf, pos)[0]
+            end = _U32.unpack_from(self._buf, pos + _U32.size)[0]
+            text = self._buf[self._blob_pos + start:self._blob_pos + end].decode("utf-8", "surrogatepass")
+            self._strings[string_id] = text
+        return text
+
+    def _decode(self, pos):
+        """Decode the value at pos; returns (value, next_pos)."""
+        buf = self._buf
+        tag = buf[pos]
+        pos += 1
+
+        if tag == _STR:
+            return self._string(_U32.unpack_from(buf, pos)[0]), pos + 4
+        if tag == _DICT:
+            count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            result = {}
+            for _ in range(count):
+                key = self._string(_U32.unpack_from(buf, pos)[0])
+                result[key], pos = self._decode(pos + 4)
+            return result, pos
+        if tag == _LIST:
+            count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            result = []
+            for _ in range(count):
+                item, pos = self._decode(pos)
+                result.append(item)
+            return result, pos
+        if tag == _NONE:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _INT:
+            return _I64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _FLOAT:
+            return _F64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _BIGINT:
+            return int(self._string(_U32.unpack_from(buf, pos)[0])), pos + 4
+
+        raise XBRLCacheError(f"Corrupt XBRL cache {self.path}: unknown tag {tag}")
+
+    def _get_rest(self):
+        if self._rest is None:
+            self._rest, _ = self._decode(self._data_pos)
+        return self._rest
+
+    @property
+    def xbrl(self):
+        """Non-fact XBRL data (contexts, units and any other top-level keys)."""
+        return self._get_rest().get("xbrl") or {}
+
+    @property
+    def contexts(self):
+        return self.xbrl.get("contexts", {})
+
+    @property
+    def units(self):
+        return self.xbrl.get("units", {})
+
+    @property
+    def metadata(self):
+        return self._get_rest().get("metadata")
+
+    def __len__(self):
+        return self._n_facts
+
+    def fact(self, index):
+        """
+        Decode a single fact.
+
+        Args:
+            index: Fact index
+
+        Returns:
+            Fact dictionary
+        """
+        if index < 0:
+            index += self._n_facts
+        if not 0 <= index < self._n_facts:
+            raise IndexError("fact index out of range")
+
+        offset = _U32.unpack_from(self._buf, self._fact_index_pos + index * _U32.size)[0]
+        value, _ = self._decode(self._data_pos + offset)
+        return value
+
+    def iter_facts(self):
+        """Iterate over all facts in order."""
+        for index in range(self._n_facts):
+            yield self.fact(index)
+
+    def to_xbrl_data(self):
+        """
+        Materialize the full parsed XBRL data.
+
+        Returns:
+            Dictionary in the same shape that was written (including "facts")
+        """
+        xbrl_data = dict(self.xbrl)
+        xbrl_data["facts"] = list(self.iter_facts())
+        return xbrl_data
+
+
+def read_xbrl_cache(path, use_mmap=True):
+    """
+    Read a binary XBRL cache file completely.
+
+    Args:
+        path: Path to the cache file
+        use_mmap: Map the file into memory instead of reading it
+
+    Returns:
+        Tuple of (xbrl_data, metadata)
+    """
+    with XBRLCacheReader(path, use_mmap=use_mmap) as reader:
+        return reader.to_xbrl_data(), reader.metadata
+
+
+def hash_source_file(path):
+    """
+    Compute the SHA-256 hash of a source document.
+
+    Args:
+        path: Path to the source document
+
+    Returns:
+        Hex digest of the file content
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_extractor_fingerprint():
+    """
+    Get the hash of the fact extraction code, computed once per process.
+
+    Returns:
+        Hex digest of xbrl_facts_extractor.py (empty if it cannot be read)
+    """
+    global _extractor_fingerprint
+    if _extractor_fingerprint is None:
+        try:
+            _extractor_fingerprint = hash_source_file(EXTRACTOR_SOURCE)
+        except OSError as e:
+            logging.warning(f"Could not hash fact extractor {EXTRACTOR_SOURCE}: {str(e)}")
+            _extractor_fingerprint = ""
+    return _extractor_fingerprint
+
+
+def load_cached_facts(cache_path, source_path):
+    """
+    Load extracted facts from a cache file if it matches the source document
+    and the current fact extractor code.
+
+    Args:
+        cache_path: Path to the cache file
+        source_path: Path to the HTML document the facts were extracted from
+
+    Returns:
+        List of facts, or None if there is no valid cache for the document
+    """
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with XBRLCacheReader(cache_path) as reader:
+            metadata = reader.metadata or {}
+            if metadata.get("source_sha256") != hash_source_file(source_path):
+                logging.info(f"XBRL cache {cache_path} is stale, source document changed")
+                return None
+            if metadata.get("facts_version") != FACTS_VERSION:
+                logging.info(f"XBRL cache {cache_path} is stale, extracted fact fields changed")
+                return None
+            if not get_extractor_fingerprint() or metadata.get("extractor_sha256") != get_extractor_fingerprint():
+                logging.info(f"XBRL cache {cache_path} is stale, fact extractor code changed")
+                return None
+            return list(reader.iter_facts())
+    except (XBRLCacheError, OSError) as e:
+        logging.warning(f"Could not read XBRL cache {cache_path}: {str(e)}")
+        return None
+
+
+def save_cached_facts(cache_path, source_path, facts):
+    """
+    Save extracted facts to a cache file tied to the source document and the
+    fact extractor code.
+
+    Args:
+        cache_path: Path to the cache file
+        source_path: Path to the HTML document the facts were extracted from
+        facts: List of fact dictionaries
+
+    Returns:
+        Size of the written file in bytes, or 0 if it could not be written
+    """
+    try:
+        return write_xbrl_cache(
+            cache_path,
+            {"facts": facts},
+            metadata={
+                "source_sha256": hash_source_file(source_path),
+                "facts_version": FACTS_VERSION,
+                "extractor_sha256": get_extractor_fingerprint()
+            }
+        )
+    except Exception as e:
+        logging.warning(f"Could not write XBRL cache {cache_path}: {str(e)}")
+        return 0
@@ -45,6 +45,7 @@ def extract_facts_from_html(html_path, output_json_path=None):
         decimals = element.get('decimals')
         scale = element.get('scale')
         format = element.get('format')
+        sign = element.get('sign')
         
         # For inline XBRL, get the concept name from the name attribute
         concept = element.get('name')
@@ -61,6 +62,7 @@ def extract_facts_from_html(html_path, output_json_path=None):
             'decimals': decimals,
             'scale': scale,
             'format': format,
+            'sign': sign,
             'value': value
         }
         
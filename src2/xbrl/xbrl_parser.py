@@ -630,9 +630,8 @@ def parse_xbrl_file(file_path, ticker=None, filing_metadata=None):
                         # Only process elements that have a context
                         if context_ref:
                             # Extract and clean value
+                            # HTML is cleaned from all fact values once extraction is done
                             value = element.text.strip() if element.text else ""
-                            # Clean HTML from value if present
-                            value = extract_text_only_from_html(value)
                             
                             # Create fact
                             fact = {
@@ -678,11 +677,10 @@ def parse_xbrl_file(file_path, ticker=None, filing_metadata=None):
                             continue
                         
                         # Extract and clean the value
+                        # HTML is cleaned from all fact values once extraction is done
                         value = ""
                         if element.text:
                             value = element.text.strip()
-                            # Clean HTML from value if present
-                            value = extract_text_only_from_html(value)
                         
                         # Create fact object
                         fact = {
@@ -730,9 +728,8 @@ def parse_xbrl_file(file_path, ticker=None, filing_metadata=None):
                         continue
                     
                     # Extract and clean value
+                    # HTML is cleaned from all fact values once extraction is done
                     value = element.text.strip() if element.text else ""
-                    # Clean HTML from value if present
-                    value = extract_text_only_from_html(value)
                     
                     # Create a fact with limited metadata
                     fact = {
@@ -750,6 +747,19 @@ def parse_xbrl_file(file_path, ticker=None, filing_metadata=None):
             except Exception as e:
                 logging.error(f"Error in aggressive fact extraction: {str(e)}")
         
+        # Clean HTML from fact values, converting each distinct fragment once
+        if facts:
+            try:
+                from .html_fragment_converter import get_fragment_converter
+                from src2.sec.instrumentation import span
+                with span("fragment_conversion", facts=len(facts)):
+                    values = get_fragment_converter().convert_many([fact["value"] for fact in facts])
+            except Exception as e:
+                logging.warning(f"Fragment conversion engine failed, cleaning values one by one: {str(e)}")
+                values = [extract_text_only_from_html(fact["value"]) for fact in facts]
+            for fact, value in zip(facts, values):
+                fact["value"] = value
+        
         logging.info(f"Processed {facts_count} elements, found {len(facts)} facts")
         logging.info(f"XBRL parsing complete for {file_path}")
         
@@ -11,9 +11,18 @@ import json
 import logging
 import os
 import re
+import glob
 from pathlib import Path
 from decimal import Decimal, InvalidOperation
 
+from src2.formatter.fact_table import read_fact_table
+from src2.formatter.text_block_store import rehydrate_llm_file
+
+DEFAULT_DOWNLOADS_DIR = os.path.join("sec_processed", "tmp", "sec_downloads")
+
+# Saved LLM file names: ticker and filing type
+LLM_FILE_NAME_PATTERN = re.compile(r'^([A-Z0-9.]+)_(.+?)_\d{4}(?:_(?:Q[1-4]|FY))?_llm\.txt$')
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -64,6 +73,24 @@ def parse_llm_concepts(llm_content):
     logging.info(f"Parsed {len(concepts)} @CONCEPT blocks from LLM file.")
     return concepts
 
+def parse_llm_fact_table(llm_content):
+    """Parse the fact table of a compact llm.txt file into @CONCEPT block dictionaries (None if there is none)."""
+    fact_table = read_fact_table(llm_content)
+    if fact_table is None:
+        return None
+
+    concepts = [
+        {
+            "CONCEPT": fact["concept"],
+            "VALUE": fact["value"],
+            "CONTEXT_REF": fact["context_ref"],
+            "UNIT_REF": fact["unit_ref"]
+        }
+        for fact in fact_table["facts"].values()
+    ]
+    logging.info(f"Parsed {len(concepts)} facts from the @FACT_TABLE of the LLM file.")
+    return concepts
+
 def compare_values(raw_value, llm_value):
     """Compare two values, handling numeric types with tolerance."""
     # Basic string comparison
@@ -87,112 +114,68 @@ def compare_values(raw_value, llm_value):
         
     return False
 
-def main():
-    parser = argparse.ArgumentParser(description="Verify LLM file completeness against raw XBRL JSON.")
-    parser.add_argument("--temp-dir", help="Path to the temporary directory containing _xbrl_raw.json")
-    parser.add_argument("--xbrl-file", help="Direct path to the XBRL JSON file")
-    parser.add_argument("--llm-file", required=True, help="Path to the final llm.txt file")
-    parser.add_argument("--downloads-dir", help="Path to the downloads directory (e.g., sec_processed/tmp/sec_downloads)")
-    
-    args = parser.parse_args()
-    
-    # Extract ticker and filing info from LLM filename
-    llm_file_path = Path(args.llm_file)
-    llm_basename = os.path.basename(args.llm_file)
-    ticker = None
-    filing_type = None
-    
-    # Try to extract ticker and filing type from filename (e.g., MSFT_10-K_2024_llm.txt)
-    import re
-    file_match = re.match(r'([A-Z]+)_(\d+-[A-Z])_.*', llm_basename)
-    if file_match:
-        ticker = file_match.group(1)
-        filing_type = file_match.group(2)
-        logging.info(f"Extracted ticker={ticker}, filing_type={filing_type} from filename")
-    
-    # Determine the XBRL file path
-    raw_json_path = None
-    
-    # First try the specified XBRL file path if provided
-    if args.xbrl_file:
-        raw_json_path = Path(os.path.abspath(args.xbrl_file))
-        
-    # Then try the specified temp directory if provided
-    elif args.temp_dir:
-        raw_json_path = Path(os.path.abspath(args.temp_dir)) / "_xbrl_raw.json"
-        
-    # Then try to find XBRL file in downloads directory based on ticker and filing type
-    elif args.downloads_dir and ticker and filing_type:
-        downloads_base = os.path.abspath(args.downloads_dir)
-        filing_dir = os.path.join(downloads_base, ticker, filing_type)
-        
-        if os.path.exists(filing_dir):
-            # Find the most recent accession directory that has an XBRL file
-            accession_dirs = []
-            for entry in os.listdir(filing_dir):
-                potential_dir = os.path.join(filing_dir, entry)
-                potential_xbrl = os.path.join(potential_dir, "_xbrl_raw.json")
-                if os.path.isdir(potential_dir) and os.path.exists(potential_xbrl):
-                    accession_dirs.append((potential_dir, os.path.getmtime(potential_xbrl)))
-            
-            # Sort by modification time (latest first)
-            if accession_dirs:
-                accession_dirs.sort(key=lambda x: x[1], reverse=True)
-                raw_json_path = Path(os.path.join(accession_dirs[0][0], "_xbrl_raw.json"))
-                logging.info(f"Found XBRL file in downloads directory: {raw_json_path}")
-    
-    # If we still don't have a path, look for it in the standard downloads location
-    if not raw_json_path and ticker and filing_type:
-        # Try the standard downloads location
-        std_downloads = os.path.join("sec_processed", "tmp", "sec_downloads", ticker, filing_type)
-        if os.path.exists(std_downloads):
-            # Find the most recent accession directory that has an XBRL file
-            accession_dirs = []
-            for entry in os.listdir(std_downloads):
-                potential_dir = os.path.join(std_downloads, entry)
-                potential_xbrl = os.path.join(potential_dir, "_xbrl_raw.json")
-                if os.path.isdir(potential_dir) and os.path.exists(potential_xbrl):
-                    accession_dirs.append((potential_dir, os.path.getmtime(potential_xbrl)))
-            
-            # Sort by modification time (latest first)
-            if accession_dirs:
-                accession_dirs.sort(key=lambda x: x[1], reverse=True)
-                raw_json_path = Path(os.path.join(accession_dirs[0][0], "_xbrl_raw.json"))
-                logging.info(f"Found XBRL file in standard downloads directory: {raw_json_path}")
-    
-    if not raw_json_path:
-        logging.error("Could not determine XBRL file path. Provide --xbrl-file, --temp-dir, or --downloads-dir")
-        return 1
-    
-    # Check if files exist
-    if not raw_json_path.exists():
-        logging.error(f"Raw XBRL JSON file not found: {raw_json_path}")
-        return 1
-        
-    if not llm_file_path.exists():
-        logging.error(f"LLM file not found: {llm_file_path}")
-        return 1
-    
-    # Load raw XBRL data
-    try:
-        with open(raw_json_path, 'r', encoding='utf-8') as f:
-            raw_xbrl_facts = json.load(f)
-        logging.info(f"Loaded {len(raw_xbrl_facts)} facts from {raw_json_path}")
-    except Exception as e:
-        logging.error(f"Error loading raw XBRL JSON: {e}")
-        return 1
-    
-    # Load LLM file content
-    try:
-        with open(llm_file_path, 'r', encoding='utf-8') as f:
-            llm_content = f.read()
-        logging.info(f"Loaded LLM file: {llm_file_path}")
-    except Exception as e:
-        logging.error(f"Error reading LLM file: {e}")
-        return 1
-    
-    # Parse LLM concepts
-    llm_concepts = parse_llm_concepts(llm_content)
+def llm_filing_date(llm_content):
+    """Filing date of an LLM file (its @FILING_DATE line, None if there is none)."""
+    date_match = re.search(r'^@FILING_DATE: (\S+)', llm_content, re.MULTILINE)
+    return date_match.group(1) if date_match else None
+
+def index_downloads(downloads_dir, ticker="*", filing_type="*"):
+    """
+    Index the downloads that have a raw XBRL JSON by company and filing type.
+
+    Args:
+        downloads_dir: Downloads directory (<ticker>/<filing type>/<accession>/)
+        ticker: Company ticker (default: every company)
+        filing_type: Filing type (default: every filing type)
+
+    Returns:
+        Dict of (ticker, filing type) to the sorted (filing date, raw JSON path)
+        of the downloads, from their filing_info.json
+    """
+    downloads = {}
+    for info_path in glob.glob(os.path.join(downloads_dir, ticker, filing_type, "*", "filing_info.json")):
+        raw_path = os.path.join(os.path.dirname(info_path), "_xbrl_raw.json")
+        if not os.path.exists(raw_path):
+            continue
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                filing_date = json.load(f).get("filing_date")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read {info_path}: {str(e)}")
+            continue
+        key = tuple(info_path.split(os.sep)[-4:-2])
+        downloads.setdefault(key, []).append((filing_date, raw_path))
+    return {key: sorted(candidates) for key, candidates in downloads.items()}
+
+def match_raw_json(candidates, filing_date):
+    """Raw JSON path of the download filed on the LLM file's filing date (None if there is none)."""
+    for candidate_date, raw_path in candidates:
+        if filing_date and candidate_date == filing_date:
+            return raw_path
+    return None
+
+def find_raw_json(downloads_dir, ticker, filing_type, filing_date):
+    """_xbrl_raw.json of a company's download of a filing type filed on a date (None if there is none)."""
+    candidates = index_downloads(downloads_dir, ticker, filing_type).get((ticker, filing_type), [])
+    raw_path = match_raw_json(candidates, filing_date)
+    return Path(raw_path) if raw_path else None
+
+def verify_completeness(raw_xbrl_facts, llm_content):
+    """
+    Compare the raw XBRL facts of a filing with its LLM file.
+
+    Args:
+        raw_xbrl_facts: Facts of the _xbrl_raw.json file
+        llm_content: Content of the LLM file
+
+    Returns:
+        Dict with the fact counts, the matched, missing, mismatched and extra
+        facts, the concept names of each side and the completeness percentages
+    """
+    # Parse LLM concepts (fact table of compact files, @CONCEPT blocks otherwise)
+    llm_concepts = parse_llm_fact_table(llm_content)
+    if llm_concepts is None:
+        llm_concepts = parse_llm_concepts(llm_content)
     
     # Create dictionary of raw facts keyed by (name, contextRef, unitRef)
     raw_facts_dict = {}
@@ -200,17 +183,18 @@ def main():
         key = (
             fact.get('name', ''),
             fact.get('contextRef', ''),
-            fact.get('unitRef', '')
+            fact.get('unitRef') or ''
         )
         if key[0]:  # Skip entries with empty concept names
             raw_facts_dict[key] = fact.get('value', '')
     
     # Create dictionary of LLM concepts keyed by (concept, context_ref, unit_ref)
+    # (context refs are written with their label: "c-1|@CONTEXT: FY2024")
     llm_concepts_dict = {}
     for concept in llm_concepts:
         key = (
             concept.get('CONCEPT', ''),
-            concept.get('CONTEXT_REF', ''),
+            concept.get('CONTEXT_REF', '').split('|@CONTEXT:')[0].strip(),
             concept.get('UNIT_REF', '')
         )
         if key[0]:  # Skip entries with empty concept names
@@ -253,21 +237,9 @@ def main():
     still_missing = []
     
     # Create concept-name-only dictionaries
-    raw_name_only = {}
-    for key, value in raw_facts_dict.items():
-        concept_name = key[0]
-        if concept_name in raw_name_only:
-            raw_name_only[concept_name].append(value)
-        else:
-            raw_name_only[concept_name] = [value]
-    
     llm_name_only = {}
     for key, value in llm_concepts_dict.items():
-        concept_name = key[0]
-        if concept_name in llm_name_only:
-            llm_name_only[concept_name].append(value)
-        else:
-            llm_name_only[concept_name] = [value]
+        llm_name_only.setdefault(key[0], []).append(value)
     
     # Check if missing facts exist by concept name only
     for fact in missing_facts:
@@ -294,6 +266,97 @@ def main():
     
     # Including name-only matches
     adjusted_completeness = ((matched_count + name_only_matched) / total_raw_facts * 100) if total_raw_facts > 0 else 0
+
+    return {
+        "total_raw_facts": total_raw_facts,
+        "total_llm_concepts": len(llm_concepts_dict),
+        "matched": matched_count,
+        "name_only_matched": name_only_matched,
+        "missing_facts": missing_facts,
+        "still_missing": still_missing,
+        "value_mismatches": value_mismatches,
+        "extra_facts": extra_facts,
+        "raw_concept_names": set(key[0] for key in raw_facts_dict.keys()),
+        "llm_concept_names": set(key[0] for key in llm_concepts_dict.keys()),
+        "completeness": completeness_pct,
+        "adjusted_completeness": adjusted_completeness
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify LLM file completeness against raw XBRL JSON.")
+    parser.add_argument("--temp-dir", help="Path to the temporary directory containing _xbrl_raw.json")
+    parser.add_argument("--xbrl-file", help="Direct path to the XBRL JSON file")
+    parser.add_argument("--llm-file", required=True, help="Path to the final llm.txt file")
+    parser.add_argument("--downloads-dir", help=f"Path to the downloads directory (default: {DEFAULT_DOWNLOADS_DIR})")
+    
+    args = parser.parse_args()
+    
+    llm_file_path = Path(args.llm_file)
+    if not llm_file_path.exists():
+        logging.error(f"LLM file not found: {llm_file_path}")
+        return 1
+
+    # Load LLM file content (with text blocks of the text block store put back)
+    try:
+        llm_content = rehydrate_llm_file(llm_file_path)
+        logging.info(f"Loaded LLM file: {llm_file_path}")
+    except Exception as e:
+        logging.error(f"Error reading LLM file: {e}")
+        return 1
+
+    # Determine the XBRL file path
+    raw_json_path = None
+    
+    # First try the specified XBRL file path if provided
+    if args.xbrl_file:
+        raw_json_path = Path(os.path.abspath(args.xbrl_file))
+        
+    # Then try the specified temp directory if provided
+    elif args.temp_dir:
+        raw_json_path = Path(os.path.abspath(args.temp_dir)) / "_xbrl_raw.json"
+        
+    # Otherwise find the download of the same filing (ticker and filing type from
+    # the file name, e.g. MSFT_10-K_2024_llm.txt, and the filing date of the file)
+    else:
+        file_match = LLM_FILE_NAME_PATTERN.match(llm_file_path.name)
+        filing_date = llm_filing_date(llm_content)
+        if not file_match or not filing_date:
+            logging.error("Could not determine the filing of the LLM file. Provide --xbrl-file or --temp-dir")
+            return 1
+        ticker, filing_type = file_match.groups()
+        downloads_dir = args.downloads_dir or DEFAULT_DOWNLOADS_DIR
+        logging.info(f"Looking for the {ticker} {filing_type} filed {filing_date} in {downloads_dir}")
+        raw_json_path = find_raw_json(downloads_dir, ticker, filing_type, filing_date)
+        if not raw_json_path:
+            logging.error(f"No download of {ticker} {filing_type} filed {filing_date} in {downloads_dir}. "
+                          f"Provide --xbrl-file, --temp-dir, or --downloads-dir")
+            return 1
+        logging.info(f"Found XBRL file in downloads directory: {raw_json_path}")
+    
+    # Check if the file exists
+    if not raw_json_path.exists():
+        logging.error(f"Raw XBRL JSON file not found: {raw_json_path}")
+        return 1
+    
+    # Load raw XBRL data
+    try:
+        with open(raw_json_path, 'r', encoding='utf-8') as f:
+            raw_xbrl_facts = json.load(f)
+        logging.info(f"Loaded {len(raw_xbrl_facts)} facts from {raw_json_path}")
+    except Exception as e:
+        logging.error(f"Error loading raw XBRL JSON: {e}")
+        return 1
+    
+    result = verify_completeness(raw_xbrl_facts, llm_content)
+    total_raw_facts = result["total_raw_facts"]
+    matched_count = result["matched"]
+    name_only_matched = result["name_only_matched"]
+    missing_facts = result["missing_facts"]
+    still_missing = result["still_missing"]
+    value_mismatches = result["value_mismatches"]
+    extra_facts = result["extra_facts"]
+    completeness_pct = result["completeness"]
+    adjusted_completeness = result["adjusted_completeness"]
     
     # Print results
     print("\n=== Verification Results ===")
@@ -301,7 +364,7 @@ def main():
     print(f"LLM File: {llm_file_path}")
     print("-" * 40)
     print(f"Total Raw XBRL Facts: {total_raw_facts}")
-    print(f"Total LLM Concepts: {len(llm_concepts_dict)}")
+    print(f"Total LLM Concepts: {result['total_llm_concepts']}")
     print(f"Facts Matched (Exact): {matched_count}")
     print(f"Facts Matched (By Name Only): {name_only_matched}")
     print(f"Facts Missing in LLM: {len(missing_facts)}")
@@ -340,8 +403,8 @@ def main():
             print(f"  {name} [Context: {context}, Unit: {unit}] = {fact['llm_value']}")
     
     # Summary of unique concept names in each source
-    raw_concept_names = set(key[0] for key in raw_facts_dict.keys())
-    llm_concept_names = set(key[0] for key in llm_concepts_dict.keys())
+    raw_concept_names = result["raw_concept_names"]
+    llm_concept_names = result["llm_concept_names"]
     
     print("\n=== Concept Name Coverage ===")
     print(f"Unique Concept Names in Raw: {len(raw_concept_names)}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Verify LLM Completeness of the Corpus
+
+Runs the completeness check of verify_llm_completeness.py on every saved LLM
+file of the processed data directory, in a process pool. The downloads are
+indexed once, and each LLM file is compared with the raw XBRL JSON of its own
+filing (same ticker, filing type and filing date), rather than the most
+recently written download of its filing type. Files written with the text
+block store are checked with the stored text put back.
+
+Per-filing results are appended to the CSV report as they complete; the JSON
+report holds all results with a summary and timing. --changed-since limits
+the run to LLM files modified after a date or after a file (e.g. the previous
+report) was written.
+
+Exits with status 1 if any filing is below the threshold or could not be verified.
+"""
+
+import os
+import csv
+import glob
+import json
+import time
+import logging
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src2.formatter.text_block_store import rehydrate_llm_file
+from verify_llm_completeness import (
+    DEFAULT_DOWNLOADS_DIR, LLM_FILE_NAME_PATTERN, index_downloads, llm_filing_date, match_raw_json, verify_completeness
+)
+
+DEFAULT_PROCESSED_DIR = "sec_processed"
+DEFAULT_REPORT = os.path.join("sec_processed", "llm_completeness_report")
+
+CSV_COLUMNS = [
+    "llm_file", "raw_json", "ticker", "filing_type", "filing_date", "status",
+    "total_raw_facts", "total_llm_concepts", "matched", "name_only_matched", "missing",
+    "still_missing", "value_mismatches", "extra_facts", "completeness", "adjusted_completeness",
+    "seconds", "error"
+]
+
+# Facts listed per filing in the JSON report
+SAMPLE_SIZE = 5
+
+
+def _quiet_logging():
+    """Keep per-file parsing logs out of the corpus run."""
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def discover_filings(processed_dir, downloads_dir):
+    """
+    Find the saved LLM files and the downloads they can be checked against
+
+    Args:
+        processed_dir: Processed data directory (<ticker>/*_llm.txt)
+        downloads_dir: Downloads directory (<ticker>/<filing type>/<accession>/)
+
+    Returns:
+        List of (LLM file, ticker, filing type, candidates) tuples, candidates
+        being the (filing date, raw JSON path) of the company's downloads of
+        that filing type
+    """
+    downloads = index_downloads(downloads_dir)
+    filings = []
+    for llm_path in sorted(glob.glob(os.path.join(processed_dir, "*", "*_llm.txt"))):
+        match = LLM_FILE_NAME_PATTERN.match(os.path.basename(llm_path))
+        if not match:
+            continue
+        ticker, filing_type = match.groups()
+        filings.append((llm_path, ticker, filing_type, downloads.get((ticker, filing_type), [])))
+    return filings
+
+
+def verify_filing(llm_path, ticker, filing_type, candidates, threshold):
+    """
+    Check one LLM file against the raw XBRL JSON of its filing
+
+    Args:
+        llm_path: Path to the LLM file
+        ticker: Company ticker
+        filing_type: Filing type
+        candidates: (filing date, raw JSON path) of the company's downloads
+        threshold: Lowest passing completeness (name-only matches included)
+
+    Returns:
+        Result dictionary (CSV_COLUMNS, plus samples of missing and mismatched facts)
+    """
+    start = time.perf_counter()
+    result = {"llm_file": llm_path, "raw_json": None, "ticker": ticker, "filing_type": filing_type,
+              "filing_date": None, "status": "error", "error": None}
+    try:
+        llm_content = rehydrate_llm_file(llm_path)
+        result["filing_date"] = llm_filing_date(llm_content)
+
+        raw_path = match_raw_json(candidates, result["filing_date"])
+        if not raw_path:
+            result["status"] = "no_raw"
+            result["error"] = f"No download of {ticker} {filing_type} filed {result['filing_date']}"
+            return result
+        result["raw_json"] = raw_path
+        with open(raw_path, 'r', encoding='utf-8') as f:
+            raw_xbrl_facts = json.load(f)
+
+        check = verify_completeness(raw_xbrl_facts, llm_content)
+        result.update({
+            "status": "passed" if check["adjusted_completeness"] >= threshold else "failed",
+            "total_raw_facts": check["total_raw_facts"],
+            "total_llm_concepts": check["total_llm_concepts"],
+            "matched": check["matched"],
+            "name_only_matched": check["name_only_matched"],
+            "missing": len(check["missing_facts"]),
+            "still_missing": len(check["still_missing"]),
+            "value_mismatches": len(check["value_mismatches"]),
+            "extra_facts": len(check["extra_facts"]),
+            "completeness": round(check["completeness"], 4),
+            "adjusted_completeness": round(check["adjusted_completeness"], 4),
+            "samples": {
+                "still_missing": [list(fact["key"]) + [fact["raw_value"]] for fact in check["still_missing"][:SAMPLE_SIZE]],
+                "value_mismatches": [list(fact["key"]) + [fact["raw_value"], fact["llm_value"]]
+                                     for fact in check["value_mismatches"][:SAMPLE_SIZE]]
+            }
+        })
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def parse_changed_since(value):
+    """
+    Cutoff time of --changed-since
+
+    Args:
+        value: ISO date or date-time, or the path of a file whose modification time is used
+
+    Returns:
+        POSIX timestamp
+    """
+    if os.path.exists(value):
+        return os.path.getmtime(value)
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a date, date-time or existing file: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the completeness of every saved LLM file")
+    parser.add_argument("--processed-dir", default=DEFAULT_PROCESSED_DIR, help=f"Processed data directory (default: {DEFAULT_PROCESSED_DIR})")
+    parser.add_argument("--downloads-dir", default=DEFAULT_DOWNLOADS_DIR, help=f"Downloads directory (default: {DEFAULT_DOWNLOADS_DIR})")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help=f"Report path without extension, written as .json and .csv (default: {DEFAULT_REPORT})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Verification processes (1 runs in process)")
+    parser.add_argument("--changed-since", type=parse_changed_since,
+                        help="Only LLM files modified after this ISO date/date-time, or after this file was written")
+    parser.add_argument("--threshold", type=float, default=99.5, help="Lowest passing completeness in percent (default: 99.5)")
+    args = parser.parse_args()
+
+    _quiet_logging()
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+
+    filings = discover_filings(args.processed_dir, args.downloads_dir)
+    discovered = len(filings)
+    if args.changed_since is not None:
+        filings = [filing for filing in filings if os.path.getmtime(filing[0]) > args.changed_since]
+    discovery_time = time.perf_counter() - start
+    print(f"Discovered {discovered} LLM files in {discovery_time:.2f}s; verifying {len(filings)}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    results = []
+    with open(f"{args.report}.csv", 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+
+        def record(result):
+            results.append(result)
+            writer.writerow(result)
+            csv_file.flush()
+            completeness = result.get("adjusted_completeness")
+            print(f"[{len(results)}/{len(filings)}] {result['status']:<7} {result['llm_file']}"
+                  + (f" {completeness:.2f}%" if completeness is not None else f" ({result['error']})")
+                  + f" {result['seconds']:.2f}s")
+
+        if args.workers > 1 and len(filings) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_quiet_logging) as executor:
+                futures = [executor.submit(verify_filing, *filing, args.threshold) for filing in filings]
+                for future in as_completed(futures):
+                    record(future.result())
+        else:
+            for filing in filings:
+                record(verify_filing(*filing, args.threshold))
+
+    results.sort(key=lambda result: result["llm_file"])
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    summary = {
+        "started_at": started_at,
+        "wall_seconds": round(time.perf_counter() - start, 4),
+        "discovery_seconds": round(discovery_time, 4),
+        "verification_seconds": round(sum(result["seconds"] for result in results), 4),
+        "workers": args.workers,
+        "threshold": args.threshold,
+        "changed_since": datetime.datetime.fromtimestamp(args.changed_since).isoformat(timespec="seconds") if args.changed_since is not None else None,
+        "discovered": discovered,
+        "verified": len(results),
+        "statuses": statuses,
+        "total_raw_facts": sum(result.get("total_raw_facts", 0) for result in results),
+        "matched": sum(result.get("matched", 0) for result in results),
+        "name_only_matched": sum(result.get("name_only_matched", 0) for result in results),
+        "still_missing": sum(result.get("still_missing", 0) for result in results)
+    }
+    with open(f"{args.report}.json", 'w', encoding='utf-8') as f:
+        json.dump({"summary": summary, "filings": results}, f, indent=2)
+
+    print(f"Verified {len(results)} filings in {summary['wall_seconds']:.2f}s "
+          f"({summary['verification_seconds']:.2f}s of verification, {args.workers} workers): "
+          + (", ".join(f"{count} {status}" for status, count in sorted(statuses.items())) or "nothing to verify"))
+    print(f"Report: {args.report}.json, {args.report}.csv")
+    return 0 if all(result["status"] == "passed" for result in results) else 1
+
+
+if __name__ == "__main__":
+    exit(main())